@@ -0,0 +1,391 @@
+import atexit
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import and_, or_
+
+from RaspPiReader import pool
+from RaspPiReader.libs import alarm_rules
+from RaspPiReader.libs.database import Database
+from RaspPiReader.libs.models import AlarmEvent
+
+logger = logging.getLogger(__name__)
+
+# Alarm states
+NORMAL = 'normal'
+ACTIVE = 'active'  # Raised, not acknowledged
+ACKNOWLEDGED = 'acknowledged'  # Raised and acknowledged
+RETURNED = 'returned'  # Condition cleared on a latching rule, waiting for acknowledgement
+
+# Transition events
+RAISED = 'raised'
+CLEARED = 'cleared'
+ACKNOWLEDGE = 'acknowledged'
+
+DEFAULT_FLUSH_SECONDS = 2.0
+DEFAULT_MAX_BATCH = 200
+
+# One change of a rule's alarm state; value is the channel reading that caused it, None if there was none
+AlarmTransition = namedtuple('AlarmTransition', ['rule', 'event', 'state', 'value', 'time', 'cycle_id'])
+
+
+class AlarmEngine:
+    """
+    Alarm state machine over the compiled alarm rules.
+
+    Each update() evaluates every rule against a scan in one step. A rule's
+    condition sets when its threshold is exceeded and clears only once the
+    value is back past the threshold by the rule's hysteresis. The alarm
+    raises after the condition has held for on_delay seconds and clears
+    after it has stayed clear for off_delay seconds. A latching alarm whose
+    condition clears before it is acknowledged stays up as 'returned' until
+    acknowledge().
+
+    Only transitions are reported: update() and acknowledge() return them
+    and pass them to subscribers, such as the history writer.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._subscribers = {}
+        self._next_subscription = 1
+        self.cycle_id = None
+        self._ruleset = None
+        self._values = np.full(alarm_rules.CHANNEL_COUNT, np.nan)
+        self._reset_state(0, time.time())
+
+    def _reset_state(self, count, now):
+        self._condition = np.zeros(count, dtype=bool)
+        self._since = np.full(count, now)
+        self._alarmed = np.zeros(count, dtype=bool)
+        self._acked = np.zeros(count, dtype=bool)
+        self._latched = np.zeros(count, dtype=bool)
+
+    def _state(self, i):
+        if self._alarmed[i]:
+            return ACKNOWLEDGED if self._acked[i] else ACTIVE
+        return RETURNED if self._latched[i] else NORMAL
+
+    def _transition(self, rule, event, state, value, now):
+        value = None if value is None or np.isnan(value) else float(value)
+        return AlarmTransition(rule, event, state, value, datetime.fromtimestamp(now), self.cycle_id)
+
+    def _rule_value(self, i):
+        return self._values[self._ruleset.index[i]]
+
+    def _sync(self, ruleset, now):
+        """Carry the state over to a recompiled rule set; alarms of removed rules clear"""
+        if self._ruleset is not None and ruleset.version == self._ruleset.version:
+            return []
+        old_ruleset, old = self._ruleset, (self._condition, self._since, self._alarmed, self._acked, self._latched)
+        self._ruleset = ruleset
+        self._reset_state(len(ruleset.rules), now)
+        if old_ruleset is None:
+            return []
+        positions = {rule.id: i for i, rule in enumerate(ruleset.rules)}
+        transitions = []
+        for j, rule in enumerate(old_ruleset.rules):
+            i = positions.get(rule.id)
+            if i is not None and ruleset.rules[i] == rule:
+                for array, previous in zip((self._condition, self._since, self._alarmed, self._acked, self._latched),
+                                           old):
+                    array[i] = previous[j]
+            elif old[2][j] or old[4][j]:
+                # The rule was changed or removed while its alarm was up
+                transitions.append(self._transition(rule, CLEARED, NORMAL,
+                                                    self._values[old_ruleset.index[j]], now))
+        return transitions
+
+    def update(self, values, now=None):
+        """
+        Advance every alarm with a new scan.
+
+        Args:
+            values: Reading per channel, values[n - 1] being channel n; NaN where there is none
+            now: Epoch seconds of the scan, the current time by default
+
+        Returns:
+            list: AlarmTransition for every alarm that changed state
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            transitions = self._sync(alarm_rules.current(), now)
+            ruleset = self._ruleset
+            self._values = np.array(values, dtype=np.float64)
+            if ruleset.rules:
+                # A channel without a reading neither sets nor clears its conditions
+                condition = np.where(self._condition, ~alarm_rules.cleared(self._values, ruleset),
+                                     alarm_rules.evaluate(self._values, ruleset))
+                self._since[condition != self._condition] = now
+                self._condition = condition
+                held = now - self._since
+                for i in np.flatnonzero(condition & ~self._alarmed & (held >= ruleset.on_delay)):
+                    self._alarmed[i] = True
+                    self._acked[i] = False
+                    self._latched[i] = False
+                    transitions.append(self._transition(ruleset.rules[i], RAISED, ACTIVE, self._rule_value(i), now))
+                for i in np.flatnonzero(~condition & self._alarmed & (held >= ruleset.off_delay)):
+                    self._alarmed[i] = False
+                    self._latched[i] = ruleset.latching[i] and not self._acked[i]
+                    transitions.append(self._transition(ruleset.rules[i], CLEARED, self._state(i),
+                                                        self._rule_value(i), now))
+        self._publish(transitions)
+        return transitions
+
+    def acknowledge(self, rule_ids=None, now=None):
+        """
+        Acknowledge raised and returned alarms.
+
+        Args:
+            rule_ids: Ids of the rules to acknowledge, all by default
+
+        Returns:
+            list: AlarmTransition for every alarm acknowledged
+        """
+        now = time.time() if now is None else now
+        transitions = []
+        with self._lock:
+            if self._ruleset is None:
+                return transitions
+            pending = (self._alarmed & ~self._acked) | self._latched
+            for i in np.flatnonzero(pending):
+                rule = self._ruleset.rules[i]
+                if rule_ids is not None and rule.id not in rule_ids:
+                    continue
+                self._acked[i] = bool(self._alarmed[i])
+                self._latched[i] = False
+                transitions.append(self._transition(rule, ACKNOWLEDGE, self._state(i), self._rule_value(i), now))
+        self._publish(transitions)
+        return transitions
+
+    def reset(self, now=None):
+        """
+        Clear every alarm, as at the end of a cycle.
+
+        Returns:
+            list: A CLEARED AlarmTransition for every alarm that was up
+        """
+        now = time.time() if now is None else now
+        transitions = []
+        with self._lock:
+            if self._ruleset is not None:
+                for i in np.flatnonzero(self._alarmed | self._latched):
+                    transitions.append(self._transition(self._ruleset.rules[i], CLEARED, NORMAL,
+                                                        self._rule_value(i), now))
+                self._reset_state(len(self._ruleset.rules), now)
+        self._publish(transitions)
+        return transitions
+
+    def set_cycle(self, cycle_id):
+        """Tag the following transitions with a cycle (cycle_data.id), None outside a cycle"""
+        with self._lock:
+            self.cycle_id = cycle_id
+
+    def alarms(self):
+        """
+        The alarms that are up.
+
+        Returns:
+            dict: 'CH<n>' -> list of (AlarmRule, state), for every channel that has rules
+        """
+        with self._lock:
+            ruleset = self._ruleset or alarm_rules.current()
+            alarms = {f"CH{number}": [] for number in ruleset.channels}
+            if ruleset is self._ruleset:
+                for i in np.flatnonzero(self._alarmed | self._latched):
+                    alarms[ruleset.rules[i].channel].append((ruleset.rules[i], self._state(i)))
+            return alarms
+
+    # Subscriptions
+
+    def subscribe(self, callback):
+        """
+        Call callback(transitions) with the list of transitions of every change.
+
+        Returns:
+            int: Subscription id for unsubscribe()
+        """
+        with self._lock:
+            subscription = self._next_subscription
+            self._next_subscription += 1
+            self._subscribers[subscription] = callback
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.pop(subscription, None)
+
+    def _publish(self, transitions):
+        if not transitions:
+            return
+        for transition in transitions:
+            text = f"{transition.rule.channel} {alarm_rules.describe(transition.rule)}"
+            if transition.event == RAISED:
+                logger.warning(f"Alarm raised: {text} at value {transition.value}")
+            else:
+                logger.info(f"Alarm {transition.event}: {text} ({transition.state})")
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for callback in subscribers:
+            try:
+                callback(transitions)
+            except Exception as e:
+                logger.error(f"Error in alarm subscriber {getattr(callback, '__name__', callback)}: {e}")
+
+
+class AlarmHistoryWriter:
+    """
+    Writes alarm transitions to the alarm_history table in batches.
+
+    Transitions are collected in memory and inserted together every
+    flush_interval seconds, as soon as max_batch are waiting, when flush()
+    is called or at exit.
+    """
+
+    def __init__(self, database_url="sqlite:///local_database.db", flush_interval=None, max_batch=DEFAULT_MAX_BATCH):
+        if flush_interval is None:
+            flush_interval = pool.config('alarm_history_flush_seconds', float, DEFAULT_FLUSH_SECONDS)
+        self.db = Database(database_url)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending = []
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def write(self, transitions):
+        """Queue transitions for the next batch"""
+        with self._lock:
+            self._pending.extend(transitions)
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """
+        Insert the queued transitions now.
+
+        Returns:
+            int: Number of transitions written
+        """
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            session = self.db.session
+            try:
+                session.add_all([AlarmEvent(
+                    cycle_id=transition.cycle_id,
+                    rule_id=transition.rule.id,
+                    channel=transition.rule.channel,
+                    kind=transition.rule.kind,
+                    threshold=transition.rule.threshold,
+                    message=transition.rule.message,
+                    event=transition.event,
+                    state=transition.state,
+                    value=transition.value,
+                    timestamp=transition.time,
+                ) for transition in batch])
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error writing {len(batch)} alarm history entries: {e}")
+                # Keep them for the next flush
+                with self._lock:
+                    self._pending[:0] = batch
+                return 0
+        logger.debug(f"Wrote {len(batch)} alarm history entries")
+        return len(batch)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="alarm_history_writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the background thread after writing what is queued"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+def cycle_events(session, cycle_id, start_time=None, stop_time=None):
+    """
+    The alarm history of a cycle, oldest first.
+
+    Transitions recorded without a cycle id are included when they fall
+    between start_time and stop_time.
+
+    Args:
+        session: SQLAlchemy session
+        cycle_id: cycle_data id
+
+    Returns:
+        list: AlarmEvent rows
+    """
+    condition = AlarmEvent.cycle_id == cycle_id
+    if start_time is not None and stop_time is not None:
+        condition = or_(condition, and_(AlarmEvent.cycle_id.is_(None),
+                                        AlarmEvent.timestamp.between(start_time, stop_time)))
+    return session.query(AlarmEvent).filter(condition).order_by(AlarmEvent.timestamp, AlarmEvent.id).all()
+
+
+def flush_history():
+    """Write the transitions the history writer still holds, if it is running"""
+    if _writer is not None:
+        _writer.flush()
+
+
+_instance = None
+_writer = None
+_instance_lock = threading.Lock()
+
+
+def get_writer():
+    """
+    Get or create the application-wide alarm history writer.
+
+    Returns:
+        AlarmHistoryWriter: The running writer
+    """
+    global _writer
+    with _instance_lock:
+        if _writer is None:
+            _writer = AlarmHistoryWriter()
+            _writer.start()
+    return _writer
+
+
+def get_instance():
+    """
+    Get or create the application-wide alarm engine, with its history writer subscribed.
+
+    Returns:
+        AlarmEngine: The shared engine
+    """
+    global _instance
+    writer = get_writer()
+    with _instance_lock:
+        if _instance is None:
+            _instance = AlarmEngine()
+            _instance.subscribe(writer.write)
+    return _instance
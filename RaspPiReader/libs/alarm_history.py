@@ -0,0 +1,236 @@
+import logging
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import func
+
+from RaspPiReader.libs.alarm_engine import CLEARED, RAISED, cycle_events
+from RaspPiReader.libs.alarm_rules import HIGH_THRESHOLD, LOW_THRESHOLD
+from RaspPiReader.libs.models import AlarmCycleSummary, AlarmEvent, CycleData
+
+logger = logging.getLogger(__name__)
+
+KINDS = {'low': LOW_THRESHOLD, 'high': HIGH_THRESHOLD}
+
+# Cycles rebuild() summarizes per commit
+REBUILD_BATCH = 100
+
+# One channel and threshold kind of one cycle, as returned by find_cycles()
+CycleAlarms = namedtuple('CycleAlarms', ['cycle_id', 'order_id', 'cycle_number', 'cycle_start', 'channel', 'kind',
+                                         'alarm_count', 'total_seconds', 'longest_seconds', 'first_raised_at',
+                                         'last_cleared_at'])
+
+
+def ensure_indexes(engine):
+    """Create the alarm history indexes on databases created before they existed"""
+    for table in (AlarmEvent.__table__, AlarmCycleSummary.__table__):
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                logger.error(f"Error creating index {index.name}: {e}")
+
+
+def channel_name(channel):
+    """'CH<n>' for a channel given as 13, '13', 'ch13' or 'CH13'"""
+    text = str(channel).strip().upper()
+    return text if text.startswith('CH') else f"CH{int(text)}"
+
+
+def _merge(intervals):
+    """Merge overlapping (start, end) intervals; returns the merged list in time order"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def summarize_events(events, end_time):
+    """
+    Count and time the alarms in a cycle's history.
+
+    An alarm lasts from its 'raised' transition to the next 'cleared' of the
+    same rule, or to end_time if it never cleared. Alarms of different rules
+    on the same channel and kind that overlap are counted once in the
+    durations.
+
+    Args:
+        events: AlarmEvent rows (or anything with the same attributes) in time order
+        end_time: When the cycle ended
+
+    Returns:
+        dict: (channel, kind) -> dict of alarm_count, total_seconds, longest_seconds,
+            first_raised_at and last_cleared_at
+    """
+    open_alarms = {}
+    intervals = {}
+    counts = {}
+    for event in events:
+        rule = event.rule_id if event.rule_id is not None else (event.channel, event.kind, event.message)
+        key = (event.channel, event.kind)
+        if event.event == RAISED:
+            if rule not in open_alarms:
+                open_alarms[rule] = (key, event.timestamp)
+                counts[key] = counts.get(key, 0) + 1
+        elif event.event == CLEARED and rule in open_alarms:
+            key, started = open_alarms.pop(rule)
+            intervals.setdefault(key, []).append((started, max(event.timestamp, started)))
+    for key, started in open_alarms.values():
+        intervals.setdefault(key, []).append((started, max(end_time, started)))
+
+    summary = {}
+    for key, count in counts.items():
+        merged = _merge(intervals.get(key, []))
+        seconds = [(end - start).total_seconds() for start, end in merged]
+        summary[key] = {
+            'alarm_count': count,
+            'total_seconds': sum(seconds),
+            'longest_seconds': max(seconds, default=0.0),
+            'first_raised_at': merged[0][0] if merged else None,
+            'last_cleared_at': merged[-1][1] if merged else None,
+        }
+    return summary
+
+
+def summarize_cycle(session, cycle_id, commit=True):
+    """
+    Write a cycle's alarm counts and durations to alarm_cycle_summary.
+
+    The cycle's previous summary rows are replaced, so this can run again
+    when a finalization is resumed or a report regenerated.
+
+    Args:
+        session: SQLAlchemy session
+        cycle_id: CycleData id
+        commit: Commit the rows; False leaves that to the caller
+
+    Returns:
+        list: The AlarmCycleSummary rows written
+    """
+    cycle = session.query(CycleData.start_time, CycleData.stop_time).filter(CycleData.id == cycle_id).one_or_none()
+    if cycle is None:
+        raise ValueError(f"Cycle {cycle_id} not found")
+    end_time = cycle.stop_time or datetime.now()
+    summary = summarize_events(cycle_events(session, cycle_id, cycle.start_time, end_time), end_time)
+    rows = [AlarmCycleSummary(cycle_id=cycle_id, cycle_start=cycle.start_time, channel=channel, kind=kind, **values)
+            for (channel, kind), values in sorted(summary.items())]
+    try:
+        session.query(AlarmCycleSummary).filter(AlarmCycleSummary.cycle_id == cycle_id).delete()
+        session.add_all(rows)
+        if commit:
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return rows
+
+
+def find_cycles(session, channel=None, kind=None, since=None, until=None, min_seconds=None, limit=None):
+    """
+    Cycles with alarms, from the per-cycle summaries.
+
+    Args:
+        session: SQLAlchemy session
+        channel: Only this channel ('CH13' or 13)
+        kind: Only LOW_THRESHOLD or HIGH_THRESHOLD alarms
+        since / until: Only cycles that started in this range
+        min_seconds: Only where the alarms were up at least this long in total
+        limit: At most this many rows, most recent cycles first
+
+    Returns:
+        list: CycleAlarms, most recent cycles first
+    """
+    query = session.query(AlarmCycleSummary, CycleData.order_id, CycleData.cycle_id)\
+        .join(CycleData, CycleData.id == AlarmCycleSummary.cycle_id)
+    if channel is not None:
+        query = query.filter(AlarmCycleSummary.channel == channel_name(channel))
+    if kind is not None:
+        query = query.filter(AlarmCycleSummary.kind == kind)
+    if since is not None:
+        query = query.filter(AlarmCycleSummary.cycle_start >= since)
+    if until is not None:
+        query = query.filter(AlarmCycleSummary.cycle_start < until)
+    if min_seconds is not None:
+        query = query.filter(AlarmCycleSummary.total_seconds >= min_seconds)
+    query = query.order_by(AlarmCycleSummary.cycle_start.desc(), AlarmCycleSummary.cycle_id.desc(),
+                           AlarmCycleSummary.channel, AlarmCycleSummary.kind)
+    if limit:
+        query = query.limit(limit)
+    return [CycleAlarms(row.cycle_id, order_id, cycle_number, row.cycle_start, row.channel, row.kind,
+                        row.alarm_count, row.total_seconds, row.longest_seconds, row.first_raised_at,
+                        row.last_cleared_at)
+            for row, order_id, cycle_number in query]
+
+
+def totals(session, since=None, until=None, kind=None):
+    """
+    Alarm totals per channel and kind over a period, from the per-cycle summaries.
+
+    Returns:
+        list: (channel, kind, cycles, alarm_count, total_seconds) tuples
+    """
+    query = session.query(AlarmCycleSummary.channel, AlarmCycleSummary.kind,
+                          func.count(AlarmCycleSummary.cycle_id), func.sum(AlarmCycleSummary.alarm_count),
+                          func.sum(AlarmCycleSummary.total_seconds))
+    if kind is not None:
+        query = query.filter(AlarmCycleSummary.kind == kind)
+    if since is not None:
+        query = query.filter(AlarmCycleSummary.cycle_start >= since)
+    if until is not None:
+        query = query.filter(AlarmCycleSummary.cycle_start < until)
+    query = query.group_by(AlarmCycleSummary.channel, AlarmCycleSummary.kind)
+    return sorted(((channel, kind, cycles, count or 0, seconds or 0.0)
+                   for channel, kind, cycles, count, seconds in query),
+                  key=lambda row: (int(row[0][2:]) if row[0][2:].isdigit() else 0, row[1]))
+
+
+def events(session, cycle_id, channel=None):
+    """
+    A cycle's alarm transitions, oldest first, served by the (cycle, channel, time) index.
+
+    Returns:
+        list: AlarmEvent rows
+    """
+    query = session.query(AlarmEvent).filter(AlarmEvent.cycle_id == cycle_id)
+    if channel is not None:
+        query = query.filter(AlarmEvent.channel == channel_name(channel))
+    return query.order_by(AlarmEvent.timestamp, AlarmEvent.id).all()
+
+
+def rebuild(session, cycle_ids=None, progress=None):
+    """
+    Summarize cycles again, by default every cycle that has alarm history.
+
+    Args:
+        cycle_ids: Only these cycles
+        progress: Called as progress(done, total) after each batch of cycles
+
+    Returns:
+        int: Number of cycles summarized
+    """
+    if cycle_ids is None:
+        cycle_ids = [cycle_id for (cycle_id,) in session.query(AlarmEvent.cycle_id)
+                     .filter(AlarmEvent.cycle_id.isnot(None)).distinct()]
+    done = 0
+    for start in range(0, len(cycle_ids), REBUILD_BATCH):
+        batch = cycle_ids[start:start + REBUILD_BATCH]
+        try:
+            for cycle_id in batch:
+                summarize_cycle(session, cycle_id, commit=False)
+            session.commit()
+            done += len(batch)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error summarizing alarms of cycles {batch[0]}-{batch[-1]}, retrying one by one: {e}")
+            for cycle_id in batch:
+                try:
+                    summarize_cycle(session, cycle_id)
+                    done += 1
+                except Exception as e:
+                    logger.error(f"Error summarizing alarms of cycle {cycle_id}: {e}")
+        if progress:
+            progress(done, len(cycle_ids))
+    return done
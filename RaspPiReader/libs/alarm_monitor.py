@@ -1,7 +1,10 @@
 import logging
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
+import numpy as np
 from RaspPiReader import pool
+from RaspPiReader.libs import alarm_engine, alarm_rules
+from RaspPiReader.libs.channel_config import CHANNEL_COUNT, convert_value, latest_scan, latest_value
 from RaspPiReader.libs.database import Database
 from RaspPiReader.libs.models import Alarm, AlarmMapping
 from RaspPiReader.libs.plc_communication import read_holding_register
@@ -9,47 +12,53 @@ from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
+# Shown after the alarm text of alarms that are up but no longer plain active
+_STATE_SUFFIXES = {
+    alarm_engine.ACKNOWLEDGED: " (acknowledged)",
+    alarm_engine.RETURNED: " (returned, not acknowledged)",
+}
+
+
 class AlarmMonitor:
     """
     Enhanced alarm monitoring system with threshold-based alarms.
-    This class handles monitoring of PLC alarms for all channels.
+    This class handles monitoring of PLC alarms for all channels; the alarm
+    states and their history are kept by the shared alarm engine.
     """
     
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, engine: Optional[alarm_engine.AlarmEngine] = None):
         """Initialize the alarm monitor."""
         self.db = db
+        self.engine = engine or alarm_engine.get_instance()
         self.cache: Dict[str, Tuple[str, str]] = {}
         self.last_update = datetime.now()
-        self.cache_duration = timedelta(seconds=1)
+        self.cache_duration = timedelta(milliseconds=500)  # A check is reused this long by the next caller
         self.is_monitoring = False
         self.monitoring_timer = None
         self._active_alarms: Dict[str, List[str]] = {}  # Channel -> List of active alarm messages
         self._last_values: Dict[str, float] = {}  # Channel -> Last read value
         self._error_counts: Dict[str, int] = {}  # Channel -> Consecutive error count
         self.MAX_ERRORS = 3  # Maximum consecutive errors before reporting communication issue
+        self._last_check = None  # (rule set version, has_active_alarms, channel_alarms) of the last check
         
     def _get_channel_value(self, channel: str) -> Optional[float]:
-        """Get the current value for a channel from the PLC."""
+        """Get the current value for a channel: the read loop's latest scan, or read from the PLC."""
         try:
             # Extract channel number (e.g., 'CH1' -> 1)
             channel_num = int(channel[2:])
+            value = latest_value(channel_num)
+            if value is not None:
+                return value
             addr_key = f'channel_{channel_num}_address'
             channel_addr = int(pool.config(addr_key, int, 0))
             
             if channel_addr > 0:
                 value = read_holding_register(channel_addr, 1)
                 if value is not None:
-                    # Ensure value is a number
                     if isinstance(value, list) and len(value) > 0:
                         value = value[0]
-                    value = int(value)  # Convert to int first
-                    
-                    # Apply scaling if configured
-                    scale_enabled = pool.config(f'scale{channel_num}', bool, False)
-                    decimal_places = pool.config(f'decimal_point{channel_num}', int, 0)
-                    if scale_enabled and decimal_places > 0:
-                        value = value / (10 ** decimal_places)
-                    return value
+                    # Same conversion as the read loop's scans
+                    return convert_value(channel_num, int(value))
             return None
         except Exception as e:
             self.db.logger.error(f"Error reading {channel} value: {e}")
@@ -57,40 +66,71 @@ class AlarmMonitor:
             
     def _check_thresholds(self, channel: str, value: float) -> List[str]:
         """Check if the value exceeds any configured thresholds."""
-        active_alarms = []
         try:
-            with Session(self.db.engine) as session:
-                alarm = session.query(Alarm).filter_by(channel=channel).first()
-                if alarm:
-                    mappings = session.query(AlarmMapping).filter_by(alarm_id=alarm.id, active=True).all()
-                    for mapping in mappings:
-                        # Ensure both value and threshold are float for comparison
-                        threshold = float(mapping.threshold)
-                        if mapping.value == 1 and value < threshold:  # Low threshold
-                            active_alarms.append(f"Low Threshold ({threshold:.2f}): {mapping.message}")
-                        elif mapping.value == 2 and value > threshold:  # High threshold
-                            active_alarms.append(f"High Threshold ({threshold:.2f}): {mapping.message}")
+            values = np.full(CHANNEL_COUNT, np.nan)
+            values[int(channel[2:]) - 1] = value
+            return alarm_rules.triggered(values).get(channel, [])
         except Exception as e:
             logger.error(f"Error checking thresholds for {channel}: {e}")
-        return active_alarms
+            return []
+
+    def _scan_values(self, channels) -> np.ndarray:
+        """
+        Current reading of every channel, NaN where there is none.
+
+        Readings come from the read loop's latest scan; only the given
+        channels missing from it are read from the PLC.
+        """
+        scan = latest_scan()
+        values = np.array(scan.values) if scan is not None else np.full(CHANNEL_COUNT, np.nan)
+        for number in channels:
+            if np.isnan(values[number - 1]):
+                value = self._get_channel_value(f"CH{number}")
+                if value is not None:
+                    values[number - 1] = value
+        return values
         
-    def start_monitoring(self):
-        """Start monitoring alarms"""
+    def start_monitoring(self, cycle_id: Optional[int] = None):
+        """
+        Start monitoring alarms.
+
+        Args:
+            cycle_id: cycle_data id the alarm history is recorded for, the current cycle's by default
+        """
         if not self.is_monitoring:
+            if cycle_id is None:
+                cycle_id = getattr(pool.get("current_cycle"), 'id', None)
+            self.engine.set_cycle(cycle_id if isinstance(cycle_id, int) else None)
             self.is_monitoring = True
             logger.info("Alarm monitoring started")
             # Clear any existing alarms when starting
+            self.engine.reset()
             self._active_alarms.clear()
             self._last_values.clear()
+            self._last_check = None
 
     def stop_monitoring(self):
         """Stop monitoring alarms"""
         if self.is_monitoring:
             self.is_monitoring = False
             logger.info("Alarm monitoring stopped")
-            # Clear alarms when stopping
+            # Clear alarms when stopping; the history records them as cleared at the end of the cycle
+            self.engine.reset()
+            self.engine.set_cycle(None)
             self._active_alarms.clear()
             self._last_values.clear()
+            self._last_check = None
+
+    def acknowledge(self, rule_ids=None) -> int:
+        """
+        Acknowledge the alarms that are up.
+
+        Returns:
+            int: Number of alarms acknowledged
+        """
+        acknowledged = self.engine.acknowledge(rule_ids)
+        self._last_check = None
+        return len(acknowledged)
 
     def check_alarms(self) -> Tuple[bool, Dict[str, List[str]]]:
         """
@@ -98,42 +138,39 @@ class AlarmMonitor:
         
         Returns:
             Tuple[bool, Dict[str, List[str]]]: (has_active_alarms, channel_alarms)
-            where channel_alarms is a dictionary mapping channels to their active alarm messages.
+            where channel_alarms is a dictionary mapping channels to the messages of their alarms that are up.
         """
-        has_active_alarms = False
-        channel_alarms: Dict[str, List[str]] = {}
-        
         # Only check alarms if monitoring is active
         if not self.is_monitoring:
-            return False, channel_alarms
-            
+            return False, {}
+
+        # The status text and style are refreshed together; evaluate once for both
+        ruleset = alarm_rules.current()
+        now = datetime.now()
+        if (self._last_check is not None and self._last_check[0] == ruleset.version
+                and now - self.last_update < self.cache_duration):
+            return self._last_check[1], self._last_check[2]
+
+        has_active_alarms = False
+        channel_alarms: Dict[str, List[str]] = {}
         try:
-            # Get all configured channels
-            channels = [f"CH{i}" for i in range(1, 15)]  # CH1 to CH14
-            
-            for channel in channels:
-                value = self._get_channel_value(channel)
-                if value is None:
-                    continue
-                    
-                # Store last value for comparison
-                self._last_values[channel] = value
-                
-                # Check thresholds
-                active_alarms = self._check_thresholds(channel, value)
-                if active_alarms:
-                    channel_alarms[channel] = active_alarms
-                    has_active_alarms = True
-                    logger.warning(f"Alarms triggered for {channel} at value {value}: {active_alarms}")
-                else:
-                    channel_alarms[channel] = []
-                        
-                # Update active alarms
-                self._active_alarms[channel] = channel_alarms[channel]
-                    
+            # All rules are evaluated against one scan in a single step
+            values = self._scan_values(ruleset.channels)
+            self.engine.update(values)
+            for channel, alarms in self.engine.alarms().items():
+                channel_alarms[channel] = [alarm_rules.describe(rule) + _STATE_SUFFIXES.get(state, "")
+                                           for rule, state in alarms]
+                has_active_alarms = has_active_alarms or bool(alarms)
+                value = values[int(channel[2:]) - 1]
+                if not np.isnan(value):
+                    # Store last value for comparison
+                    self._last_values[channel] = float(value)
+            self._active_alarms = channel_alarms
         except Exception as e:
             logger.error(f"Error checking alarms: {e}")
-            
+
+        self.last_update = now
+        self._last_check = (ruleset.version, has_active_alarms, channel_alarms)
         return has_active_alarms, channel_alarms
         
     def get_alarm_status_text(self) -> str:
@@ -187,7 +224,8 @@ class AlarmMonitor:
             if value is None:
                 return "No data", "color: gray;"
 
-            active_alarms = self._check_thresholds(channel, value)
+            self.check_alarms()
+            active_alarms = self._active_alarms.get(channel, [])
             if active_alarms:
                 return "\n".join(active_alarms), "color: red; font-weight: bold;"
             return "Normal", "color: green;"
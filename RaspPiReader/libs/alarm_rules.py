@@ -0,0 +1,188 @@
+import logging
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_COUNT = 14
+
+# alarm_mappings.value of a low and a high threshold rule
+LOW_THRESHOLD = 1
+HIGH_THRESHOLD = 2
+
+# One active alarm mapping: channel is the 'CH<n>' name, number its channel number.
+#   hysteresis       how far back past the threshold the value must go before the condition clears
+#   on_delay / off_delay  seconds the condition must hold / stay clear before the alarm raises / clears
+#   latching         the alarm stays up after its condition clears until it is acknowledged
+AlarmRule = namedtuple('AlarmRule', ['id', 'channel', 'number', 'kind', 'threshold', 'message',
+                                     'hysteresis', 'on_delay', 'off_delay', 'latching'])
+
+# The active rules compiled for evaluation, one array entry per rule:
+#   index            channel number - 1 of the rule, to pick its value from a scan
+#   threshold        threshold value
+#   high             True for a high threshold (value > threshold), False for low (value < threshold)
+#   hysteresis / on_delay / off_delay / latching  the rules' settings as arrays
+AlarmRuleSet = namedtuple('AlarmRuleSet', ['rules', 'index', 'threshold', 'high', 'hysteresis', 'on_delay',
+                                           'off_delay', 'latching', 'channels', 'version'])
+
+
+def _channel_number(channel):
+    try:
+        number = int(str(channel).strip().upper().replace('CH', ''))
+    except ValueError:
+        return None
+    return number if 1 <= number <= CHANNEL_COUNT else None
+
+
+def describe(rule):
+    """The alarm text shown for a triggered rule"""
+    kind = "High" if rule.kind == HIGH_THRESHOLD else "Low"
+    return f"{kind} Threshold ({rule.threshold:.2f}): {rule.message}"
+
+
+def compile_rules(rules, version=0):
+    """
+    Compile rules into the arrays evaluate() works with.
+
+    Args:
+        rules: AlarmRule per rule, in display order
+        version: Version number of the rule set
+
+    Returns:
+        AlarmRuleSet: The compiled rules
+    """
+    rules = tuple(rules)
+    index = np.array([rule.number - 1 for rule in rules], dtype=np.intp)
+    threshold = np.array([rule.threshold for rule in rules], dtype=np.float64)
+    high = np.array([rule.kind == HIGH_THRESHOLD for rule in rules], dtype=bool)
+    hysteresis = np.array([rule.hysteresis for rule in rules], dtype=np.float64)
+    on_delay = np.array([rule.on_delay for rule in rules], dtype=np.float64)
+    off_delay = np.array([rule.off_delay for rule in rules], dtype=np.float64)
+    latching = np.array([rule.latching for rule in rules], dtype=bool)
+    for array in (index, threshold, high, hysteresis, on_delay, off_delay, latching):
+        array.setflags(write=False)
+    channels = tuple(sorted({rule.number for rule in rules}))
+    return AlarmRuleSet(rules, index, threshold, high, hysteresis, on_delay, off_delay, latching, channels, version)
+
+
+def evaluate(values, ruleset=None):
+    """
+    Evaluate every rule against a scan in one step.
+
+    Args:
+        values: Reading per channel, values[n - 1] being channel n; NaN where there is none
+        ruleset: AlarmRuleSet to evaluate, the current one by default
+
+    Returns:
+        numpy.ndarray: True for each rule whose threshold is exceeded, in ruleset.rules order
+    """
+    ruleset = ruleset or current()
+    if not ruleset.rules:
+        return np.zeros(0, dtype=bool)
+    values = np.asarray(values, dtype=np.float64)[ruleset.index]
+    # Comparisons with NaN are False, so channels without a reading never alarm
+    return np.where(ruleset.high, values > ruleset.threshold, values < ruleset.threshold)
+
+
+def cleared(values, ruleset=None):
+    """
+    Which rules' conditions a scan clears, taking hysteresis into account.
+
+    A high threshold clears once the value is at least hysteresis below the
+    threshold, a low threshold once it is at least hysteresis above it. A
+    channel without a reading clears nothing.
+
+    Returns:
+        numpy.ndarray: True for each rule whose condition is clear, in ruleset.rules order
+    """
+    ruleset = ruleset or current()
+    if not ruleset.rules:
+        return np.zeros(0, dtype=bool)
+    values = np.asarray(values, dtype=np.float64)[ruleset.index]
+    return np.where(ruleset.high, values <= ruleset.threshold - ruleset.hysteresis,
+                    values >= ruleset.threshold + ruleset.hysteresis)
+
+
+def triggered(values, ruleset=None):
+    """
+    The alarm texts of the rules a scan triggers.
+
+    Returns:
+        dict: 'CH<n>' -> list of alarm texts, for every channel that has rules
+    """
+    ruleset = ruleset or current()
+    alarms = {f"CH{number}": [] for number in ruleset.channels}
+    for rule, hit in zip(ruleset.rules, evaluate(values, ruleset)):
+        if hit:
+            alarms[rule.channel].append(describe(rule))
+    return alarms
+
+
+_ruleset = None
+_ruleset_lock = threading.Lock()
+_schema_checked = False
+
+
+def reload(db=None):
+    """
+    Compile the active alarm mappings and swap them in.
+
+    Args:
+        db: Database to read the alarms from, the local database by default
+
+    Returns:
+        AlarmRuleSet: The new rule set; empty if the alarms could not be read
+    """
+    global _ruleset, _schema_checked
+    rules = []
+    try:
+        from RaspPiReader.libs.database import Database
+        from RaspPiReader.libs.models import Alarm, AlarmMapping
+        db = db or Database("sqlite:///local_database.db")
+        if not _schema_checked:
+            # Older databases lack the hysteresis, delay and latching columns
+            db.update_alarm_schema()
+            _schema_checked = True
+        try:
+            rows = (db.session.query(Alarm.channel, AlarmMapping)
+                    .join(AlarmMapping, AlarmMapping.alarm_id == Alarm.id)
+                    .filter(AlarmMapping.active == True)
+                    .order_by(Alarm.id, AlarmMapping.id))
+            for channel, mapping in rows:
+                number = _channel_number(channel)
+                if number is None or mapping.threshold is None:
+                    logger.error(f"Skipping alarm mapping {mapping.id}: invalid channel {channel!r} or threshold")
+                    continue
+                kind = HIGH_THRESHOLD if mapping.value == HIGH_THRESHOLD else LOW_THRESHOLD
+                rules.append(AlarmRule(mapping.id, f"CH{number}", number, kind, float(mapping.threshold),
+                                       mapping.message, max(mapping.hysteresis or 0.0, 0.0),
+                                       max(mapping.on_delay or 0.0, 0.0), max(mapping.off_delay or 0.0, 0.0),
+                                       bool(mapping.latching)))
+        finally:
+            db.session.rollback()
+    except Exception as e:
+        logger.error(f"Error loading alarm rules: {e}")
+
+    with _ruleset_lock:
+        version = _ruleset.version + 1 if _ruleset is not None else 1
+        _ruleset = compile_rules(rules, version)
+    logger.info(f"Compiled {len(rules)} alarm rules, version {version}")
+    return _ruleset
+
+
+def current():
+    """
+    The compiled alarm rules, compiled on first use.
+
+    Returns:
+        AlarmRuleSet: Immutable rule set, replaced as a whole by reload()
+    """
+    ruleset = _ruleset
+    if ruleset is None:
+        with _ruleset_lock:
+            ruleset = _ruleset
+        if ruleset is None:
+            ruleset = reload()
+    return ruleset
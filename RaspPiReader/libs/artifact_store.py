@@ -0,0 +1,231 @@
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from datetime import datetime
+
+from RaspPiReader.libs.database import Database
+from RaspPiReader.libs.models import Artifact, ArtifactReference
+
+logger = logging.getLogger(__name__)
+
+# Blobs live under <reports>/artifacts/<first two hex digits>/<digest><extension>
+ARTIFACTS_FOLDER = "artifacts"
+HASH_CHUNK = 1024 * 1024
+
+
+def content_digest(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactStore(object):
+    """
+    Content-addressed store for report artifacts such as plot images.
+
+    Every distinct file content is kept once, named after its SHA-256, and
+    each use by a cycle is recorded as an ArtifactReference. Storing the same
+    image for another cycle, or again for the same cycle, only adds a
+    reference. Blobs are immutable, so a report can link to one directly.
+
+    References can carry a cache key describing what the blob was rendered
+    from; find() with that key lets callers skip rendering an identical plot.
+    """
+
+    def __init__(self, root=None, database_url="sqlite:///local_database.db"):
+        """
+        Args:
+            root: Blob folder, reports/artifacts under the working directory by default
+            database_url: Database holding the artifact tables
+        """
+        self.root = root or os.path.join(os.getcwd(), "reports", ARTIFACTS_FOLDER)
+        self.db = Database(database_url)
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest, extension):
+        return os.path.join(self.root, digest[:2], f"{digest}{extension}")
+
+    def put(self, path, move=False):
+        """
+        Add a file's content to the store.
+
+        Args:
+            path: Source file
+            move: Remove the source file once its content is stored
+
+        Returns:
+            tuple: (digest, blob path)
+        """
+        extension = os.path.splitext(path)[1].lower()
+        digest = content_digest(path)
+        blob = self.blob_path(digest, extension)
+        if os.path.exists(blob):
+            if move:
+                os.remove(path)
+            logger.debug(f"Artifact {digest[:12]} already stored, not copying {path}")
+        else:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            # Write under a temporary name so a blob is never seen half written
+            handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(blob), suffix='.tmp')
+            os.close(handle)
+            try:
+                if move:
+                    shutil.move(path, temp_path)
+                else:
+                    shutil.copyfile(path, temp_path)
+                os.replace(temp_path, blob)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            logger.info(f"Stored artifact {digest[:12]} ({os.path.getsize(blob)} bytes) from {path}")
+        with self._lock:
+            try:
+                if self.db.session.get(Artifact, digest) is None:
+                    self.db.session.add(Artifact(digest=digest, extension=extension,
+                                                 size=os.path.getsize(blob)))
+                    self.db.session.commit()
+            except Exception as e:
+                self.db.session.rollback()
+                logger.error(f"Error recording artifact {digest[:12]}: {e}")
+        return digest, blob
+
+    def add_reference(self, digest, role, cycle_id=None, cycle_number=None, cache_key=None):
+        """Record that a cycle uses a stored blob"""
+        with self._lock:
+            try:
+                self.db.session.add(ArtifactReference(
+                    digest=digest, role=role, cycle_id=cycle_id,
+                    cycle_number=str(cycle_number) if cycle_number is not None else None,
+                    cache_key=cache_key, created_at=datetime.now()))
+                self.db.session.commit()
+                return True
+            except Exception as e:
+                self.db.session.rollback()
+                logger.error(f"Error recording reference to artifact {digest[:12]}: {e}")
+                return False
+
+    def store(self, path, role, cycle_id=None, cycle_number=None, cache_key=None, move=False):
+        """
+        put() a file and reference it for a cycle.
+
+        Returns:
+            str: Blob path
+        """
+        digest, blob = self.put(path, move=move)
+        self.add_reference(digest, role, cycle_id=cycle_id, cycle_number=cycle_number, cache_key=cache_key)
+        return blob
+
+    def reference(self, blob, role, cycle_id=None, cycle_number=None, cache_key=None):
+        """Reference an already stored blob for a cycle; returns the blob path"""
+        digest = os.path.splitext(os.path.basename(blob))[0]
+        self.add_reference(digest, role, cycle_id=cycle_id, cycle_number=cycle_number, cache_key=cache_key)
+        return blob
+
+    def find(self, role, cycle_id=None, cycle_number=None, cache_key=None):
+        """
+        Return the blob of the newest matching reference whose file still exists.
+
+        References linked to cycle_id are searched first, then those carrying
+        cycle_number; with neither given any cycle matches.
+
+        Args:
+            role: Reference role
+            cycle_id / cycle_number: Cycle the reference belongs to
+            cache_key: Only references made for this render cache key
+
+        Returns:
+            str: Blob path, or None
+        """
+        with self._lock:
+            try:
+                filters = []
+                if cycle_id is not None:
+                    filters.append(ArtifactReference.cycle_id == cycle_id)
+                if cycle_number is not None:
+                    filters.append(ArtifactReference.cycle_number == str(cycle_number))
+                # References linked to the cycle id win over those only carrying its number
+                for cycle_filter in filters or [None]:
+                    query = self.db.session.query(ArtifactReference.digest, Artifact.extension)\
+                        .join(Artifact, Artifact.digest == ArtifactReference.digest)\
+                        .filter(ArtifactReference.role == role)
+                    if cycle_filter is not None:
+                        query = query.filter(cycle_filter)
+                    if cache_key is not None:
+                        query = query.filter(ArtifactReference.cache_key == cache_key)
+                    rows = query.order_by(ArtifactReference.created_at.desc(), ArtifactReference.id.desc())\
+                        .limit(20).all()
+                    for digest, extension in rows:
+                        blob = self.blob_path(digest, extension)
+                        if os.path.exists(blob):
+                            return blob
+                return None
+            except Exception as e:
+                logger.error(f"Error looking up {role} artifacts: {e}")
+                return None
+            finally:
+                self.db.session.rollback()
+
+    def prune(self):
+        """
+        Delete blobs that no reference points to.
+
+        Returns:
+            int: Number of blobs removed
+        """
+        removed = 0
+        with self._lock:
+            try:
+                orphans = self.db.session.query(Artifact)\
+                    .outerjoin(ArtifactReference, ArtifactReference.digest == Artifact.digest)\
+                    .filter(ArtifactReference.id.is_(None)).all()
+                for artifact in orphans:
+                    blob = self.blob_path(artifact.digest, artifact.extension)
+                    if os.path.exists(blob):
+                        os.remove(blob)
+                    self.db.session.delete(artifact)
+                    removed += 1
+                self.db.session.commit()
+            except Exception as e:
+                self.db.session.rollback()
+                logger.error(f"Error pruning artifacts: {e}")
+        return removed
+
+_instance = None
+_instance_lock = threading.Lock()
+
+
+def get_instance():
+    """
+    Get or create the application-wide artifact store.
+
+    Returns:
+        ArtifactStore: The singleton instance
+    """
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = ArtifactStore()
+    return _instance
+
+
+def configure(database_url, root=None):
+    """
+    Replace the application-wide artifact store with one on another database.
+
+    For batch tools working on a database other than the local one; the
+    application itself always uses the default instance.
+
+    Returns:
+        ArtifactStore: The new instance
+    """
+    global _instance
+    with _instance_lock:
+        _instance = ArtifactStore(root=root, database_url=database_url)
+    return _instance
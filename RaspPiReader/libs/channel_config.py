@@ -0,0 +1,313 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from RaspPiReader import pool
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_COUNT = 14
+CORE_TEMP_CHANNEL = 12
+PRESSURE_CHANNEL = 13
+
+# Scaling defaults per channel: (input high, output high); everything else defaults to 0
+_SCALE_DEFAULTS = {
+    CORE_TEMP_CHANNEL: (100.0, 200.0),
+    PRESSURE_CHANNEL: (100.0, 10.0),
+}
+_OTHER_SCALE_DEFAULTS = (0.0, 1000.0)
+
+# One channel's acquisition settings, compiled to what the read loop needs:
+#   number           channel number, 1 based
+#   address / pv     device address (decimal) and register (hex) to read
+#   decimal_point    decimal places of the raw value
+#   divisor          10 ** decimal_point, None when the raw value is not divided
+#   slope            output units per input unit, None when the channel is not scaled
+#   input_low / output_low  scaling origin
+#   gated            scale only values at or above input_low (all but core temperature and pressure)
+#   error            why the settings could not be compiled, None when they are valid
+ChannelSpec = namedtuple('ChannelSpec', ['number', 'address', 'pv', 'decimal_point', 'divisor', 'slope',
+                                         'input_low', 'output_low', 'gated', 'error'])
+
+# The channels' conversion settings as arrays indexed by channel number - 1, so
+# a whole scan is converted in one pass:
+#   divisor          10 ** decimal_point, 1 when the raw value is not divided
+#   scaled           channel has valid scaling
+#   slope / input_low / output_low  scaling coefficients, 0 where not scaled
+#   gated            scale only values at or above input_low
+#   decimals / rounding  decimal_point and 10 ** decimal_point, to round scaled values
+ScanCoefficients = namedtuple('ScanCoefficients', ['divisor', 'scaled', 'slope', 'input_low', 'output_low',
+                                                   'gated', 'decimals', 'rounding'])
+
+ChannelConfigSnapshot = namedtuple('ChannelConfigSnapshot', ['channels', 'version', 'coefficients'])
+
+# A converted scan: values[n - 1] is channel n, NaN where the channel was not read
+Scan = namedtuple('Scan', ['values', 'time', 'version'])
+
+# Readers use the read loop's last scan rather than reading the PLC again while it is this recent (seconds)
+SCAN_MAX_AGE = 5.0
+
+
+def _as_bool(value):
+    """QSettings hands booleans back as 'true'/'false' strings, which are both truthy"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1', 'yes', 'on')
+    return bool(value)
+
+
+def _setting(key, number, row, attribute):
+    """The legacy '<key><n>' setting, falling back to the channel_config_settings column"""
+    value = pool.config(f'{key}{number}', str, None)
+    if value is None and row is not None:
+        value = row.get(attribute)
+    return value
+
+
+def _float(value, default):
+    try:
+        return float(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        return default
+
+
+def compile_channel(number, row=None):
+    """
+    Compile one channel's settings.
+
+    Settings come from the '<key><n>' pool keys the read loop always used,
+    and from the channel's channel_config_settings values (a dict of
+    column values) where a key is not set.
+
+    Returns:
+        ChannelSpec: The compiled channel; error is set if its address or register is invalid
+    """
+    input_high_default, output_high_default = _SCALE_DEFAULTS.get(number, _OTHER_SCALE_DEFAULTS)
+    try:
+        address = int(str(_setting('address', number, row, 'address') or 0).strip(), 10)
+        pv = int(str(_setting('pv', number, row, 'pv') or 0).strip(), 16)
+    except ValueError as e:
+        return ChannelSpec(number, None, None, 0, None, None, 0.0, 0.0, False, f"Invalid address or register: {e}")
+
+    decimal_point = int(_float(_setting('decimal_point', number, row, 'decimal_point'), 0))
+    divisor = pow(10, decimal_point) if decimal_point > 0 else None
+    gated = number not in _SCALE_DEFAULTS
+    input_low = _float(_setting('limit_low', number, row, 'limit_low'), 0.0)
+    input_high = _float(_setting('limit_high', number, row, 'limit_high'), input_high_default)
+    output_low = _float(_setting('min_scale_range', number, row, 'min_scale_range'), 0.0)
+    output_high = _float(_setting('max_scale_range', number, row, 'max_scale_range'), output_high_default)
+
+    slope = None
+    if _as_bool(_setting('scale', number, row, 'scale') or False):
+        # Core temperature and pressure scale over any increasing range, the
+        # other channels only over a range of at least 10 input units
+        valid = input_high >= input_low + 10 if gated else input_high > input_low
+        if valid:
+            slope = (output_high - output_low) / (input_high - input_low)
+    return ChannelSpec(number, address, pv, decimal_point, divisor, slope, input_low, output_low, gated, None)
+
+
+def compile_coefficients(channels):
+    """
+    Build the per-channel coefficient arrays convert_scan() works with.
+
+    Args:
+        channels: ChannelSpec per channel, channels[n - 1] being channel n
+
+    Returns:
+        ScanCoefficients: Read-only arrays of len(channels) entries
+    """
+    scaled = np.array([spec.slope is not None for spec in channels], dtype=bool)
+    coefficients = ScanCoefficients(
+        divisor=np.array([spec.divisor or 1 for spec in channels], dtype=np.float64),
+        scaled=scaled,
+        slope=np.array([spec.slope or 0.0 for spec in channels], dtype=np.float64),
+        input_low=np.array([spec.input_low for spec in channels], dtype=np.float64),
+        output_low=np.array([spec.output_low for spec in channels], dtype=np.float64),
+        gated=np.array([spec.gated for spec in channels], dtype=bool),
+        decimals=np.array([spec.decimal_point for spec in channels], dtype=np.int64),
+        rounding=np.array([10.0 ** spec.decimal_point for spec in channels], dtype=np.float64),
+    )
+    for array in coefficients:
+        array.setflags(write=False)
+    return coefficients
+
+
+def convert_scan(raw, snapshot=None):
+    """
+    Turn a scan's raw 16-bit register values into the channels' readings.
+
+    Every value is sign extended, divided by its decimal places and, for
+    scaled channels, mapped linearly from the input to the output range and
+    rounded to the decimal places. Gated channels are only scaled at or
+    above their input low limit.
+
+    Args:
+        raw: Raw register value per channel, raw[n - 1] being channel n; None or NaN where not read
+        snapshot: ChannelConfigSnapshot to convert with, the current one by default
+
+    Returns:
+        numpy.ndarray: Float reading per channel, NaN where the channel was not read
+    """
+    coefficients = (snapshot or current()).coefficients
+    values, missing, scale = _divide_scan(raw, coefficients)
+    if scale.any():
+        scaled = coefficients.slope * (values - coefficients.input_low) + coefficients.output_low
+        shifted = scaled * coefficients.rounding
+        rounded = np.round(shifted) / coefficients.rounding
+        # Near a half the shift itself can round either way; settle those few
+        # values with round(), which the read loop always rounded with
+        for i in np.flatnonzero(scale & (np.abs(np.abs(shifted) % 1 - 0.5) < 1e-6)):
+            rounded[i] = round(float(scaled[i]), int(coefficients.decimals[i]))
+        values = np.where(scale, rounded, values)
+    values[missing] = np.nan
+    return values
+
+
+def _divide_scan(raw, coefficients):
+    """Sign extend and divide a raw scan; returns (values, missing mask, mask of the values to scale)"""
+    raw = np.array(raw, dtype=np.float64)
+    missing = np.isnan(raw)
+    words = np.where(missing, 0, raw).astype(np.int64) & 0xFFFF
+    values = words.astype(np.uint16).view(np.int16) / coefficients.divisor
+    scale = coefficients.scaled & (~coefficients.gated | (values >= coefficients.input_low))
+    return values, missing, scale
+
+
+def integer_channels(raw, snapshot=None):
+    """
+    Which readings of a scan are the plain register values, neither divided
+    nor scaled, and so are whole numbers the CSV and UI should show as ints.
+
+    Args:
+        raw: Raw register value per channel, as passed to convert_scan()
+        snapshot: ChannelConfigSnapshot the scan is converted with, the current one by default
+
+    Returns:
+        numpy.ndarray: Bool per channel, False where the channel was not read
+    """
+    coefficients = (snapshot or current()).coefficients
+    _, missing, scale = _divide_scan(raw, coefficients)
+    return (coefficients.divisor == 1) & ~scale & ~missing
+
+
+def convert_value(number, raw, snapshot=None):
+    """
+    Convert a single channel's raw register value through convert_scan().
+
+    Returns:
+        float: The channel's reading, None if raw is None
+    """
+    if raw is None:
+        return None
+    scan = np.full(CHANNEL_COUNT, np.nan)
+    scan[number - 1] = raw
+    return float(convert_scan(scan, snapshot)[number - 1])
+
+
+_latest_scan = None
+
+
+def publish_scan(values, version=None):
+    """Make a converted scan available to other readers through latest_scan()"""
+    global _latest_scan
+    values = np.array(values, dtype=np.float64)
+    values.setflags(write=False)
+    _latest_scan = Scan(values, time.monotonic(), version if version is not None else current().version)
+
+
+def latest_scan(max_age=SCAN_MAX_AGE):
+    """
+    The read loop's last converted scan.
+
+    Returns:
+        Scan: The scan, None if there is none or it is older than max_age seconds
+            or was converted with settings that have since changed
+    """
+    scan = _latest_scan
+    if scan is None or time.monotonic() - scan.time > max_age or scan.version != current().version:
+        return None
+    return scan
+
+
+def latest_value(number, max_age=SCAN_MAX_AGE):
+    """Channel number's reading from the latest scan, None if there is no recent reading"""
+    scan = latest_scan(max_age)
+    if scan is None or np.isnan(scan.values[number - 1]):
+        return None
+    return float(scan.values[number - 1])
+
+
+# Settings the snapshot is compiled from; a change to any of them recompiles it
+_SETTING_KEYS = frozenset(f'{key}{number}' for key in ('address', 'pv', 'decimal_point', 'scale', 'limit_low',
+                                                      'limit_high', 'min_scale_range', 'max_scale_range')
+                          for number in range(1, CHANNEL_COUNT + 1))
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def reload(db=None):
+    """
+    Compile a new snapshot from the current settings and swap it in.
+
+    Readers holding the previous snapshot keep using it until they fetch
+    the current one again, so a save never exposes half-updated settings.
+
+    Args:
+        db: Database to read channel_config_settings from, the local database by default
+
+    Returns:
+        ChannelConfigSnapshot: The new snapshot
+    """
+    global _snapshot
+    rows = {}
+    try:
+        from RaspPiReader.libs.database import Database
+        from RaspPiReader.libs.models import ChannelConfigSettings
+        db = db or Database("sqlite:///local_database.db")
+        try:
+            columns = [column.name for column in ChannelConfigSettings.__table__.columns]
+            rows = {row.id: {name: getattr(row, name) for name in columns}
+                    for row in db.session.query(ChannelConfigSettings)}
+        finally:
+            db.session.rollback()
+    except Exception as e:
+        logger.error(f"Error loading channel settings, using the pool settings only: {e}")
+
+    channels = tuple(compile_channel(number, rows.get(number)) for number in range(1, CHANNEL_COUNT + 1))
+    for spec in channels:
+        if spec.error:
+            logger.error(f"Channel {spec.number}: {spec.error}")
+    with _snapshot_lock:
+        version = _snapshot.version + 1 if _snapshot is not None else 1
+        _snapshot = ChannelConfigSnapshot(channels, version, compile_coefficients(channels))
+    logger.info(f"Compiled channel configuration version {version}")
+    return _snapshot
+
+
+def current():
+    """
+    The current channel configuration, compiled on first use.
+
+    Returns:
+        ChannelConfigSnapshot: Immutable snapshot; channels[n - 1] is channel n
+    """
+    snapshot = _snapshot
+    if snapshot is None:
+        with _snapshot_lock:
+            snapshot = _snapshot
+        if snapshot is None:
+            snapshot = reload()
+    return snapshot
+
+
+def _on_settings_changed(changes, version):
+    if _snapshot is not None:
+        logger.info(f"Channel settings {', '.join(sorted(changes))} changed, recompiling")
+        reload()
+
+
+pool.subscribe(_on_settings_changed, keys=_SETTING_KEYS)
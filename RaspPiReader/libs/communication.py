@@ -4,7 +4,9 @@ from pymodbus.exceptions import ConnectionException, ModbusException
 from PyQt5.QtCore import QSettings, QObject, pyqtSignal, QThread, QTimer
 from PyQt5 import QtCore
 from RaspPiReader import pool
-from RaspPiReader.ui.setting_form_handler import READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS
+
+READ_INPUT_REGISTERS = "Read Input Registers"
+READ_HOLDING_REGISTERS = "Read Holding Registers"
 
 logger = logging.getLogger(__name__)
 
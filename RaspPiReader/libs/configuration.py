@@ -1,12 +1,27 @@
+import os
+import re
 import json
+import logging
 
 import serial
 from PyQt5.QtGui import QColor
 
+from RaspPiReader import pool
+
+logger = logging.getLogger(__name__)
+
 TermoCount = 8
 
 class Configuration(object):
+    """
+    Legacy thermocouple configuration.
+
+    The settings live in the application settings store under the
+    'configuration' key; a config.json left by older versions is imported
+    into the store the first time it is loaded.
+    """
     filename = 'config.json'
+    setting_key = 'configuration'
     
     colors = [
         QColor(32, 159, 223), QColor(153, 202, 83), QColor(246, 166, 37), QColor(109, 95, 213), 
@@ -42,15 +57,21 @@ class Configuration(object):
 
     def LoadFromFile(self):
         try:
-            with open(self.filename, 'r') as fp:
-                 info = json.load(fp)
-
-                 if self.info.keys() == info.keys():
-                    self.info = info
-        except:
-            pass
+            stored = pool.config(self.setting_key, str, None)
+            if stored is None and os.path.exists(self.filename):
+                with open(self.filename, 'r') as fp:
+                    stored = json.load(fp)
+                pool.set_config(self.setting_key, json.dumps(stored))
+                logger.info(f"Imported {self.filename} into the settings store")
+            if isinstance(stored, str):
+                stored = json.loads(stored)
+            if stored and self.info.keys() == stored.keys():
+                self.info = stored
+        except Exception as e:
+            logger.error(f"Error loading configuration: {e}")
         
     def SaveToFile(self):
+        """Validate the settings and save them to the settings store"""
         try:
             if self.info['SampleTime'] <= 0:
                 self.info['SampleTime'] = 1.0
@@ -67,9 +88,22 @@ class Configuration(object):
             if self.info['ScaleRange'] <= 100:
                 self.info['ScaleRange'] = 100
             
-            with open(self.filename, 'w') as fp:
-                json.dump(self.info, fp)
-        except:
-            pass
+            pool.set_config(self.setting_key, json.dumps(self.info))
+        except Exception as e:
+            logger.error(f"Error saving configuration: {e}")
+
+    def get_channel_configs(self):
+        """
+        Channel settings published in the settings store as channel_<n>_<field>.
+
+        Returns:
+            dict: channel number -> {field: value}
+        """
+        channels = {}
+        for key in pool.keys(prefix='channel_'):
+            match = re.match(r'^channel_(\d+)_(\w+)$', key)
+            if match:
+                channels.setdefault(int(match.group(1)), {})[match.group(2)] = pool.get(key)
+        return channels
 
 config = Configuration()
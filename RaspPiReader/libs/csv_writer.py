@@ -0,0 +1,232 @@
+import os
+import csv
+import time
+import queue
+import logging
+import threading
+
+from RaspPiReader import pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_ROWS = 60
+DEFAULT_FLUSH_SECONDS = 5.0
+# fsync policies: 'always' after every flush, 'close' only when a file is
+# closed or rotated, 'never' leave it to the OS
+FSYNC_POLICIES = ('always', 'close', 'never')
+DEFAULT_FSYNC_POLICY = 'close'
+
+_CLOSE = object()
+_FLUSH = object()
+
+
+class CycleCsvWriter(object):
+    """
+    Append-only CSV writer for the samples of one cycle.
+
+    Rows are queued by write_row()/write_rows() and never touch the disk on
+    the calling thread. A writer thread collects them and appends them in one
+    write when flush_rows rows are pending or flush_seconds have passed since
+    the last flush, whichever comes first. Files are only ever opened for
+    appending, so a restarted cycle continues its file instead of truncating it.
+
+    With max_bytes set the file is rotated once it grows past that size: the
+    next rows go to <name>_part002.csv, <name>_part003.csv, ... and each part
+    starts with the same header rows.
+    """
+
+    def __init__(self, path, header_rows=None, flush_rows=None, flush_seconds=None,
+                 fsync_policy=None, max_bytes=None):
+        """
+        Open the writer and start its thread.
+
+        Args:
+            path: CSV file to append to
+            header_rows: Rows written at the top of every new file or part
+            flush_rows: Pending rows that trigger a flush ('csv_flush_rows')
+            flush_seconds: Longest time a row waits in memory ('csv_flush_seconds')
+            fsync_policy: One of FSYNC_POLICIES ('csv_fsync_policy')
+            max_bytes: Rotate after this many bytes, 0 disables rotation ('csv_max_bytes')
+        """
+        self.path = path
+        self.header_rows = [list(row) for row in (header_rows or [])]
+        self.flush_rows = max(1, flush_rows or pool.config('csv_flush_rows', int, DEFAULT_FLUSH_ROWS))
+        self.flush_seconds = flush_seconds or pool.config('csv_flush_seconds', float, DEFAULT_FLUSH_SECONDS)
+        fsync_policy = fsync_policy or pool.config('csv_fsync_policy', str, DEFAULT_FSYNC_POLICY)
+        if fsync_policy not in FSYNC_POLICIES:
+            logger.error(f"Unknown CSV fsync policy '{fsync_policy}', using '{DEFAULT_FSYNC_POLICY}'")
+            fsync_policy = DEFAULT_FSYNC_POLICY
+        self.fsync_policy = fsync_policy
+        self.max_bytes = max_bytes if max_bytes is not None else pool.config('csv_max_bytes', int, 0)
+        self.paths = []
+        self.stats = {'rows': 0, 'flushes': 0, 'bytes': 0, 'errors': 0}
+        self.closed = False
+
+        self._queue = queue.Queue()
+        self._part = 1
+        self._file = None
+        self._writer = None
+        self._flushed = threading.Condition()
+        self._flush_requests = 0
+        self._flush_done = 0
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name=f"csv_writer:{os.path.basename(path)}")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write_row(self, row):
+        """Queue one row; returns immediately"""
+        if self.closed:
+            raise ValueError(f"CSV writer for {self.path} is closed")
+        self._queue.put(list(row))
+
+    def write_rows(self, rows):
+        """Queue several rows; returns immediately"""
+        for row in rows:
+            self.write_row(row)
+
+    def flush(self, wait=False, timeout=None):
+        """
+        Ask the writer thread to write out every queued row now.
+
+        Args:
+            wait: Block until the rows are on disk
+            timeout: Longest time to wait in seconds
+
+        Returns:
+            bool: False if waiting timed out
+        """
+        with self._flushed:
+            self._flush_requests += 1
+            ticket = self._flush_requests
+        self._queue.put(_FLUSH)
+        if not wait:
+            return True
+        with self._flushed:
+            return self._flushed.wait_for(lambda: self._flush_done >= ticket or not self._thread.is_alive(),
+                                          timeout)
+
+    def close(self, wait=True, timeout=None):
+        """
+        Flush the remaining rows and stop the writer thread.
+
+        Args:
+            wait: Block until the file is complete and closed
+            timeout: Longest time to wait in seconds
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(_CLOSE)
+        if wait:
+            self._thread.join(timeout)
+
+    # Writer thread
+
+    def _part_path(self):
+        if self._part == 1:
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        return f"{root}_part{self._part:03d}{ext or '.csv'}"
+
+    def _open(self):
+        path = self._part_path()
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        if path not in self.paths:
+            self.paths.append(path)
+        if is_new and self.header_rows:
+            self._writer.writerows(self.header_rows)
+        logger.info(f"{'Created' if is_new else 'Appending to'} CSV file {path}")
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            if self.fsync_policy != 'never':
+                os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def _write(self, rows):
+        if not rows:
+            return
+        try:
+            if self._file is None:
+                self._open()
+            self._writer.writerows(rows)
+            self._file.flush()
+            if self.fsync_policy == 'always':
+                os.fsync(self._file.fileno())
+            self.stats['rows'] += len(rows)
+            self.stats['flushes'] += 1
+            size = self._file.tell()
+            self.stats['bytes'] = size
+            if self.max_bytes and size >= self.max_bytes:
+                self._close_file()
+                self._part += 1
+                logger.info(f"CSV file reached {size} bytes, continuing in {self._part_path()}")
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Error writing {len(rows)} rows to {self.path}: {e}")
+            # Reopen on the next flush; the rows are dropped rather than retried forever
+            try:
+                self._close_file()
+            except Exception:
+                self._file = None
+                self._writer = None
+
+    def _run(self):
+        pending = []
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+                if item is _CLOSE:
+                    break
+                if item is _FLUSH:
+                    self._write(pending)
+                    pending, deadline = [], None
+                    with self._flushed:
+                        self._flush_done += 1
+                        self._flushed.notify_all()
+                    continue
+                if item is not None:
+                    pending.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_seconds
+                if len(pending) >= self.flush_rows or (deadline is not None and time.monotonic() >= deadline):
+                    self._write(pending)
+                    pending, deadline = [], None
+            # Rows queued before close() still belong to the file
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, list):
+                    pending.append(item)
+            self._write(pending)
+            if self._file is None and not self.paths:
+                # Nothing was written; still leave the header so the file exists
+                self._open()
+        finally:
+            try:
+                self._close_file()
+            except Exception as e:
+                logger.error(f"Error closing CSV file {self.path}: {e}")
+            with self._flushed:
+                self._flush_done = self._flush_requests
+                self._flushed.notify_all()
+            logger.info(f"CSV writer for {self.path} closed: {self.stats['rows']} rows "
+                        f"in {self.stats['flushes']} flushes")
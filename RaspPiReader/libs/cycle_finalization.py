@@ -1,21 +1,31 @@
 import os
 import csv
 import logging
-import pdfkit
 import webbrowser
-import shutil
-from jinja2 import Template
+import hashlib
+import tempfile
+from types import SimpleNamespace
 from datetime import datetime
 from RaspPiReader.libs.plc_communication import write_coil
-from RaspPiReader.libs.onedrive_api import OneDriveAPI
+from RaspPiReader.libs import alarm_engine, alarm_history, onedrive_api, upload_queue
 from RaspPiReader import pool
 from RaspPiReader.libs.database import Database
-from RaspPiReader.libs.models import Alarm, OneDriveSettings, CycleSerialNumber, CycleData, CycleReport, AlarmMapping, DefaultProgram
+from RaspPiReader.libs.plot_pyramid import build_cycle_pyramid
+from RaspPiReader.libs import pdf_renderer
+from RaspPiReader.libs import report_templates
+from RaspPiReader.libs import reports_catalog
+from RaspPiReader.libs import artifact_store
+from RaspPiReader.libs.sample_export import write_cycle_samples
+from RaspPiReader.libs.models import CycleSerialNumber, CycleData, CycleReport, DefaultProgram, PlotData, ChannelConfigSettings
 import sqlalchemy.exc
+from sqlalchemy import text, func
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
+# Database the stages read the cycle from and write its records to, unless the context names another
+DEFAULT_DATABASE_URL = "sqlite:///local_database.db"
+
 
 def convert_to_int(val):
     try:
@@ -29,7 +39,20 @@ def convert_to_int(val):
         raise ValueError(f"Cannot convert {val} to an integer.")
 
 
-def generate_csv_report(serial_numbers, filepath, cycle_data=None):
+def generate_csv_report(serial_numbers, filepath, cycle_data=None, cycle_db_id=None, resample_seconds=None,
+                        database_url=DEFAULT_DATABASE_URL):
+    """
+    Write the cycle CSV report: cycle information, serial numbers and, when the
+    cycle's database id is known, the full per-channel time series.
+
+    Args:
+        serial_numbers: Serial numbers of the cycle
+        filepath: Output CSV file
+        cycle_data: Cycle record (or snapshot) for the information section
+        cycle_db_id: CycleData id whose samples are exported
+        resample_seconds: Resample the time series to this interval ('csv_resample_seconds')
+        database_url: Database holding the cycle's samples
+    """
     try:
         with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
             writer = csv.writer(csvfile)
@@ -48,6 +71,15 @@ def generate_csv_report(serial_numbers, filepath, cycle_data=None):
             else:
                 for sn in valid_serials:
                     writer.writerow([sn])
+            if cycle_db_id is not None:
+                db = Database(database_url)
+                try:
+                    writer.writerow([])
+                    writer.writerow(['Time Series'])
+                    if not write_cycle_samples(writer, db, cycle_db_id, resample_seconds):
+                        writer.writerow(["No samples recorded"])
+                finally:
+                    db.session.close()
         logger.info(f"CSV report generated successfully at {filepath}")
     except Exception as e:
         logger.error(f"Error generating CSV report: {e}")
@@ -66,261 +98,430 @@ def generate_csv_report(serial_numbers, filepath, cycle_data=None):
 
 
 def upload_to_onedrive(csv_path, pdf_path):
+    """
+    Queue the reports for OneDrive on the persistent upload queue.
+
+    The queue uploads in the background, retries failures and skips files
+    whose content was already uploaded.
+
+    Returns:
+        bool: True if OneDrive is configured and the files were handed to the queue
+    """
     try:
-        db = Database("sqlite:///local_database.db")
-        settings = db.session.query(OneDriveSettings).first()
-        if not settings or not all([settings.client_id, settings.client_secret, settings.tenant_id]):
+        if not onedrive_api.is_configured():
             logger.warning("OneDrive settings not properly configured. Files saved locally only.")
             return False
-        onedrive = OneDriveAPI()
-        onedrive.authenticate(settings.client_id, settings.client_secret, settings.tenant_id)
-        folder_name = f"PLC_Reports_{datetime.now().strftime('%Y-%m-%d')}"
-        try:
-            folder_response = onedrive.create_folder(folder_name)
-            folder_id = folder_response.get('id')
-            logger.info(f"Created OneDrive folder: {folder_name}")
-        except Exception as e:
-            logger.warning(f"Could not create OneDrive folder, uploading to root instead: {e}")
-            folder_id = None
-        if os.path.exists(csv_path):
-            try:
-                onedrive.upload_file(csv_path, folder_id)
-                logger.info(f"CSV uploaded to OneDrive: {os.path.basename(csv_path)}")
-            except Exception as e:
-                logger.error(f"Failed to upload CSV to OneDrive: {e}")
-        if os.path.exists(pdf_path):
-            try:
-                onedrive.upload_file(pdf_path, folder_id)
-                logger.info(f"PDF uploaded to OneDrive: {os.path.basename(pdf_path)}")
-            except Exception as e:
-                logger.error(f"Failed to upload PDF to OneDrive: {e}")
+        queue = upload_queue.get_instance()
+        queued = queue.enqueue_many([csv_path, pdf_path])
+        queue.start()
+        logger.info(f"Queued {queued} report files for OneDrive")
         return True
     except Exception as e:
         logger.error(f"OneDrive upload process failed: {e}")
         return False
 
-def create_unique_plot_export(cycle_id, timestamp):
+def _reports_relative(path, reports_dir=None):
+    """Path of a report artifact relative to the reports folder, with forward slashes"""
+    reports_dir = reports_dir or os.path.join(os.getcwd(), "reports")
+    return os.path.relpath(path, reports_dir).replace(os.sep, '/')
+
+
+def create_unique_plot_export(cycle_id, timestamp, cycle_db_id=None, database_url=DEFAULT_DATABASE_URL,
+                              use_shared_plot=True):
     """
-    Create a unique plot export image for this cycle using a multi-strategy approach:
-    1. Try to find a plot image named with the cycle ID first
-    2. Copy the default plot_export.png to a unique name if it exists
-    3. Use the most recent plot as a fallback
-    4. Create a basic placeholder plot if nothing else is available
-    
+    Resolve the plot image of this cycle in the artifact store using a multi-strategy approach:
+    1. Reuse the plot already stored for this cycle
+    2. Store a plot of this cycle found in the reports catalog (exported before the store existed)
+    3. Render the plot from the cycle's stored samples (skipped when an identical render is cached)
+    4. Store the default plot_export.png if it exists and use_shared_plot is set
+    5. Create a basic placeholder plot if nothing else is available
+
+    Images are stored once per distinct content; the cycle only gets a
+    reference to the blob, so nothing is copied per report.
+
     Args:
         cycle_id: The cycle ID
-        timestamp: Timestamp string for the filename
-        
+        timestamp: Timestamp string, kept for callers; blobs are named by content
+        cycle_db_id: Database id of the cycle, if known
+        database_url: Database holding the cycle's samples
+        use_shared_plot: Fall back to plot_export.png, which belongs to whichever cycle
+                         stopped last; only right for the cycle that has just stopped
+
     Returns:
-        Tuple of (plot_filename, plot_path)
+        Tuple of (plot path relative to the reports folder, plot path)
     """
     try:
-        reports_dir = os.path.join(os.getcwd(), "reports")
-        os.makedirs(reports_dir, exist_ok=True)
-        
-        # Create a unique filename for this cycle's plot
-        plot_filename = f"{cycle_id}_{timestamp}_plot.png"
-        unique_plot_path = os.path.join(reports_dir, plot_filename)
-        
-        # Strategy 1: Look for a plot with the cycle ID in the name
-        cycle_id_str = str(cycle_id)
-        cycle_plots = list(filter(
-            lambda f: cycle_id_str in f and f.endswith('.png'),
-            os.listdir(reports_dir)
-        ))
-        
-        if cycle_plots:
-            # Use the most recent plot for this cycle
-            most_recent = sorted(cycle_plots, key=lambda f: os.path.getmtime(os.path.join(reports_dir, f)), reverse=True)[0]
-            most_recent_path = os.path.join(reports_dir, most_recent)
-            shutil.copy2(most_recent_path, unique_plot_path)
-            logger.info(f"Using existing cycle plot for cycle {cycle_id}: {most_recent} → {unique_plot_path}")
-            return (plot_filename, unique_plot_path)
-        
-        # Strategy 2: Check normal plot_export.png
-        default_plot_path = os.path.join(os.getcwd(), "RaspPiReader", "reports", "plot_export.png")
-        if os.path.exists(default_plot_path):
-            # Copy the plot export to our unique filename
-            shutil.copy2(default_plot_path, unique_plot_path)
-            logger.info(f"Created unique plot from default for cycle {cycle_id}: {unique_plot_path}")
-            return (plot_filename, unique_plot_path)
-        
-        # Strategy 3: No plot exists, check if we have an older one to use
-        logger.warning(f"No plot_export.png found at {default_plot_path}")
-        existing_plots = sorted(list(filter(
-            lambda f: f.endswith('_plot.png'),
-            os.listdir(reports_dir)
-        )), reverse=True)
-        
-        if existing_plots:
-            # Use the most recent plot as a fallback
-            recent_plot = os.path.join(reports_dir, existing_plots[0])
-            shutil.copy2(recent_plot, unique_plot_path)
-            logger.info(f"Using most recent plot as template: {recent_plot} -> {unique_plot_path}")
-            return (plot_filename, unique_plot_path)
-        
-        # Strategy 4: Create a basic placeholder plot
-        try:
-            import matplotlib.pyplot as plt
-            import numpy as np
-            
-            # Create a simple placeholder plot
-            plt.figure(figsize=(10, 6))
-            x = np.linspace(0, 10, 100)
-            y = np.sin(x)
-            plt.plot(x, y)
-            plt.title(f"Cycle {cycle_id} - Placeholder Chart")
-            plt.xlabel("Time")
-            plt.ylabel("Value")
-            plt.grid(True)
-            
-            # Save it
-            plt.savefig(unique_plot_path)
-            plt.close()
-            
-            logger.info(f"Created placeholder plot for cycle {cycle_id}: {unique_plot_path}")
-            return (plot_filename, unique_plot_path)
-            
-        except Exception as e:
-            logger.error(f"Error creating placeholder plot: {e}")
-            logger.warning(f"No plot images found to use as fallback")
-            return (None, None)
-            
+        store = artifact_store.get_instance()
+
+        # Strategy 1: A plot already stored for this cycle
+        blob = store.find('plot', cycle_id=cycle_db_id, cycle_number=str(cycle_id))
+        if blob:
+            logger.info(f"Using stored plot for cycle {cycle_id}: {blob}")
+            return (_reports_relative(blob), blob)
+
+        # Strategy 2: A plot of this cycle exported before the artifact store existed
+        catalog = reports_catalog.get_instance()
+        legacy_path = catalog.find('png', cycle_id=cycle_db_id, cycle_number=str(cycle_id))
+        if legacy_path:
+            blob = store.store(legacy_path, 'plot', cycle_id=cycle_db_id, cycle_number=cycle_id)
+            logger.info(f"Stored existing plot of cycle {cycle_id}: {legacy_path} -> {blob}")
+            return (_reports_relative(blob), blob)
+
+        # Strategy 3: Render the plot from the cycle's samples
+        if cycle_db_id is not None:
+            try:
+                blob = render_cycle_plot_cached(cycle_db_id, cycle_id, database_url)
+                if blob:
+                    return (_reports_relative(blob), blob)
+            except Exception as e:
+                logger.error(f"Error rendering plot of cycle {cycle_id} from data: {e}")
+
+        # Strategy 4: Check normal plot_export.png
+        if use_shared_plot:
+            default_plot_path = os.path.join(os.getcwd(), "RaspPiReader", "reports", "plot_export.png")
+            if os.path.exists(default_plot_path):
+                blob = store.store(default_plot_path, 'plot', cycle_id=cycle_db_id, cycle_number=cycle_id)
+                logger.info(f"Stored default plot for cycle {cycle_id}: {blob}")
+                return (_reports_relative(blob), blob)
+            logger.warning(f"No plot_export.png found at {default_plot_path}")
+
+        # Strategy 5: Create a basic placeholder plot
+        return create_placeholder_plot(cycle_id, timestamp, cycle_db_id)
+
     except Exception as e:
         logger.error(f"Error creating unique plot export: {e}")
         return (None, None)
 
-def finalize_cycle(cycle_data, serial_numbers, supervisor_username=None, alarm_values={},
-                   reports_folder="reports", template_file="RaspPiReader/ui/result_template.html"):
+
+def create_placeholder_plot(cycle_id, timestamp, cycle_db_id=None):
     """
-    Finalize a cycle by generating reports and storing cycle data.
+    Store a placeholder chart for a cycle that has no plot of its own.
+
+    The placeholder is stored under its own artifact kind, so it is never
+    reused as the cycle's real plot.
 
     Args:
-        cycle_data: The cycle data object
-        serial_numbers: List of serial numbers to associate with this cycle
-        supervisor_username: Optional supervisor name for the report
-        alarm_values: Dictionary of alarm values
-        reports_folder: Folder to store reports
-        template_file: HTML template for report generation
+        cycle_id: The cycle ID shown in the chart title
+        timestamp: Timestamp string used in the temporary file name
+        cycle_db_id: Database id of the cycle, if known
 
     Returns:
-        Tuple of (pdf_filename, csv_filename)
+        Tuple of (plot path relative to the reports folder, plot path), (None, None) on error
     """
-    # Verify cycle_data has a valid ID
-    if not hasattr(cycle_data, 'id') or not cycle_data.id:
-        logger.error("Cannot finalize cycle: cycle_data has no valid ID")
-        return (None, None)
-    
-    cycle_id = cycle_data.id
-    logger.info(f"Finalizing cycle with ID: {cycle_id}")
-    
-    # Write to the PLC coil to signal end-of-cycle using fixed address 0x2008 (8200)
-    stop_coil_addr = 0x2008  # Fixed address for cycle stop signal
     try:
-        write_coil(stop_coil_addr, False)  # Write False to stop the cycle
-        logger.info(f"Cycle stop signal sent to coil {stop_coil_addr} (0x{stop_coil_addr:04X})")
+        # Figure API rather than pyplot: this may run on a finalization worker thread
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        import numpy as np
+
+        store = artifact_store.get_instance()
+        figure = Figure(figsize=(10, 6))
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot(111)
+        x = np.linspace(0, 10, 100)
+        axes.plot(x, np.sin(x))
+        axes.set_title(f"Cycle {cycle_id} - Placeholder Chart")
+        axes.set_xlabel("Time")
+        axes.set_ylabel("Value")
+        axes.grid(True)
+
+        os.makedirs(store.root, exist_ok=True)
+        placeholder_path = os.path.join(store.root, f"{cycle_id}_{timestamp}_placeholder.png")
+        figure.savefig(placeholder_path)
+        blob = store.store(placeholder_path, 'placeholder_plot', cycle_id=cycle_db_id,
+                           cycle_number=cycle_id, move=True)
+
+        logger.info(f"Created placeholder plot for cycle {cycle_id}: {blob}")
+        return (_reports_relative(blob), blob)
     except Exception as e:
-        logger.error(f"Error writing to stop coil: {e}")
-    
-    # Ensure we write False again
+        logger.error(f"Error creating placeholder plot: {e}")
+        logger.warning(f"No plot images found to use as fallback")
+        return (None, None)
+
+
+# Fixed axis scales of the cycle report plot (see VisualizationManager.generate_plot_from_data)
+REPORT_PLOT_LEFT_RANGE = (-150, 800)
+REPORT_PLOT_RIGHT_RANGE = (0, 140)
+
+
+def render_cycle_plot(cycle_db_id, save_path, database_url=DEFAULT_DATABASE_URL):
+    """
+    Render the report plot of a cycle from its stored PlotData samples.
+
+    Unlike create_unique_plot_export this never reuses another image, so it is
+    what batch regeneration uses to rebuild a cycle's plot after the fact.
+
+    Args:
+        cycle_db_id: Database id of the cycle
+        save_path: Output image path
+        database_url: Database holding the cycle's samples
+
+    Returns:
+        str: save_path, or None if the cycle has no plot data
+    """
+    from RaspPiReader.libs.visualization import render_chart_image
+
+    db = Database(database_url)
     try:
-        write_coil(stop_coil_addr, False)
-    except Exception as e:
-        logger.error(f"Error writing second stop signal: {e}")
-
-    db = Database("sqlite:///local_database.db")
-    from RaspPiReader.libs.models import CycleData, CycleReport
-    cycle_data = db.session.query(CycleData)\
-        .outerjoin(CycleReport, CycleData.id == CycleReport.cycle_id)\
-        .filter(CycleData.id == cycle_data.id)\
-        .one_or_none()
-    
-    # Build alarm mapping from DB
-    alarm_mapping = {}
-    alarm_logs = []  # List to store alarm logs
-    db_alarms = db.session.query(Alarm).all()
-    for alarm in db_alarms:
-        # Get all active mappings for this alarm
-        mappings = db.session.query(AlarmMapping).filter_by(
-            alarm_id=alarm.id,
-            active=True
-        ).all()
-        
-        for mapping in mappings:
-            threshold_type = "Low" if mapping.value == 1 else "High"
-            alarm_text = f"{threshold_type} Threshold ({mapping.threshold:.2f}) - {mapping.message}"
-            alarm_mapping[str(alarm.channel)] = alarm_text
-            # Add to alarm logs
-            alarm_logs.append(f"Channel {alarm.channel}: {alarm_text}")
-
-    active_alarms = []
-    for addr, value in alarm_values.items():
+        rows = db.session.query(PlotData.channel, PlotData.timestamp, PlotData.value)\
+            .filter(PlotData.cycle_id == cycle_db_id)\
+            .order_by(PlotData.channel, PlotData.timestamp)\
+            .all()
+        configs = {config.id: config for config in db.session.query(ChannelConfigSettings)}
+    finally:
+        db.session.close()
+    if not rows:
+        logger.warning(f"No plot data stored for cycle {cycle_db_id}")
+        return None
+
+    origin = min(row.timestamp for row in rows if row.timestamp is not None)
+    series = {}
+    for channel, timestamp, value in rows:
+        if timestamp is None or value is None:
+            continue
+        item = series.get(channel)
+        if item is None:
+            config = None
+            if channel.startswith('ch') and channel[2:].isdigit():
+                config = configs.get(int(channel[2:]))
+            axis = (config.axis_direction or 'L').strip().upper() if config else 'L'
+            item = series[channel] = {
+                'name': channel,
+                'label': config.label if config else channel,
+                'color': config.color if config else None,
+                'axis': 'R' if axis == 'R' else 'L',
+                'timestamps': [],
+                'values': [],
+            }
+        item['timestamps'].append((timestamp - origin).total_seconds())
+        item['values'].append(float(value))
+
+    render_chart_image(list(series.values()), save_path,
+                       left_range=REPORT_PLOT_LEFT_RANGE, right_range=REPORT_PLOT_RIGHT_RANGE,
+                       left_label="Left Axis Values", right_label="Right Axis Values")
+    logger.info(f"Rendered plot of cycle {cycle_db_id} from {len(rows)} samples: {save_path}")
+    return save_path
+
+
+# Bump when render_cycle_plot's output changes so cached renders are not reused
+PLOT_RENDER_VERSION = 1
+
+
+def plot_render_key(cycle_db_id, database_url=DEFAULT_DATABASE_URL):
+    """
+    Render cache key of a cycle's plot.
+
+    Combines the cycle id, a watermark of its stored samples (count, last id
+    and last timestamp) and a hash of the channel settings that affect the
+    plot, so the key changes whenever the rendered image could.
+
+    Returns:
+        str: SHA-1 hex key, or None if the cycle has no samples
+    """
+    db = Database(database_url)
+    try:
+        count, last_id, last_time = db.session.query(
+            func.count(PlotData.id), func.max(PlotData.id), func.max(PlotData.timestamp)
+        ).filter(PlotData.cycle_id == cycle_db_id).one()
+        if not count:
+            return None
+        channels = db.session.query(ChannelConfigSettings.id, ChannelConfigSettings.label,
+                                    ChannelConfigSettings.color, ChannelConfigSettings.axis_direction)\
+            .order_by(ChannelConfigSettings.id).all()
+    finally:
+        db.session.close()
+    config_hash = hashlib.sha1(repr([tuple(row) for row in channels]).encode('utf-8')).hexdigest()
+    watermark = (count, last_id, str(last_time))
+    source = repr((PLOT_RENDER_VERSION, cycle_db_id, watermark, config_hash,
+                   REPORT_PLOT_LEFT_RANGE, REPORT_PLOT_RIGHT_RANGE))
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+def render_cycle_plot_cached(cycle_db_id, cycle_number=None, database_url=DEFAULT_DATABASE_URL):
+    """
+    Return the cycle's plot from the artifact store, rendering it only if its
+    samples or channel settings changed since the last render.
+
+    Returns:
+        str: Blob path of the plot, or None if the cycle has no samples
+    """
+    key = plot_render_key(cycle_db_id, database_url)
+    if key is None:
+        logger.warning(f"No plot data stored for cycle {cycle_db_id}")
+        return None
+    store = artifact_store.get_instance()
+    blob = store.find('plot', cache_key=key)
+    if blob:
+        logger.info(f"Plot of cycle {cycle_db_id} unchanged since its last render, reusing {blob}")
+        return blob
+    os.makedirs(store.root, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=store.root, suffix='.png')
+    os.close(handle)
+    try:
+        if not render_cycle_plot(cycle_db_id, temp_path, database_url):
+            return None
+        return store.store(temp_path, 'plot', cycle_id=cycle_db_id, cycle_number=cycle_number,
+                           cache_key=key, move=True)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+# Cycle attributes copied out of the ORM object so stages can run on any thread.
+CYCLE_SNAPSHOT_FIELDS = (
+    'id', 'order_id', 'cycle_id', 'start_time', 'stop_time', 'quantity', 'program_number',
+    'size', 'cycle_location', 'core_temp_setpoint', 'cool_down_temp', 'temp_ramp',
+    'dwell_time', 'set_pressure', 'maintain_vacuum', 'initial_set_cure_temp',
+    'final_set_cure_temp', 'core_high_temp_time', 'pressure_drop_core_temp',
+)
+
+# Finalization stages and the stages each one depends on, in a valid run order.
+FINALIZATION_STAGES = (
+    ('prepare', ()),
+    ('csv', ('prepare',)),
+    ('plot', ('prepare',)),
+    ('pyramid', ('prepare',)),
+    ('html', ('plot',)),
+    ('pdf', ('html',)),
+    ('record', ('plot',)),
+    ('alarms', ('prepare',)),
+    ('upload', ('csv', 'pdf')),
+)
+
+
+def new_finalization_context(cycle_id, serial_numbers, supervisor_username=None, alarm_values=None,
+                             reports_folder="reports", template_file="RaspPiReader/ui/result_template.html",
+                             signal_plc=True, plot_from_data=False, open_report=True,
+                             database_url=DEFAULT_DATABASE_URL):
+    """
+    Create the shared state passed between finalization stages.
+
+    Only plain values are stored at the top level so the context can be
+    persisted with a job record and restored after a restart.
+
+    Args:
+        signal_plc: Write the end-of-cycle coil in stage_prepare
+        plot_from_data: Render the plot from stored PlotData instead of reusing an exported image
+        open_report: Open the HTML report in the browser once written
+        database_url: Database the stages read the cycle from and write its records to
+    """
+    return {
+        'cycle_db_id': cycle_id,
+        'serial_numbers': list(serial_numbers or []),
+        'supervisor_username': supervisor_username,
+        'alarm_values': dict(alarm_values or {}),
+        'reports_folder': reports_folder,
+        'template_file': template_file,
+        'resumed': False,
+        'signal_plc': signal_plc,
+        'plot_from_data': plot_from_data,
+        'open_report': open_report,
+        'database_url': database_url,
+    }
+
+
+def _database(ctx):
+    """A Database on the context's database; the caller closes its session"""
+    return Database(ctx.get('database_url') or DEFAULT_DATABASE_URL)
+
+
+def stage_prepare(ctx):
+    """Signal the PLC, snapshot the cycle and resolve everything the other stages share."""
+    cycle_id = ctx['cycle_db_id']
+
+    if ctx.get('signal_plc', True) and not ctx.get('resumed'):
+        # Write to the PLC coil to signal end-of-cycle using fixed address 0x2008 (8200)
+        stop_coil_addr = 0x2008  # Fixed address for cycle stop signal
         try:
-            numeric_value = convert_to_int(value)
-            if numeric_value == 1:
-                text = alarm_mapping.get(str(addr), f"Unknown Alarm at {addr}")
-                active_alarms.append(text)
+            write_coil(stop_coil_addr, False)  # Write False to stop the cycle
+            logger.info(f"Cycle stop signal sent to coil {stop_coil_addr} (0x{stop_coil_addr:04X})")
         except Exception as e:
-            logger.error(f"Error converting alarm value for address {addr}: {e}")
-    alarm_info = ", ".join(active_alarms) if active_alarms else "None"
-
-    # Ensure the reports folder exists.
-    reports_dir = os.path.join(os.getcwd(), reports_folder)
-    os.makedirs(reports_dir, exist_ok=True)
-
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    # Determine a unique cycle identifier: prefer cycle_data.cycle_id if provided.
-    cycle_number = getattr(cycle_data, 'cycle_id', None)
-    if not cycle_number or not str(cycle_number).strip():
-        cycle_number = getattr(cycle_data, 'order_id', "unknown")
-    cycle_number = str(cycle_number).strip()
-    base_filename = f"{cycle_number}_{timestamp}"
-    csv_filename = f"{base_filename}.csv"
-    pdf_filename = f"{base_filename}.pdf"
-    html_filename = f"{base_filename}.html"
-    csv_path = os.path.join(reports_dir, csv_filename)
-    pdf_path = os.path.join(reports_dir, pdf_filename)
-    html_path = os.path.join(reports_dir, html_filename)
-    
-    # Create a unique plot export for this cycle
-    plot_filename, plot_path = create_unique_plot_export(cycle_number, timestamp)
-        
-    # Try to get plot path from visualization manager if available
-    try:
-        # Import here to avoid circular imports
-        from RaspPiReader.libs.visualization_manager import VisualizationManager
-        vis_manager = VisualizationManager.instance()
-        if hasattr(vis_manager, 'get_current_plot_path'):
-            vis_plot_path = vis_manager.get_current_plot_path()
-            if vis_plot_path and os.path.exists(vis_plot_path):
-                logger.info(f"Using visualization manager plot: {vis_plot_path}")
-                plot_path = vis_plot_path
-                plot_filename = os.path.basename(vis_plot_path)
-    except Exception as e:
-        logger.warning(f"Could not get plot from visualization manager: {e}")
+            logger.error(f"Error writing to stop coil: {e}")
 
+        # Ensure we write False again
+        try:
+            write_coil(stop_coil_addr, False)
+        except Exception as e:
+            logger.error(f"Error writing second stop signal: {e}")
+
+    db = _database(ctx)
     try:
-        generate_csv_report(serial_numbers, csv_path, cycle_data)
-        logger.info(f"CSV report generated: {csv_path}")
-    except Exception as e:
-        logger.error(f"Error generating CSV report: {e}")
-        raise
+        cycle_record = db.session.query(CycleData)\
+            .outerjoin(CycleReport, CycleData.id == CycleReport.cycle_id)\
+            .filter(CycleData.id == cycle_id)\
+            .one_or_none()
+        if cycle_record is None:
+            raise ValueError(f"Cycle {cycle_id} not found")
+        cycle_data = SimpleNamespace(**{
+            field: getattr(cycle_record, field) for field in CYCLE_SNAPSHOT_FIELDS if hasattr(cycle_record, field)
+        })
+        ctx['cycle'] = cycle_data
 
-    # Process serial numbers to handle duplicates for display.
-    final_serials = []
-    counts = {}
-    for sn in serial_numbers:
-        if not sn:
-            continue
-        counts[sn] = counts.get(sn, 0) + 1
-        final_serials.append(f"{sn}R" if counts[sn] > 1 else sn)
+        # The alarm section comes from the alarm history recorded during the cycle
+        alarm_engine.flush_history()
+        raised = []
+        alarm_logs = []
+        for event in alarm_engine.cycle_events(db.session, cycle_id, cycle_record.start_time,
+                                               cycle_record.stop_time or datetime.now()):
+            threshold_type = "Low" if event.kind == 1 else "High"
+            alarm_text = f"{threshold_type} Threshold ({event.threshold:.2f}) - {event.message}"
+            if event.event == alarm_engine.RAISED and f"{event.channel}: {alarm_text}" not in raised:
+                raised.append(f"{event.channel}: {alarm_text}")
+            value = f" at {event.value:.2f}" if event.value is not None else ""
+            alarm_logs.append(f"{event.timestamp:%Y-%m-%d %H:%M:%S} Channel {event.channel} {event.event}{value}: "
+                              f"{alarm_text}")
+        ctx['alarm_info'] = ", ".join(raised) if raised else "None"
+        ctx['alarm_logs'] = alarm_logs
+
+        # Ensure the reports folder exists.
+        reports_dir = os.path.join(os.getcwd(), ctx['reports_folder'])
+        os.makedirs(reports_dir, exist_ok=True)
+
+        # A resumed job keeps the file names chosen on its first run.
+        if not ctx.get('base_filename'):
+            ctx['timestamp'] = datetime.now().strftime("%Y%m%d_%H%M%S")
+            # Determine a unique cycle identifier: prefer cycle_data.cycle_id if provided.
+            cycle_number = getattr(cycle_data, 'cycle_id', None)
+            if not cycle_number or not str(cycle_number).strip():
+                cycle_number = getattr(cycle_data, 'order_id', "unknown")
+            ctx['cycle_number'] = str(cycle_number).strip()
+            ctx['base_filename'] = f"{ctx['cycle_number']}_{ctx['timestamp']}"
+        base_filename = ctx['base_filename']
+        ctx['csv_filename'] = f"{base_filename}.csv"
+        ctx['pdf_filename'] = f"{base_filename}.pdf"
+        ctx['html_filename'] = f"{base_filename}.html"
+        ctx['csv_path'] = os.path.join(reports_dir, ctx['csv_filename'])
+        ctx['pdf_path'] = os.path.join(reports_dir, ctx['pdf_filename'])
+        ctx['html_path'] = os.path.join(reports_dir, ctx['html_filename'])
+
+        ctx['serial_list'] = _lookup_serial_list(db, cycle_id, cycle_data)
+
+        # Get program number and settings
+        program_number = getattr(cycle_data, 'program_number', None)
+        if not program_number:
+            program_number = pool.config("program_number", int, default_val=1)
+        ctx['program_number'] = program_number
+
+        # Get program settings from database
+        program_settings = db.session.query(DefaultProgram).filter_by(
+            program_number=program_number
+        ).first()
+
+        if program_settings:
+            ctx['core_temp_setpoint'] = program_settings.core_temp_setpoint
+        else:
+            ctx['core_temp_setpoint'] = pool.config("core_temp_setpoint", float, default_val=100.0)
+    finally:
+        db.session.close()
 
+
+def _lookup_serial_list(db, cycle_id, cycle_data):
+    """Return the display string of serial numbers stored for a cycle or its related cycles."""
     try:
         # First check for serial numbers directly associated with this cycle
         stored_serials = db.session.query(CycleSerialNumber).filter(CycleSerialNumber.cycle_id == cycle_id).all()
         db_serial_list = [s.serial_number for s in stored_serials
                           if s.serial_number and not s.serial_number.startswith("PLACEHOLDER_")]
-        
+
         # If no valid serial numbers found for this cycle, check for related cycles
         if not db_serial_list:
             logger.info(f"No direct serial numbers found for cycle {cycle_id}, checking related cycles")
@@ -331,36 +532,133 @@ def finalize_cycle(cycle_data, serial_numbers, supervisor_username=None, alarm_v
                     CycleData.order_id == cycle_data.order_id,
                     CycleData.id != cycle_id  # Exclude current cycle
                 ).all()
-                
+
                 for related_cycle in related_cycles:
                     related_serials = db.session.query(CycleSerialNumber).filter(
                         CycleSerialNumber.cycle_id == related_cycle.id
                     ).all()
-                    
+
                     related_serial_list = [s.serial_number for s in related_serials
                                           if s.serial_number and not s.serial_number.startswith("PLACEHOLDER_")]
-                    
+
                     if related_serial_list:
                         logger.info(f"Found {len(related_serial_list)} serial numbers from related cycle {related_cycle.id}")
                         db_serial_list.extend(related_serial_list)
-        
+
         if not db_serial_list:
-            serial_list = "No serial numbers recorded"
             logger.info(f"Only placeholder serial numbers found in DB for cycle {cycle_id}")
-        else:
-            # Remove duplicates while preserving order
-            seen = set()
-            unique_serials = []
-            for sn in db_serial_list:
-                if sn not in seen:
-                    seen.add(sn)
-                    unique_serials.append(sn)
-            
-            serial_list = ", ".join(unique_serials)
-            logger.info(f"Retrieved serial numbers for cycle {cycle_id}: {serial_list}")
+            return "No serial numbers recorded"
+        # Remove duplicates while preserving order
+        seen = set()
+        unique_serials = []
+        for sn in db_serial_list:
+            if sn not in seen:
+                seen.add(sn)
+                unique_serials.append(sn)
+
+        serial_list = ", ".join(unique_serials)
+        logger.info(f"Retrieved serial numbers for cycle {cycle_id}: {serial_list}")
+        return serial_list
     except Exception as e:
         logger.error(f"Error fetching stored serial numbers: {e}")
-        serial_list = "No serial numbers recorded"
+        return "No serial numbers recorded"
+
+
+def _catalog_file(ctx, path, kind):
+    """Record a report artifact of the cycle being finalized in the reports catalog."""
+    reports_catalog.register_report_file(path, kind, cycle_id=ctx['cycle_db_id'],
+                                         cycle_number=ctx.get('cycle_number'))
+
+
+def stage_csv(ctx):
+    """Write the cycle CSV report, including the cycle's full time series."""
+    try:
+        generate_csv_report(ctx['serial_numbers'], ctx['csv_path'], ctx['cycle'], ctx['cycle_db_id'],
+                            database_url=ctx.get('database_url') or DEFAULT_DATABASE_URL)
+        _catalog_file(ctx, ctx['csv_path'], 'csv')
+        logger.info(f"CSV report generated: {ctx['csv_path']}")
+    except Exception as e:
+        logger.error(f"Error generating CSV report: {e}")
+        raise
+
+
+def stage_plot(ctx):
+    """Resolve the plot image used by the report."""
+    if ctx.get('plot_from_data'):
+        # Only this cycle's own samples may be used: the shared plot_export.png and the
+        # live plot belong to whatever cycle ran last
+        plot_path = None
+        try:
+            plot_path = render_cycle_plot_cached(ctx['cycle_db_id'], ctx['cycle_number'],
+                                                 ctx.get('database_url') or DEFAULT_DATABASE_URL)
+        except Exception as e:
+            logger.error(f"Error rendering plot of cycle {ctx['cycle_db_id']} from data: {e}")
+        if plot_path:
+            ctx['plot_filename'] = _reports_relative(plot_path)
+            ctx['plot_path'] = plot_path
+        else:
+            ctx['plot_filename'], ctx['plot_path'] = create_placeholder_plot(ctx['cycle_number'], ctx['timestamp'],
+                                                                             ctx['cycle_db_id'])
+        return
+
+    # The shared plot_export.png and the live plot only show this cycle while its job
+    # runs right after it stopped; a job resumed after a restart must not pick them up
+    live = not ctx.get('resumed')
+    plot_filename, plot_path = create_unique_plot_export(ctx['cycle_number'], ctx['timestamp'], ctx['cycle_db_id'],
+                                                         ctx.get('database_url') or DEFAULT_DATABASE_URL,
+                                                         use_shared_plot=live)
+    if not live:
+        ctx['plot_filename'] = plot_filename
+        ctx['plot_path'] = plot_path
+        return
+
+    # Try to get plot path from visualization manager if available
+    try:
+        # Import here to avoid circular imports
+        from RaspPiReader.libs.visualization_manager import VisualizationManager
+        vis_manager = VisualizationManager.instance()
+        if hasattr(vis_manager, 'get_current_plot_path'):
+            vis_plot_path = vis_manager.get_current_plot_path()
+            if vis_plot_path and os.path.exists(vis_plot_path):
+                logger.info(f"Using visualization manager plot: {vis_plot_path}")
+                plot_path = vis_plot_path
+                plot_filename = _reports_relative(vis_plot_path)
+    except Exception as e:
+        logger.warning(f"Could not get plot from visualization manager: {e}")
+    ctx['plot_filename'] = plot_filename
+    ctx['plot_path'] = plot_path
+
+
+def stage_pyramid(ctx):
+    """Precompute the min/max/mean pyramid used by the cycle history viewer."""
+    db = _database(ctx)
+    try:
+        build_cycle_pyramid(db, ctx['cycle_db_id'])
+    except Exception as e:
+        logger.error(f"Error building plot pyramid for cycle {ctx['cycle_db_id']}: {e}")
+    finally:
+        db.session.close()
+
+
+def stage_alarms(ctx):
+    """Store the cycle's alarm counts and durations for the alarm history queries."""
+    db = _database(ctx)
+    try:
+        alarm_history.ensure_indexes(db.engine)
+        alarm_history.summarize_cycle(db.session, ctx['cycle_db_id'])
+    except Exception as e:
+        logger.error(f"Error summarizing alarms of cycle {ctx['cycle_db_id']}: {e}")
+    finally:
+        db.session.close()
+
+
+def stage_html(ctx):
+    """Render the HTML report; a failure leaves the PDF stage to write the fallback report."""
+    cycle_data = ctx['cycle']
+    cycle_number = ctx['cycle_number']
+    serial_numbers = ctx['serial_numbers']
+    plot_path = ctx.get('plot_path')
+    ctx['html_content'] = None
 
     try:
         dwell_time = float(cycle_data.dwell_time) if hasattr(cycle_data, 'dwell_time') else 0.0
@@ -371,26 +669,10 @@ def finalize_cycle(cycle_data, serial_numbers, supervisor_username=None, alarm_v
     except Exception:
         quantity = len(serial_numbers)
 
-    # Get program number and settings
-    program_number = getattr(cycle_data, 'program_number', None)
-    if not program_number:
-        program_number = pool.config("program_number", int, default_val=1)
-    
-    # Get program settings from database
-    from RaspPiReader.libs.models import DefaultProgram
-    program_settings = db.session.query(DefaultProgram).filter_by(
-        program_number=program_number
-    ).first()
-    
-    if program_settings:
-        core_temp_setpoint = program_settings.core_temp_setpoint
-    else:
-        core_temp_setpoint = pool.config("core_temp_setpoint", float, default_val=100.0)
-
+    report_data = {'data': {'order_id': getattr(cycle_data, 'order_id', "N/A")}}
+    ctx['report_data'] = report_data
     try:
-        with open(template_file, 'r', encoding='utf-8') as file:
-            template_content = file.read()
-        template = Template(template_content)
+        template = report_templates.get_instance().get(ctx['template_file'])
         cycle_date = (cycle_data.start_time.strftime("%Y-%m-%d")
                       if hasattr(cycle_data, 'start_time') and cycle_data.start_time
                       else datetime.now().strftime("%Y-%m-%d"))
@@ -400,103 +682,105 @@ def finalize_cycle(cycle_data, serial_numbers, supervisor_username=None, alarm_v
         cycle_end_time = (cycle_data.stop_time.strftime("%H:%M:%S")
                           if hasattr(cycle_data, 'stop_time') and cycle_data.stop_time
                           else datetime.now().strftime("%H:%M:%S"))
-        
+
         # Prepare plot image path for the template
         plot_image_rel_path = None
         if plot_path and os.path.exists(plot_path):
             try:
-                # Get relative path for HTML - use the reports directory as base
-                reports_dir = os.path.join(os.getcwd(), "reports")
-                # Make sure we're using the correct path separator for HTML
-                plot_image_rel_path = os.path.basename(plot_path)
+                # Link the stored plot relative to the HTML file; blobs never change, so no copy is needed
+                plot_image_rel_path = _reports_relative(plot_path, os.path.dirname(os.path.abspath(ctx['html_path'])))
                 logger.info(f"Including plot image in report: {plot_image_rel_path}")
-                
-                # Create a backup copy with timestamp in the filename for reference
-                timestamp_str = datetime.now().strftime("%Y%m%d%H%M%S")
-                backup_filename = f"{cycle_number}_{timestamp_str}_plot.png"
-                backup_path = os.path.join(reports_dir, backup_filename)
-                
-                if not os.path.exists(backup_path) and os.path.exists(plot_path):
-                    try:
-                        shutil.copy2(plot_path, backup_path)
-                        logger.info(f"Created timestamped backup of plot: {backup_filename}")
-                    except Exception as copy_err:
-                        logger.warning(f"Could not create timestamped backup of plot: {copy_err}")
             except Exception as e:
                 logger.error(f"Error preparing plot path for template: {e}")
         # Add timestamp for cache busting
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        
-        report_data = {
-            'data': {
-                'order_id': getattr(cycle_data, 'order_id', "N/A"),
-                'cycle_id': getattr(cycle_data, 'cycle_id', "N/A"),
-                'program_number': program_number,
-                'core_temp_setpoint': core_temp_setpoint,
-                'quantity': quantity,
-                'size': getattr(cycle_data, 'size', "N/A"),
-                'serial_numbers': serial_list,
-                'cycle_location': getattr(cycle_data, 'cycle_location', "N/A"),
-                'cycle_date': cycle_date,
-                'cycle_start_time': cycle_start_time,
-                'cycle_end_time': cycle_end_time,
-                'dwell_time': dwell_time,
-                'cool_down_temp': getattr(cycle_data, 'cool_down_temp', "N/A"),
-                'temp_ramp': getattr(cycle_data, 'temp_ramp', "N/A"),
-                'set_pressure': getattr(cycle_data, 'set_pressure', "N/A"),
-                'maintain_vacuum': "Yes" if (hasattr(cycle_data, 'maintain_vacuum') and cycle_data.maintain_vacuum) else "No",
-                'initial_set_cure_temp': getattr(cycle_data, 'initial_set_cure_temp', "N/A"),
-                'final_set_cure_temp': getattr(cycle_data, 'final_set_cure_temp', "N/A"),
-                'core_high_temp_time': getattr(cycle_data, 'core_high_temp_time', None),
-                'release_temp': getattr(cycle_data, 'pressure_drop_core_temp', None),
-                'alarms': alarm_info,
-                'alarm_logs': alarm_logs,
-                'supervisor': supervisor_username if supervisor_username else "N/A",
-                'current_date': datetime.now().strftime("%Y-%m-%d"),
-                'generation_time': datetime.now().strftime("%H:%M:%S"),
-                'timestamp': timestamp,
-                'plot_image': plot_image_rel_path,
-                'plot_path': f"{plot_image_rel_path}?t={timestamp}" if plot_image_rel_path else None
-            }
+
+        report_data['data'] = {
+            'order_id': getattr(cycle_data, 'order_id', "N/A"),
+            'cycle_id': getattr(cycle_data, 'cycle_id', "N/A"),
+            'program_number': ctx['program_number'],
+            'core_temp_setpoint': ctx['core_temp_setpoint'],
+            'quantity': quantity,
+            'size': getattr(cycle_data, 'size', "N/A"),
+            'serial_numbers': ctx['serial_list'],
+            'cycle_location': getattr(cycle_data, 'cycle_location', "N/A"),
+            'cycle_date': cycle_date,
+            'cycle_start_time': cycle_start_time,
+            'cycle_end_time': cycle_end_time,
+            'dwell_time': dwell_time,
+            'cool_down_temp': getattr(cycle_data, 'cool_down_temp', "N/A"),
+            'temp_ramp': getattr(cycle_data, 'temp_ramp', "N/A"),
+            'set_pressure': getattr(cycle_data, 'set_pressure', "N/A"),
+            'maintain_vacuum': "Yes" if (hasattr(cycle_data, 'maintain_vacuum') and cycle_data.maintain_vacuum) else "No",
+            'initial_set_cure_temp': getattr(cycle_data, 'initial_set_cure_temp', "N/A"),
+            'final_set_cure_temp': getattr(cycle_data, 'final_set_cure_temp', "N/A"),
+            'core_high_temp_time': getattr(cycle_data, 'core_high_temp_time', None),
+            'release_temp': getattr(cycle_data, 'pressure_drop_core_temp', None),
+            'alarms': ctx['alarm_info'],
+            'alarm_logs': ctx['alarm_logs'],
+            'supervisor': ctx['supervisor_username'] if ctx['supervisor_username'] else "N/A",
+            'current_date': datetime.now().strftime("%Y-%m-%d"),
+            'generation_time': datetime.now().strftime("%H:%M:%S"),
+            'timestamp': timestamp,
+            'plot_image': plot_image_rel_path,
+            'plot_path': f"{plot_image_rel_path}?t={timestamp}" if plot_image_rel_path else None
         }
         html_content = template.render(**report_data)
-        with open(html_path, 'w', encoding='utf-8') as f:
+        with open(ctx['html_path'], 'w', encoding='utf-8') as f:
             f.write(html_content)
-        logger.info(f"HTML report generated successfully: {html_path}")
-        webbrowser.open_new_tab(html_path)
+        ctx['html_content'] = html_content
+        _catalog_file(ctx, ctx['html_path'], 'html')
+        logger.info(f"HTML report generated successfully: {ctx['html_path']}")
+        if ctx.get('open_report', True):
+            webbrowser.open_new_tab(ctx['html_path'])
+    except Exception as e:
+        logger.error(f"Failed to generate HTML report: {e}")
 
-        options = {
-            'page-size': 'A4',
-            'encoding': "UTF-8",
-            'enable-local-file-access': ""
-        }
-        wkhtmltopdf_path = os.path.join(os.getcwd(), 'wkhtmltopdf.exe')
-        config_pdfkit = pdfkit.configuration(wkhtmltopdf=wkhtmltopdf_path)
-        pdfkit.from_string(html_content, pdf_path, options=options, configuration=config_pdfkit)
-        logger.info(f"PDF report generated: {pdf_path}")
+
+def _write_fallback_report(ctx):
+    fallback_path = ctx['pdf_path'].replace('.pdf', '.txt')
+    try:
+        with open(fallback_path, 'w', encoding='utf-8') as file:
+            file.write(f"Report for {ctx['cycle_number']} (fallback due to PDF generation failure)\n")
+            for key, value in ctx.get('report_data', {}).get('data', {}).items():
+                file.write(f"{key}: {value}\n")
+        _catalog_file(ctx, fallback_path, 'txt')
+        logger.info(f"Fallback text report generated: {fallback_path}")
+    except Exception as ex:
+        logger.error(f"Failed to generate fallback report: {ex}")
+
+
+def stage_pdf(ctx):
+    """Convert the rendered HTML to PDF, or write a text fallback report."""
+    html_content = ctx.get('html_content')
+    if html_content is None:
+        logger.error("Failed to generate PDF report: no HTML report was rendered")
+        _write_fallback_report(ctx)
+        return
+    try:
+        # The report links the plot relative to the HTML file's folder
+        pdf_renderer.get_instance().render(html_content, ctx['pdf_path'],
+                                           base_dir=os.path.dirname(os.path.abspath(ctx['html_path'])))
+        _catalog_file(ctx, ctx['pdf_path'], 'pdf')
+        logger.info(f"PDF report generated: {ctx['pdf_path']}")
     except Exception as e:
         logger.error(f"Failed to generate PDF report: {e}")
-        fallback_path = pdf_path.replace('.pdf', '.txt')
-        try:
-            with open(fallback_path, 'w', encoding='utf-8') as file:
-                file.write(f"Report for {cycle_number} (fallback due to PDF generation failure)\n")
-                for key, value in report_data['data'].items():
-                    file.write(f"{key}: {value}\n")
-            logger.info(f"Fallback text report generated: {fallback_path}")
-        except Exception as ex:
-            logger.error(f"Failed to generate fallback report: {ex}")
+        _write_fallback_report(ctx)
+
+
+def stage_record(ctx):
+    """Store the report record and the final serial numbers of the cycle."""
+    cycle_id = ctx['cycle_db_id']
+    cycle_data = ctx['cycle']
+    serial_numbers = ctx['serial_numbers']
+    plot_filename = ctx.get('plot_filename')
+    db = _database(ctx)
 
     # Create or update the CycleReport record bound to this cycle.
     try:
-        # Explicitly verify the cycle ID before proceeding
-        cycle_id = getattr(cycle_data, 'id', None)
-        if not cycle_id:
-            logger.error("Cannot associate report: cycle_data has no valid ID")
-            return (pdf_filename, csv_filename)
-                
         # Check if a report already exists for this cycle
         existing_report = db.session.query(CycleReport).filter(CycleReport.cycle_id == cycle_id).first()
-            
+
         if existing_report:
             logger.info(f"Updating existing report record for cycle {cycle_id}")
             # Remove non-existent fields
@@ -518,16 +802,12 @@ def finalize_cycle(cycle_data, serial_numbers, supervisor_username=None, alarm_v
         logger.error(f"Database integrity error updating cycle report record: {ie}")
         db.session.rollback()
         try:
-            cycle_id = getattr(cycle_data, 'id', None)
-            if cycle_id:
-                db.session.execute(
-                    "UPDATE cycle_reports SET plot_image_path = :plot WHERE cycle_id = :cycle_id",
-                    {"plot": plot_filename, "cycle_id": cycle_id}
-                )
-                db.session.commit()
-                logger.info(f"Successfully updated report using direct SQL for cycle {cycle_id}")
-            else:
-                logger.error("Cannot update report: cycle_data has no valid ID")
+            db.session.execute(
+                text("UPDATE cycle_reports SET plot_image_path = :plot WHERE cycle_id = :cycle_id"),
+                {"plot": plot_filename, "cycle_id": cycle_id}
+            )
+            db.session.commit()
+            logger.info(f"Successfully updated report using direct SQL for cycle {cycle_id}")
         except Exception as e2:
             logger.error(f"Second attempt to update report failed: {e2}")
             db.session.rollback()
@@ -540,13 +820,13 @@ def finalize_cycle(cycle_data, serial_numbers, supervisor_username=None, alarm_v
     try:
         stored_serials = db.session.query(CycleSerialNumber).filter(CycleSerialNumber.cycle_id == cycle_id).all()
         valid_stored = [s.serial_number for s in stored_serials if s.serial_number and not s.serial_number.startswith("PLACEHOLDER_")]
-        
+
         # Check if we have valid stored serial numbers for this cycle
         if valid_stored:
             logger.info(f"Using stored serial numbers for cycle {cycle_id}: {valid_stored}")
         else:
             # No valid serials found directly for this cycle
-            
+
             # First, check if we have serial numbers from related cycles with the same order_id
             related_serials = []
             if hasattr(cycle_data, 'order_id') and cycle_data.order_id:
@@ -555,16 +835,16 @@ def finalize_cycle(cycle_data, serial_numbers, supervisor_username=None, alarm_v
                     CycleData.order_id == cycle_data.order_id,
                     CycleData.id != cycle_id  # Exclude current cycle
                 ).all()
-                
+
                 for related_cycle in related_cycles:
                     related_records = db.session.query(CycleSerialNumber).filter(
                         CycleSerialNumber.cycle_id == related_cycle.id
                     ).all()
-                    
+
                     for record in related_records:
                         if record.serial_number and not record.serial_number.startswith("PLACEHOLDER_"):
                             related_serials.append(record.serial_number)
-                
+
                 if related_serials:
                     logger.info(f"Found {len(related_serials)} serial numbers from related cycles")
                     # Copy these serial numbers to the current cycle
@@ -574,14 +854,14 @@ def finalize_cycle(cycle_data, serial_numbers, supervisor_username=None, alarm_v
                             CycleSerialNumber.cycle_id == cycle_id,
                             CycleSerialNumber.serial_number == sn
                         ).first()
-                        
+
                         if not existing:
                             record = CycleSerialNumber(cycle_id=cycle_id, serial_number=sn)
                             db.session.add(record)
-                    
+
                     db.session.commit()
                     logger.info(f"Copied serial numbers from related cycles to cycle {cycle_id}")
-            
+
             # If we still don't have serial numbers, use the provided list
             if not related_serials:
                 # No valid serials found, so insert from the provided list.
@@ -610,10 +890,59 @@ def finalize_cycle(cycle_data, serial_numbers, supervisor_username=None, alarm_v
     except Exception as e:
         logger.error(f"Error saving cycle serial numbers: {e}")
         db.session.rollback()
+    finally:
+        db.session.close()
+
 
+def stage_upload(ctx):
+    """Queue the CSV and PDF reports for upload to OneDrive."""
     try:
-        upload_to_onedrive(csv_path, pdf_path)
+        upload_to_onedrive(ctx['csv_path'], ctx['pdf_path'])
     except Exception as e:
         logger.error(f"Error during OneDrive upload: {e}")
 
-    return (pdf_filename, csv_filename)
+
+STAGE_FUNCTIONS = {
+    'prepare': stage_prepare,
+    'csv': stage_csv,
+    'plot': stage_plot,
+    'pyramid': stage_pyramid,
+    'html': stage_html,
+    'pdf': stage_pdf,
+    'record': stage_record,
+    'alarms': stage_alarms,
+    'upload': stage_upload,
+}
+
+
+def finalize_cycle(cycle_data, serial_numbers, supervisor_username=None, alarm_values={},
+                   reports_folder="reports", template_file="RaspPiReader/ui/result_template.html"):
+    """
+    Finalize a cycle by generating reports and storing cycle data.
+
+    Runs every finalization stage in order on the calling thread. The UI uses
+    FinalizationJobQueue instead, which runs the same stages on a worker pool.
+
+    Args:
+        cycle_data: The cycle data object
+        serial_numbers: List of serial numbers to associate with this cycle
+        supervisor_username: Optional supervisor name for the report
+        alarm_values: Ignored; the report's alarm section comes from the alarm history
+        reports_folder: Folder to store reports
+        template_file: HTML template for report generation
+
+    Returns:
+        Tuple of (pdf_filename, csv_filename)
+    """
+    # Verify cycle_data has a valid ID
+    if not hasattr(cycle_data, 'id') or not cycle_data.id:
+        logger.error("Cannot finalize cycle: cycle_data has no valid ID")
+        return (None, None)
+
+    logger.info(f"Finalizing cycle with ID: {cycle_data.id}")
+    ctx = new_finalization_context(cycle_data.id, serial_numbers, supervisor_username,
+                                   alarm_values, reports_folder, template_file)
+    for stage, _ in FINALIZATION_STAGES:
+        STAGE_FUNCTIONS[stage](ctx)
+
+    return (ctx['pdf_filename'], ctx['csv_filename'])
@@ -435,6 +435,15 @@ class Database:
                     conn.execute(text("ALTER TABLE alarm_mappings ADD COLUMN active BOOLEAN NOT NULL DEFAULT 1"))
                     self.logger.info("Added active column to alarm_mappings table")
                     
+                # Alarm engine settings; existing rules keep the old immediate, non-latching behaviour
+                for column, definition in (('hysteresis', 'FLOAT NOT NULL DEFAULT 0'),
+                                           ('on_delay', 'FLOAT NOT NULL DEFAULT 0'),
+                                           ('off_delay', 'FLOAT NOT NULL DEFAULT 0'),
+                                           ('latching', 'BOOLEAN NOT NULL DEFAULT 0')):
+                    if column not in column_names:
+                        conn.execute(text(f"ALTER TABLE alarm_mappings ADD COLUMN {column} {definition}"))
+                        self.logger.info(f"Added {column} column to alarm_mappings table")
+                    
                 # Update any NULL threshold values to 0
                 conn.execute(text("UPDATE alarm_mappings SET threshold = 0 WHERE threshold IS NULL"))
                 self.logger.info("Updated NULL threshold values to 0")
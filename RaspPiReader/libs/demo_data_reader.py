@@ -1,25 +1,31 @@
 import csv
+import logging
 import os
 import random
 import time
 import threading
 from RaspPiReader import pool
-from RaspPiReader.libs.database import Database
-from RaspPiReader.libs.models import DemoData
 
-data = []
-db = Database("sqlite:///local_database.db")
+logger = logging.getLogger(__name__)
 
-# Load data from the database
-demo_data = db.session.query(DemoData).all()
-if demo_data:
-    data = [[record.column1, record.column2, record.column3, record.column4, record.column5, record.column6, record.column7, record.column8, record.column9, record.column10, record.column11, record.column12, record.column13, record.column14] for record in demo_data]
-else:
-    demo_file_path = os.path.join(os.getcwd(), "RaspPiReader", "demo.csv")
-    if os.path.exists(demo_file_path):
-        with open(demo_file_path) as file_name:
-            file_read = csv.reader(file_name)
-            data = list(file_read)
+_data = None
+_data_lock = threading.Lock()
+
+
+def _load():
+    """Demo rows from the demo_data table, seeded from demo.csv on first use"""
+    from RaspPiReader.libs.database import Database
+    from RaspPiReader.libs.models import DemoData
+
+    db = Database("sqlite:///local_database.db")
+    try:
+        demo_data = db.session.query(DemoData).all()
+        if demo_data:
+            return [[record.column1, record.column2, record.column3, record.column4, record.column5, record.column6, record.column7, record.column8, record.column9, record.column10, record.column11, record.column12, record.column13, record.column14] for record in demo_data]
+        data = load_demo_data()
+        if not data:
+            logger.warning(f"{os.path.join(os.getcwd(), 'RaspPiReader', 'demo.csv')} not found. Demo data will be empty.")
+            return data
         # Save data to the database
         for row in data:
             demo_record = DemoData(
@@ -29,8 +35,38 @@ else:
             )
             db.session.add(demo_record)
         db.session.commit()
-    else:
-        print(f"Warning: {demo_file_path} not found. Demo data will be empty.")
+        return data
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error loading demo data: {e}")
+        return load_demo_data()
+    finally:
+        db.session.close()
+
+
+def get_data():
+    """
+    The demo data rows, loaded on first call.
+
+    Loading used to happen when this module was imported, which cost every
+    start a database query even outside demo mode.
+
+    Returns:
+        list: One list of 14 channel values per row
+    """
+    global _data
+    if _data is None:
+        with _data_lock:
+            if _data is None:
+                _data = _load()
+    return _data
+
+
+def __getattr__(name):
+    # Keep 'from demo_data_reader import data' working, loading on first access
+    if name == 'data':
+        return get_data()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def load_demo_data():
     demo_file_path = os.path.join(os.getcwd(), "RaspPiReader", "demo.csv")
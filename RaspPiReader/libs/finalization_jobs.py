@@ -0,0 +1,283 @@
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from RaspPiReader import pool
+from RaspPiReader.libs.database import Database
+from RaspPiReader.libs.models import FinalizationJob
+from RaspPiReader.libs.cycle_finalization import (
+    FINALIZATION_STAGES, STAGE_FUNCTIONS, new_finalization_context
+)
+
+logger = logging.getLogger(__name__)
+
+# Context values saved with the job record; everything else is rebuilt by re-running stages.
+PERSISTED_CONTEXT_KEYS = (
+    'cycle_db_id', 'serial_numbers', 'supervisor_username', 'alarm_values',
+    'reports_folder', 'template_file', 'timestamp', 'cycle_number', 'base_filename', 'database_url',
+)
+# Stages that only fill the in-memory context and are always re-run when a job resumes.
+RESUME_RERUN_STAGES = ('prepare', 'plot')
+
+STAGE_DEPENDENCIES = dict(FINALIZATION_STAGES)
+STAGE_ORDER = [stage for stage, _ in FINALIZATION_STAGES]
+
+
+class FinalizationJobQueue(QObject):
+    """
+    Runs cycle finalizations as jobs on a thread pool.
+
+    Each job is split into the stages of FINALIZATION_STAGES; a stage is
+    submitted as soon as all the stages it depends on have finished, so
+    independent stages (CSV, plot pyramid, report record, ...) run
+    concurrently. Every stage transition is written to the finalization_jobs
+    table, and jobs left unfinished by a restart are picked up again by
+    resume_unfinished().
+
+    Signals are emitted from worker threads; Qt delivers them queued to slots
+    of objects living in the GUI thread.
+    """
+
+    jobQueued = pyqtSignal(int, int)  # job id, cycle id
+    stageStarted = pyqtSignal(int, str)  # job id, stage
+    stageFinished = pyqtSignal(int, str, bool, float)  # job id, stage, success, seconds
+    jobProgress = pyqtSignal(int, int)  # job id, percent of stages completed
+    jobFinished = pyqtSignal(int, bool, str, str)  # job id, success, pdf filename, csv filename
+
+    def __init__(self, max_workers=None, parent=None):
+        super(FinalizationJobQueue, self).__init__(parent)
+        if max_workers is None:
+            max_workers = pool.config('finalization_workers', int, 3)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                           thread_name_prefix="finalization")
+        self.db = Database("sqlite:///local_database.db")
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, cycle_data, serial_numbers, supervisor_username=None, alarm_values=None,
+               reports_folder="reports", template_file="RaspPiReader/ui/result_template.html"):
+        """
+        Queue the finalization of a stored cycle.
+
+        Args:
+            cycle_data: CycleData object (or anything with the cycle's database id as .id)
+            serial_numbers: List of serial numbers to associate with this cycle
+            supervisor_username: Optional supervisor name for the report
+            alarm_values: Ignored; the report's alarm section comes from the alarm history
+            reports_folder: Folder to store reports
+            template_file: HTML template for report generation
+
+        Returns:
+            int: Id of the job, or None if the cycle has no id
+        """
+        cycle_id = getattr(cycle_data, 'id', None)
+        if not cycle_id:
+            logger.error("Cannot finalize cycle: cycle_data has no valid ID")
+            return None
+        ctx = new_finalization_context(cycle_id, serial_numbers, supervisor_username,
+                                       alarm_values, reports_folder, template_file)
+        with self._db_lock:
+            try:
+                job = FinalizationJob(
+                    cycle_id=cycle_id,
+                    status='queued',
+                    context=json.dumps(self._persisted_context(ctx), default=str),
+                    stages=json.dumps({}),
+                )
+                self.db.session.add(job)
+                self.db.session.commit()
+                job_id = job.id
+            except Exception as e:
+                self.db.session.rollback()
+                logger.error(f"Error creating finalization job for cycle {cycle_id}: {e}")
+                raise
+        logger.info(f"Queued finalization job {job_id} for cycle {cycle_id}")
+        self.jobQueued.emit(job_id, cycle_id)
+        self._start(job_id, ctx, {})
+        return job_id
+
+    def resume_unfinished(self):
+        """
+        Restart jobs that were queued or running when the application stopped.
+
+        Returns:
+            list: Ids of the resumed jobs
+        """
+        resumed = []
+        with self._db_lock:
+            try:
+                jobs = self.db.session.query(FinalizationJob)\
+                    .filter(FinalizationJob.status.in_(['queued', 'running']))\
+                    .order_by(FinalizationJob.id)\
+                    .all()
+                pending = [(job.id, job.context, job.stages) for job in jobs]
+            except Exception as e:
+                logger.error(f"Error loading unfinished finalization jobs: {e}")
+                return resumed
+        for job_id, context_json, stages_json in pending:
+            if job_id in self._jobs:
+                continue
+            try:
+                ctx = json.loads(context_json or '{}')
+                stages = json.loads(stages_json or '{}')
+            except ValueError as e:
+                logger.error(f"Finalization job {job_id} has an unreadable record: {e}")
+                continue
+            ctx['resumed'] = True
+            # Failed or skipped stages get another attempt
+            stages = {stage: record for stage, record in stages.items() if record.get('status') == 'done'}
+            for stage in RESUME_RERUN_STAGES:
+                stages.pop(stage, None)
+            # The HTML stage only keeps the rendered page in memory; re-render it if the PDF is still due.
+            if stages.get('pdf', {}).get('status') != 'done':
+                stages.pop('html', None)
+            logger.info(f"Resuming finalization job {job_id} for cycle {ctx.get('cycle_db_id')}")
+            self._start(job_id, ctx, stages)
+            resumed.append(job_id)
+        return resumed
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job finishes. Returns True if it finished within the timeout."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return True
+        return job['finished'].wait(timeout)
+
+    def job_state(self, job_id):
+        """Return a copy of a running job's per-stage records, or None if it is not running."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job['stages']) if job else None
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def _persisted_context(self, ctx):
+        return {key: ctx.get(key) for key in PERSISTED_CONTEXT_KEYS if key in ctx}
+
+    def _start(self, job_id, ctx, stages):
+        job = {
+            'ctx': ctx,
+            'stages': dict(stages),
+            'running': set(),
+            'closing': False,
+            'started': time.time(),
+            'finished': threading.Event(),
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        self._save(job_id, status='running')
+        self._dispatch(job_id)
+
+    def _dispatch(self, job_id):
+        """Submit every stage whose dependencies are satisfied; finish the job when nothing is left."""
+        to_submit = []
+        finished = False
+        with self._lock:
+            job = self._jobs[job_id]
+            stages = job['stages']
+            for stage in STAGE_ORDER:
+                if stage in stages or stage in job['running']:
+                    continue
+                dependencies = STAGE_DEPENDENCIES[stage]
+                if any(stages.get(dep, {}).get('status') in ('failed', 'skipped') for dep in dependencies):
+                    stages[stage] = {'status': 'skipped', 'seconds': 0.0}
+                    continue
+                if all(stages.get(dep, {}).get('status') == 'done' for dep in dependencies):
+                    job['running'].add(stage)
+                    to_submit.append(stage)
+            if not job['running'] and not job['closing'] and all(stage in stages for stage in STAGE_ORDER):
+                job['closing'] = True
+                finished = True
+        for stage in to_submit:
+            self.executor.submit(self._run_stage, job_id, stage)
+        if finished:
+            self._finish(job_id)
+
+    def _run_stage(self, job_id, stage):
+        job = self._jobs[job_id]
+        self.stageStarted.emit(job_id, stage)
+        started = time.perf_counter()
+        success = True
+        error = None
+        try:
+            STAGE_FUNCTIONS[stage](job['ctx'])
+        except Exception as e:
+            success = False
+            error = str(e)
+            logger.error(f"Finalization job {job_id} stage {stage} failed: {e}")
+        seconds = time.perf_counter() - started
+        logger.info(f"Finalization job {job_id} stage {stage} {'finished' if success else 'failed'} in {seconds:.2f}s")
+
+        with self._lock:
+            job['running'].discard(stage)
+            job['stages'][stage] = {'status': 'done' if success else 'failed', 'seconds': round(seconds, 3)}
+            if error:
+                job['stages'][stage]['error'] = error
+            completed = sum(1 for record in job['stages'].values() if record['status'] != 'pending')
+        self._save(job_id)
+        self.stageFinished.emit(job_id, stage, success, seconds)
+        self.jobProgress.emit(job_id, int(completed * 100 / len(STAGE_ORDER)))
+        self._dispatch(job_id)
+
+    def _finish(self, job_id):
+        job = self._jobs[job_id]
+        failed = [stage for stage, record in job['stages'].items() if record['status'] != 'done']
+        success = not failed
+        error = None if success else f"Stages not completed: {', '.join(failed)}"
+        self._save(job_id, status='done' if success else 'failed', error=error, finished=True)
+        ctx = job['ctx']
+        logger.info(f"Finalization job {job_id} {'completed' if success else 'failed'} "
+                    f"in {time.time() - job['started']:.2f}s")
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        job['finished'].set()
+        self.jobFinished.emit(job_id, success, ctx.get('pdf_filename') or '', ctx.get('csv_filename') or '')
+
+    def _save(self, job_id, status=None, error=None, finished=False):
+        """Write the job's stage records (and optionally its status) to the database"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            stages_json = json.dumps(job['stages']) if job else None
+            context_json = json.dumps(self._persisted_context(job['ctx']), default=str) if job else None
+        with self._db_lock:
+            try:
+                record = self.db.session.query(FinalizationJob).filter_by(id=job_id).first()
+                if record is None:
+                    return
+                if stages_json is not None:
+                    record.stages = stages_json
+                    record.context = context_json
+                if status:
+                    record.status = status
+                if error:
+                    record.error = error
+                record.updated_at = datetime.utcnow()
+                if finished:
+                    record.finished_at = record.updated_at
+                self.db.session.commit()
+            except Exception as e:
+                self.db.session.rollback()
+                logger.error(f"Error saving finalization job {job_id}: {e}")
+
+
+_instance = None
+
+
+def get_instance():
+    """
+    Get or create the application-wide finalization job queue.
+
+    Returns:
+        FinalizationJobQueue: The singleton instance
+    """
+    global _instance
+    if _instance is None:
+        _instance = FinalizationJobQueue()
+    return _instance
@@ -0,0 +1,243 @@
+import time
+import weakref
+import logging
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from RaspPiReader import pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FRAME_RATE_HZ = 5.0
+MIN_FRAME_RATE_HZ = 1.0
+MAX_FRAME_RATE_HZ = 30.0
+# Length of the window the load figures are averaged over
+STATS_WINDOW_SECONDS = 1.0
+
+
+class FrameTimer(QObject):
+    """
+    Drop-in replacement for a QTimer driven by the FrameScheduler.
+
+    Offers the QTimer subset used by the UI (timeout, start, stop, isActive,
+    interval, setInterval, setSingleShot). Instead of waking the event loop on
+    its own, the timer fires during the first frame at or after its due time,
+    together with every other UI update of that frame.
+    """
+
+    timeout = pyqtSignal()
+
+    def __init__(self, scheduler, name, parent=None):
+        super(FrameTimer, self).__init__(parent)
+        self.scheduler = scheduler
+        self.name = name
+        self._interval_ms = 0
+        self._single_shot = False
+        self._active = False
+        self.next_due = 0.0
+
+    def start(self, msec=None):
+        if msec is not None:
+            self._interval_ms = int(msec)
+        self._active = True
+        self.next_due = time.monotonic() + self._interval_ms / 1000.0
+        self.scheduler.ensure_running()
+
+    def stop(self):
+        self._active = False
+
+    def isActive(self):
+        return self._active
+
+    def interval(self):
+        return self._interval_ms
+
+    def setInterval(self, msec):
+        self._interval_ms = int(msec)
+
+    def setSingleShot(self, single_shot):
+        self._single_shot = bool(single_shot)
+
+    def isSingleShot(self):
+        return self._single_shot
+
+
+class FrameScheduler(QObject):
+    """
+    Single UI heartbeat that batches all periodic and pending UI updates.
+
+    Subsystems either create FrameTimers (periodic work such as status polling
+    or plot refreshes) or post() one-off updates keyed by name, where a newer
+    post replaces an older one that has not been applied yet. Everything due is
+    applied in one pass per frame at the configured display rate, independent
+    of how fast data is acquired.
+
+    The scheduler measures how much of each second it spends inside frames
+    (load) and how late frames start relative to their schedule (lag), which is
+    a direct measure of event loop congestion.
+    """
+
+    # Emitted once per stats window: load (0..1), average frame lag in ms
+    loadMeasured = pyqtSignal(float, float)
+
+    def __init__(self, rate_hz=None, parent=None):
+        super(FrameScheduler, self).__init__(parent)
+        if rate_hz is None:
+            rate_hz = pool.config('ui_frame_rate_hz', float, DEFAULT_FRAME_RATE_HZ)
+        # Timers are held weakly so a discarded timer simply stops firing
+        self._timers = weakref.WeakValueDictionary()
+        self._timer_ids = 0
+        self._pending = {}
+        self._frame_timer = QtCore.QTimer(self)
+        self._frame_timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self._frame_timer.timeout.connect(self.run_frame)
+        self._expected_frame = None
+        self._window_start = time.monotonic()
+        self._window_busy = 0.0
+        self._window_lag = 0.0
+        self._window_frames = 0
+        self._task_seconds = {}
+        self.stats = {
+            'rate_hz': 0.0,
+            'load': 0.0,
+            'lag_ms': 0.0,
+            'frames': 0,
+            'tasks_ms': {},
+        }
+        self.set_rate(rate_hz)
+
+    @property
+    def rate_hz(self):
+        return self._rate_hz
+
+    def set_rate(self, rate_hz):
+        """Set the display rate in frames per second (clamped to a sane range)"""
+        try:
+            rate_hz = float(rate_hz)
+        except (TypeError, ValueError):
+            rate_hz = DEFAULT_FRAME_RATE_HZ
+        self._rate_hz = max(MIN_FRAME_RATE_HZ, min(MAX_FRAME_RATE_HZ, rate_hz))
+        self._frame_interval = 1.0 / self._rate_hz
+        self._frame_timer.setInterval(int(round(self._frame_interval * 1000)))
+        self.stats['rate_hz'] = self._rate_hz
+        logger.info(f"UI frame rate set to {self._rate_hz:.1f} Hz")
+
+    def timer(self, name=None, parent=None):
+        """
+        Create a FrameTimer owned by this scheduler.
+
+        Args:
+            name: Label used in the per-task timing stats
+            parent: Optional QObject parent of the timer
+
+        Returns:
+            FrameTimer: A stopped timer; call start(msec) as with a QTimer
+        """
+        self._timer_ids += 1
+        timer_id = self._timer_ids
+        frame_timer = FrameTimer(self, name or f"timer{timer_id}", parent)
+        self._timers[timer_id] = frame_timer
+        frame_timer.destroyed.connect(lambda *args: self._timers.pop(timer_id, None))
+        return frame_timer
+
+    def _active_timers(self):
+        return [frame_timer for _, frame_timer in sorted(self._timers.items(), key=lambda item: item[0])]
+
+    def post(self, key, callback, *args):
+        """
+        Queue a UI update for the next frame.
+
+        A later post with the same key replaces an earlier one that has not run
+        yet, so only the latest state is ever drawn.
+        """
+        self._pending[key] = (callback, args)
+        self.ensure_running()
+
+    def ensure_running(self):
+        if not self._frame_timer.isActive():
+            self._expected_frame = time.monotonic() + self._frame_interval
+            self._frame_timer.start()
+
+    def stop(self):
+        self._frame_timer.stop()
+
+    def _run_task(self, name, callback):
+        started = time.perf_counter()
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Error in UI frame task {name}: {e}")
+        self._task_seconds[name] = self._task_seconds.get(name, 0.0) + time.perf_counter() - started
+
+    def run_frame(self):
+        """Apply every due timer and pending update in a single pass"""
+        frame_start = time.monotonic()
+        busy_start = time.perf_counter()
+        if self._expected_frame is not None:
+            self._window_lag += max(0.0, frame_start - self._expected_frame)
+        self._expected_frame = frame_start + self._frame_interval
+
+        # Fire timers whose due time falls within half a frame, so a 1000 ms
+        # timer at 5 Hz fires every 5th frame instead of drifting to the 6th.
+        horizon = frame_start + self._frame_interval / 2
+        for frame_timer in self._active_timers():
+            if not frame_timer.isActive() or frame_timer.next_due > horizon:
+                continue
+            if frame_timer.isSingleShot():
+                frame_timer.stop()
+            else:
+                interval = frame_timer.interval() / 1000.0
+                frame_timer.next_due += interval
+                if frame_timer.next_due <= frame_start:
+                    # Fell behind; skip missed ticks rather than firing a burst
+                    frame_timer.next_due = frame_start + interval
+            self._run_task(frame_timer.name, frame_timer.timeout.emit)
+
+        pending, self._pending = self._pending, {}
+        for key, (callback, args) in pending.items():
+            self._run_task(str(key), lambda: callback(*args))
+
+        self._window_busy += time.perf_counter() - busy_start
+        self._window_frames += 1
+        elapsed = frame_start - self._window_start
+        if elapsed >= STATS_WINDOW_SECONDS:
+            self._publish_stats(elapsed)
+
+        if not self._pending and not any(t.isActive() for t in self._active_timers()):
+            self._frame_timer.stop()
+
+    def _publish_stats(self, elapsed):
+        frames = max(self._window_frames, 1)
+        self.stats = {
+            'rate_hz': self._rate_hz,
+            'load': min(1.0, self._window_busy / elapsed),
+            'lag_ms': self._window_lag / frames * 1000.0,
+            'frames': self._window_frames,
+            'tasks_ms': {
+                name: seconds / frames * 1000.0 for name, seconds in self._task_seconds.items()
+            },
+        }
+        self._window_start = time.monotonic()
+        self._window_busy = 0.0
+        self._window_lag = 0.0
+        self._window_frames = 0
+        self._task_seconds = {}
+        logger.debug(f"UI frame stats: {self.stats}")
+        self.loadMeasured.emit(self.stats['load'], self.stats['lag_ms'])
+
+
+_instance = None
+
+
+def get_instance():
+    """
+    Get or create the application-wide FrameScheduler.
+
+    Returns:
+        FrameScheduler: The singleton instance
+    """
+    global _instance
+    if _instance is None:
+        _instance = FrameScheduler()
+    return _instance
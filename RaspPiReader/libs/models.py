@@ -1,5 +1,5 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, Boolean, Text, Float, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, Text, Float, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -44,6 +44,42 @@ class OneDriveSettings(Base):
     tenant_id = Column(String, nullable=False)
     update_interval = Column(Integer, nullable=False)
 
+class OneDriveUploadSession(Base):
+    """An unfinished OneDrive upload session, kept so a large upload resumes after a failure or restart."""
+    __tablename__ = 'onedrive_upload_sessions'
+    id = Column(Integer, primary_key=True)
+    file_path = Column(String, nullable=False)
+    target = Column(String, nullable=False)  # Drive item path the file is uploaded to
+    file_size = Column(Integer, nullable=False)
+    file_mtime = Column(Float, nullable=False)  # The session is dropped if the file changed
+    upload_url = Column(Text, nullable=False)
+    expires_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (UniqueConstraint('file_path', 'target', name='_upload_session_file_target_uc'), )
+
+class UploadQueueItem(Base):
+    """A report file queued for OneDrive, identified by its content hash so unchanged files are sent once."""
+    __tablename__ = 'upload_queue'
+    id = Column(Integer, primary_key=True)
+    file_path = Column(String, nullable=False)
+    file_name = Column(String, nullable=False)
+    folder_name = Column(String, nullable=True)  # Drive folder the file goes to, drive root when empty
+    digest = Column(String(64), nullable=False)  # SHA-256 of the content at enqueue time
+    file_size = Column(Integer, nullable=False)
+    file_mtime = Column(Float, nullable=False)
+    status = Column(String(16), nullable=False, default='pending')  # pending, uploading, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    remote_id = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    uploaded_at = Column(DateTime, nullable=True)
+    __table_args__ = (
+        Index('ix_upload_queue_status_due', 'status', 'next_attempt_at'),
+        Index('ix_upload_queue_remote', 'folder_name', 'file_name', 'digest'),
+        Index('ix_upload_queue_path', 'file_path'),
+    )
+
 class GeneralConfigSettings(Base):
     __tablename__ = 'general_config_settings'
     id = Column(Integer, primary_key=True)
@@ -96,6 +132,27 @@ class PlotData(Base):
     # Relationship with CycleData
     cycle = relationship("CycleData", back_populates="plot_data")
 
+    __table_args__ = (
+        Index('ix_plot_data_cycle_time', 'cycle_id', 'timestamp'),
+    )
+
+class PlotDataPyramid(Base):
+    """Precomputed min/max/mean buckets of a finished cycle's plot data, one row per bucket."""
+    __tablename__ = 'plot_data_pyramid'
+    id = Column(Integer, primary_key=True)
+    cycle_id = Column(Integer, ForeignKey('cycle_data.id'), nullable=False)
+    channel = Column(String, nullable=False)
+    level = Column(Integer, nullable=False)  # 0 is the finest level
+    bucket_seconds = Column(Float, nullable=False)
+    bucket_start = Column(Float, nullable=False)  # Epoch seconds
+    min_value = Column(Float, nullable=False)
+    max_value = Column(Float, nullable=False)
+    mean_value = Column(Float, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    __table_args__ = (
+        Index('ix_plot_data_pyramid_lookup', 'cycle_id', 'level', 'channel', 'bucket_start'),
+    )
+
 class CycleReport(Base):
     __tablename__ = 'cycle_reports'
     id = Column(Integer, primary_key=True)
@@ -106,6 +163,49 @@ class CycleReport(Base):
     # Additional fields as needed
     cycle = relationship("CycleData", back_populates="report")
 
+class ReportFile(Base):
+    """Catalog entry for one generated report artifact (CSV, PDF, HTML, plot image)."""
+    __tablename__ = 'report_files'
+    id = Column(Integer, primary_key=True)
+    cycle_id = Column(Integer, ForeignKey('cycle_data.id'), nullable=True)  # None if not matched to a cycle
+    cycle_number = Column(String, nullable=True)  # Cycle label used in the file name
+    kind = Column(String, nullable=False)  # csv, pdf, html, png, txt
+    path = Column(String, nullable=False, unique=True)  # Absolute path
+    size = Column(Integer, nullable=True)
+    checksum = Column(String, nullable=True)  # SHA-256 of the content
+    modified_at = Column(Float, nullable=True)  # File mtime when it was cataloged
+    created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        Index('ix_report_files_cycle', 'cycle_id', 'kind', 'created_at'),
+        Index('ix_report_files_cycle_number', 'cycle_number', 'kind', 'created_at'),
+    )
+
+class Artifact(Base):
+    """One content-addressed blob of the artifact store, stored once whatever the number of references."""
+    __tablename__ = 'artifacts'
+    digest = Column(String(64), primary_key=True)  # SHA-256 of the content
+    extension = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    references = relationship("ArtifactReference", back_populates="artifact")
+
+class ArtifactReference(Base):
+    """Use of an artifact blob by a cycle, e.g. the plot of its report."""
+    __tablename__ = 'artifact_references'
+    id = Column(Integer, primary_key=True)
+    digest = Column(String(64), ForeignKey('artifacts.digest'), nullable=False)
+    cycle_id = Column(Integer, ForeignKey('cycle_data.id'), nullable=True)
+    cycle_number = Column(String, nullable=True)
+    role = Column(String, nullable=False)  # plot, placeholder_plot
+    cache_key = Column(String(40), nullable=True)  # Render cache key the blob was produced for
+    created_at = Column(DateTime, default=datetime.utcnow)
+    artifact = relationship("Artifact", back_populates="references")
+    __table_args__ = (
+        Index('ix_artifact_references_cycle', 'cycle_id', 'role', 'created_at'),
+        Index('ix_artifact_references_cycle_number', 'cycle_number', 'role', 'created_at'),
+        Index('ix_artifact_references_cache_key', 'cache_key'),
+    )
+
 class CycleData(Base):
     __tablename__ = 'cycle_data'
     id = Column(Integer, primary_key=True)
@@ -133,6 +233,19 @@ class CycleData(Base):
     serial_numbers = relationship("CycleSerialNumber", back_populates="cycle", cascade="all, delete-orphan")
     report = relationship("CycleReport", back_populates="cycle", uselist=False)
 
+class FinalizationJob(Base):
+    """Persisted state of an asynchronous cycle finalization, so unfinished jobs resume after a restart."""
+    __tablename__ = 'finalization_jobs'
+    id = Column(Integer, primary_key=True)
+    cycle_id = Column(Integer, ForeignKey('cycle_data.id'), nullable=False)
+    status = Column(String, nullable=False, default='queued')  # queued, running, done, failed
+    context = Column(Text, nullable=True)  # JSON of the plain finalization context values
+    stages = Column(Text, nullable=True)  # JSON: stage -> {'status': ..., 'seconds': ...}
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
 class CycleSerialNumber(Base):
     __tablename__ = 'cycle_serial_numbers'
     id = Column(Integer, primary_key=True)
@@ -217,7 +330,49 @@ class AlarmMapping(Base):
     threshold = Column(Float, nullable=False)
     message = Column(String(255), nullable=False)
     active = Column(Boolean, default=True)
+    hysteresis = Column(Float, nullable=False, default=0.0)  # Deadband the value must clear by
+    on_delay = Column(Float, nullable=False, default=0.0)  # Seconds the condition must hold before alarming
+    off_delay = Column(Float, nullable=False, default=0.0)  # Seconds the condition must be clear before clearing
+    latching = Column(Boolean, nullable=False, default=False)  # Stays up until acknowledged
     alarm = relationship("Alarm", back_populates="mappings")
     
     def __repr__(self):
         return f"<AlarmMapping(alarm_id={self.alarm_id}, value={self.value}, message='{self.message}', threshold={self.threshold}, active={self.active})>"
+
+class AlarmEvent(Base):
+    """An alarm state transition, written by the alarm engine's history writer."""
+    __tablename__ = 'alarm_history'
+    id = Column(Integer, primary_key=True)
+    cycle_id = Column(Integer, ForeignKey('cycle_data.id'), nullable=True)
+    rule_id = Column(Integer, nullable=True)  # alarm_mappings.id of the rule
+    channel = Column(String(10), nullable=False)
+    kind = Column(Integer, nullable=False)  # 1 for low threshold, 2 for high threshold
+    threshold = Column(Float, nullable=False)
+    message = Column(String(255), nullable=False)
+    event = Column(String(16), nullable=False)  # raised, cleared, acknowledged
+    state = Column(String(16), nullable=False)  # State after the transition: normal, active, acknowledged, returned
+    value = Column(Float, nullable=True)
+    timestamp = Column(DateTime, nullable=False, default=datetime.now)
+    __table_args__ = (
+        Index('ix_alarm_history_cycle_channel_time', 'cycle_id', 'channel', 'timestamp'),
+        Index('ix_alarm_history_channel_time', 'channel', 'timestamp'),
+    )
+
+class AlarmCycleSummary(Base):
+    """Alarm count and duration of one channel and threshold kind in a cycle, written at finalization."""
+    __tablename__ = 'alarm_cycle_summary'
+    id = Column(Integer, primary_key=True)
+    cycle_id = Column(Integer, ForeignKey('cycle_data.id'), nullable=False)
+    cycle_start = Column(DateTime, nullable=True)  # Copied from the cycle so time range queries need no join
+    channel = Column(String(10), nullable=False)
+    kind = Column(Integer, nullable=False)  # 1 for low threshold, 2 for high threshold
+    alarm_count = Column(Integer, nullable=False, default=0)
+    total_seconds = Column(Float, nullable=False, default=0.0)  # Time any alarm of the kind was up
+    longest_seconds = Column(Float, nullable=False, default=0.0)
+    first_raised_at = Column(DateTime, nullable=True)
+    last_cleared_at = Column(DateTime, nullable=True)
+    __table_args__ = (
+        UniqueConstraint('cycle_id', 'channel', 'kind', name='_alarm_cycle_summary_uc'),
+        Index('ix_alarm_cycle_summary_lookup', 'channel', 'kind', 'cycle_start'),
+        Index('ix_alarm_cycle_summary_start', 'cycle_start'),
+    )
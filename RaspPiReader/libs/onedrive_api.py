@@ -1,14 +1,230 @@
 import os
+import time
 import requests
+from requests.adapters import HTTPAdapter
 import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from RaspPiReader import pool
+
+logger = logging.getLogger(__name__)
+
+GRAPH_URL = "https://graph.microsoft.com/v1.0"
+LOGIN_URL = "https://login.microsoftonline.com"
+# Upload session fragments must be a multiple of 320 KiB
+CHUNK_UNIT = 320 * 1024
+DEFAULT_CHUNK_SIZE = 10 * CHUNK_UNIT
+# Files up to this size are sent in a single PUT
+SIMPLE_UPLOAD_MAX = 4 * 1024 * 1024
+DEFAULT_UPLOAD_WORKERS = 2
+# Retries of an upload request (simple PUT or session fragment) after a throttling or server error
+CHUNK_RETRIES = 4
+# Session answers in a row that do not move the upload forward before it is given up
+NO_PROGRESS_LIMIT = 3
+REQUEST_TIMEOUT = 60
+# Tokens are refreshed this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 300
+DEFAULT_TOKEN_LIFETIME = 3600
+# Reports are uploaded into one folder per day
+DAILY_FOLDER_PREFIX = "PLC_Reports_"
+
+
+def daily_folder_name(day=None):
+    """Name of the folder a day's reports are uploaded to (today by default)"""
+    day = day or datetime.now()
+    return f"{DAILY_FOLDER_PREFIX}{day.strftime('%Y-%m-%d')}"
+
+
+class UploadSessionStore(object):
+    """
+    Persists the upload URL of unfinished upload sessions in the database.
+
+    A session is only handed back for the same file, target and file
+    size/modification time, and never after it expired, so a changed file
+    always starts a fresh upload.
+    """
+
+    def __init__(self, database_url="sqlite:///local_database.db"):
+        self.database_url = database_url
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _session(self):
+        if self._db is None:
+            from RaspPiReader.libs.database import Database
+            self._db = Database(self.database_url)
+        return self._db.session
+
+    def load(self, file_path, target, size, mtime):
+        """Return the upload URL of a resumable session, or None"""
+        from RaspPiReader.libs.models import OneDriveUploadSession
+        with self._lock:
+            session = self._session()
+            try:
+                record = session.query(OneDriveUploadSession).filter_by(file_path=file_path, target=target).first()
+                if record is None:
+                    return None
+                expired = record.expires_at is not None and record.expires_at <= datetime.utcnow()
+                if expired or record.file_size != size or abs(record.file_mtime - mtime) > 1e-6:
+                    session.delete(record)
+                    session.commit()
+                    return None
+                url = record.upload_url
+                session.commit()
+                return url
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error loading upload session of {file_path}: {e}")
+                return None
+
+    def save(self, file_path, target, size, mtime, upload_url, expires_at=None):
+        from RaspPiReader.libs.models import OneDriveUploadSession
+        with self._lock:
+            session = self._session()
+            try:
+                record = session.query(OneDriveUploadSession).filter_by(file_path=file_path, target=target).first()
+                if record is None:
+                    record = OneDriveUploadSession(file_path=file_path, target=target)
+                    session.add(record)
+                record.file_size = size
+                record.file_mtime = mtime
+                record.upload_url = upload_url
+                record.expires_at = expires_at
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error saving upload session of {file_path}: {e}")
+
+    def delete(self, file_path, target):
+        from RaspPiReader.libs.models import OneDriveUploadSession
+        with self._lock:
+            session = self._session()
+            try:
+                session.query(OneDriveUploadSession).filter_by(file_path=file_path, target=target).delete()
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error deleting upload session of {file_path}: {e}")
+
+
+def _parse_graph_time(value):
+    """Parse a Graph expirationDateTime into a naive UTC datetime"""
+    if not value:
+        return None
+    try:
+        value = value.rstrip('Z').split('+')[0]
+        if '.' in value:
+            head, fraction = value.split('.', 1)
+            value = f"{head}.{fraction[:6]}"
+            return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f")
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")
+    except ValueError:
+        return None
+
 
 class OneDriveAPI:
-    def __init__(self):
-        self.base_url = "https://graph.microsoft.com/v1.0"
+    """
+    Microsoft Graph client for report uploads.
+
+    One instance is meant to live for the whole session (see get_client()):
+    the access token is cached and refreshed shortly before it expires, all
+    requests go through one keep-alive requests.Session, and the id of each
+    day's report folder is looked up once. Every request's latency is
+    recorded per endpoint and available from latency_stats().
+    """
+
+    def __init__(self, base_url=None, login_url=None, session_store=None):
+        """
+        Args:
+            base_url: Graph API root ('onedrive_graph_url'), e.g. a local stand-in for testing
+            login_url: Token endpoint root ('onedrive_login_url')
+            session_store: UploadSessionStore for resumable uploads
+        """
+        self.base_url = (base_url or pool.config('onedrive_graph_url', str, GRAPH_URL)).rstrip('/')
+        self.login_url = (login_url or pool.config('onedrive_login_url', str, LOGIN_URL)).rstrip('/')
         self.token = None
+        self.token_expires = 0.0
+        self.credentials = None
+        self.sessions = session_store or UploadSessionStore()
+        workers = pool.config('onedrive_upload_workers', int, DEFAULT_UPLOAD_WORKERS)
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(4, workers + 2))
+        self.http.mount('https://', adapter)
+        self.http.mount('http://', adapter)
+        self._token_lock = threading.Lock()
+        self._folder_ids = {}
+        self._folder_lock = threading.Lock()
+        self._latency = {}
+        self._latency_lock = threading.Lock()
+
+    # Requests, tokens and latency
+
+    def _request(self, name, method, url, auth=True, **kwargs):
+        """
+        Send a request through the pooled session and record its latency.
+
+        Args:
+            name: Endpoint name the latency is recorded under
+            auth: Add the bearer token, refreshing it first if it is about to expire;
+                  a 401 answer refreshes the token and retries once
+        """
+        kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+        headers = dict(kwargs.pop('headers', None) or {})
+        for attempt in range(2):
+            if auth:
+                headers["Authorization"] = f"Bearer {self._ensure_token(force=attempt > 0)}"
+            started = time.perf_counter()
+            try:
+                response = self.http.request(method, url, headers=headers, **kwargs)
+            finally:
+                self._record_latency(name, time.perf_counter() - started)
+            if not (auth and response.status_code == 401 and attempt == 0 and self.credentials):
+                return response
+            logger.info("OneDrive token rejected, requesting a new one")
+        return response
+
+    def _record_latency(self, name, seconds):
+        with self._latency_lock:
+            stats = self._latency.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+        logger.debug(f"OneDrive {name} took {seconds * 1000:.0f} ms")
+
+    def latency_stats(self, reset=False):
+        """
+        Request latency per endpoint.
+
+        Returns:
+            dict: endpoint -> {'count', 'avg_ms', 'max_ms', 'total_s'}
+        """
+        with self._latency_lock:
+            stats = {name: {'count': value['count'],
+                            'avg_ms': value['total'] / value['count'] * 1000 if value['count'] else 0.0,
+                            'max_ms': value['max'] * 1000,
+                            'total_s': value['total']}
+                     for name, value in self._latency.items()}
+            if reset:
+                self._latency.clear()
+        return stats
+
+    def log_latency(self, reset=True):
+        """Log a one-line latency summary per endpoint"""
+        for name, value in sorted(self.latency_stats(reset).items()):
+            logger.info(f"OneDrive {name}: {value['count']} requests, avg {value['avg_ms']:.0f} ms, "
+                        f"max {value['max_ms']:.0f} ms")
 
     def authenticate(self, client_id, client_secret, tenant_id):
-        url = f"https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
+        self.credentials = (client_id, client_secret, tenant_id)
+        with self._token_lock:
+            self._fetch_token()
+        return True
+
+    def _fetch_token(self):
+        client_id, client_secret, tenant_id = self.credentials
+        url = f"{self.login_url}/{tenant_id}/oauth2/v2.0/token"
         headers = {
             "Content-Type": "application/x-www-form-urlencoded"
         }
@@ -18,32 +234,45 @@ class OneDriveAPI:
             "client_secret": client_secret,
             "grant_type": "client_credentials"
         }
-        response = requests.post(url, headers=headers, data=data)
+        response = self._request('token', 'POST', url, auth=False, headers=headers, data=data)
         if response.status_code == 200:
-            self.token = response.json().get("access_token")
-            return True
+            body = response.json()
+            self.token = body.get("access_token")
+            lifetime = float(body.get("expires_in") or DEFAULT_TOKEN_LIFETIME)
+            self.token_expires = time.monotonic() + lifetime
+            logger.info(f"OneDrive token acquired, valid for {lifetime / 60:.0f} minutes")
         else:
             raise Exception(f"Authentication failed: {response.text}")
 
+    def _ensure_token(self, force=False):
+        """Return a valid token, refreshing it TOKEN_REFRESH_MARGIN seconds before it expires"""
+        with self._token_lock:
+            if self.credentials and (force or not self.token or
+                                     time.monotonic() >= self.token_expires - TOKEN_REFRESH_MARGIN):
+                self._fetch_token()
+            if not self.token:
+                raise Exception("Not authenticated")
+            return self.token
+
+    # Drive operations
+
     def check_connection(self):
         if not self.token:
             return False
-        
+
         url = f"{self.base_url}/me/drive"
-        headers = {"Authorization": f"Bearer {self.token}"}
-        response = requests.get(url, headers=headers)
+        response = self._request('drive', 'GET', url)
         return response.status_code == 200
 
     def create_folder(self, folder_name, parent_folder_id=None):
         if not self.token:
             raise Exception("Not authenticated")
-            
+
         url = f"{self.base_url}/me/drive/root/children"
         if parent_folder_id:
             url = f"{self.base_url}/me/drive/items/{parent_folder_id}/children"
-            
+
         headers = {
-            "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json"
         }
         data = {
@@ -51,30 +280,294 @@ class OneDriveAPI:
             "folder": {},
             "@microsoft.graph.conflictBehavior": "rename"
         }
-        response = requests.post(url, headers=headers, json=data)
+        response = self._request('create_folder', 'POST', url, headers=headers, json=data)
         if response.status_code in [201, 200]:
             return response.json()
         else:
             raise Exception(f"Failed to create folder: {response.text}")
 
-    def upload_file(self, file_path, folder_id=None):
+    def folder_id(self, folder_name):
+        """
+        Return the id of a folder in the drive root, creating it if needed.
+
+        Ids are cached, so the folder is looked up once per client instead of
+        being created (and renamed to a duplicate) for every upload.
+        """
+        with self._folder_lock:
+            folder_id = self._folder_ids.get(folder_name)
+            if folder_id:
+                return folder_id
+            response = self._request('get_folder', 'GET', f"{self.base_url}/me/drive/root:/{folder_name}")
+            if response.status_code == 200:
+                folder_id = response.json().get('id')
+            else:
+                folder_id = self.create_folder(folder_name).get('id')
+                logger.info(f"Created OneDrive folder: {folder_name}")
+            self._folder_ids[folder_name] = folder_id
+            return folder_id
+
+    def daily_folder_id(self, day=None):
+        """Id of the PLC_Reports_<YYYY-mm-dd> folder of a day (today by default)"""
+        return self.folder_id(daily_folder_name(day))
+
+    def _item_path(self, file_name, folder_id=None):
+        if folder_id:
+            return f"{self.base_url}/me/drive/items/{folder_id}:/{file_name}:"
+        return f"{self.base_url}/me/drive/root:/{file_name}:"
+
+    def upload_file(self, file_path, folder_id=None, chunk_size=None):
+        """
+        Upload a file, using a resumable upload session for files above
+        SIMPLE_UPLOAD_MAX ('onedrive_simple_upload_max').
+
+        Returns:
+            dict: The uploaded drive item
+        """
         if not self.token:
             raise Exception("Not authenticated")
-            
+        simple_max = pool.config('onedrive_simple_upload_max', int, SIMPLE_UPLOAD_MAX)
+        if os.path.getsize(file_path) > simple_max:
+            return self.upload_large_file(file_path, folder_id, chunk_size)
+
         file_name = os.path.basename(file_path)
-        url = f"{self.base_url}/me/drive/root:/{file_name}:/content"
-        if folder_id:
-            url = f"{self.base_url}/me/drive/items/{folder_id}:/{file_name}:/content"
-            
-        headers = {"Authorization": f"Bearer {self.token}"}
+        url = f"{self._item_path(file_name, folder_id)}/content"
+
         try:
             with open(file_path, "rb") as file:
-                response = requests.put(url, headers=headers, data=file)
-                
-            if response.status_code == 201:
+                data = file.read()
+            response = self._request_with_retry('upload', 'PUT', url, f"Upload of {file_name}", data=data)
+
+            if response.status_code in (200, 201):
                 return response.json()
             else:
                 raise Exception(f"Failed to upload file: {response.text}")
         except Exception as e:
-            logging.error(f"Error uploading file to OneDrive: {str(e)}")
-            raise
\ No newline at end of file
+            logger.error(f"Error uploading file to OneDrive: {str(e)}")
+            raise
+
+    def upload_large_file(self, file_path, folder_id=None, chunk_size=None):
+        """
+        Upload a file in chunks through a Graph upload session.
+
+        The session URL is persisted, so after a network failure or a restart
+        the next call for the same unchanged file asks the session which
+        bytes it still expects and continues from there instead of starting
+        over. Each chunk is retried with exponential backoff, and the upload
+        fails once the session answers NO_PROGRESS_LIMIT times in a row
+        without accepting any bytes.
+
+        Args:
+            file_path: Local file
+            folder_id: Target folder id, drive root when None
+            chunk_size: Bytes per request, rounded down to a multiple of
+                        320 KiB ('onedrive_chunk_size')
+
+        Returns:
+            dict: The uploaded drive item
+        """
+        if not self.token:
+            raise Exception("Not authenticated")
+        chunk_size = chunk_size or pool.config('onedrive_chunk_size', int, DEFAULT_CHUNK_SIZE)
+        chunk_size = max(CHUNK_UNIT, chunk_size - chunk_size % CHUNK_UNIT)
+        file_path = os.path.abspath(file_path)
+        file_name = os.path.basename(file_path)
+        target = self._item_path(file_name, folder_id)
+        stat = os.stat(file_path)
+        size = stat.st_size
+
+        upload_url = self.sessions.load(file_path, target, size, stat.st_mtime)
+        offset = self._session_offset(upload_url) if upload_url else None
+        if offset is None:
+            if upload_url:
+                self.sessions.delete(file_path, target)
+            upload_url = self._start_session(file_path, target, size, stat.st_mtime)
+            offset = 0
+        else:
+            logger.info(f"Resuming upload of {file_name} at byte {offset} of {size}")
+
+        started = time.time()
+        restarted = False
+        stalled = 0
+        with open(file_path, 'rb') as file:
+            while True:
+                file.seek(offset)
+                data = file.read(min(chunk_size, size - offset))
+                response = self._put_chunk(upload_url, data, offset, size)
+                if response.status_code in (200, 201):
+                    self.sessions.delete(file_path, target)
+                    elapsed = max(time.time() - started, 1e-6)
+                    logger.info(f"Uploaded {file_name} ({size} bytes) in {elapsed:.1f}s "
+                                f"({size / elapsed / 1024:.0f} KiB/s)")
+                    return response.json()
+                next_offset = None
+                if response.status_code == 202:
+                    next_offset = self._next_offset(response.json(), offset + len(data))
+                elif response.status_code == 416:
+                    # The session already has some of these bytes; ask where to continue
+                    next_offset = self._session_offset(upload_url)
+                if next_offset is not None:
+                    stalled = stalled + 1 if next_offset <= offset else 0
+                    if stalled >= NO_PROGRESS_LIMIT:
+                        raise Exception(f"Upload of {file_name} makes no progress: the session expected "
+                                        f"byte {next_offset} {stalled} times in a row")
+                    offset = next_offset
+                    continue
+                if response.status_code == 404 and not restarted:
+                    # The session expired or was cancelled on the server: start over once
+                    logger.warning(f"Upload session of {file_name} is gone, starting a new one")
+                    restarted = True
+                    stalled = 0
+                    upload_url = self._start_session(file_path, target, size, stat.st_mtime)
+                    offset = 0
+                    continue
+                raise Exception(f"Failed to upload {file_name} at byte {offset}: "
+                                f"{response.status_code} {response.text}")
+
+    def _start_session(self, file_path, target, size, mtime):
+        """Create an upload session and persist its URL; returns the URL"""
+        headers = {
+            "Content-Type": "application/json"
+        }
+        data = {"item": {"@microsoft.graph.conflictBehavior": "replace"}}
+        response = self._request('create_upload_session', 'POST', f"{target}/createUploadSession",
+                                 headers=headers, json=data)
+        if response.status_code != 200:
+            raise Exception(f"Failed to create upload session: {response.text}")
+        session = response.json()
+        self.sessions.save(file_path, target, size, mtime, session['uploadUrl'],
+                           _parse_graph_time(session.get('expirationDateTime')))
+        return session['uploadUrl']
+
+    def _put_chunk(self, upload_url, data, offset, size):
+        """PUT one fragment, retrying connection errors and server errors with backoff"""
+        # The upload URL is pre-authenticated; Graph rejects an Authorization header on it
+        headers = {
+            "Content-Length": str(len(data)),
+            "Content-Range": f"bytes {offset}-{offset + len(data) - 1}/{size}",
+        }
+        return self._request_with_retry('upload_chunk', 'PUT', upload_url, f"Chunk at byte {offset}",
+                                        auth=False, headers=headers, data=data)
+
+    def _request_with_retry(self, name, method, url, description, **kwargs):
+        """
+        Send a request, retrying connection errors, throttling (429) and server
+        errors with exponential backoff; a Retry-After header lengthens the wait.
+
+        Args:
+            description: What is sent, for the log and error messages
+
+        Returns:
+            requests.Response: The first answer that is neither 429 nor a server error
+        """
+        delay = 1.0
+        for attempt in range(CHUNK_RETRIES + 1):
+            try:
+                response = self._request(name, method, url, **kwargs)
+                if response.status_code < 500 and response.status_code != 429:
+                    return response
+                error = f"{response.status_code} {response.text[:200]}"
+                retry_after = response.headers.get('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+            except requests.RequestException as e:
+                error = str(e)
+            if attempt == CHUNK_RETRIES:
+                raise Exception(f"{description} failed after {CHUNK_RETRIES + 1} attempts: {error}")
+            logger.warning(f"{description} failed ({error}), retrying in {delay:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _session_offset(self, upload_url):
+        """Ask an upload session which byte it expects next; None if the session is unusable"""
+        try:
+            response = self._request('upload_status', 'GET', upload_url, auth=False)
+            if response.status_code != 200:
+                return None
+            return self._next_offset(response.json(), None)
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"Could not query upload session status: {e}")
+            return None
+
+    @staticmethod
+    def _next_offset(status, default):
+        ranges = status.get('nextExpectedRanges') or []
+        if not ranges:
+            return default
+        return int(str(ranges[0]).split('-')[0])
+
+    def upload_files(self, file_paths, folder_id=None, max_workers=None, chunk_size=None):
+        """
+        Upload independent files concurrently.
+
+        Args:
+            file_paths: Local files
+            folder_id: Target folder id
+            max_workers: Concurrent uploads ('onedrive_upload_workers')
+
+        Returns:
+            dict: file path -> uploaded drive item, or the exception that stopped its upload
+        """
+        max_workers = max_workers or pool.config('onedrive_upload_workers', int, DEFAULT_UPLOAD_WORKERS)
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="onedrive_upload") as executor:
+            futures = {executor.submit(self.upload_file, path, folder_id, chunk_size): path for path in file_paths}
+            for future, path in futures.items():
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    logger.error(f"Upload of {path} failed: {e}")
+                    results[path] = e
+        return results
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _configured_credentials():
+    """OneDrive credentials from the settings, falling back to the onedrive_settings table"""
+    credentials = (pool.config('onedrive_client_id'), pool.config('onedrive_client_secret'),
+                   pool.config('onedrive_tenant_id'))
+    if all(credentials):
+        return credentials
+    try:
+        from RaspPiReader.libs.database import Database
+        from RaspPiReader.libs.models import OneDriveSettings
+        db = Database("sqlite:///local_database.db")
+        try:
+            settings = db.session.query(OneDriveSettings).first()
+        finally:
+            db.session.close()
+        if settings:
+            return (settings.client_id, settings.client_secret, settings.tenant_id)
+    except Exception as e:
+        logger.error(f"Error loading OneDrive settings: {e}")
+    return credentials
+
+
+def is_configured():
+    """True when OneDrive credentials are available"""
+    return all(_configured_credentials())
+
+
+def get_client(client_id=None, client_secret=None, tenant_id=None):
+    """
+    Get the application-wide authenticated OneDrive client.
+
+    The client is created and authenticated on first use and reused
+    afterwards; it is replaced when the credentials change.
+
+    Returns:
+        OneDriveAPI: The client, or None if OneDrive is not configured
+    """
+    global _client
+    credentials = (client_id, client_secret, tenant_id)
+    if not all(credentials):
+        credentials = _configured_credentials()
+    if not all(credentials):
+        return None
+    with _client_lock:
+        if _client is None or _client.credentials != credentials:
+            client = OneDriveAPI()
+            client.authenticate(*credentials)
+            _client = client
+        return _client
@@ -0,0 +1,335 @@
+import os
+import re
+import sys
+import shutil
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, unquote
+
+from PyQt5 import QtCore, QtGui
+
+from RaspPiReader import pool
+
+logger = logging.getLogger(__name__)
+
+# Print resolution of the generated PDF. Text is vector output either way;
+# this only sets the grid the layout is computed on.
+DEFAULT_PDF_DPI = 300
+# Embedded images are downsampled to this many pixels per printed inch
+DEFAULT_IMAGE_DPI = 200
+DEFAULT_IMAGE_QUALITY = 85
+# Page margins in inches (top, right, bottom, left)
+DEFAULT_MARGINS_IN = (0.35, 0.75, 0.75, 0.75)
+# Width at which HTML pixels are laid out (CSS reference pixel)
+CSS_DPI = 96.0
+# Share of the printable width an image may take (matches .plot-image max-width)
+MAX_IMAGE_WIDTH_RATIO = 0.9
+
+BACKENDS = ('native', 'wkhtmltopdf')
+
+_IMG_TAG_RE = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+_SRC_RE = re.compile(r'\bsrc\s*=\s*(["\'])(.*?)\1', re.IGNORECASE | re.DOTALL)
+_WIDTH_RE = re.compile(r'\s(width|height)\s*=\s*(["\']).*?\2', re.IGNORECASE)
+_DRIVE_RE = re.compile(r'^[a-zA-Z]:[\\/]')
+_TABLE_TAG_RE = re.compile(r'<table\b(?![^>]*\bwidth\s*=)', re.IGNORECASE)
+
+
+def find_wkhtmltopdf():
+    """
+    Locate the wkhtmltopdf binary.
+
+    Looks at the 'wkhtmltopdf_path' setting first, then a binary shipped next
+    to the application (wkhtmltopdf.exe on Windows), then the PATH.
+
+    Returns:
+        str: Path of the binary, or None if it is not installed
+    """
+    configured = pool.config('wkhtmltopdf_path', str, '')
+    if configured and os.path.isfile(configured):
+        return configured
+    binary = 'wkhtmltopdf.exe' if sys.platform.startswith('win') else 'wkhtmltopdf'
+    bundled = os.path.join(os.getcwd(), binary)
+    if os.path.isfile(bundled):
+        return bundled
+    return shutil.which('wkhtmltopdf')
+
+
+def wkhtmltopdf_options(dpi=DEFAULT_PDF_DPI, image_dpi=DEFAULT_IMAGE_DPI,
+                        image_quality=DEFAULT_IMAGE_QUALITY, margins_in=DEFAULT_MARGINS_IN):
+    """Build the pdfkit option dict matching the native renderer's settings"""
+    top, right, bottom, left = margins_in
+    return {
+        'page-size': 'A4',
+        'dpi': dpi,
+        'image-dpi': image_dpi,
+        'image-quality': image_quality,
+        'margin-top': f'{top}in',
+        'margin-right': f'{right}in',
+        'margin-bottom': f'{bottom}in',
+        'margin-left': f'{left}in',
+        'encoding': "UTF-8",
+        'no-outline': None,
+        'enable-local-file-access': None,
+        'quiet': None,
+    }
+
+
+class PdfRenderService(object):
+    """
+    Resident HTML to PDF renderer.
+
+    Reports are rendered in-process: the HTML is laid out with a
+    QTextDocument and painted into a QPdfWriter, so no external process is
+    started per report and the service runs on headless Linux (Qt 'offscreen'
+    platform) as well as on Windows. Embedded images are scaled to the size
+    they are printed at and downsampled to image_dpi before layout; downsampled
+    copies are cached by path and modification time.
+
+    All renders go through a single long-lived worker thread, which keeps the
+    font database and image cache warm and serialises access to them.
+    wkhtmltopdf (through pdfkit) remains available as the 'wkhtmltopdf' backend
+    and as the fallback if a native render fails.
+
+    A Q(Gui)Application must exist before the first render.
+    """
+
+    def __init__(self, backend=None, dpi=None, image_dpi=None, image_quality=None,
+                 margins_in=DEFAULT_MARGINS_IN):
+        if backend is None:
+            backend = pool.config('pdf_renderer', str, 'native')
+        if backend not in BACKENDS:
+            logger.error(f"Unknown PDF renderer '{backend}', using native")
+            backend = 'native'
+        self.backend = backend
+        self.dpi = dpi or pool.config('pdf_dpi', int, DEFAULT_PDF_DPI)
+        self.image_dpi = image_dpi or pool.config('pdf_image_dpi', int, DEFAULT_IMAGE_DPI)
+        self.image_quality = image_quality or pool.config('pdf_image_quality', int, DEFAULT_IMAGE_QUALITY)
+        self.margins_in = margins_in
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf_render")
+        self._image_cache = {}
+        self._image_cache_lock = threading.Lock()
+        self._wkhtmltopdf = None
+        self.stats = {'renders': 0, 'failures': 0, 'seconds': 0.0}
+
+    # Public API
+
+    def submit(self, html, pdf_path, base_dir=None, backend=None):
+        """
+        Queue a render.
+
+        Args:
+            html: HTML document as a string
+            pdf_path: Output path of the PDF
+            base_dir: Directory relative image paths are resolved against
+                (defaults to the current directory)
+            backend: Override the configured backend for this render
+
+        Returns:
+            concurrent.futures.Future: Resolves to pdf_path
+        """
+        return self.executor.submit(self._render, html, pdf_path, base_dir, backend or self.backend)
+
+    def render(self, html, pdf_path, base_dir=None, backend=None, timeout=None):
+        """Render and wait for the result. Raises if the render failed."""
+        return self.submit(html, pdf_path, base_dir, backend).result(timeout)
+
+    def render_file(self, html_path, pdf_path, backend=None, timeout=None):
+        """Render an HTML file; relative images are resolved against its folder."""
+        with open(html_path, encoding='utf-8') as f:
+            html = f.read()
+        return self.render(html, pdf_path, os.path.dirname(os.path.abspath(html_path)), backend, timeout)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    # Worker side
+
+    def _render(self, html, pdf_path, base_dir, backend):
+        started = time.perf_counter()
+        folder = os.path.dirname(pdf_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        try:
+            if backend == 'wkhtmltopdf':
+                self._render_wkhtmltopdf(html, pdf_path)
+            else:
+                try:
+                    self._render_native(html, pdf_path, base_dir or os.getcwd())
+                except Exception as e:
+                    if not self._wkhtmltopdf_path():
+                        raise
+                    logger.error(f"Native PDF render failed, falling back to wkhtmltopdf: {e}")
+                    self._render_wkhtmltopdf(html, pdf_path)
+        except Exception:
+            self.stats['failures'] += 1
+            raise
+        seconds = time.perf_counter() - started
+        self.stats['renders'] += 1
+        self.stats['seconds'] += seconds
+        logger.info(f"Rendered {pdf_path} with {backend} in {seconds:.2f}s "
+                    f"({os.path.getsize(pdf_path) / 1024:.0f} KB)")
+        return pdf_path
+
+    def _page_layout(self):
+        top, right, bottom, left = self.margins_in
+        return QtGui.QPageLayout(QtGui.QPageSize(QtGui.QPageSize.A4), QtGui.QPageLayout.Portrait,
+                                 QtCore.QMarginsF(left, top, right, bottom), QtGui.QPageLayout.Inch)
+
+    def _render_native(self, html, pdf_path, base_dir):
+        if QtGui.QGuiApplication.instance() is None:
+            raise RuntimeError("Native PDF rendering needs a running QApplication")
+        layout = self._page_layout()
+        writer = QtGui.QPdfWriter(pdf_path)
+        writer.setPageLayout(layout)
+        writer.setResolution(self.dpi)
+        writer.setCreator("RaspPiReader")
+
+        # Lay the document out in CSS pixels over the printable area, as a browser would
+        printable = layout.paintRect(QtGui.QPageLayout.Inch)
+        page_width = printable.width() * CSS_DPI
+        page_height = printable.height() * CSS_DPI
+
+        document = QtGui.QTextDocument()
+        document.setDocumentMargin(0)
+        # Qt rich text ignores stylesheet widths on tables; report tables span the page
+        html = _TABLE_TAG_RE.sub('<table width="100%"', html)
+        document.setHtml(self._prepare_images(document, html, base_dir, page_width))
+        document.setPageSize(QtCore.QSizeF(page_width, page_height))
+
+        painter = QtGui.QPainter()
+        if not painter.begin(writer):
+            raise RuntimeError(f"Cannot open {pdf_path} for writing")
+        try:
+            scale = self.dpi / CSS_DPI
+            painter.scale(scale, scale)
+            pages = max(1, document.pageCount())
+            for page in range(pages):
+                if page:
+                    writer.newPage()
+                painter.save()
+                painter.translate(0, -page * page_height)
+                clip = QtCore.QRectF(0, page * page_height, page_width, page_height)
+                context = QtGui.QAbstractTextDocumentLayout.PaintContext()
+                context.clip = clip
+                painter.setClipRect(clip)
+                document.documentLayout().draw(painter, context)
+                painter.restore()
+        finally:
+            painter.end()
+
+    def _prepare_images(self, document, html, base_dir, page_width):
+        """
+        Register every local <img> with the document as a downsampled resource.
+
+        Each image is fitted to the printable width and resampled to image_dpi
+        at its printed size; the tag gets explicit width/height so the layout
+        does not depend on the source image's pixel count.
+        """
+        max_width = page_width * MAX_IMAGE_WIDTH_RATIO
+
+        def replace(match):
+            tag = match.group(0)
+            src_match = _SRC_RE.search(tag)
+            if not src_match:
+                return tag
+            src = src_match.group(2)
+            path = self._resolve_image_path(src, base_dir)
+            if path is None:
+                return tag
+            entry = self._load_image(path, max_width)
+            if entry is None:
+                return tag
+            image, width, height = entry
+            document.addResource(QtGui.QTextDocument.ImageResource, QtCore.QUrl(src), image)
+            tag = _WIDTH_RE.sub('', tag)
+            return tag[:-1].rstrip('/ ') + f' width="{width}" height="{height}">'
+
+        return _IMG_TAG_RE.sub(replace, html)
+
+    def _resolve_image_path(self, src, base_dir):
+        src_path = src.split('?', 1)[0].split('#', 1)[0]
+        if _DRIVE_RE.match(src_path):
+            path = src_path
+        else:
+            parsed = urlparse(src_path)
+            if parsed.scheme == 'file':
+                path = unquote(parsed.path)
+                if _DRIVE_RE.match(path.lstrip('/')):
+                    path = path.lstrip('/')
+            elif parsed.scheme:
+                return None
+            else:
+                path = unquote(src_path)
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        return path if os.path.isfile(path) else None
+
+    def _load_image(self, path, max_width):
+        """Return (QImage, layout width, layout height) for a file, cached by mtime and size"""
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        key = (path, mtime, int(max_width), self.image_dpi)
+        with self._image_cache_lock:
+            cached = self._image_cache.get(key)
+        if cached is not None:
+            return cached
+        reader = QtGui.QImageReader(path)
+        source_size = reader.size()
+        if not source_size.isValid():
+            logger.error(f"Cannot read report image {path}: {reader.errorString()}")
+            return None
+        # Printed size in CSS pixels: natural size, shrunk to fit the page width
+        width = min(float(source_size.width()), max_width)
+        height = source_size.height() * width / source_size.width()
+        # Pixels needed at the printed size
+        target_width = int(round(width / CSS_DPI * self.image_dpi))
+        if target_width < source_size.width():
+            reader.setScaledSize(QtCore.QSize(
+                target_width, max(1, int(round(source_size.height() * target_width / source_size.width())))))
+        image = reader.read()
+        if image.isNull():
+            logger.error(f"Cannot read report image {path}: {reader.errorString()}")
+            return None
+        entry = (image, int(round(width)), int(round(height)))
+        with self._image_cache_lock:
+            # Keep only the newest version of each file
+            for old_key in [k for k in self._image_cache if k[0] == path]:
+                del self._image_cache[old_key]
+            self._image_cache[key] = entry
+        return entry
+
+    def _wkhtmltopdf_path(self):
+        if self._wkhtmltopdf is None:
+            self._wkhtmltopdf = find_wkhtmltopdf() or ''
+        return self._wkhtmltopdf
+
+    def _render_wkhtmltopdf(self, html, pdf_path):
+        import pdfkit
+        binary = self._wkhtmltopdf_path()
+        if not binary:
+            raise RuntimeError("wkhtmltopdf is not installed")
+        options = wkhtmltopdf_options(self.dpi, self.image_dpi, self.image_quality, self.margins_in)
+        config = pdfkit.configuration(wkhtmltopdf=binary)
+        pdfkit.from_string(html, pdf_path, options=options, configuration=config)
+
+
+_instance = None
+_instance_lock = threading.Lock()
+
+
+def get_instance():
+    """
+    Get or create the application-wide PDF render service.
+
+    Returns:
+        PdfRenderService: The singleton instance
+    """
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = PdfRenderService()
+    return _instance
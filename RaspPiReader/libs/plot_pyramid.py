@@ -0,0 +1,222 @@
+import logging
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func
+
+from RaspPiReader.libs.models import PlotData, PlotDataPyramid
+
+logger = logging.getLogger(__name__)
+
+# Width of a level 0 bucket in seconds and the reduction factor between levels.
+BASE_BUCKET_SECONDS = 2.0
+LEVEL_FACTOR = 4
+# Stop adding levels once the coarsest level has at most this many buckets per channel.
+MIN_TOP_LEVEL_BUCKETS = 256
+
+
+def _to_epoch(value):
+    """Convert a datetime (or already numeric timestamp) to epoch seconds."""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+def _reduce_buckets(bucket_ids, mins, maxs, sums, counts):
+    """
+    Collapse consecutive entries sharing the same bucket id.
+
+    All arrays must be sorted by bucket id. Returns the unique bucket ids with
+    their aggregated min, max, sum and count.
+    """
+    unique_ids, starts = np.unique(bucket_ids, return_index=True)
+    return (
+        unique_ids,
+        np.minimum.reduceat(mins, starts),
+        np.maximum.reduceat(maxs, starts),
+        np.add.reduceat(sums, starts),
+        np.add.reduceat(counts, starts),
+    )
+
+
+def compute_pyramid_levels(timestamps, values, origin,
+                           base_bucket_seconds=BASE_BUCKET_SECONDS,
+                           factor=LEVEL_FACTOR,
+                           min_top_level_buckets=MIN_TOP_LEVEL_BUCKETS):
+    """
+    Compute min/max/mean pyramid levels for one channel.
+
+    Args:
+        timestamps: Sorted numpy array of epoch seconds
+        values: Numpy array of sample values matching timestamps
+        origin: Epoch seconds that bucket 0 of every level starts at
+        base_bucket_seconds: Width of a level 0 bucket
+        factor: Number of child buckets merged into one parent bucket
+        min_top_level_buckets: Stop once a level has at most this many buckets
+
+    Returns:
+        list: One tuple per level of
+              (level, bucket_seconds, bucket_ids, mins, maxs, means, counts)
+    """
+    levels = []
+    if len(timestamps) == 0:
+        return levels
+
+    bucket_ids = np.floor((timestamps - origin) / base_bucket_seconds).astype(np.int64)
+    ids, mins, maxs, sums, counts = _reduce_buckets(
+        bucket_ids, values, values, values, np.ones(len(values), dtype=np.int64)
+    )
+    level = 0
+    bucket_seconds = base_bucket_seconds
+    while True:
+        levels.append((level, bucket_seconds, ids, mins, maxs, sums / counts, counts))
+        if len(ids) <= min_top_level_buckets:
+            break
+        ids, mins, maxs, sums, counts = _reduce_buckets(ids // factor, mins, maxs, sums, counts)
+        level += 1
+        bucket_seconds *= factor
+    return levels
+
+
+def build_cycle_pyramid(db, cycle_id,
+                        base_bucket_seconds=BASE_BUCKET_SECONDS,
+                        factor=LEVEL_FACTOR):
+    """
+    Build (or rebuild) the pyramid levels for a finished cycle from its stored samples.
+
+    Args:
+        db: Database instance
+        cycle_id: CycleData id whose PlotData samples are aggregated
+
+    Returns:
+        int: Number of pyramid rows written
+    """
+    start_time = time.time()
+    rows = db.session.query(PlotData.channel, PlotData.timestamp, PlotData.value)\
+        .filter(PlotData.cycle_id == cycle_id)\
+        .order_by(PlotData.channel, PlotData.timestamp)\
+        .all()
+    if not rows:
+        logger.info(f"No plot data stored for cycle {cycle_id}; pyramid not built")
+        return 0
+
+    channels = {}
+    for channel, timestamp, value in rows:
+        if timestamp is None or value is None:
+            continue
+        series = channels.setdefault(channel, ([], []))
+        series[0].append(_to_epoch(timestamp))
+        series[1].append(float(value))
+
+    origin = min(series[0][0] for series in channels.values() if series[0])
+    records = []
+    for channel, (timestamps, values) in channels.items():
+        levels = compute_pyramid_levels(
+            np.asarray(timestamps, dtype=np.float64),
+            np.asarray(values, dtype=np.float64),
+            origin,
+            base_bucket_seconds=base_bucket_seconds,
+            factor=factor,
+        )
+        for level, bucket_seconds, ids, mins, maxs, means, counts in levels:
+            starts = origin + ids * bucket_seconds
+            for i in range(len(ids)):
+                records.append({
+                    'cycle_id': cycle_id,
+                    'channel': channel,
+                    'level': level,
+                    'bucket_seconds': bucket_seconds,
+                    'bucket_start': float(starts[i]),
+                    'min_value': float(mins[i]),
+                    'max_value': float(maxs[i]),
+                    'mean_value': float(means[i]),
+                    'sample_count': int(counts[i]),
+                })
+
+    try:
+        db.session.query(PlotDataPyramid).filter(PlotDataPyramid.cycle_id == cycle_id)\
+            .delete(synchronize_session=False)
+        db.session.bulk_insert_mappings(PlotDataPyramid, records)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Built plot pyramid for cycle {cycle_id}: {len(records)} buckets "
+                f"from {len(rows)} samples in {time.time() - start_time:.2f}s")
+    return len(records)
+
+
+def get_pyramid_extent(db, cycle_id):
+    """
+    Return (start, end, max_level, channels) for a cycle's pyramid, or None if not built.
+    Start and end are epoch seconds.
+    """
+    extent = db.session.query(
+        func.min(PlotDataPyramid.bucket_start),
+        func.max(PlotDataPyramid.bucket_start + PlotDataPyramid.bucket_seconds),
+    ).filter(PlotDataPyramid.cycle_id == cycle_id, PlotDataPyramid.level == 0).first()
+    if not extent or extent[0] is None:
+        return None
+    max_level = db.session.query(func.max(PlotDataPyramid.level))\
+        .filter(PlotDataPyramid.cycle_id == cycle_id).scalar()
+    channels = [row[0] for row in db.session.query(PlotDataPyramid.channel)
+                .filter(PlotDataPyramid.cycle_id == cycle_id, PlotDataPyramid.level == 0)
+                .distinct().all()]
+    return extent[0], extent[1], max_level, channels
+
+
+def choose_level(span_seconds, max_buckets, max_level,
+                 base_bucket_seconds=BASE_BUCKET_SECONDS, factor=LEVEL_FACTOR):
+    """
+    Pick the finest level whose bucket count over span_seconds fits in max_buckets.
+
+    max_buckets is normally the plot width in pixels, so one bucket maps to
+    roughly one pixel column.
+    """
+    level = 0
+    bucket_seconds = base_bucket_seconds
+    while level < max_level and span_seconds / bucket_seconds > max_buckets:
+        level += 1
+        bucket_seconds *= factor
+    return level
+
+
+def load_pyramid_window(db, cycle_id, level, start, end, channels=None):
+    """
+    Load the buckets of one level that overlap [start, end] (epoch seconds).
+
+    Returns:
+        dict: channel -> dict of numpy arrays 'start', 'min', 'max', 'mean'
+    """
+    query = db.session.query(
+        PlotDataPyramid.channel,
+        PlotDataPyramid.bucket_start,
+        PlotDataPyramid.min_value,
+        PlotDataPyramid.max_value,
+        PlotDataPyramid.mean_value,
+    ).filter(
+        PlotDataPyramid.cycle_id == cycle_id,
+        PlotDataPyramid.level == level,
+        PlotDataPyramid.bucket_start >= start - PlotDataPyramid.bucket_seconds,
+        PlotDataPyramid.bucket_start <= end,
+    )
+    if channels:
+        query = query.filter(PlotDataPyramid.channel.in_(list(channels)))
+    query = query.order_by(PlotDataPyramid.channel, PlotDataPyramid.bucket_start)
+
+    grouped = {}
+    for channel, bucket_start, min_value, max_value, mean_value in query:
+        grouped.setdefault(channel, []).append((bucket_start, min_value, max_value, mean_value))
+
+    result = {}
+    for channel, buckets in grouped.items():
+        array = np.asarray(buckets, dtype=np.float64)
+        result[channel] = {
+            'start': array[:, 0],
+            'min': array[:, 1],
+            'max': array[:, 2],
+            'mean': array[:, 3],
+        }
+    return result
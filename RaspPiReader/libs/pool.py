@@ -1,62 +1,310 @@
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+
 from PyQt5.QtCore import QSettings
 
+logger = logging.getLogger(__name__)
+
+# Persistent writes are collected and synced to disk together after this many seconds
+FLUSH_DELAY = 0.5
+
+_TRUE_STRINGS = ('true', '1', 'yes', 'on')
+
+
+def _coerce(value, return_type, base=10):
+    """
+    Convert a stored value to the requested type.
+
+    QSettings hands most values back as strings, so 'false' must become
+    False rather than a truthy string, and '5' an int. Values that are
+    already of the requested type are returned unchanged, and so are
+    non-string values read as str, the default type of untyped reads.
+    """
+    if return_type is None or isinstance(value, return_type):
+        return value
+    if return_type is bool:
+        if isinstance(value, str):
+            return value.strip().lower() in _TRUE_STRINGS
+        return bool(value)
+    if return_type is int:
+        if isinstance(value, str):
+            return int(value.strip(), base)
+        return int(value)
+    if return_type is str:
+        return value
+    return return_type(value)
+
+
+def _changed(old, new):
+    if old is new:
+        return False
+    try:
+        return bool(old != new)
+    except Exception:
+        # Objects such as numpy arrays do not compare to a single bool
+        return True
+
+
+def _same_setting(old, new):
+    """True if a value read back from QSettings is what the registry already holds"""
+    if not _changed(old, new):
+        return True
+    if old is None or isinstance(old, (list, tuple, dict, set)):
+        return False
+    try:
+        return not _changed(old, _coerce(new, type(old)))
+    except (TypeError, ValueError):
+        return False
+
+
 class Pool:
-    def __init__(self):
+    """
+    Application configuration and runtime registry.
+
+    Values set with set_config() are typed and persisted to QSettings; values
+    set with set() only live for the session. Reads through config() convert
+    to the requested type whether the value comes from the registry or from
+    QSettings.
+
+    Persistent writes are batched: QSettings is synced once, FLUSH_DELAY
+    seconds after the last write, when flush() is called, when a batch()
+    block ends, or at exit.
+
+    Every change bumps the store version. subscribe() registers a callback
+    that receives the changed keys as {key: (old, new)} together with the
+    new version, so consumers can react to the diff instead of polling or
+    reloading everything. Changes made inside batch() are delivered as one
+    diff when the block ends.
+    """
+
+    def __init__(self, flush_delay=FLUSH_DELAY):
         self._registry = dict()
         self._setting = QSettings('RaspPiHandler', 'RaspPiModbusReader')
+        self._lock = threading.RLock()
+        self.flush_delay = flush_delay
+        self._version = 0
+        self._key_versions = {}
+        self._subscribers = {}
+        self._next_subscription = 1
+        self._batch_depth = 0
+        self._pending = {}
+        self._dirty = {}
+        self._flush_timer = None
         self._registry["active_channels"] = list(range(1, 15))  # For 14 channels
         self.reload_config()  # Load initial settings
+        atexit.register(self.flush)
+
+    # Registry
 
     def get(self, key):
         return self._registry.get(key, None)
 
     def set(self, key, val):
-        self._registry[key] = val
+        """Set a session-only value"""
+        self._store({key: val})
         return self._registry.get(key)
 
+    def keys(self, prefix=''):
+        """Keys in the registry, optionally only those starting with prefix"""
+        with self._lock:
+            return [key for key in self._registry if key.startswith(prefix)]
+
     def erase(self):
-        self._registry = dict()
+        with self._lock:
+            self._registry = dict()
+            self._version += 1
         return True
 
+    @property
+    def version(self):
+        """Number of changes made to the store so far"""
+        return self._version
+
+    def key_version(self, key):
+        """Store version of the last change to key, 0 if it never changed"""
+        return self._key_versions.get(key, 0)
+
+    # Configuration
+
     def config(self, key, return_type=str, default_val=None, base=10):
-        if key in self._registry:
-            return self._registry[key]
-        val = self._setting.value(key, default_val)
-        val_str = str(val).strip()
-        if val is None or val_str.lower() == "none" or val_str == "":
+        with self._lock:
+            if key in self._registry:
+                val = self._registry[key]
+            else:
+                val = self._setting.value(key, default_val)
+        if val is None:
             return default_val
+        if isinstance(val, str):
+            val_str = val.strip()
+            if val_str == "" or val_str.lower() == "none":
+                return default_val
         try:
-            if return_type == int:
-                if base != 10:
-                    return int(val_str, base)
-                else:
-                    return int(val_str)
-            else:
-                return return_type(val)
+            return _coerce(val, return_type, base)
         except Exception as e:
             print(f"Error converting {key} = {val} to {return_type}: {e}")
             return default_val
 
     def set_config(self, key, value):
-        """Set a configuration value and ensure it's immediately available."""
-        self._registry[key] = value
-        self._setting.setValue(key, value)
-        self._setting.sync()  # Ensure settings are written immediately
-    
+        """Set a configuration value; it is available at once and persisted with the next flush."""
+        self._store({key: value}, persist=True)
+
+    def update(self, values, persist=True):
+        """
+        Set several values as one change.
+
+        Args:
+            values: dict of key -> value
+            persist: Write the values to QSettings, as set_config() does
+        """
+        self._store(dict(values), persist=persist)
+
+    def _store(self, values, persist=False):
+        with self._lock:
+            changes = {}
+            for key, value in values.items():
+                old = self._registry.get(key)
+                self._registry[key] = value
+                if persist:
+                    self._dirty[key] = value
+                if _changed(old, value):
+                    changes[key] = (old, value)
+            if persist and values:
+                self._schedule_flush()
+            self._record(changes)
+        self._deliver()
+
+    def _record(self, changes):
+        """Version the changes and queue them for subscribers; called with the lock held"""
+        if not changes:
+            return
+        self._version += 1
+        for key, change in changes.items():
+            self._key_versions[key] = self._version
+            if key in self._pending:
+                # Keep the value from before the batch as the old value
+                self._pending[key] = (self._pending[key][0], change[1])
+            else:
+                self._pending[key] = change
+
+    @contextmanager
+    def batch(self):
+        """
+        Group changes: subscribers get one diff and QSettings is synced once when the block ends.
+
+            with pool.batch():
+                pool.set_config('a', 1)
+                pool.set_config('b', 2)
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                outermost = self._batch_depth == 0
+            if outermost:
+                self.flush()
+                self._deliver()
+
+    # Persistence
+
+    def _schedule_flush(self):
+        if self._batch_depth or self._flush_timer is not None:
+            return
+        self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def flush(self):
+        """Write pending set_config() values to QSettings and sync it to disk"""
+        with self._lock:
+            timer, self._flush_timer = self._flush_timer, None
+            if timer is not None:
+                timer.cancel()
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, {}
+            try:
+                for key, value in dirty.items():
+                    self._setting.setValue(key, value)
+                self._setting.sync()
+            except Exception as e:
+                logger.error(f"Error writing settings: {e}")
+
     def reload_config(self):
         """Reload configuration settings from QSettings into the internal registry."""
-        # Retrieve all keys stored in QSettings
-        keys = self._setting.allKeys()
-        for key in keys:
-            val = self._setting.value(key)
-            if val is not None:
+        self.flush()
+        with self._lock:
+            changes = {}
+            # Retrieve all keys stored in QSettings
+            for key in self._setting.allKeys():
+                val = self._setting.value(key)
+                if val is None:
+                    continue
+                old = self._registry.get(key)
+                # Keep the typed value when QSettings only hands back its string form
+                if key in self._registry and _same_setting(old, val):
+                    continue
                 self._registry[key] = val
-        # Ensure any required defaults are in place (for example, active channels)
-        self._registry["active_channels"] = list(range(1, 15))
-        
+                changes[key] = (old, val)
+            # Ensure any required defaults are in place (for example, active channels)
+            self._registry["active_channels"] = list(range(1, 15))
+            self._record(changes)
+        self._deliver()
+
     def force_reload_all(self):
         """Force reload all settings from both QSettings and database."""
         self.reload_config()
         # Add any additional reload logic here if needed
 
-pool = Pool()
\ No newline at end of file
+    # Subscriptions
+
+    def subscribe(self, callback, keys=None, prefixes=None):
+        """
+        Call callback(changes, version) after matching keys change.
+
+        Args:
+            callback: Receives {key: (old, new)} with only the matching keys, and the store version
+            keys: Exact keys to watch
+            prefixes: Key prefixes to watch; with neither keys nor prefixes every change matches
+
+        Returns:
+            int: Subscription id for unsubscribe()
+        """
+        with self._lock:
+            subscription = self._next_subscription
+            self._next_subscription += 1
+            self._subscribers[subscription] = (callback, frozenset(keys) if keys else None,
+                                               tuple(prefixes) if prefixes else None)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.pop(subscription, None)
+
+    def _deliver(self):
+        with self._lock:
+            if self._batch_depth or not self._pending:
+                return
+            changes, self._pending = self._pending, {}
+            version = self._version
+            subscribers = list(self._subscribers.values())
+        # Callbacks run outside the lock so they may read and write the store
+        for callback, keys, prefixes in subscribers:
+            if keys is None and prefixes is None:
+                matching = changes
+            else:
+                matching = {key: change for key, change in changes.items()
+                            if (keys is not None and key in keys)
+                            or (prefixes is not None and key.startswith(prefixes))}
+            if not matching:
+                continue
+            try:
+                callback(matching, version)
+            except Exception as e:
+                logger.error(f"Error in settings subscriber {getattr(callback, '__name__', callback)}: {e}")
+
+pool = Pool()
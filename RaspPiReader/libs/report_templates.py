@@ -0,0 +1,189 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from RaspPiReader import pool
+from RaspPiReader.libs.database import Database
+from RaspPiReader.libs.models import ReportTemplate
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     'ui', 'result_template.html')
+# Compiled templates kept in memory; a handful of report layouts is the realistic maximum
+MAX_COMPILED_TEMPLATES = 16
+TEMPLATE_SOURCES = ('auto', 'file', 'database')
+
+
+class ReportTemplateCache(object):
+    """
+    Compiles report templates once and reuses them until their source changes.
+
+    Templates come either from a file or from the newest ReportTemplate row.
+    Compiled templates are keyed by the SHA-1 of their source text, so an
+    edited file or database template is recompiled on its next use and
+    unchanged ones are never parsed twice. For file templates the hash is only
+    recomputed when the file's modification time or size changes.
+
+    With the 'report_template_source' setting at 'auto' (the default) a
+    template stored in the database takes precedence over the file; 'file' and
+    'database' force one source.
+    """
+
+    def __init__(self, database_url="sqlite:///local_database.db"):
+        # Imported here so the main window does not pay for jinja2 until the first report
+        import jinja2
+        self.environment = jinja2.Environment(extensions=['jinja2.ext.loopcontrols'])
+        self.database_url = database_url
+        self._db = None
+        self._compiled = OrderedDict()
+        self._file_hashes = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.stats = {'hits': 0, 'compiles': 0}
+
+    def get(self, template_file=None):
+        """
+        Return the compiled report template, compiling it only if its source changed.
+
+        Args:
+            template_file: Template file used when no database template applies
+
+        Returns:
+            jinja2.Template: Compiled template
+        """
+        mode = pool.config('report_template_source', str, 'auto')
+        if mode not in TEMPLATE_SOURCES:
+            logger.error(f"Unknown report template source '{mode}', using auto")
+            mode = 'auto'
+        if mode != 'file':
+            content = self._database_template()
+            if content:
+                return self.compile(content, 'database')
+            if mode == 'database':
+                logger.error("No report template stored in the database, using the template file")
+
+        path = template_file or DEFAULT_TEMPLATE_FILE
+        key, source = self._file_key(path)
+        with self._lock:
+            template = self._compiled.get(key)
+            if template is not None:
+                self._compiled.move_to_end(key)
+                self.stats['hits'] += 1
+                return template
+        if source is None:
+            with open(path, 'r', encoding='utf-8') as f:
+                source = f.read()
+        return self.compile(source, path)
+
+    def compile(self, source, origin='<string>'):
+        """Return the compiled template for a source text, compiling it on first use"""
+        key = self._hash(source)
+        with self._lock:
+            template = self._compiled.get(key)
+            if template is not None:
+                self._compiled.move_to_end(key)
+                self.stats['hits'] += 1
+                return template
+        template = self.environment.from_string(source)
+        logger.info(f"Compiled report template from {origin} ({key[:10]})")
+        with self._lock:
+            self._compiled[key] = template
+            self.stats['compiles'] += 1
+            while len(self._compiled) > MAX_COMPILED_TEMPLATES:
+                self._compiled.popitem(last=False)
+        return template
+
+    def render(self, context, template_file=None):
+        """
+        Render the report template.
+
+        Args:
+            context: Dict of template variables (the report templates expect a 'data' entry)
+            template_file: Template file used when no database template applies
+
+        Returns:
+            str: Rendered HTML
+        """
+        return self.get(template_file).render(**context)
+
+    def clear(self):
+        with self._lock:
+            self._compiled.clear()
+            self._file_hashes.clear()
+
+    def _file_key(self, path):
+        """Return (source hash, source text or None); the file is only read when it changed"""
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._file_hashes.get(path)
+        if cached and cached[0] == signature:
+            return cached[1], None
+        with open(path, 'r', encoding='utf-8') as f:
+            source = f.read()
+        digest = self._hash(source)
+        with self._lock:
+            self._file_hashes[path] = (signature, digest)
+        return digest, source
+
+    @staticmethod
+    def _hash(source):
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def _database_template(self):
+        with self._db_lock:
+            try:
+                if self._db is None:
+                    self._db = Database(self.database_url)
+                row = self._db.session.query(ReportTemplate.content)\
+                    .order_by(ReportTemplate.id.desc())\
+                    .first()
+                # End the read transaction so the next call sees template edits
+                self._db.session.rollback()
+                return row[0] if row else None
+            except Exception as e:
+                logger.error(f"Error loading report template from database: {e}")
+                if self._db is not None:
+                    self._db.session.rollback()
+                return None
+
+_instance = None
+_instance_lock = threading.Lock()
+
+
+def get_instance():
+    """
+    Get or create the application-wide report template cache.
+
+    Returns:
+        ReportTemplateCache: The singleton instance
+    """
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = ReportTemplateCache()
+    return _instance
+
+
+def configure(database_url):
+    """
+    Replace the application-wide report template cache with one on another database.
+
+    For batch tools working on a database other than the local one; the
+    application itself always uses the default instance.
+
+    Returns:
+        ReportTemplateCache: The new instance
+    """
+    global _instance
+    with _instance_lock:
+        _instance = ReportTemplateCache(database_url)
+    return _instance
+
+
+def render_report(context, template_file=None):
+    """Render the report template through the shared cache (see ReportTemplateCache.render)."""
+    return get_instance().render(context, template_file)
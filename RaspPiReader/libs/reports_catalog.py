@@ -0,0 +1,323 @@
+import os
+import re
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+from RaspPiReader.libs.database import Database
+from RaspPiReader.libs.models import ReportFile, CycleData
+
+logger = logging.getLogger(__name__)
+
+# File extensions the catalog tracks and the kind they are stored as
+REPORT_KINDS = {
+    '.csv': 'csv',
+    '.pdf': 'pdf',
+    '.html': 'html',
+    '.htm': 'html',
+    '.png': 'png',
+    '.txt': 'txt',
+}
+# Report files are named <cycle number>_<YYYYmmdd_HHMMSS>[_plot].<ext>
+_REPORT_NAME_RE = re.compile(r'^(?P<cycle>.+?)_(?P<stamp>\d{8}_\d{6}|\d{14})(?:_plot)?\.[^.]+$')
+CHECKSUM_CHUNK = 1024 * 1024
+# Files stored per transaction by index_folder()
+INDEX_BATCH = 500
+# Sub-folders index_folder() leaves alone; artifact store blobs are tracked by their own tables
+SKIPPED_FOLDERS = ('artifacts',)
+
+
+def file_checksum(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_report_name(file_name):
+    """
+    Split a report file name into its cycle number and timestamp.
+
+    Returns:
+        tuple: (cycle number, datetime) or (None, None) if the name does not follow the pattern
+    """
+    match = _REPORT_NAME_RE.match(file_name)
+    if not match:
+        return None, None
+    stamp = match.group('stamp').replace('_', '')
+    try:
+        created = datetime.strptime(stamp, "%Y%m%d%H%M%S")
+    except ValueError:
+        created = None
+    return match.group('cycle'), created
+
+
+class ReportsCatalog(object):
+    """
+    Index of the report files generated for each cycle.
+
+    Finalization registers every artifact it writes, so finding a cycle's
+    reports is an indexed query instead of a scan of the reports folder.
+    Lookups only return files that still exist; entries whose file vanished
+    are dropped when they are encountered. index_folder() catalogs files
+    written before the catalog existed.
+    """
+
+    def __init__(self, database_url="sqlite:///local_database.db"):
+        self.db = Database(database_url)
+        self._lock = threading.Lock()
+
+    def register(self, path, kind=None, cycle_id=None, cycle_number=None, checksum=True):
+        """
+        Add or refresh the catalog entry of a report file.
+
+        Args:
+            path: Report file
+            kind: File kind, derived from the extension when omitted
+            cycle_id: Database id of the cycle the file belongs to
+            cycle_number: Cycle label used in the file name
+            checksum: Compute the SHA-256 of the file
+
+        Returns:
+            bool: True if the file was cataloged
+        """
+        path = os.path.abspath(path)
+        if not os.path.isfile(path):
+            logger.warning(f"Not cataloging missing report file {path}")
+            return False
+        kind = kind or REPORT_KINDS.get(os.path.splitext(path)[1].lower())
+        if not kind:
+            return False
+        try:
+            stat = os.stat(path)
+            digest = file_checksum(path) if checksum else None
+        except OSError as e:
+            logger.error(f"Error reading report file {path}: {e}")
+            return False
+        with self._lock:
+            try:
+                self._upsert(path, stat, kind, cycle_id, cycle_number, digest)
+                self.db.session.commit()
+            except Exception as e:
+                self.db.session.rollback()
+                logger.error(f"Error cataloging report file {path}: {e}")
+                return False
+        return True
+
+    def _upsert(self, path, stat, kind, cycle_id, cycle_number, digest, entry=None):
+        if entry is None:
+            entry = self.db.session.query(ReportFile).filter_by(path=path).first()
+        if entry is None:
+            entry = ReportFile(path=path, created_at=datetime.fromtimestamp(stat.st_mtime))
+            self.db.session.add(entry)
+        entry.kind = kind
+        if cycle_id is not None:
+            entry.cycle_id = cycle_id
+        if cycle_number is not None:
+            entry.cycle_number = str(cycle_number)
+        entry.size = stat.st_size
+        entry.checksum = digest
+        entry.modified_at = stat.st_mtime
+
+    def find(self, kind, cycle_id=None, cycle_number=None):
+        """
+        Return the newest existing file of a kind for a cycle.
+
+        Args:
+            kind: File kind ('csv', 'pdf', 'html', 'png', 'txt')
+            cycle_id: Database id of the cycle
+            cycle_number: Cycle label, used when no entry is linked to cycle_id
+
+        Returns:
+            str: Path of the file, or None
+        """
+        for entry in self.files(kind, cycle_id=cycle_id, cycle_number=cycle_number, limit=1):
+            return entry.path
+        return None
+
+    def files(self, kind=None, cycle_id=None, cycle_number=None, name_suffix=None, limit=None):
+        """
+        List existing cataloged files, newest first.
+
+        Matches entries linked to cycle_id, or else those carrying cycle_number;
+        with neither given, all files of the kind are listed.
+
+        Returns:
+            list: ReportFile entries (detached copies safe to use on any thread)
+        """
+        with self._lock:
+            try:
+                results = []
+                if cycle_id is not None:
+                    results = self._existing(
+                        self._query(kind, name_suffix).filter(ReportFile.cycle_id == cycle_id), limit)
+                if not results and cycle_number is not None:
+                    results = self._existing(
+                        self._query(kind, name_suffix).filter(ReportFile.cycle_number == str(cycle_number)), limit)
+                if cycle_id is None and cycle_number is None:
+                    results = self._existing(self._query(kind, name_suffix), limit)
+                self.db.session.commit()
+                return results
+            except Exception as e:
+                self.db.session.rollback()
+                logger.error(f"Error querying reports catalog: {e}")
+                return []
+
+    def _query(self, kind, name_suffix):
+        query = self.db.session.query(ReportFile)
+        if kind:
+            query = query.filter(ReportFile.kind == kind)
+        if name_suffix:
+            query = query.filter(ReportFile.path.endswith(name_suffix, autoescape=True))
+        return query.order_by(ReportFile.created_at.desc(), ReportFile.id.desc())
+
+    def _existing(self, query, limit):
+        """
+        Run a query, dropping entries whose file no longer exists.
+
+        With a limit only that many rows are loaded; when some of them were
+        missing files, the next rows are queried to make up the shortfall.
+        """
+        results = []
+        while True:
+            if limit:
+                # Missing entries are deleted below, so the existing ones returned so far are the offset
+                rows = query.offset(len(results)).limit(limit - len(results)).all()
+            else:
+                rows = query.all()
+            missing = 0
+            for entry in rows:
+                if os.path.exists(entry.path):
+                    self.db.session.expunge(entry)
+                    results.append(entry)
+                else:
+                    logger.info(f"Removing catalog entry of missing report file {entry.path}")
+                    self.db.session.delete(entry)
+                    missing += 1
+            if not limit or not missing:
+                return results
+            self.db.session.flush()
+
+    def index_folder(self, folder, checksum=True, progress=None):
+        """
+        Catalog the report files of a folder (recursively).
+
+        Files already cataloged with an unchanged size and modification time
+        are skipped, so the indexer can be re-run cheaply. Cycle numbers are
+        taken from the file names and linked to a cycle when exactly one
+        cycle carries that number.
+
+        Args:
+            folder: Reports folder
+            checksum: Compute SHA-256 checksums
+            progress: Optional callable(indexed, skipped, path)
+
+        Returns:
+            dict: Counts of 'indexed', 'skipped' and 'unmatched' files
+        """
+        counts = {'indexed': 0, 'skipped': 0, 'unmatched': 0}
+        with self._lock:
+            known = {path: (size, mtime) for path, size, mtime in
+                     self.db.session.query(ReportFile.path, ReportFile.size, ReportFile.modified_at)}
+            cycle_ids = {}
+            for cycle_db_id, cycle_number, order_id in self.db.session.query(
+                    CycleData.id, CycleData.cycle_id, CycleData.order_id):
+                for label in (cycle_number, order_id):
+                    if label:
+                        cycle_ids.setdefault(str(label).strip(), set()).add(cycle_db_id)
+            self.db.session.commit()
+
+        batch = []
+        for root, folders, names in os.walk(folder):
+            folders[:] = [name for name in folders if name not in SKIPPED_FOLDERS]
+            for name in names:
+                kind = REPORT_KINDS.get(os.path.splitext(name)[1].lower())
+                if not kind:
+                    continue
+                path = os.path.abspath(os.path.join(root, name))
+                try:
+                    stat = os.stat(path)
+                    if known.get(path) == (stat.st_size, stat.st_mtime):
+                        counts['skipped'] += 1
+                        continue
+                    digest = file_checksum(path) if checksum else None
+                except OSError as e:
+                    logger.error(f"Error reading report file {path}: {e}")
+                    continue
+                cycle_number, _ = parse_report_name(name)
+                matches = cycle_ids.get(cycle_number, set()) if cycle_number else set()
+                cycle_id = next(iter(matches)) if len(matches) == 1 else None
+                if cycle_id is None:
+                    counts['unmatched'] += 1
+                batch.append((path, stat, kind, cycle_id, cycle_number, digest, path in known))
+                if len(batch) >= INDEX_BATCH:
+                    counts['indexed'] += self._store_batch(batch)
+                    batch = []
+                    if progress:
+                        progress(counts['indexed'], counts['skipped'], path)
+        counts['indexed'] += self._store_batch(batch)
+        return counts
+
+    def _store_batch(self, batch):
+        """Upsert indexed files in one transaction; returns the number stored"""
+        if not batch:
+            return 0
+        with self._lock:
+            try:
+                for path, stat, kind, cycle_id, cycle_number, digest, existing in batch:
+                    entry = None if existing else ReportFile(path=path,
+                                                             created_at=datetime.fromtimestamp(stat.st_mtime))
+                    if entry is not None:
+                        self.db.session.add(entry)
+                    self._upsert(path, stat, kind, cycle_id, cycle_number, digest, entry)
+                self.db.session.commit()
+                return len(batch)
+            except Exception as e:
+                self.db.session.rollback()
+                logger.error(f"Error storing {len(batch)} catalog entries: {e}")
+                return 0
+
+_instance = None
+_instance_lock = threading.Lock()
+
+
+def get_instance():
+    """
+    Get or create the application-wide reports catalog.
+
+    Returns:
+        ReportsCatalog: The singleton instance
+    """
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = ReportsCatalog()
+    return _instance
+
+
+def configure(database_url):
+    """
+    Replace the application-wide reports catalog with one on another database.
+
+    For batch tools working on a database other than the local one; the
+    application itself always uses the default instance.
+
+    Returns:
+        ReportsCatalog: The new instance
+    """
+    global _instance
+    with _instance_lock:
+        _instance = ReportsCatalog(database_url)
+    return _instance
+
+
+def register_report_file(path, kind=None, cycle_id=None, cycle_number=None):
+    """Register a report file in the shared catalog; errors are logged, never raised."""
+    try:
+        return get_instance().register(path, kind, cycle_id=cycle_id, cycle_number=cycle_number)
+    except Exception as e:
+        logger.error(f"Error registering report file {path}: {e}")
+        return False
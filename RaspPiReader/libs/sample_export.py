@@ -0,0 +1,250 @@
+import re
+import logging
+from datetime import timedelta
+
+import numpy as np
+
+from RaspPiReader import pool
+from RaspPiReader.libs.models import PlotData, ChannelConfigSettings
+
+logger = logging.getLogger(__name__)
+
+# Samples fetched from the database per round trip
+DEFAULT_CHUNK_ROWS = 5000
+# Samples of different channels this close together are written on one row
+DEFAULT_ALIGN_SECONDS = 0.5
+# Resampled values are left empty across gaps longer than this many intervals
+DEFAULT_MAX_GAP_INTERVALS = 10
+
+_CHANNEL_RE = re.compile(r'^ch(\d+)$')
+
+
+def ensure_sample_index(engine):
+    """Create the (cycle_id, timestamp) index of plot_data on databases created before it existed"""
+    for index in PlotData.__table__.indexes:
+        try:
+            index.create(bind=engine, checkfirst=True)
+        except Exception as e:
+            logger.error(f"Error creating index {index.name}: {e}")
+
+
+def _channel_sort_key(name):
+    match = _CHANNEL_RE.match(name)
+    return (0, int(match.group(1)), name) if match else (1, 0, name)
+
+
+def cycle_channels(db, cycle_id):
+    """
+    Return the channels recorded for a cycle and their column labels.
+
+    Returns:
+        tuple: (list of channel names in channel order, list of labels)
+    """
+    names = [row[0] for row in db.session.query(PlotData.channel)
+             .filter(PlotData.cycle_id == cycle_id).distinct()]
+    names.sort(key=_channel_sort_key)
+    configs = {config.id: config.label for config in db.session.query(ChannelConfigSettings.id,
+                                                                       ChannelConfigSettings.label)}
+    labels = []
+    for name in names:
+        match = _CHANNEL_RE.match(name)
+        label = configs.get(int(match.group(1))) if match else None
+        labels.append(label or name)
+    return names, labels
+
+
+def iter_sample_chunks(db, cycle_id, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Stream the samples of a cycle in time order without loading them all.
+
+    The query runs with stream_results/yield_per, so the driver hands rows
+    over chunk_rows at a time instead of buffering the whole result set.
+
+    Yields:
+        list: Up to chunk_rows (channel, timestamp, value) tuples
+    """
+    query = db.session.query(PlotData.channel, PlotData.timestamp, PlotData.value)\
+        .filter(PlotData.cycle_id == cycle_id, PlotData.timestamp.isnot(None))\
+        .order_by(PlotData.timestamp, PlotData.id)\
+        .execution_options(stream_results=True, yield_per=chunk_rows)
+    chunk = []
+    for row in query:
+        chunk.append(tuple(row))
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_aligned_rows(chunks, channels, align_seconds=DEFAULT_ALIGN_SECONDS):
+    """
+    Collapse time-ordered samples into one row per acquisition.
+
+    A row collects the samples that arrive within align_seconds of its first
+    sample, one per channel; a repeated channel or a later sample starts the
+    next row. Channels without a sample in a row get an empty cell.
+
+    Yields:
+        tuple: (row datetime, list of values)
+    """
+    index = {name: position for position, name in enumerate(channels)}
+    row_time = None
+    values = None
+    for chunk in chunks:
+        for channel, timestamp, value in chunk:
+            position = index.get(channel)
+            if position is None:
+                continue
+            if (row_time is None or values[position] != ''
+                    or (timestamp - row_time).total_seconds() > align_seconds):
+                if row_time is not None:
+                    yield row_time, values
+                row_time = timestamp
+                values = [''] * len(channels)
+            values[position] = value
+    if row_time is not None:
+        yield row_time, values
+
+
+def _interpolate(times, values, grid, max_gap):
+    """np.interp over one channel, with NaN outside its samples and inside gaps longer than max_gap"""
+    result = np.interp(grid, times, values, left=np.nan, right=np.nan)
+    if len(times) > 1:
+        after = np.clip(np.searchsorted(times, grid, side='left'), 1, len(times) - 1)
+        gaps = times[after] - times[after - 1]
+        exact = times[np.minimum(np.searchsorted(times, grid, side='left'), len(times) - 1)] == grid
+        result[(gaps > max_gap) & ~exact] = np.nan
+    return result
+
+
+def iter_resampled_rows(chunks, channels, interval, max_gap=None):
+    """
+    Resample time-ordered samples onto a uniform time grid.
+
+    Every channel is linearly interpolated (np.interp) at origin + k * interval.
+    Samples are buffered per channel only until the grid has passed them, so
+    memory stays bounded by the chunk size plus one gap. Grid points before a
+    channel's first sample, after its last one or inside a gap longer than
+    max_gap are left empty.
+
+    Args:
+        chunks: Iterable of lists of (channel, timestamp, value), in time order
+        channels: Channel names, in column order
+        interval: Grid spacing in seconds
+        max_gap: Longest gap in seconds interpolated across
+
+    Yields:
+        tuple: (seconds since the first sample, list of values)
+    """
+    if max_gap is None:
+        max_gap = interval * DEFAULT_MAX_GAP_INTERVALS
+    index = {name: position for position, name in enumerate(channels)}
+    buffers = [[np.empty(0), np.empty(0)] for _ in channels]
+    origin = None
+    next_point = 0.0
+    latest = None
+
+    def emit(limit, final=False):
+        nonlocal next_point
+        count = int(np.floor((limit - next_point) / interval)) + 1 if limit >= next_point else 0
+        if count <= 0:
+            return
+        grid = next_point + interval * np.arange(count)
+        columns = []
+        for times, values in buffers:
+            if len(times):
+                columns.append(_interpolate(times, values, grid, max_gap))
+            else:
+                columns.append(np.full(count, np.nan))
+        table = np.column_stack(columns) if columns else np.empty((count, 0))
+        for offset, row in zip(grid, table):
+            yield float(offset), ['' if np.isnan(value) else round(float(value), 6) for value in row]
+        next_point = float(grid[-1] + interval)
+        if not final:
+            # Keep the last sample at or before the grid so the next points can interpolate from it
+            for buffer in buffers:
+                keep = max(0, int(np.searchsorted(buffer[0], grid[-1], side='right')) - 1)
+                buffer[0] = buffer[0][keep:]
+                buffer[1] = buffer[1][keep:]
+
+    for chunk in chunks:
+        rows = [(index[channel], timestamp, value) for channel, timestamp, value in chunk
+                if channel in index and value is not None]
+        if not rows:
+            continue
+        if origin is None:
+            origin = rows[0][1]
+        positions = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        seconds = np.fromiter(((row[1] - origin).total_seconds() for row in rows), dtype=float, count=len(rows))
+        samples = np.fromiter((row[2] for row in rows), dtype=float, count=len(rows))
+        for position in np.unique(positions):
+            mask = positions == position
+            buffer = buffers[position]
+            buffer[0] = np.concatenate((buffer[0], seconds[mask]))
+            buffer[1] = np.concatenate((buffer[1], samples[mask]))
+        latest = float(seconds[-1])
+
+        # Grid points up to the oldest live channel's last sample are final;
+        # a channel silent for longer than max_gap no longer holds them back.
+        limit = latest
+        for times, _ in buffers:
+            if len(times) and latest - times[-1] <= max_gap:
+                limit = min(limit, float(times[-1]))
+        yield from emit(limit)
+
+    if latest is not None:
+        yield from emit(latest, final=True)
+
+
+def write_cycle_samples(writer, db, cycle_id, resample_seconds=None, chunk_rows=None):
+    """
+    Write the time series of a cycle to a csv writer.
+
+    Writes a header row (date, time, elapsed seconds and one column per
+    channel) followed by either the time-aligned raw samples or, with
+    resample_seconds set, values resampled to that interval.
+
+    Args:
+        writer: csv.writer
+        db: Database whose PlotData holds the cycle's samples
+        cycle_id: CycleData id
+        resample_seconds: Uniform output interval; None or 0 writes raw samples
+        chunk_rows: Samples fetched per database round trip
+
+    Returns:
+        int: Number of data rows written
+    """
+    if resample_seconds is None:
+        resample_seconds = pool.config('csv_resample_seconds', float, 0.0)
+    chunk_rows = chunk_rows or pool.config('csv_export_chunk_rows', int, DEFAULT_CHUNK_ROWS)
+    ensure_sample_index(db.engine)
+    channels, labels = cycle_channels(db, cycle_id)
+    if not channels:
+        return 0
+
+    writer.writerow(['Date', 'Time', 'Elapsed (s)'] + labels)
+    chunks = iter_sample_chunks(db, cycle_id, chunk_rows)
+    count = 0
+    if resample_seconds and resample_seconds > 0:
+        first = db.session.query(PlotData.timestamp)\
+            .filter(PlotData.cycle_id == cycle_id, PlotData.timestamp.isnot(None))\
+            .order_by(PlotData.timestamp, PlotData.id).first()
+        origin = first[0]
+        for offset, values in iter_resampled_rows(chunks, channels, resample_seconds):
+            moment = origin + timedelta(seconds=offset)
+            writer.writerow([moment.strftime("%Y/%m/%d"), moment.strftime("%H:%M:%S.%f")[:-3],
+                             f"{offset:.3f}"] + values)
+            count += 1
+    else:
+        align_seconds = pool.config('csv_align_seconds', float, DEFAULT_ALIGN_SECONDS)
+        origin = None
+        for moment, values in iter_aligned_rows(chunks, channels, align_seconds):
+            if origin is None:
+                origin = moment
+            writer.writerow([moment.strftime("%Y/%m/%d"), moment.strftime("%H:%M:%S.%f")[:-3],
+                             f"{(moment - origin).total_seconds():.3f}"] + values)
+            count += 1
+    logger.info(f"Wrote {count} time series rows of cycle {cycle_id} ({len(channels)} channels"
+                f"{f', resampled to {resample_seconds}s' if resample_seconds else ''})")
+    return count
@@ -0,0 +1,110 @@
+import threading
+
+import numpy as np
+
+
+class ColumnarSampleStore:
+    """
+    Append-only sample table kept as one NumPy array per column.
+
+    Every row has a timestamp (epoch seconds) and one value per column; missing
+    values are stored as NaN. Arrays grow by doubling, so appends are amortized
+    O(1) and reading a row range is a cheap slice that never copies the table.
+    """
+
+    INITIAL_CAPACITY = 4096
+
+    def __init__(self, columns=None, value_dtype=np.float32):
+        self._lock = threading.Lock()
+        self._value_dtype = value_dtype
+        self._columns = []
+        self._column_index = {}
+        self._capacity = self.INITIAL_CAPACITY
+        self._size = 0
+        self._timestamps = np.empty(self._capacity, dtype=np.float64)
+        self._values = {}
+        for name in columns or []:
+            self.add_column(name)
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def __len__(self):
+        return self._size
+
+    def add_column(self, name):
+        """Add a column; existing rows get NaN for it. Returns the column index."""
+        with self._lock:
+            if name in self._column_index:
+                return self._column_index[name]
+            array = np.full(self._capacity, np.nan, dtype=self._value_dtype)
+            self._values[name] = array
+            self._column_index[name] = len(self._columns)
+            self._columns.append(name)
+            return self._column_index[name]
+
+    def _grow(self, needed):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        timestamps = np.empty(capacity, dtype=np.float64)
+        timestamps[:self._size] = self._timestamps[:self._size]
+        self._timestamps = timestamps
+        for name, old in self._values.items():
+            array = np.full(capacity, np.nan, dtype=self._value_dtype)
+            array[:self._size] = old[:self._size]
+            self._values[name] = array
+        self._capacity = capacity
+
+    def append(self, timestamp, values):
+        """
+        Append one row.
+
+        Args:
+            timestamp: Epoch seconds of the row
+            values: Dict of column name -> value; unknown names add a column
+
+        Returns:
+            int: Index of the new row
+        """
+        for name in values:
+            if name not in self._column_index:
+                self.add_column(name)
+        with self._lock:
+            if self._size >= self._capacity:
+                self._grow(self._size + 1)
+            row = self._size
+            self._timestamps[row] = timestamp
+            for name, array in self._values.items():
+                value = values.get(name)
+                array[row] = np.nan if value is None else float(value)
+            self._size += 1
+            return row
+
+    def clear(self):
+        with self._lock:
+            self._size = 0
+
+    def timestamps(self, start=0, stop=None):
+        """Return a read-only view of the timestamps of rows [start, stop)."""
+        stop = self._size if stop is None else min(stop, self._size)
+        view = self._timestamps[start:stop]
+        view.flags.writeable = False
+        return view
+
+    def column(self, name, start=0, stop=None):
+        """Return a read-only view of one column for rows [start, stop)."""
+        stop = self._size if stop is None else min(stop, self._size)
+        view = self._values[name][start:stop]
+        view.flags.writeable = False
+        return view
+
+    def value(self, row, column_index):
+        """Return a single cell by row and column index."""
+        return self._values[self._columns[column_index]][row]
+
+    def timestamp(self, row):
+        return self._timestamps[row]
@@ -0,0 +1,219 @@
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# One unit of startup work:
+#   name             unique name, used in requires and the timing log
+#   function         called without arguments; its return value is kept in the result
+#   requires         names of the tasks that must have succeeded before this one starts
+#   main_thread      run in the GUI thread (anything creating Qt objects), otherwise on the pool
+#   weight           share of the splash progress bar, roughly the task's usual duration
+#   critical         startup cannot continue without it; its failure is raised by run()
+StartupTask = namedtuple('StartupTask', ['name', 'function', 'requires', 'main_thread', 'weight', 'critical'])
+
+# How a task went: seconds is its own run time, started its start relative to the startup
+StartupResult = namedtuple('StartupResult', ['name', 'ok', 'value', 'error', 'seconds', 'started', 'thread'])
+
+# How often the GUI thread processes events while waiting on pool tasks (seconds)
+POLL_INTERVAL = 0.03
+
+
+def task(name, function, requires=(), main_thread=False, weight=1, critical=False):
+    """Build a StartupTask; see StartupTask for the arguments"""
+    return StartupTask(name, function, tuple(requires), main_thread, weight, critical)
+
+
+class StartupError(RuntimeError):
+    """A critical startup task failed"""
+
+
+class StartupOrchestrator(object):
+    """
+    Runs the application's startup tasks, independent ones concurrently.
+
+    A task starts as soon as every task it requires has succeeded: pool
+    tasks are submitted to a thread pool, also straight from the worker that
+    finished their last requirement, while GUI thread tasks run one at a time
+    in run()'s loop between event processing, so the splash screen stays
+    responsive. A task whose requirement failed is skipped. Progress is
+    reported by completed task weight, and every task's run time is logged.
+    """
+
+    def __init__(self, tasks, max_workers=3, progress=None):
+        """
+        Args:
+            tasks: StartupTask list; requirements must name other tasks in it
+            max_workers: Threads running pool tasks
+            progress: Called in the GUI thread as progress(percent, task name) after each task
+        """
+        self.tasks = list(tasks)
+        names = [t.name for t in self.tasks]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate startup task names in {names}")
+        for t in self.tasks:
+            unknown = [name for name in t.requires if name not in names]
+            if unknown:
+                raise ValueError(f"Startup task {t.name} requires unknown tasks {unknown}")
+        self.max_workers = max(1, max_workers)
+        self.progress = progress
+        self.results = {}
+        self._lock = threading.Lock()
+        self._finished = queue.Queue()
+        self._pending = []
+        self._done = {}
+        self._failed_critical = None
+        self._running = 0
+        self._executor = None
+        self._started = None
+
+    def _run_task(self, t):
+        started = time.perf_counter()
+        try:
+            value = t.function()
+            error = None
+        except Exception as e:
+            value = None
+            error = e
+        return StartupResult(t.name, error is None, value, error, time.perf_counter() - started,
+                             started - self._started, threading.current_thread().name)
+
+    def _fail(self, t, result):
+        """Note a task that did not run; called with the lock held"""
+        self._done[t.name] = result
+        self._finished.put((t, result))
+        if t.critical and self._failed_critical is None:
+            self._failed_critical = result
+
+    def _complete(self, t, result, pooled=False):
+        """Note a task's result and start the pool tasks that were waiting for it"""
+        with self._lock:
+            self._done[t.name] = result
+            self._finished.put((t, result))
+            if not result.ok and t.critical and self._failed_critical is None:
+                self._failed_critical = result
+            if pooled:
+                self._running -= 1
+            self._schedule()
+
+    def _run_pooled(self, t):
+        self._complete(t, self._run_task(t), pooled=True)
+
+    def _schedule(self):
+        """
+        Submit the pool tasks whose requirements have all succeeded and skip
+        those with a failed requirement; called with the lock held.
+
+        Returns:
+            list: GUI thread tasks that are ready to run
+        """
+        ready_main = []
+        changed = True
+        while changed:
+            changed = False
+            if self._failed_critical is not None:
+                # Start nothing new; run() raises once the running tasks are done
+                self._pending = []
+                return []
+            for t in list(self._pending):
+                if any(name in self._done and not self._done[name].ok for name in t.requires):
+                    self._pending.remove(t)
+                    self._fail(t, StartupResult(t.name, False, None, None, 0.0, 0.0, None))
+                    changed = True
+                elif all(name in self._done for name in t.requires):
+                    if not t.main_thread:
+                        self._pending.remove(t)
+                        self._running += 1
+                        self._executor.submit(self._run_pooled, t)
+                    elif t not in ready_main:
+                        ready_main.append(t)
+        return ready_main
+
+    def _record(self, t, result):
+        """Log a finished task and report progress; called in the GUI thread"""
+        self.results[t.name] = result
+        if result.ok:
+            logger.info(f"Startup task {t.name} finished in {result.seconds * 1000:.0f} ms "
+                        f"(at {result.started * 1000:.0f} ms, {result.thread})")
+        elif result.error is not None:
+            logger.error(f"Startup task {t.name} failed after {result.seconds * 1000:.0f} ms: {result.error}")
+        else:
+            logger.warning(f"Startup task {t.name} skipped: a task it requires failed")
+        if self.progress:
+            total = sum(task.weight for task in self.tasks) or 1
+            done = sum(task.weight for task in self.tasks if task.name in self.results)
+            try:
+                self.progress(int(done * 100 / total), t.name)
+            except Exception as e:
+                logger.error(f"Error reporting startup progress: {e}")
+
+    def _record_finished(self, timeout=None):
+        """Record the results that have come in, waiting up to timeout seconds for the first"""
+        try:
+            while True:
+                t, result = self._finished.get(timeout=timeout) if timeout else self._finished.get_nowait()
+                timeout = None
+                self._record(t, result)
+        except queue.Empty:
+            pass
+
+    def run(self, app=None):
+        """
+        Run all tasks and wait for them, processing app's events meanwhile.
+
+        Args:
+            app: QApplication to keep responsive, None when there is no GUI
+
+        Returns:
+            dict: Task name -> StartupResult
+
+        Raises:
+            StartupError: When a critical task failed; tasks already running are finished first
+        """
+        self._started = time.perf_counter()
+        self.results = {}
+        self._done = {}
+        self._failed_critical = None
+        self._running = 0
+        self._pending = list(self.tasks)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="startup")
+        try:
+            while True:
+                with self._lock:
+                    ready_main = self._schedule()
+                    if ready_main:
+                        self._pending.remove(ready_main[0])
+                    running, pending = self._running, list(self._pending)
+                if ready_main:
+                    t = ready_main[0]
+                    self._complete(t, self._run_task(t))
+                    self._record_finished()
+                elif not running and not pending:
+                    break
+                elif not running:
+                    # Nothing running and nothing can start: the remaining tasks require each other
+                    with self._lock:
+                        for t in pending:
+                            self._pending.remove(t)
+                            self._fail(t, StartupResult(t.name, False, None,
+                                                        ValueError("circular requirement"), 0.0, 0.0, None))
+                else:
+                    self._record_finished(POLL_INTERVAL)
+                if app is not None:
+                    app.processEvents()
+        finally:
+            self._executor.shutdown(wait=True)
+        self._record_finished()
+
+        elapsed = time.perf_counter() - self._started
+        busy = sum(result.seconds for result in self.results.values())
+        logger.info(f"Startup tasks finished in {elapsed * 1000:.0f} ms "
+                    f"({busy * 1000:.0f} ms of work, {len(self.results)} tasks)")
+        if self._failed_critical is not None:
+            failed = self._failed_critical
+            raise StartupError(f"Startup task {failed.name} failed: {failed.error or 'a task it requires failed'}")
+        return self.results
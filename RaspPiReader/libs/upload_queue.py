@@ -0,0 +1,373 @@
+import os
+import random
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func
+
+from RaspPiReader import pool
+from RaspPiReader.libs import onedrive_api
+from RaspPiReader.libs.artifact_store import content_digest
+from RaspPiReader.libs.database import Database
+from RaspPiReader.libs.models import UploadQueueItem
+
+logger = logging.getLogger(__name__)
+
+# Retry delays double from the base up to the maximum, with some jitter
+DEFAULT_RETRY_SECONDS = 30
+DEFAULT_RETRY_MAX_SECONDS = 3600
+DEFAULT_MAX_ATTEMPTS = 12
+# The dispatcher looks for due items at least this often
+IDLE_POLL_SECONDS = 60
+
+PENDING = 'pending'
+UPLOADING = 'uploading'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class UploadQueue(object):
+    """
+    Persistent OneDrive upload queue for report files.
+
+    Files are queued with the SHA-256 of their content. A file whose content
+    was already uploaded under the same name to the same folder is skipped,
+    so periodic syncs only send new or changed reports. Queue entries live in
+    the upload_queue table: pending uploads, and uploads interrupted by a
+    restart, are picked up again by start().
+
+    A dispatcher thread runs due entries on a pool of
+    'onedrive_upload_workers' threads. A failed upload is retried after an
+    exponentially growing delay and marked failed after
+    'onedrive_max_attempts' attempts.
+    """
+
+    def __init__(self, database_url="sqlite:///local_database.db", client_factory=None, retry_seconds=None):
+        """
+        Args:
+            database_url: Database holding the upload_queue table
+            client_factory: Returns the OneDriveAPI to upload with, onedrive_api.get_client by default
+            retry_seconds: First retry delay, 'onedrive_retry_seconds' by default
+        """
+        self.db = Database(database_url)
+        self.client_factory = client_factory or onedrive_api.get_client
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._idle = threading.Condition()
+        self._active = set()
+        self._thread = None
+        self._executor = None
+        self.workers = onedrive_api.DEFAULT_UPLOAD_WORKERS
+
+    # Queueing
+
+    def _file_digest(self, path, size, mtime):
+        """Digest of a file, reusing the stored one while its size and modification time are unchanged"""
+        with self._lock:
+            try:
+                row = self.db.session.query(UploadQueueItem.digest)\
+                    .filter(UploadQueueItem.file_path == path, UploadQueueItem.file_size == size,
+                            UploadQueueItem.file_mtime == mtime)\
+                    .order_by(UploadQueueItem.id.desc()).first()
+            finally:
+                self.db.session.rollback()
+        return row[0] if row else content_digest(path)
+
+    def enqueue(self, file_path, folder_name=None):
+        """
+        Queue a file unless the same content is already uploaded or queued.
+
+        Queued entries of the same remote file with older content are dropped,
+        so only the newest version is sent.
+
+        Args:
+            file_path: Local file
+            folder_name: Drive folder, today's report folder by default
+
+        Returns:
+            bool: True if the file was queued, False if it was skipped
+        """
+        if not file_path or not os.path.exists(file_path):
+            return False
+        file_path = os.path.abspath(file_path)
+        folder_name = folder_name or onedrive_api.daily_folder_name()
+        file_name = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        try:
+            digest = self._file_digest(file_path, stat.st_size, stat.st_mtime)
+        except OSError as e:
+            logger.error(f"Error reading {file_path} for upload: {e}")
+            return False
+
+        with self._lock:
+            session = self.db.session
+            try:
+                existing = session.query(UploadQueueItem)\
+                    .filter(UploadQueueItem.folder_name == folder_name, UploadQueueItem.file_name == file_name,
+                            UploadQueueItem.digest == digest,
+                            UploadQueueItem.status.in_((PENDING, UPLOADING, DONE)))\
+                    .first()
+                if existing is not None:
+                    session.rollback()
+                    logger.debug(f"{file_name} is unchanged ({existing.status}), not queueing it again")
+                    return False
+                session.query(UploadQueueItem)\
+                    .filter(UploadQueueItem.folder_name == folder_name, UploadQueueItem.file_name == file_name,
+                            UploadQueueItem.status.in_((PENDING, FAILED)))\
+                    .delete(synchronize_session=False)
+                session.add(UploadQueueItem(
+                    file_path=file_path, file_name=file_name, folder_name=folder_name, digest=digest,
+                    file_size=stat.st_size, file_mtime=stat.st_mtime, status=PENDING, attempts=0,
+                    next_attempt_at=datetime.now(), created_at=datetime.now()))
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error queueing {file_name} for upload: {e}")
+                return False
+        logger.info(f"Queued {file_name} for upload to {folder_name}")
+        self._wake.set()
+        return True
+
+    def enqueue_many(self, file_paths, folder_name=None):
+        """
+        enqueue() several files.
+
+        Returns:
+            int: Number of files queued
+        """
+        return sum(1 for path in file_paths if path and self.enqueue(path, folder_name))
+
+    # Dispatching
+
+    def start(self, workers=None):
+        """
+        Start the dispatcher, resuming entries left pending or interrupted by a restart.
+
+        Args:
+            workers: Concurrent uploads, 'onedrive_upload_workers' by default
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            session = self.db.session
+            try:
+                interrupted = session.query(UploadQueueItem).filter(UploadQueueItem.status == UPLOADING)\
+                    .update({UploadQueueItem.status: PENDING, UploadQueueItem.next_attempt_at: datetime.now()},
+                            synchronize_session=False)
+                session.commit()
+                if interrupted:
+                    logger.info(f"Resuming {interrupted} interrupted uploads")
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error resetting interrupted uploads: {e}")
+            self.workers = max(1, workers or pool.config('onedrive_upload_workers', int,
+                                                         onedrive_api.DEFAULT_UPLOAD_WORKERS))
+            self._stopping.clear()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upload_queue")
+            self._thread = threading.Thread(target=self._run, name="upload_queue_dispatcher", daemon=True)
+            self._thread.start()
+        logger.info(f"Upload queue started with {self.workers} workers")
+
+    def stop(self, wait=True):
+        """Stop dispatching; running uploads finish, or resume after the next start()"""
+        self._stopping.set()
+        self._wake.set()
+        thread, executor = self._thread, self._executor
+        if thread is not None:
+            thread.join()
+        if executor is not None:
+            executor.shutdown(wait=wait)
+        self._thread = None
+        self._executor = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.clear()
+            try:
+                for item_id in self._claim(self.workers - len(self._active)):
+                    self._active.add(item_id)
+                    self._executor.submit(self._upload, item_id)
+                timeout = self._seconds_to_next()
+            except Exception as e:
+                logger.error(f"Upload queue dispatcher error: {e}")
+                timeout = IDLE_POLL_SECONDS
+            self._wake.wait(timeout)
+
+    def _claim(self, slots):
+        """Mark up to slots due entries as uploading; returns their ids"""
+        if slots <= 0:
+            return []
+        with self._lock:
+            session = self.db.session
+            try:
+                items = session.query(UploadQueueItem)\
+                    .filter(UploadQueueItem.status == PENDING, UploadQueueItem.next_attempt_at <= datetime.now())\
+                    .order_by(UploadQueueItem.next_attempt_at, UploadQueueItem.id).limit(slots).all()
+                for item in items:
+                    item.status = UPLOADING
+                session.commit()
+                return [item.id for item in items]
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error claiming queued uploads: {e}")
+                return []
+
+    def _seconds_to_next(self):
+        """Seconds until the next pending entry is due, at most IDLE_POLL_SECONDS"""
+        with self._lock:
+            try:
+                due = self.db.session.query(func.min(UploadQueueItem.next_attempt_at))\
+                    .filter(UploadQueueItem.status == PENDING).scalar()
+            finally:
+                self.db.session.rollback()
+        if due is None:
+            return IDLE_POLL_SECONDS
+        return min(IDLE_POLL_SECONDS, max(0.0, (due - datetime.now()).total_seconds()))
+
+    def _upload(self, item_id):
+        file_name, attempts = str(item_id), 0
+        try:
+            with self._lock:
+                item = self.db.session.get(UploadQueueItem, item_id)
+                file_path, file_name, folder_name, digest = item.file_path, item.file_name, item.folder_name, item.digest
+                attempts = item.attempts
+                self.db.session.rollback()
+
+            if not os.path.exists(file_path):
+                self._finish(item_id, FAILED, error="File no longer exists")
+                return
+            if content_digest(file_path) != digest:
+                # Changed since it was queued: queue the new content instead
+                self._finish(item_id, FAILED, error="File changed before upload, queued again")
+                self.enqueue(file_path, folder_name)
+                return
+
+            client = self.client_factory()
+            if client is None:
+                raise Exception("OneDrive is not configured")
+            folder_id = client.folder_id(folder_name) if folder_name else None
+            result = client.upload_file(file_path, folder_id)
+            self._finish(item_id, DONE, remote_id=(result or {}).get('id'))
+            logger.info(f"Uploaded {file_name} to OneDrive folder {folder_name}")
+        except Exception as e:
+            attempts += 1
+            max_attempts = pool.config('onedrive_max_attempts', int, DEFAULT_MAX_ATTEMPTS)
+            if attempts >= max_attempts:
+                logger.error(f"Upload of {file_name} failed for good after {attempts} attempts: {e}")
+                self._finish(item_id, FAILED, error=str(e), attempts=attempts)
+            else:
+                delay = self.retry_delay(attempts)
+                logger.warning(f"Upload of {file_name} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+                self._finish(item_id, PENDING, error=str(e), attempts=attempts,
+                             next_attempt_at=datetime.now() + timedelta(seconds=delay))
+        finally:
+            self._active.discard(item_id)
+            self._wake.set()
+            with self._idle:
+                self._idle.notify_all()
+
+    def retry_delay(self, attempts):
+        """Seconds to wait before the next attempt after attempts failures"""
+        base = self.retry_seconds or pool.config('onedrive_retry_seconds', float, DEFAULT_RETRY_SECONDS)
+        ceiling = pool.config('onedrive_retry_max_seconds', float, DEFAULT_RETRY_MAX_SECONDS)
+        delay = min(ceiling, base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _finish(self, item_id, status, error=None, attempts=None, next_attempt_at=None, remote_id=None):
+        with self._lock:
+            session = self.db.session
+            try:
+                item = session.get(UploadQueueItem, item_id)
+                if item is None:
+                    return
+                item.status = status
+                item.last_error = error
+                if attempts is not None:
+                    item.attempts = attempts
+                if next_attempt_at is not None:
+                    item.next_attempt_at = next_attempt_at
+                if status == DONE:
+                    item.remote_id = remote_id
+                    item.uploaded_at = datetime.now()
+                    item.attempts += 1
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error updating queued upload {item_id}: {e}")
+
+    # Status
+
+    def retry_failed(self):
+        """
+        Queue every failed entry again.
+
+        Returns:
+            int: Number of entries queued
+        """
+        with self._lock:
+            session = self.db.session
+            try:
+                count = session.query(UploadQueueItem).filter(UploadQueueItem.status == FAILED)\
+                    .update({UploadQueueItem.status: PENDING, UploadQueueItem.attempts: 0,
+                             UploadQueueItem.next_attempt_at: datetime.now()}, synchronize_session=False)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error requeueing failed uploads: {e}")
+                return 0
+        self._wake.set()
+        return count
+
+    def counts(self):
+        """
+        Returns:
+            dict: status -> number of entries
+        """
+        with self._lock:
+            try:
+                return dict(self.db.session.query(UploadQueueItem.status, func.count(UploadQueueItem.id))
+                            .group_by(UploadQueueItem.status).all())
+            except Exception as e:
+                logger.error(f"Error counting queued uploads: {e}")
+                return {}
+            finally:
+                self.db.session.rollback()
+
+    def wait_idle(self, timeout=None):
+        """
+        Block until nothing is pending or uploading, or until timeout seconds passed.
+
+        Returns:
+            bool: True if the queue drained
+        """
+        deadline = None if timeout is None else datetime.now() + timedelta(seconds=timeout)
+        with self._idle:
+            while True:
+                counts = self.counts()
+                if not counts.get(PENDING) and not counts.get(UPLOADING):
+                    return True
+                remaining = None if deadline is None else (deadline - datetime.now()).total_seconds()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(min(remaining, 1.0) if remaining is not None else 1.0)
+
+_instance = None
+_instance_lock = threading.Lock()
+
+
+def get_instance():
+    """
+    Get or create the application-wide upload queue.
+
+    Returns:
+        UploadQueue: The singleton instance
+    """
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = UploadQueue()
+    return _instance
@@ -1,12 +1,183 @@
 import time
+import heapq
+from operator import itemgetter
 from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtCore import QThread, pyqtSignal
 import pyqtgraph as pg
 import numpy as np
 from typing import Dict, List, Any, Optional
+from RaspPiReader.libs import frame_scheduler
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def _series_stream(index, timestamps, values):
+    """Yield (timestamp, series index, value) tuples for one sorted series."""
+    for timestamp, value in zip(timestamps, values):
+        yield timestamp, index, value
+
+
+def iter_merged_rows(buffers):
+    """
+    Merge-join already sorted per-series buffers into CSV rows.
+
+    Each buffer is a dict with 'timestamps' and 'values' lists appended in time
+    order, so a k-way heap merge yields all samples in timestamp order in a
+    single linear pass. Samples sharing a timestamp are collapsed into one row;
+    parameters without a sample at that timestamp get an empty cell.
+
+    Args:
+        buffers: Ordered mapping of parameter name -> {'timestamps': [...], 'values': [...]}
+
+    Yields:
+        list: [timestamp, value_param1, value_param2, ...]
+    """
+    names = list(buffers.keys())
+    streams = [
+        _series_stream(index, buffers[name]['timestamps'], buffers[name]['values'])
+        for index, name in enumerate(names)
+    ]
+    row = None
+    current_timestamp = None
+    for timestamp, index, value in heapq.merge(*streams, key=itemgetter(0)):
+        if row is None or timestamp != current_timestamp:
+            if row is not None:
+                yield row
+            current_timestamp = timestamp
+            row = [timestamp] + [''] * len(names)
+        row[index + 1] = value
+    if row is not None:
+        yield row
+
+
+def write_merged_csv(buffers, file_path):
+    """
+    Stream the merged rows of the given buffers into a CSV file.
+
+    Returns:
+        int: Number of data rows written
+    """
+    import csv
+
+    rows_written = 0
+    with open(file_path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['timestamp'] + list(buffers.keys()))
+        for row in iter_merged_rows(buffers):
+            writer.writerow(row)
+            rows_written += 1
+    return rows_written
+
+
+class DataExportWorker(QThread):
+    """Worker thread that writes a buffer snapshot to CSV without blocking the UI thread"""
+    # Emits (success, file_path or error message, rows written)
+    exportFinished = pyqtSignal(bool, str, int)
+
+    def __init__(self, buffers, file_path, parent=None):
+        super(DataExportWorker, self).__init__(parent)
+        self.buffers = buffers
+        self.file_path = file_path
+
+    def run(self):
+        try:
+            start_time = time.time()
+            rows_written = write_merged_csv(self.buffers, self.file_path)
+            logger.info(f"Exported {rows_written} rows to {self.file_path} in {time.time() - start_time:.3f}s")
+            self.exportFinished.emit(True, self.file_path, rows_written)
+        except Exception as e:
+            logger.error(f"Error exporting data to {self.file_path}: {e}")
+            self.exportFinished.emit(False, str(e), 0)
+
+# Fixed output geometry for exported chart images, independent of the on-screen widget size
+CHART_EXPORT_WIDTH = 1600
+CHART_EXPORT_HEIGHT = 900
+CHART_EXPORT_DPI = 100
+
+
+def render_chart_image(series, save_path, left_range=None, right_range=None,
+                       left_label=None, right_label=None, x_label="Time (s)",
+                       width=CHART_EXPORT_WIDTH, height=CHART_EXPORT_HEIGHT, dpi=CHART_EXPORT_DPI):
+    """
+    Render a snapshot of plot series to an image file with matplotlib's Agg backend.
+
+    Uses the object-oriented Figure API rather than pyplot, so it keeps no global
+    state and is safe to call from a worker thread.
+
+    Args:
+        series: List of dicts with 'name', 'label', 'color', 'axis' ('L' or 'R'),
+                'timestamps' and 'values'
+        save_path: Output image path; the format follows the file extension
+        left_range / right_range: Optional (min, max) for the left and right y-axes
+        width / height: Output size in pixels
+        dpi: Resolution used to map the pixel size to the figure size
+
+    Returns:
+        str: save_path
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    FigureCanvasAgg(figure)
+    left_axis = figure.add_subplot(111)
+    left_axis.grid(True, alpha=0.3)
+    left_axis.set_xlabel(x_label)
+    right_axis = None
+    if right_range is not None or any(item.get('axis') == 'R' for item in series):
+        right_axis = left_axis.twinx()
+
+    for item in series:
+        if not item['timestamps']:
+            continue
+        axis = right_axis if item.get('axis') == 'R' and right_axis is not None else left_axis
+        axis.plot(item['timestamps'], item['values'], color=item.get('color'),
+                  linewidth=1.5, label=item.get('label') or item['name'])
+
+    if left_range is not None:
+        left_axis.set_ylim(*left_range)
+    if left_label:
+        left_axis.set_ylabel(left_label)
+    handles, labels = left_axis.get_legend_handles_labels()
+    if right_axis is not None:
+        if right_range is not None:
+            right_axis.set_ylim(*right_range)
+        if right_label:
+            right_axis.set_ylabel(right_label)
+        right_handles, right_labels = right_axis.get_legend_handles_labels()
+        handles += right_handles
+        labels += right_labels
+    if handles:
+        left_axis.legend(handles, labels, loc='upper left', fontsize='small', ncol=2)
+
+    figure.tight_layout()
+    figure.savefig(save_path, dpi=dpi)
+    return save_path
+
+
+class ChartExportWorker(QThread):
+    """Render a chart snapshot to one or more image files off the GUI thread."""
+
+    exportFinished = pyqtSignal(bool, str)  # success, first path or error message
+
+    def __init__(self, series, save_paths, render_options=None, parent=None):
+        super().__init__(parent)
+        self.series = series
+        self.save_paths = list(save_paths)
+        self.render_options = render_options or {}
+
+    def run(self):
+        try:
+            start_time = time.time()
+            for save_path in self.save_paths:
+                render_chart_image(self.series, save_path, **self.render_options)
+            logger.info(f"Exported chart image to {self.save_paths[0]} in {time.time() - start_time:.2f}s")
+            self.exportFinished.emit(True, self.save_paths[0])
+        except Exception as e:
+            logger.error(f"Error exporting chart image: {e}")
+            self.exportFinished.emit(False, str(e))
+
 class LiveDataVisualization:
     """
     Handles real-time visualization of PLC data during a cycle.
@@ -24,7 +195,8 @@ class LiveDataVisualization:
         self.update_interval = update_interval_ms
         self.start_time = None
         self.active = False
-        self.timer = QtCore.QTimer()
+        # Plot refreshes are drawn on the shared UI frame, at most once per frame
+        self.timer = frame_scheduler.get_instance().timer("plot_refresh")
         self.timer.timeout.connect(self.update_plots)
         self.max_points = 1000  # maximum number of data points to store per channel
         
@@ -156,80 +328,117 @@ class LiveDataVisualization:
                 plot_info['curve'].setData(timestamps, values)
                 logger.debug(f"Updated plot {param_name} with {len(values)} points.")
     
-    def export_chart_image(self, plot_widget, save_path):
+    def snapshot_chart_series(self, axes=None):
+        """
+        Copy the plotted series for rendering elsewhere.
+
+        Args:
+            axes: Optional dict of parameter name -> 'L' or 'R'; parameters not
+                  listed are drawn on the left axis
+
+        Returns:
+            list: Series dicts as expected by render_chart_image
+        """
+        axes = axes or {}
+        series = []
+        for name, plot_info in self.plots.items():
+            buffer = self.data_buffers.get(name)
+            if not buffer:
+                continue
+            timestamps = list(buffer['timestamps'])
+            values = list(buffer['values'])
+            if plot_info.get('smooth'):
+                values = list(self.smooth_data(values))
+                timestamps = timestamps[-len(values):] if values else []
+            series.append({
+                'name': name,
+                'label': plot_info.get('title'),
+                'color': plot_info.get('color'),
+                'axis': axes.get(name, 'L'),
+                'timestamps': timestamps,
+                'values': values,
+            })
+        return series
+
+    def export_chart_image(self, plot_widget, save_path, axes=None, **render_options):
         """
-        Export the given plot widget as an image saved to save_path.
+        Export the plotted data as an image saved to save_path.
         Returns True if export succeeded.
         
-        This method now uses pyqtgraph's ImageExporter to capture the complete plot,
-        including axis labels and all graphics items, to ensure a proper final report image.
+        The image is rendered offscreen from a snapshot of the data buffers at a
+        fixed resolution; plot_widget is left untouched and only kept for
+        compatibility with existing callers.
         """
         try:
-            from pyqtgraph.exporters import ImageExporter
-            # Process any pending GUI events to guarantee all rendering is complete
-            QtCore.QCoreApplication.processEvents()
-            
-            # Get the plot item
-            plot_item = plot_widget.getPlotItem()
-            
-            # Create a temporary scene to capture both axes
-            scene = QtWidgets.QGraphicsScene()
-            
-            # Add the main plot item to the scene
-            scene.addItem(plot_item)
-            
-            # If there's a right axis view box, add it to the scene
-            if hasattr(plot_widget, 'right_vb'):
-                scene.addItem(plot_widget.right_vb)
-            
-            # Create exporter with the scene
-            exporter = ImageExporter(scene)
-            
-            # Set exporter parameters
-            exporter.parameters()['width'] = plot_widget.width()
-            exporter.parameters()['height'] = plot_widget.height()
-            exporter.parameters()['antialias'] = True
-            
-            # Export the image
-            exporter.export(save_path)
+            render_chart_image(self.snapshot_chart_series(axes), save_path, **render_options)
             return True
         except Exception as e:
-            logging.getLogger(__name__).error(f"Error exporting chart image: {e}")
+            logger.error(f"Error exporting chart image: {e}")
             return False
+
+    def export_chart_image_async(self, save_paths, axes=None, on_finished=None, parent=None, **render_options):
+        """
+        Export the plotted data as images on a worker thread.
         
+        Args:
+            save_paths: Output path or list of paths that receive the same image
+            axes: Optional dict of parameter name -> 'L' or 'R'
+            on_finished: Optional slot receiving (success, path_or_error)
+            parent: Optional QObject parent for the worker
+            render_options: Extra keyword arguments for render_chart_image
+            
+        Returns:
+            ChartExportWorker: The started worker (keep a reference until it finishes)
+        """
+        if isinstance(save_paths, str):
+            save_paths = [save_paths]
+        worker = ChartExportWorker(self.snapshot_chart_series(axes), save_paths, render_options, parent)
+        if on_finished is not None:
+            worker.exportFinished.connect(on_finished)
+        worker.finished.connect(worker.deleteLater)
+        worker.start()
+        return worker
+        
+    def snapshot_buffers(self):
+        """
+        Return a shallow copy of all data buffers.
+
+        The copy can be handed to another thread while acquisition keeps
+        appending to (and trimming) the live buffers.
+        """
+        return {
+            name: {'timestamps': list(buffer['timestamps']), 'values': list(buffer['values'])}
+            for name, buffer in self.data_buffers.items()
+        }
+
     def export_data(self, file_path: str):
         """
         Export collected data to a CSV file.
         
+        Rows are produced by a streaming merge of the per-parameter buffers,
+        so export time grows linearly with the number of samples.
+        
         Args:
             file_path: Path to save the CSV file
         """
-        import csv
-        
-        # Prepare all timestamps in a unified list
-        all_timestamps = set()
-        for param_data in self.data_buffers.values():
-            all_timestamps.update(param_data['timestamps'])
-        all_timestamps = sorted(all_timestamps)
-        
-        # Prepare the CSV header
-        header = ['timestamp'] + list(self.data_buffers.keys())
+        write_merged_csv(self.snapshot_buffers(), file_path)
+        return True
+
+    def export_data_async(self, file_path: str, on_finished=None, parent=None):
+        """
+        Export collected data to a CSV file on a worker thread.
         
-        with open(file_path, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(header)
+        Args:
+            file_path: Path to save the CSV file
+            on_finished: Optional slot receiving (success, path_or_error, rows_written)
+            parent: Optional QObject parent for the worker
             
-            # Write each row of data
-            for timestamp in all_timestamps:
-                row = [timestamp]
-                for param_name in self.data_buffers.keys():
-                    param_data = self.data_buffers[param_name]
-                    try:
-                        idx = param_data['timestamps'].index(timestamp)
-                        value = param_data['values'][idx]
-                    except ValueError:
-                        value = ''  # No data for this timestamp
-                    row.append(value)
-                writer.writerow(row)
-                
-        return True
+        Returns:
+            DataExportWorker: The started worker (keep a reference until it finishes)
+        """
+        worker = DataExportWorker(self.snapshot_buffers(), file_path, parent)
+        if on_finished is not None:
+            worker.exportFinished.connect(on_finished)
+        worker.finished.connect(worker.deleteLater)
+        worker.start()
+        return worker
@@ -1,58 +1,19 @@
 import os
+import re
 import logging
 from datetime import datetime, timedelta
 from PyQt5 import QtWidgets, QtCore
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend for headless operation
 # Suppress matplotlib font manager debug logs
 logging.getLogger('matplotlib.font_manager').setLevel(logging.WARNING)
 # Suppress PyQt5 UI parser debug logs
 logging.getLogger('PyQt5.uic').setLevel(logging.WARNING)
-import matplotlib.pyplot as plt
 import numpy as np
-from RaspPiReader.ui.visualization_dashboard import VisualizationDashboard
-from RaspPiReader.libs.visualization import LiveDataVisualization
 from RaspPiReader.libs.database import Database
 from RaspPiReader.libs.models import PlotData, ChannelConfigSettings, DefaultProgram
+from RaspPiReader.libs import artifact_store
+from RaspPiReader.libs.channel_config import convert_value, latest_value
 from RaspPiReader.libs.plc_communication import modbus_comm
-
-# Configuration pool for application settings
-class ConfigPool:
-    """Configuration pool to manage application settings."""
-    
-    def __init__(self):
-        self.settings = {}
-        # Initialize with default settings if needed
-        
-    def config(self, key, value_type=None, default_val=None):
-        """
-        Get a configuration value by key.
-        
-        Args:
-            key (str): The configuration key to look up
-            value_type (type, optional): Type to convert the value to
-            default_val: Default value if the key doesn't exist
-            
-        Returns:
-            The configuration value or default_val if not found
-        """
-        if key not in self.settings:
-            return default_val
-            
-        value = self.settings[key]
-        if value_type is not None:
-            try:
-                return value_type(value)
-            except (ValueError, TypeError):
-                return default_val
-        return value
-        
-    def set_config(self, key, value):
-        """Set a configuration value."""
-        self.settings[key] = value
-
-# Create a singleton instance
-pool = ConfigPool()
+from RaspPiReader import pool
 
 # Define a custom logging filter for PLC raw data logs
 class PLCDataFilter(logging.Filter):
@@ -67,9 +28,24 @@ class PLCDataFilter(logging.Filter):
         return True
 
 logger = logging.getLogger(__name__)
+_CHANNEL_KEY_RE = re.compile(r'^channel_(\d+)_(\w+)$')
 # Add the filter to suppress raw PLC value debug messages
 logger.addFilter(PLCDataFilter())
 
+
+def _pyplot():
+    """
+    matplotlib.pyplot on the non-interactive Agg backend, imported on first use.
+
+    pyplot takes longer to import than the rest of the main window together,
+    and is only needed when a cycle's plot image is generated.
+    """
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-interactive backend for headless operation
+    import matplotlib.pyplot as plt
+    return plt
+
+
 def safe_int(val, default=0):
     """
     Safely converts a value to an integer.
@@ -143,6 +119,8 @@ class VisualizationManager:
         self.cycle_id = None
         self.channel_configs = {}
         self.last_loaded_configs = {}  # Store last loaded configurations to avoid duplicate logging
+        # Channel settings saved elsewhere reach the cache as a diff instead of a full reload
+        self._settings_subscription = pool.subscribe(self._on_channel_settings_changed, prefixes=('channel_',))
         self.last_values = {}  # Cache for the last value of each channel
         self.last_update_time = {}  # Timestamps of the last update per channel
         self.current_plot_path = None  # Track the current cycle's plot path
@@ -171,13 +149,6 @@ class VisualizationManager:
         self.cycle_start_time = None
         self.core_high_temp_time = None  # Add this to track total time above threshold
         
-        # Test mode settings
-        self.is_test_mode = True  # Enable test mode for simulator data
-        self.test_scaling = {
-            12: {'min': 0, 'max': 100, 'decimal': 1},  # Core temperature (Channel 12)
-            13: {'min': 0, 'max': 100, 'decimal': 1}   # Pressure (Channel 13)
-        }
-        
         # Cycle outcomes data for sharing
         self.cycle_outcomes_data = {
             'program_number': None,
@@ -201,6 +172,7 @@ class VisualizationManager:
             
             # Load channel settings from database
             channels = self.db.session.query(ChannelConfigSettings).all()
+            pool_values = {}
             for channel in channels:
                 channel_id = channel.id
                 config = {
@@ -220,18 +192,18 @@ class VisualizationManager:
                     'max_scale_range': channel.max_scale_range
                 }
                 
-                # Update pool configuration
-                for key, value in config.items():
-                    pool.set_config(f'channel_{channel_id}_{key}', value)
-                
                 # Store in local cache
                 self.channel_configs[channel_id] = config
+                pool_values.update({f'channel_{channel_id}_{key}': value for key, value in config.items()})
                 
                 # Log only if configuration has changed
                 if channel_id not in self.last_loaded_configs or self.last_loaded_configs[channel_id] != config:
                     logger.info(f"Loaded configuration for CH{channel_id}: {config}")
                     self.last_loaded_configs[channel_id] = config
             
+            # Publish the channel settings as one change; they are session values mirroring the database
+            pool.update(pool_values, persist=False)
+            
             # Update visualization if dashboard exists
             if self.dashboard:
                 self.dashboard.load_channel_config()
@@ -242,70 +214,67 @@ class VisualizationManager:
         except Exception as e:
             logger.error(f"Error loading channel configurations: {e}")
             return False
+
+    def _on_channel_settings_changed(self, changes, version):
+        """Apply changed channel_<n>_<field> settings to the cached channel configurations"""
+        updated = set()
+        for key, (old, new) in changes.items():
+            match = _CHANNEL_KEY_RE.match(key)
+            if not match:
+                continue
+            channel_id, field = int(match.group(1)), match.group(2)
+            config = self.channel_configs.get(channel_id)
+            if config is None or field not in config or config[field] == new:
+                continue
+            config[field] = new
+            updated.add(channel_id)
+        if not updated:
+            return
+        logger.info(f"Channel settings of CH{', CH'.join(str(ch) for ch in sorted(updated))} changed "
+                    f"(settings version {version})")
+        if self.dashboard:
+            self.dashboard.load_channel_config()
+            self.dashboard.apply_channel_colors()
+            self.dashboard.configure_plot_axes()
     
-    def scale_value(self, value, min_scale, max_scale, limit_low, limit_high):
+    def _read_channel_value(self, channel_number, channel_config):
         """
-        Scales the raw value read from PLC to a new range based on provided limits.
-        
+        Current value of a channel.
+
+        Numeric channels come from the read loop's latest converted scan
+        while it is recent; otherwise the register is read here and put
+        through the same conversion.
+
         Args:
-            value: The raw integer value.
-            min_scale: The minimum value of the source scale.
-            max_scale: The maximum value of the source scale.
-            limit_low: The lower limit of the target scale.
-            limit_high: The upper limit of the target scale.
-        
+            channel_number: Channel number, 1 based
+            channel_config: The channel's settings from load_channel_configs()
+
         Returns:
-            Scaled value as a float.
+            The reading (coil state for LA channels), None if nothing could be read
         """
-        value = safe_float(value, 0.0)
-        limit_low = safe_float(limit_low, 0.0)
-        limit_high = safe_float(limit_high, 0.0)
-        raw_min = 0.0
-        raw_max = 32767.0
-        # Only scale if the range is non-zero
-        if (limit_high - limit_low) != 0:
-            try:
-                scaled = limit_low + (value - raw_min) * (limit_high - limit_low) / (raw_max - raw_min)
-                return scaled
-            except Exception as e:
-                logger.error(f"Error scaling value: {e}")
-                return value
-        else:
-            # If limits are not set (or equal), skip scaling
-            logger.debug("Scaling skipped because limit_high equals limit_low")
+        address = safe_int(channel_config['address'])  # Use address directly, no -1
+        if channel_config.get('label', '').upper().startswith("LA"):
+            from RaspPiReader.libs.plc_communication import read_coil
+            value = read_coil(address, 1)
+            if isinstance(value, list):
+                value = value[0] if value else None
+            return value
+        value = latest_value(channel_number)
+        if value is not None:
             return value
-           
-    def read_channel_data(self, channel_config):
+        from RaspPiReader.libs.plc_communication import read_holding_register
+        value = read_holding_register(address, 1)
+        if isinstance(value, list):
+            value = value[0] if value else None
+        return convert_value(channel_number, value)
+
+    def read_channel_data(self, channel_config, channel_number):
         """
         Read channel data using dictionary access for configuration.
         Uses the same reading functions as in collect_data so that real PLC values are retrieved.
         """
         try:
-            address = safe_int(channel_config['address'])  # Use address directly, no -1
-            if channel_config.get('label', '').upper().startswith("LA"):
-                from RaspPiReader.libs.plc_communication import read_coil
-                value = read_coil(address, 1)
-            else:
-                from RaspPiReader.libs.plc_communication import read_holding_register
-                value = read_holding_register(address, 1)
-            
-            if value is not None:
-                if isinstance(value, list) and len(value) > 0:
-                    value = value[0]
-                # Convert to signed 16-bit if not a coil
-                if not channel_config.get('label', '').upper().startswith("LA"):
-                    from RaspPiReader.ui.main_form_handler import to_signed_16bit
-                    value = to_signed_16bit(value)
-                if channel_config.get('scale'):
-                    value = self.scale_value(
-                        value, 
-                        channel_config['min_scale_range'], 
-                        channel_config['max_scale_range'],
-                        channel_config['limit_low'],
-                        channel_config['limit_high']
-                    )
-                return value
-            return None
+            return self._read_channel_value(channel_number, channel_config)
         except Exception as e:
             logger.error(f"Error reading {channel_config['label']}: {str(e)}")
             return None
@@ -318,6 +287,7 @@ class VisualizationManager:
             parent_window: The main window that will host the dashboard
         """
         if self.dashboard is None:
+            from RaspPiReader.ui.visualization_dashboard import VisualizationDashboard
             self.dashboard = VisualizationDashboard()
             self.dock_widget = QtWidgets.QDockWidget("Live PLC Data Visualization", parent_window)
             self.dock_widget.setWidget(self.dashboard)
@@ -422,7 +392,6 @@ class VisualizationManager:
                 # Ensure we have a consistent file location for reports to reference
                 for target_path in [
                     os.path.join("RaspPiReader", "reports", "plot_export.png"),  # Legacy path
-                    os.path.join("RaspPiReader", "reports", f"plot_export_{self.cycle_id}.png"),  # Cycle-specific path
                 ]:
                     if os.path.exists(unique_export_path):
                         import shutil
@@ -443,8 +412,20 @@ class VisualizationManager:
             except Exception as copy_error:
                 logger.error(f"Error copying plot to report location: {copy_error}")
             
+            # Keep the cycle's plot in the artifact store, where identical images are stored once
+            if os.path.exists(unique_export_path):
+                try:
+                    # cycle_id is the CycleData id, or the unknown_<timestamp> fallback
+                    cycle_db_id = self.cycle_id if isinstance(self.cycle_id, int) else None
+                    self.current_plot_path = artifact_store.get_instance().store(
+                        unique_export_path, 'plot', cycle_id=cycle_db_id,
+                        cycle_number=self._cycle_label(cycle_db_id), move=True)
+                    unique_filename = os.path.relpath(self.current_plot_path, reports_dir).replace(os.sep, '/')
+                except Exception as store_error:
+                    logger.error(f"Error storing plot in the artifact store: {store_error}")
+            
             # Log the final plot path for debugging
-            logger.info(f"Plot for cycle {self.cycle_id} exported to: {unique_export_path}")
+            logger.info(f"Plot for cycle {self.cycle_id} exported to: {self.current_plot_path}")
             
             # Update plot references in the database for this cycle
             self.update_plot_reference_in_database(unique_filename)
@@ -490,6 +471,19 @@ class VisualizationManager:
             logger.error(f"Error exporting chart from dashboard: {e}")
             return False
     
+    def _cycle_label(self, cycle_db_id):
+        """The cycle number (CycleData.cycle_id) of a cycle, None if it is unknown"""
+        if cycle_db_id is None:
+            return None
+        try:
+            from RaspPiReader.libs.models import CycleData
+            row = self.db.session.query(CycleData.cycle_id).filter_by(id=cycle_db_id).first()
+            return row[0] if row and row[0] else None
+        except Exception as e:
+            logger.error(f"Error looking up the number of cycle {cycle_db_id}: {e}")
+            self.db.session.rollback()
+            return None
+
     def update_plot_reference_in_database(self, plot_filename):
         """Update database records to reference the proper plot file for this cycle."""
         try:
@@ -573,6 +567,7 @@ class VisualizationManager:
                 channels_data[channel].append((point.timestamp, value))
             
             # Create the plot with two y-axes
+            plt = _pyplot()
             fig, ax1 = plt.subplots(figsize=(14, 10))
             ax2 = ax1.twinx()  # Create a second y-axis
             
@@ -755,6 +750,7 @@ class VisualizationManager:
         """Generate a simple fallback plot when all else fails."""
         try:
             # Create a simple plot that looks somewhat realistic
+            plt = _pyplot()
             plt.figure(figsize=(10, 6))
             
             # Generate x-axis (time)
@@ -849,7 +845,6 @@ class VisualizationManager:
         if not self.is_active or self.dashboard is None:
             return
         try:
-            from RaspPiReader.libs.plc_communication import read_holding_register, read_coil
             current_time = QtCore.QTime.currentTime().msecsSinceStartOfDay() / 1000.0  # current time in seconds
             throttle_interval = 2.0  # seconds - update at most every 2 seconds per channel
             
@@ -859,29 +854,11 @@ class VisualizationManager:
                     if channel_config and channel_config.get('address', 0):
                         # Read PLC data based on channel configuration
                         address = safe_int(channel_config['address'])
-                        if channel_config.get('label', '').upper().startswith("LA"):
-                            value = read_coil(address, 1)
-                        else:
-                            value = read_holding_register(address, 1)
+                        value = self._read_channel_value(channel_number, channel_config)
                         if value is not None:
-                            if isinstance(value, list) and len(value) > 0:
-                                value = value[0]
-                            # Convert to signed 16-bit if not a coil
-                            if not channel_config.get('label', '').upper().startswith("LA"):
-                                from RaspPiReader.ui.main_form_handler import to_signed_16bit
-                                value = to_signed_16bit(value)
-                            numeric_value = safe_int(value)
-                            
-                            # Apply test mode scaling for simulator data
-                            if self.is_test_mode and channel_number in self.test_scaling:
-                                scaling = self.test_scaling[channel_number]
-                                if channel_number == 12:  # Core temperature
-                                    # Scale 5132.0 to a reasonable temperature range
-                                    numeric_value = (numeric_value / 5132.0) * (scaling['max'] - scaling['min']) + scaling['min']
-                                elif channel_number == 13:  # Pressure
-                                    # Scale 5132.0 to a reasonable pressure range
-                                    numeric_value = (numeric_value / 5132.0) * (scaling['max'] - scaling['min']) + scaling['min']
-                            
+                            # Already converted by the channel settings (see _read_channel_value)
+                            numeric_value = safe_float(value)
+
                             # Track core temperature (Channel 12) above program setpoint
                             if channel_number == 12:  # Core temperature channel
                                 core_temp_threshold = self.program_settings.get('core_temp_setpoint')
@@ -1,5 +1,6 @@
 import logging
 from PyQt5 import QtWidgets
+from RaspPiReader.libs import alarm_rules
 from RaspPiReader.libs.database import Database
 from RaspPiReader.libs.models import Alarm, AlarmMapping
 from RaspPiReader.ui.alarm_settings_form import AlarmSettingsForm
@@ -72,6 +73,26 @@ class AlarmSettingsFormHandler(QtWidgets.QDialog):
         self.form.message_edit.setPlaceholderText("Enter alarm message")
         form_layout.addRow("Alarm Message:", self.form.message_edit)
         
+        # Hysteresis: how far back past the threshold the value must go to clear
+        self.form.hysteresis_spin = QtWidgets.QDoubleSpinBox()
+        self.form.hysteresis_spin.setRange(0, 999999)
+        self.form.hysteresis_spin.setDecimals(2)
+        form_layout.addRow("Hysteresis:", self.form.hysteresis_spin)
+        
+        # Delays before the alarm raises and clears
+        self.form.on_delay_spin = QtWidgets.QDoubleSpinBox()
+        self.form.on_delay_spin.setRange(0, 86400)
+        self.form.on_delay_spin.setSuffix(" s")
+        form_layout.addRow("On Delay:", self.form.on_delay_spin)
+        self.form.off_delay_spin = QtWidgets.QDoubleSpinBox()
+        self.form.off_delay_spin.setRange(0, 86400)
+        self.form.off_delay_spin.setSuffix(" s")
+        form_layout.addRow("Off Delay:", self.form.off_delay_spin)
+        
+        # Latching alarms stay up until acknowledged
+        self.form.latching_check = QtWidgets.QCheckBox("Stay up until acknowledged")
+        form_layout.addRow("Latching:", self.form.latching_check)
+        
         layout.addLayout(form_layout)
         
         # Add buttons
@@ -120,7 +141,17 @@ class AlarmSettingsFormHandler(QtWidgets.QDialog):
                         alarm_info = []
                         for mapping in mappings:
                             threshold_type = "Low" if mapping.value == 1 else "High"
-                            alarm_info.append(f"{threshold_type} Threshold ({mapping.threshold:.2f}): {mapping.message}")
+                            options = []
+                            if mapping.hysteresis:
+                                options.append(f"hysteresis {mapping.hysteresis:g}")
+                            if mapping.on_delay:
+                                options.append(f"on delay {mapping.on_delay:g}s")
+                            if mapping.off_delay:
+                                options.append(f"off delay {mapping.off_delay:g}s")
+                            if mapping.latching:
+                                options.append("latching")
+                            suffix = f" [{', '.join(options)}]" if options else ""
+                            alarm_info.append(f"{threshold_type} Threshold ({mapping.threshold:.2f}): {mapping.message}{suffix}")
                         
                         # Add to table with channel info
                         self.form.tableWidget.setItem(row, 0, QtWidgets.QTableWidgetItem(str(channel)))
@@ -172,10 +203,16 @@ class AlarmSettingsFormHandler(QtWidgets.QDialog):
                     value=1 if alarm_type == "Low Threshold" else 2,  # 1 for low, 2 for high
                     threshold=threshold,
                     message=message,
-                    active=True
+                    active=True,
+                    hysteresis=float(self.form.hysteresis_spin.value()),
+                    on_delay=float(self.form.on_delay_spin.value()),
+                    off_delay=float(self.form.off_delay_spin.value()),
+                    latching=self.form.latching_check.isChecked()
                 )
                 session.add(mapping)
                 session.commit()
+                # The monitor evaluates the compiled rules; recompile them
+                alarm_rules.reload(self.db)
                 
                 # Reload alarms
                 self.load_alarms()
@@ -221,6 +258,8 @@ class AlarmSettingsFormHandler(QtWidgets.QDialog):
                     )
                     session.add(mapping)
                     session.commit()
+                    # The monitor evaluates the compiled rules; recompile them
+                    alarm_rules.reload(self.db)
                     
                     # Reload alarms
                     self.load_alarms()
@@ -246,6 +285,8 @@ class AlarmSettingsFormHandler(QtWidgets.QDialog):
                     for mapping in mappings:
                         mapping.active = False
                     session.commit()
+                    # The monitor evaluates the compiled rules; recompile them
+                    alarm_rules.reload(self.db)
                     
                     # Reload alarms
                     self.load_alarms()
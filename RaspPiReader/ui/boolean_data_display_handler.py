@@ -1,6 +1,7 @@
 from PyQt5 import QtWidgets, QtCore
 from .boolean_data_display_custom import Ui_BooleanDataDisplay, update_boolean_indicator, BooleanIndicator
 from RaspPiReader.libs.plc_communication import read_boolean
+from RaspPiReader.libs import frame_scheduler
 import logging
 
 logger = logging.getLogger(__name__)
@@ -57,7 +58,7 @@ class BooleanDataDisplayHandler(QtWidgets.QWidget):
             indicator.setStyleSheet("")
 
         # Create timer but don't start it yet
-        self.timer = QtCore.QTimer(self)
+        self.timer = frame_scheduler.get_instance().timer("boolean_display", self)
         self.timer.timeout.connect(self.update_boolean_data)
         
         logger.info("BooleanDataDisplayHandler initialized - waiting for cycle start")
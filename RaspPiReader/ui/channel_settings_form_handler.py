@@ -1,6 +1,7 @@
 from PyQt5 import QtWidgets
 from RaspPiReader.libs.database import Database
 from RaspPiReader.libs.models import ChannelConfigSettings
+from RaspPiReader.libs import channel_config
 
 class ChannelSettingsFormHandler(QtWidgets.QDialog):
     def __init__(self, parent=None):
@@ -65,4 +66,5 @@ class ChannelSettingsFormHandler(QtWidgets.QDialog):
                 channel.axis_direction = self.table.item(row, 10).text()
                 channel.color = self.table.item(row, 11).text()
         session.commit()
+        channel_config.reload(self.db)
         QtWidgets.QMessageBox.information(self, "Saved", "Channel settings have been saved.")
\ No newline at end of file
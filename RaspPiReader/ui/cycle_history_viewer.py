@@ -0,0 +1,207 @@
+from PyQt5 import QtWidgets, QtCore
+import pyqtgraph as pg
+import logging
+
+from RaspPiReader.libs.database import Database
+from RaspPiReader.libs.models import CycleData, ChannelConfigSettings, PlotDataPyramid
+from RaspPiReader.libs.plot_pyramid import get_pyramid_extent, choose_level, load_pyramid_window
+
+logger = logging.getLogger(__name__)
+
+
+class CycleHistoryViewer(QtWidgets.QDialog):
+    """
+    Interactive viewer for finished cycles backed by the precomputed plot pyramid.
+    Only the pyramid level matching the current zoom is loaded, and only for the
+    visible time window, so panning and zooming a long cycle stays responsive.
+    """
+
+    # Delay between the last range change and the reload, in milliseconds
+    REDRAW_DELAY_MS = 40
+
+    def __init__(self, cycle_id=None, parent=None):
+        super(CycleHistoryViewer, self).__init__(parent)
+        self.setWindowTitle("Cycle History")
+        self.resize(1200, 700)
+        self.db = Database("sqlite:///local_database.db")
+        self.cycle_id = None
+        self.extent = None
+        self.channels_config = {}
+        self.curves = {}
+        # Cache of the last loaded window: (level, start, end, data)
+        self._window_cache = None
+        self._redraw_timer = QtCore.QTimer(self)
+        self._redraw_timer.setSingleShot(True)
+        self._redraw_timer.timeout.connect(self.refresh_view)
+        self.load_channel_config()
+        self.setup_ui()
+        self.populate_cycles()
+        if cycle_id is not None:
+            index = self.cycle_combo.findData(cycle_id)
+            if index >= 0:
+                self.cycle_combo.setCurrentIndex(index)
+
+    def load_channel_config(self):
+        """Load labels, colors and axis sides of the numeric channels"""
+        try:
+            for channel in self.db.session.query(ChannelConfigSettings).all():
+                self.channels_config[f"ch{channel.id}"] = {
+                    'label': channel.label or f"Channel {channel.id}",
+                    'color': channel.color or "#3498db",
+                    'axis_direction': (channel.axis_direction or 'L').strip().upper(),
+                }
+        except Exception as e:
+            logger.error(f"Error loading channel config for cycle history: {e}")
+
+    def setup_ui(self):
+        layout = QtWidgets.QVBoxLayout(self)
+
+        controls = QtWidgets.QHBoxLayout()
+        controls.addWidget(QtWidgets.QLabel("Cycle:"))
+        self.cycle_combo = QtWidgets.QComboBox()
+        self.cycle_combo.currentIndexChanged.connect(self.on_cycle_selected)
+        controls.addWidget(self.cycle_combo, 1)
+        self.btn_reset_zoom = QtWidgets.QPushButton("Reset Zoom")
+        self.btn_reset_zoom.clicked.connect(self.reset_zoom)
+        controls.addWidget(self.btn_reset_zoom)
+        layout.addLayout(controls)
+
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.setBackground('w')
+        self.plot_widget.showGrid(x=True, y=True, alpha=0.3)
+        self.plot_widget.addLegend()
+        self.plot_widget.setLabel('bottom', 'Time (s)')
+        self.plot_widget.setLabel('left', 'Left Axis Values')
+        self.plot_widget.showAxis('right')
+        self.plot_widget.setLabel('right', 'Right Axis Values')
+        self.plot_widget.setYRange(-150, 800, padding=0)
+        self.plot_widget.setMouseEnabled(x=True, y=False)
+        self.plot_widget.setClipToView(True)
+
+        # Second view box for channels configured on the right axis, as in the live dashboard
+        self.right_vb = pg.ViewBox()
+        self.plot_widget.scene().addItem(self.right_vb)
+        self.plot_widget.getAxis('right').linkToView(self.right_vb)
+        self.right_vb.setXLink(self.plot_widget)
+        self.right_vb.setYRange(0, 140, padding=0)
+
+        def update_views():
+            self.right_vb.setGeometry(self.plot_widget.getViewBox().sceneBoundingRect())
+            self.right_vb.linkedViewChanged(self.plot_widget.getViewBox(), self.right_vb.XAxis)
+
+        update_views()
+        self.plot_widget.getViewBox().sigResized.connect(update_views)
+        self.plot_widget.getViewBox().sigXRangeChanged.connect(self.schedule_refresh)
+        layout.addWidget(self.plot_widget)
+
+        self.status_label = QtWidgets.QLabel("")
+        layout.addWidget(self.status_label)
+
+    def populate_cycles(self):
+        """Fill the cycle selector with cycles that have a pyramid"""
+        self.cycle_combo.blockSignals(True)
+        self.cycle_combo.clear()
+        try:
+            cycle_ids = self.db.session.query(PlotDataPyramid.cycle_id).distinct()
+            cycles = self.db.session.query(CycleData)\
+                .filter(CycleData.id.in_(cycle_ids))\
+                .order_by(CycleData.id.desc())\
+                .all()
+            for cycle in cycles:
+                started = cycle.start_time.strftime("%Y-%m-%d %H:%M") if cycle.start_time else "N/A"
+                self.cycle_combo.addItem(f"{cycle.cycle_id or cycle.id} - {cycle.order_id} ({started})", cycle.id)
+        except Exception as e:
+            logger.error(f"Error listing cycles for history viewer: {e}")
+        self.cycle_combo.blockSignals(False)
+        if self.cycle_combo.count():
+            self.on_cycle_selected(self.cycle_combo.currentIndex())
+        else:
+            self.status_label.setText("No finalized cycles with stored plot data")
+
+    def on_cycle_selected(self, index):
+        cycle_id = self.cycle_combo.itemData(index)
+        if cycle_id is None:
+            return
+        self.cycle_id = cycle_id
+        self._window_cache = None
+        self.extent = get_pyramid_extent(self.db, cycle_id)
+        self.create_curves()
+        self.reset_zoom()
+
+    def create_curves(self):
+        """Create one mean curve and one min/max envelope per channel of the selected cycle"""
+        for items in self.curves.values():
+            for item in items.values():
+                if item.getViewBox() is self.right_vb:
+                    self.right_vb.removeItem(item)
+                else:
+                    self.plot_widget.removeItem(item)
+        self.curves = {}
+        if not self.extent:
+            return
+        for channel in sorted(self.extent[3], key=lambda name: int(name[2:]) if name[2:].isdigit() else 0):
+            config = self.channels_config.get(channel, {})
+            color = config.get('color', "#3498db")
+            mean_curve = pg.PlotDataItem([], [], pen=pg.mkPen(color=color, width=2),
+                                         name=config.get('label', channel))
+            min_curve = pg.PlotDataItem([], [], pen=pg.mkPen(color=color, width=0))
+            max_curve = pg.PlotDataItem([], [], pen=pg.mkPen(color=color, width=0))
+            envelope = pg.FillBetweenItem(min_curve, max_curve, brush=pg.mkBrush(pg.mkColor(color).lighter(170)))
+            items = {'envelope': envelope, 'min': min_curve, 'max': max_curve, 'mean': mean_curve}
+            if config.get('axis_direction', 'L') == 'R':
+                for item in items.values():
+                    self.right_vb.addItem(item)
+            else:
+                for item in items.values():
+                    self.plot_widget.addItem(item)
+            self.curves[channel] = items
+
+    def reset_zoom(self):
+        if not self.extent:
+            return
+        self.plot_widget.setXRange(0, self.extent[1] - self.extent[0], padding=0)
+        self.schedule_refresh()
+
+    def schedule_refresh(self, *args):
+        """Coalesce bursts of range changes into a single reload"""
+        self._redraw_timer.start(self.REDRAW_DELAY_MS)
+
+    def refresh_view(self):
+        """Load the pyramid level matching the visible range and pixel width, then redraw"""
+        if not self.extent or not self.curves:
+            return
+        timer = QtCore.QElapsedTimer()
+        timer.start()
+        origin = self.extent[0]
+        x_min, x_max = self.plot_widget.getViewBox().viewRange()[0]
+        start = origin + max(x_min, 0.0)
+        end = origin + min(x_max, self.extent[1] - origin)
+        span = max(end - start, 1.0)
+        width_px = max(int(self.plot_widget.getViewBox().width()), 100)
+        level = choose_level(span, width_px, self.extent[2])
+
+        cache = self._window_cache
+        if cache and cache[0] == level and cache[1] <= start and cache[2] >= end:
+            data = cache[3]
+        else:
+            # Load one extra span on each side so short pans are served from memory
+            load_start = start - span
+            load_end = end + span
+            data = load_pyramid_window(self.db, self.cycle_id, level, load_start, load_end,
+                                       channels=list(self.curves.keys()))
+            self._window_cache = (level, load_start, load_end, data)
+
+        for channel, items in self.curves.items():
+            series = data.get(channel)
+            if series is None:
+                for key in ('min', 'max', 'mean'):
+                    items[key].setData([], [])
+                continue
+            x = series['start'] - origin
+            items['min'].setData(x, series['min'])
+            items['max'].setData(x, series['max'])
+            items['mean'].setData(x, series['mean'])
+        self.status_label.setText(
+            f"Level {level} - {len(next(iter(data.values()))['start']) if data else 0} buckets per channel "
+            f"- redraw {timer.elapsed()} ms"
+        )
@@ -1,12 +1,10 @@
 import os
 import csv
-import pdfkit
 from datetime import datetime
 import logging
 from colorama import Fore
 import webbrowser
 import tempfile
-import jinja2
 from pathlib import Path
 from PyQt5 import QtWidgets, uic, QtCore
 from PyQt5.QtCore import QTimer, pyqtSignal, QSettings, Qt
@@ -18,6 +16,8 @@ from .setting_form_handler import SettingFormHandler, CHANNEL_COUNT
 from .user_management_form_handler import UserManagementFormHandler
 from RaspPiReader.ui.one_drive_settings_form_handler import OneDriveSettingsFormHandler
 from RaspPiReader.libs.onedrive_api import OneDriveAPI
+from RaspPiReader.libs import upload_queue
+from RaspPiReader.libs import channel_config
 from .plc_comm_settings_form_handler import PLCCommSettingsFormHandler
 from RaspPiReader.ui.database_settings_form_handler import DatabaseSettingsFormHandler
 from PyQt5 import sip
@@ -49,6 +49,11 @@ from .boolean_data_display_handler import BooleanDataDisplayHandler
 from PyQt5.QtWidgets import QVBoxLayout, QGroupBox
 from RaspPiReader.libs.models import CycleSerialNumber
 from RaspPiReader.libs.alarm_monitor import AlarmMonitor
+from RaspPiReader.libs import frame_scheduler
+from RaspPiReader.libs import finalization_jobs
+from RaspPiReader.libs import pdf_renderer
+from RaspPiReader.libs import report_templates
+from RaspPiReader.libs.csv_writer import CycleCsvWriter
 
 logger = logging.getLogger(__name__)
 
@@ -74,6 +79,8 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
         self.db = Database("sqlite:///local_database.db")
         self.settings = QSettings('RaspPiHandler', 'RaspPiModbusReader')
         self.immediate_panel_update_locked = False
+        # All periodic UI work runs on the shared frame scheduler instead of separate QTimers
+        self.frame_scheduler = frame_scheduler.get_instance()
 
         # Immediately assign cycle timer labels via findChild.
         self.run_duration = self.findChild(QtWidgets.QLabel, "run_duration")
@@ -103,7 +110,7 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
         self.username = self.user_record.username if self.user_record else ''
 
         # Initialize the cycle timer but don't start it yet
-        self.cycle_timer = QTimer()
+        self.cycle_timer = self.frame_scheduler.timer("cycle", self)
         self.cycle_timer.timeout.connect(self.cycle_timer_update)
         self.cycle_timer_active = False
 
@@ -126,14 +133,14 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
         self.integrate_new_cycle_widget()
 
         # Start timers.
-        self.status_timer = QTimer(self)
+        self.status_timer = self.frame_scheduler.timer("status", self)
         self.status_timer.start(5000)
         self.add_default_program_menu()
         self.add_alarm_settings_menu()
-        self.connectionTimer = QTimer(self)
+        self.connectionTimer = self.frame_scheduler.timer("connection", self)
         self.connectionTimer.timeout.connect(self.update_connection_status_display)
         self.connectionTimer.start(5000)
-        self.live_update_timer = QTimer(self)
+        self.live_update_timer = self.frame_scheduler.timer("live_update", self)
         self.live_update_timer.timeout.connect(self.update_live_data)
         
         # Initialize the alarm monitor
@@ -143,12 +150,23 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
         self.init_alarm_label()
         
         # Start the alarm timer to update the alarm status.
-        self.alarmTimer = QTimer(self)
+        self.alarmTimer = self.frame_scheduler.timer("alarm", self)
         self.alarmTimer.timeout.connect(self.update_alarm_status)
         self.alarmTimer.start(1000)  # Check every second
         
         # UI visualization
         self.init_visualization()
+
+        # Pick up report generation jobs interrupted by a restart
+        try:
+            finalization_jobs.get_instance().resume_unfinished()
+        except Exception as e:
+            logger.error(f"Error resuming finalization jobs: {e}")
+
+        # Show the event loop load measured by the frame scheduler
+        self.ui_load_label = QLabel("UI load: --", self)
+        self.statusBar().addPermanentWidget(self.ui_load_label)
+        self.frame_scheduler.loadMeasured.connect(self.update_ui_load_display)
     
         # Create Boolean Data Display widget but don't start reading data yet
         self.boolean_data_display = BooleanDataDisplayHandler(self)
@@ -177,6 +195,12 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
         # Now initialize UI panels (which uses channel_info_widgets)
         self.initialize_ui_panels()
 
+    def update_ui_load_display(self, load, lag_ms):
+        """Show the share of time spent in UI frames and the average frame lag"""
+        self.ui_load_label.setText(
+            f"UI load: {load * 100:.0f}% | lag {lag_ms:.0f} ms | {self.frame_scheduler.rate_hz:.0f} Hz"
+        )
+
     def start_cycle_timer(self, start_time):
         """
         Start the cycle timer which updates the cycle duration display and logs cycle time.
@@ -392,6 +416,11 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
         reset_action = QtWidgets.QAction("Reset Visualization", self)
         reset_action.triggered.connect(self.reset_visualization)
         viz_menu.addAction(reset_action)
+
+        # Add cycle history browser
+        history_action = QtWidgets.QAction("Browse Cycle History", self)
+        history_action.triggered.connect(self.show_cycle_history)
+        viz_menu.addAction(history_action)
         
         logger.info("Visualization menu added")
 
@@ -403,6 +432,12 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
         """Reset visualization dashboard"""
         self.viz_manager.reset_visualization()
 
+    def show_cycle_history(self):
+        """Open the zoomable viewer for finished cycles"""
+        from RaspPiReader.ui.cycle_history_viewer import CycleHistoryViewer
+        self.cycle_history_viewer = CycleHistoryViewer(parent=self)
+        self.cycle_history_viewer.show()
+
     def start_live_data(self):
         logger.debug("update_live_data: Fetching and updating live PLC data.")
         """Start reading live data every 2 seconds."""
@@ -421,7 +456,7 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
         Update UI elements based on the new_data dictionary and live PLC channel readings.
         Ensures all channels (CH1–CH14) are displayed in order, with correct values and labels.
         CH12 and CH13 always use addresses 130 and 140.
-        Converts unsigned 16-bit values to signed for display.
+        Values are converted by channel_config like the read loop's.
         """
         logger.info(f"MainForm received update: {new_data}")
         try:
@@ -442,13 +477,16 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
                     addr_key = f'channel_{ch}_address'
                     channel_addr = int(pool.config(addr_key, int, 0))
 
-                # Read from PLC
-                channel_value = read_holding_register(channel_addr, 1)
-                logger.info(f"CH{ch}: Read from PLC address {channel_addr}, value={channel_value}")
-                # Convert to signed 16-bit
-                signed_value = to_signed_16bit(channel_value)
+                # The read loop's latest scan, or read from the PLC and convert the same way
+                channel_value = channel_config.latest_value(ch)
+                if channel_value is None:
+                    channel_value = read_holding_register(channel_addr, 1)
+                    logger.info(f"CH{ch}: Read from PLC address {channel_addr}, value={channel_value}")
+                    if isinstance(channel_value, list):
+                        channel_value = channel_value[0] if channel_value else None
+                    channel_value = channel_config.convert_value(ch, channel_value)
                 try:
-                    float_value = float(signed_value if signed_value is not None else 0)
+                    float_value = float(channel_value if channel_value is not None else 0)
                     channel_values[f"CH{ch}"] = float_value
                     # Update data stack (index ch, so CH1=1, CH14=14)
                     while len(self.data_stack) <= ch:
@@ -519,7 +557,7 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
         if hasattr(self, 'viz_manager') and self.viz_manager.dashboard is not None:
             # Option 1: Reset data buffers and update plots
             self.viz_manager.dashboard.visualization.reset_data()
-            self.viz_manager.dashboard.update_plots()
+            self.frame_scheduler.post('plot_redraw', self.viz_manager.dashboard.update_plots)
             # Option 2: Alternatively, if a dedicated refresh method exists:
             # self.viz_manager.dashboard.refresh_configuration()
 
@@ -930,7 +968,7 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
                 if hasattr(self.viz_manager, 'dashboard') and self.viz_manager.dashboard is not None:
                     self.viz_manager.dashboard.stop_visualization()
                     self.viz_manager.dashboard.visualization.reset_data()
-                    self.viz_manager.dashboard.update_plots()
+                    self.frame_scheduler.post('plot_redraw', self.viz_manager.dashboard.update_plots)
                     self.viz_manager.dashboard.reset()  # <-- Fully reset dashboard (timer, plots, values)
             
             # Stop alarm monitoring if available
@@ -981,7 +1019,7 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
             # Double check to ensure plots are reset
             if hasattr(self.viz_manager, 'dashboard') and self.viz_manager.dashboard is not None:
                 self.viz_manager.dashboard.visualization.reset_data()
-                self.viz_manager.dashboard.update_plots()
+                self.frame_scheduler.post('plot_redraw', self.viz_manager.dashboard.update_plots)
         logger.info("Cycle and visualization stopped")
 
     def _print_result(self):
@@ -1033,13 +1071,9 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
     def update_data(self):
         # Update CSV file
         self.update_csv_file()
-        
-        # Update UI elements in a way that maintains responsiveness
-        def update_ui():
-            self.update_immediate_values_panel()
-        
-        # Use a short timer instead of processEvents()
-        QTimer.singleShot(10, update_ui)
+
+        # Redraw the values panel in the next UI frame; updates arriving before it are drawn once
+        self.frame_scheduler.post('immediate_values', self.update_immediate_values_panel)
 
     def update_immediate_test_values_panel(self):
         for i in self.active_channels:
@@ -1170,7 +1204,7 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
             logger.error(f"update_live_data: {e}")
 
     def create_csv_file(self):
-        self.csv_update_locked = False
+        self.close_csv_file()
         self.last_written_index = 0
         file_extension = '.csv'
         # Use new_cycle_handler properties if available; otherwise use fallback path.
@@ -1183,68 +1217,77 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
             if not os.path.exists(reports_dir):
                 os.makedirs(reports_dir)
             self.csv_path = os.path.join(reports_dir, "cycle_report.csv")
-        delimiter = pool.config('csv_delimiter') or ' '
-        csv.register_dialect('unixpwd', delimiter=delimiter)
-        self.open_csv_file(mode='w')
-        self.write_cycle_info_to_csv()
-
-    def open_csv_file(self, mode='a'):
-        self.csv_file = open(self.csv_path, mode, newline='')
-        self.csv_writer = csv.writer(self.csv_file)
-
-    def close_csv_file(self):
-        if hasattr(self, 'csv_file') and self.csv_file:
-            self.csv_file.close()
-    def write_cycle_info_to_csv(self):
+        self.csv_writer = CycleCsvWriter(self.csv_path, header_rows=self.cycle_info_rows())
+
+    def close_csv_file(self, wait=False):
+        """Flush and close the cycle CSV; the final write happens on the writer thread."""
+        writer = getattr(self, 'csv_writer', None)
+        if writer is not None:
+            writer.close(wait=wait)
+            self.csv_writer = None
+
+    def cycle_info_rows(self):
+        """Rows written at the top of every cycle CSV file"""
         if self.new_cycle_handler and hasattr(self.new_cycle_handler, "cycle_start_time"):
             start_time_str = self.new_cycle_handler.cycle_start_time.strftime("%Y-%m-%d %H:%M:%S")
         else:
             start_time_str = "N/A"
-        data = [
+        if not hasattr(self, 'headers') or not self.headers:
+            self.headers = ['Date', 'Time', 'Timer(min)', 'CycleID', 'OrderID', 'Quantity', 'CycleLocation']
+        return [
             ["Work Order", pool.config("order_id")],
             ["Cycle Number", pool.config("cycle_id")],
             ["Quantity", pool.config("quantity")],
-            ["Process Start Time", start_time_str]
+            ["Process Start Time", start_time_str],
+            ['Date', 'Time', 'Timer(min)'] + self.headers[3:],
         ]
-        self.csv_writer.writerows(data)
-        if not hasattr(self, 'headers') or not self.headers:
-            self.headers = ['Date', 'Time', 'Timer(min)', 'CycleID', 'OrderID', 'Quantity', 'CycleLocation']
-        self.csv_writer.writerows([['Date', 'Time', 'Timer(min)'] + self.headers[3:]])
+
+    def csv_rows(self, start, stop):
+        """Build CSV rows for data_stack samples [start, stop)"""
+        rows = []
+        for i in range(start, stop):
+            row = [
+                self.data_stack[15][i].strftime("%Y/%m/%d"),
+                self.data_stack[15][i].strftime("%H:%M:%S"),
+                self.data_stack[0][i],
+            ]
+            for j in range(CHANNEL_COUNT):
+                row.append(self.data_stack[j + 1][i])
+            rows.append(row)
+        return rows
 
     def update_csv_file(self, csv_file_path=None):
-        if csv_file_path is None:
-            # Use reports folder for all CSV files
-            reports_dir = os.path.join(os.getcwd(), "reports")
-            if not os.path.exists(reports_dir):
-                os.makedirs(reports_dir)
-            csv_file_path = pool.config('csv_file_path', str, os.path.join(reports_dir, "cycle_report.csv"))
-        if self.csv_update_locked:
-            return
-        self.csv_update_locked = True
+        """
+        Queue the samples recorded since the last call for the cycle CSV.
 
-        n_data = len(self.data_stack[0])
-        temp_data = []
-        for i in range(self.last_written_index, n_data):
-            temp_rec = []
-            temp_rec.append(self.data_stack[15][i].strftime("%Y/%m/%d"))
-            temp_rec.append(self.data_stack[15][i].strftime("%H:%M:%S"))
-            temp_rec.append(self.data_stack[0][i])
-            for j in range(CHANNEL_COUNT):
-                temp_rec.append(self.data_stack[j + 1][i])
-            temp_data.append(temp_rec)
-        
-        try:
-            with open(csv_file_path, 'w', newline='') as csv_file:
-                import csv
-                csv_writer = csv.writer(csv_file)
-                csv_writer.writerows(temp_data)
-        except Exception as e:
-            self.csv_update_locked = False
-            raise e
+        The rows are appended by the CycleCsvWriter thread, so this never waits
+        on the disk. With csv_file_path pointing elsewhere than the open cycle
+        file, every sample is written to that file and the call returns once
+        it is complete.
 
+        Returns:
+            str: Path of the CSV file
+        """
+        n_data = len(self.data_stack[0])
+        writer = getattr(self, 'csv_writer', None)
+        if csv_file_path is not None and (writer is None or os.path.abspath(csv_file_path) != os.path.abspath(writer.path)):
+            export = CycleCsvWriter(csv_file_path, header_rows=self.cycle_info_rows())
+            export.write_rows(self.csv_rows(0, n_data))
+            export.close()
+            return csv_file_path
+
+        if writer is None:
+            # No cycle file was opened; append to the default report file
+            if not self.csv_path:
+                reports_dir = pool.config('csv_file_path', str, os.path.join(os.getcwd(), "reports"))
+                self.csv_path = os.path.join(reports_dir, "cycle_report.csv")
+            writer = self.csv_writer = CycleCsvWriter(self.csv_path, header_rows=self.cycle_info_rows())
+
+        start = min(getattr(self, 'last_written_index', 0), n_data)
+        writer.write_rows(self.csv_rows(start, n_data))
         self.last_written_index = n_data
-        self.csv_update_locked = False
-        return csv_file_path
+        return writer.path
+
     def finalize_cycle_report(self, pool: Pool):
         """Generate both CSV and PDF reports for the finalized cycle."""
         try:
@@ -1275,7 +1318,14 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
             # Build full path to the HTML template (assumed to reside relative to this file)
             html_template_path = os.path.join(os.path.dirname(__file__), 'result_template.html')
             try:
-                pdfkit.from_file(html_template_path, pdf_report_path)
+                report_data = {column.name: getattr(cycle_data, column.name)
+                               for column in cycle_data.__table__.columns}
+                try:
+                    report_data['dwell_time'] = float(cycle_data.dwell_time or 0)
+                except (TypeError, ValueError):
+                    report_data['dwell_time'] = 0.0
+                html = report_templates.render_report({'data': report_data}, html_template_path)
+                pdf_renderer.get_instance().render(html, pdf_report_path)
             except Exception as e:
                 raise Exception(f"Error generating PDF report: {e}")
 
@@ -1292,8 +1342,7 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
             self.new_cycle_handler.stop_cycle()
         self.actionStart.setEnabled(True)
         self.actionStop.setEnabled(False)
-        if hasattr(self, 'csv_file'):
-            self.csv_file.close()
+        self.close_csv_file()
 
     def generate_html_report(self, image_path=None):
         # Retrieve cycle times, using new_cycle_handler if available
@@ -1349,10 +1398,8 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
         self.render_print_template(template_file='result_template.html', data=report_data)
 
     def render_print_template(self, *args, template_file=None, **kwargs):
-        templateLoader = jinja2.FileSystemLoader(searchpath=os.path.join(os.getcwd(), "ui"))
-        templateEnv = jinja2.Environment(loader=templateLoader, extensions=['jinja2.ext.loopcontrols'])
-        template = templateEnv.get_template(template_file)
-        html = template.render(**kwargs.get("data", {}))
+        template_path = os.path.join(os.path.dirname(__file__), template_file)
+        html = report_templates.render_report({'data': kwargs.get("data", {})}, template_path)
         import tempfile
         with tempfile.NamedTemporaryFile('w', delete=False, suffix='.html') as f:
             fname = f.name
@@ -1370,21 +1417,7 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
 
     def html2pdf(self, html_path, pdf_path):
         self.pdf_path = pdf_path
-        options = {
-            'page-size': 'A4',
-            'dpi': 2000,
-            'margin-top': '0.35in',
-            'margin-right': '0.75in',
-            'margin-bottom': '0.75in',
-            'margin-left': '0.75in',
-            'encoding': "UTF-8",
-            'no-outline': None,
-            'enable-local-file-access': None
-        }
-        path_wkhtmltopdf = os.path.join(os.getcwd(), 'wkhtmltopdf.exe')
-        config = pdfkit.configuration(wkhtmltopdf=path_wkhtmltopdf)
-        with open(html_path) as f:
-            pdfkit.from_file(f, pdf_path, options=options, configuration=config)
+        pdf_renderer.get_instance().render_file(html_path, pdf_path)
         webbrowser.open('file://' + pdf_path)
 
     def open_pdf(self):
@@ -1414,7 +1447,7 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
             msg.exec_()
             self.update_status_bar_signal.emit('OneDrive connection failed.', 0, 'red')
 
-    def _sync_onedrive(self, *args, upload_csv=True, upload_pdf=True, show_message=True, delete_existing=True):
+    def _sync_onedrive(self, *args, upload_csv=True, upload_pdf=True, show_message=True):
         try:
             # Check if settings are configured
             client_id = pool.config("onedrive_client_id")
@@ -1427,39 +1460,24 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
                                     "Please configure OneDrive settings first.")
                 return False
                 
-            # Create OneDrive API instance
-            onedrive_api = OneDriveAPI()
-            onedrive_api.authenticate(client_id, client_secret, tenant_id)
-            
-            # Create folder for reports
-            folder_name = f"PLC_Reports_{datetime.now().strftime('%Y-%m-%d')}"
-            try:
-                folder_response = onedrive_api.create_folder(folder_name)
-                folder_id = folder_response.get('id')
-                # Use logger instead of print for consistent logging
-                logger.info(f"Created OneDrive folder: {folder_name}")
-            except Exception as e:
-                logger.warning(f"Could not create OneDrive folder: {e}")
-                folder_id = None
-                
-            # Upload CSV file if requested
-            if upload_csv:
-                csv_file_path = self.csv_path
-                if csv_file_path and os.path.exists(csv_file_path):  # Added null check
-                    file_resp = onedrive_api.upload_file(csv_file_path, folder_id)
-                    logger.info(f"CSV uploaded to OneDrive: {os.path.basename(csv_file_path)}")
-                    self.update_status_bar_signal.emit(f"CSV uploaded to OneDrive", 10000, 'green')
-            
-            # Upload PDF file if requested
-            if upload_pdf:
-                pdf_file_path = self.pdf_path
-                if pdf_file_path and os.path.exists(pdf_file_path):  # Added null check
-                    file_resp = onedrive_api.upload_file(pdf_file_path, folder_id)
-                    logger.info(f"PDF uploaded to OneDrive: {os.path.basename(pdf_file_path)}")
-                    self.update_status_bar_signal.emit(f"PDF uploaded to OneDrive", 10000, 'green')
+            # Files go through the persistent queue, which skips content that was already uploaded
+            paths = []
+            if upload_csv and self.csv_path:
+                paths.append(self.csv_path)
+            if upload_pdf and self.pdf_path:
+                paths.append(self.pdf_path)
+            queue = upload_queue.get_instance()
+            queued = queue.enqueue_many(paths)
+            queue.start()
+            if queued:
+                logger.info(f"Queued {queued} files for OneDrive")
+                self.update_status_bar_signal.emit(f"{queued} file(s) queued for OneDrive", 10000, 'green')
             
             if show_message:
-                QMessageBox.information(self, "Success", "Files uploaded to OneDrive successfully")
+                if queued:
+                    QMessageBox.information(self, "Success", f"{queued} file(s) queued for upload to OneDrive")
+                else:
+                    QMessageBox.information(self, "Up to date", "The reports are already on OneDrive")
             return True
             
         except Exception as e:
@@ -1479,6 +1497,7 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
         reply = QMessageBox.question(self, 'Exiting app ...',
                                      quit_msg, (QMessageBox.Yes | QMessageBox.Cancel))
         if reply == QMessageBox.Yes:
+            self.close_csv_file(wait=True)
             event.accept()
         elif reply == QMessageBox.Cancel:
             event.ignore()
@@ -1498,7 +1517,7 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
         the cycle timer does not yet count until the full input is provided.
         """
         if not hasattr(self, 'channel_update_timer') or not self.channel_update_timer.isActive():
-            self.channel_update_timer = QTimer(self)
+            self.channel_update_timer = self.frame_scheduler.timer("channel_update", self)
             self.channel_update_timer.timeout.connect(self.update_immediate_values_panel)
             # Refresh channel labels values every second (adjust as needed)
             self.channel_update_timer.start(1000)
@@ -1546,7 +1565,7 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
             self.mainLayout.addWidget(self.labelCycleOutcomesPressure)
         
         # Start a timer to update these values periodically
-        self.cycleOutcomesTimer = QTimer(self)
+        self.cycleOutcomesTimer = self.frame_scheduler.timer("cycle_outcomes", self)
         self.cycleOutcomesTimer.timeout.connect(self.update_cycle_outcomes)
         self.cycleOutcomesTimer.start(1000)  # update every second
 
@@ -1693,6 +1712,9 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
             alarm_settings_action = QAction("Manage Alarms", self)
             alarm_settings_action.triggered.connect(self.open_alarm_settings)
             alarms_menu.addAction(alarm_settings_action)
+            acknowledge_action = QAction("Acknowledge Alarms", self)
+            acknowledge_action.triggered.connect(self.acknowledge_alarms)
+            alarms_menu.addAction(acknowledge_action)
             logger.info("Alarm settings menu added successfully")
         except Exception as e:
             logger.error(f"Error adding alarm settings menu: {e}")
@@ -1708,6 +1730,15 @@ class MainFormHandler(QMainWindow, Ui_MainWindow):
             logger.error(f"Error opening alarm settings: {e}")
             raise
 
+    def acknowledge_alarms(self):
+        """Acknowledge the alarms that are up and refresh the alarm display"""
+        try:
+            count = self.alarm_monitor.acknowledge()
+            logger.info(f"Acknowledged {count} alarms")
+            self.update_alarm_status()
+        except Exception as e:
+            logger.error(f"Error acknowledging alarms: {e}")
+
     def new_cycle_start(self):
         """Start a new cycle by opening the work order form"""
         try:
@@ -6,7 +6,7 @@ from RaspPiReader.ui.work_order_form_handler import WorkOrderFormHandler
 from datetime import datetime  
 from RaspPiReader.libs.database import Database
 from RaspPiReader.libs.models import CycleData
-from RaspPiReader.libs.cycle_finalization import finalize_cycle
+from RaspPiReader.libs import finalization_jobs
 from PyQt5.QtWidgets import QMessageBox, QPushButton
 import logging
 import os
@@ -18,7 +18,7 @@ class NewCycleHandler(QtWidgets.QWidget):
     NewCycleHandler encapsulates the logic for managing a cycle.
     When a cycle starts, the timing is reset and recorded.
     When a cycle stops, the elapsed time is logged, a CycleData record is created,
-    and reports (CSV and PDF) are generated via finalize_cycle.
+    and reports (CSV and PDF) are generated by the finalization job queue.
     """
     # Signal to notify when a cycle starts
     start_cycle_signal = pyqtSignal()
@@ -185,17 +185,54 @@ class NewCycleHandler(QtWidgets.QWidget):
             # Obtain serial numbers for this cycle (if any)
             serial_numbers = self.serial_numbers if self.serial_numbers else []
             
-            # Generate reports using finalize_cycle.
-            pdf_filename, csv_filename = finalize_cycle(cycle_data, serial_numbers)
-            logger.info(f"Reports generated: PDF: {pdf_filename}, CSV: {csv_filename}")
-            
-            # Show success message.
-            QMessageBox.information(self, "Cycle Finalized",
-                f"Cycle reports generated successfully.\nPDF: {pdf_filename}\nCSV: {csv_filename}")
+            # Generate reports on the finalization worker pool; the result is reported by on_finalization_finished.
+            self.submit_finalization(cycle_data, serial_numbers)
         except Exception as e:
             logger.error(f"Error finalizing cycle: {e}")
             QMessageBox.critical(self, "Finalization Error", f"Error finalizing cycle: {str(e)}")
             
+    def submit_finalization(self, cycle_data, serial_numbers):
+        """Queue report generation for a stored cycle and track its progress"""
+        job_queue = finalization_jobs.get_instance()
+        if not getattr(self, "_finalization_signals_connected", False):
+            job_queue.stageFinished.connect(self.on_finalization_stage_finished)
+            job_queue.jobFinished.connect(self.on_finalization_finished)
+            self._finalization_signals_connected = True
+        if not hasattr(self, "finalization_job_ids"):
+            self.finalization_job_ids = set()
+        job_id = job_queue.submit(cycle_data, serial_numbers)
+        if job_id is not None:
+            self.finalization_job_ids.add(job_id)
+            self.show_finalization_status(f"Generating reports for cycle {cycle_data.cycle_id}...")
+        return job_id
+
+    def show_finalization_status(self, message, color="blue"):
+        main_form = pool.get("main_form")
+        if main_form and hasattr(main_form, "update_status_bar"):
+            main_form.update_status_bar(message, 10000, color)
+
+    def on_finalization_stage_finished(self, job_id, stage, success, seconds):
+        if job_id not in getattr(self, "finalization_job_ids", set()):
+            return
+        state = "done" if success else "failed"
+        self.show_finalization_status(f"Report generation: {stage} {state} ({seconds:.1f}s)",
+                                      "blue" if success else "red")
+
+    def on_finalization_finished(self, job_id, success, pdf_filename, csv_filename):
+        if job_id not in getattr(self, "finalization_job_ids", set()):
+            return
+        self.finalization_job_ids.discard(job_id)
+        if success:
+            logger.info(f"Reports generated: PDF: {pdf_filename}, CSV: {csv_filename}")
+            self.show_finalization_status("Cycle reports generated", "green")
+            QMessageBox.information(self, "Cycle Finalized",
+                f"Cycle reports generated successfully.\nPDF: {pdf_filename}\nCSV: {csv_filename}")
+        else:
+            logger.error(f"Finalization job {job_id} did not complete")
+            self.show_finalization_status("Cycle report generation failed", "red")
+            QMessageBox.critical(self, "Finalization Error",
+                "Error finalizing cycle. See the log for the stages that failed.")
+
     def cancel_cycle(self):
         """
         Cancel the active cycle without finalizing reports.
@@ -0,0 +1,130 @@
+from PyQt5 import QtWidgets, QtCore
+import pyqtgraph as pg
+import time
+import logging
+
+from RaspPiReader.libs.sample_store import ColumnarSampleStore
+from RaspPiReader.ui.table_models import SampleTableModel
+
+logger = logging.getLogger(__name__)
+
+
+class PlotDataTab(QtWidgets.QWidget):
+    """
+    Tab showing every recorded sample as a plot and as a scrollable table.
+
+    Samples are kept in a ColumnarSampleStore and shown through a
+    SampleTableModel, so the table scrolls through millions of rows without
+    creating an item per cell. update_plot() only appends to the store; the
+    plot and table are refreshed together by a timer at a fixed rate.
+    """
+
+    def __init__(self, parent=None, refresh_interval_ms=500, channel_labels=None, channel_colors=None):
+        super(PlotDataTab, self).__init__(parent)
+        self.store = ColumnarSampleStore()
+        self.channel_labels = channel_labels or {}
+        self.channel_colors = channel_colors or {}
+        self.curves = {}
+        self.start_time = None
+        self._dirty = False
+        self.setup_ui()
+        self.refresh_timer = QtCore.QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(refresh_interval_ms)
+
+    def setup_ui(self):
+        layout = QtWidgets.QVBoxLayout(self)
+        splitter = QtWidgets.QSplitter(QtCore.Qt.Vertical)
+
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.setBackground('w')
+        self.plot_widget.showGrid(x=True, y=True, alpha=0.3)
+        self.plot_widget.addLegend()
+        self.plot_widget.setLabel('bottom', 'Time (s)')
+        # Draw at most a few points per pixel however long the recording gets
+        self.plot_widget.setDownsampling(auto=True, mode='peak')
+        self.plot_widget.setClipToView(True)
+        splitter.addWidget(self.plot_widget)
+
+        self.table_model = SampleTableModel(self.store, column_labels=self.channel_labels, parent=self)
+        self.table_view = QtWidgets.QTableView()
+        self.table_view.setModel(self.table_model)
+        self.table_view.setAlternatingRowColors(True)
+        self.table_view.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table_view.verticalHeader().setDefaultSectionSize(20)
+        # Fixed row heights let the view skip measuring rows it does not show
+        self.table_view.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        splitter.addWidget(self.table_view)
+        splitter.setSizes([500, 300])
+        layout.addWidget(splitter)
+
+        controls = QtWidgets.QHBoxLayout()
+        self.follow_checkbox = QtWidgets.QCheckBox("Follow latest")
+        self.follow_checkbox.setChecked(True)
+        controls.addWidget(self.follow_checkbox)
+        controls.addStretch()
+        self.row_count_label = QtWidgets.QLabel("0 samples")
+        controls.addWidget(self.row_count_label)
+        self.btn_clear = QtWidgets.QPushButton("Clear")
+        self.btn_clear.clicked.connect(self.clear)
+        controls.addWidget(self.btn_clear)
+        layout.addLayout(controls)
+
+    def update_plot(self, channel_values, boolean_values=None, timestamp=None):
+        """
+        Record one sample row.
+
+        Args:
+            channel_values: Dict of channel name (e.g. 'ch1') -> numeric value
+            boolean_values: Optional dict of boolean name (e.g. 'bool1') -> bool
+            timestamp: Epoch seconds of the sample, defaults to now
+        """
+        values = dict(channel_values or {})
+        for name, state in (boolean_values or {}).items():
+            values[name] = 1.0 if state else 0.0
+        if timestamp is None:
+            timestamp = time.time()
+        if self.start_time is None:
+            self.start_time = timestamp
+        try:
+            self.store.append(timestamp, values)
+            self._dirty = True
+        except Exception as e:
+            logger.error(f"Error recording plot data sample: {e}")
+
+    def _ensure_curve(self, name, index):
+        if name in self.curves:
+            return self.curves[name]
+        color = self.channel_colors.get(name, pg.intColor(index, hues=20))
+        curve = self.plot_widget.plot([], [], pen=pg.mkPen(color=color, width=2),
+                                      name=self.channel_labels.get(name, name))
+        self.curves[name] = curve
+        return curve
+
+    def refresh(self):
+        """Push samples recorded since the last refresh to the plot and the table"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        follow = self.follow_checkbox.isChecked()
+        self.table_model.flush(follow_tail=follow)
+        if follow:
+            self.table_view.scrollToBottom()
+
+        self.row_count_label.setText(f"{len(self.store)} samples")
+
+        if not self.plot_widget.isVisible():
+            # Redrawn on the next refresh after the tab is shown again
+            self._dirty = True
+            return
+        x = self.store.timestamps() - self.start_time
+        for index, name in enumerate(self.store.columns):
+            self._ensure_curve(name, index).setData(x, self.store.column(name), connect='finite')
+
+    def clear(self):
+        """Drop all recorded samples"""
+        self.table_model.reset()
+        self.start_time = None
+        for curve in self.curves.values():
+            curve.setData([], [])
+        self.row_count_label.setText("0 samples")
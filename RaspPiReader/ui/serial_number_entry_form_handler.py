@@ -1,5 +1,4 @@
 import logging
-import pandas as pd
 from PyQt5 import QtWidgets
 from PyQt5.QtCore import Qt
 from RaspPiReader.ui.serial_number_entry_form import Ui_SerialNumberEntryForm
@@ -66,6 +65,8 @@ class SerialNumberEntryFormHandler(QtWidgets.QWidget):
             return
             
         try:
+            # pandas is only needed here; importing it with the form slowed every start
+            import pandas as pd
             if file_name.lower().endswith(('.xlsx', '.xls')):
                 df = pd.read_excel(file_name, header=None)
             elif file_name.lower().endswith('.csv'):
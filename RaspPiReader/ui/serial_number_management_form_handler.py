@@ -1,6 +1,5 @@
 import logging
 import os
-import glob
 import re
 import csv
 from PyQt5 import QtWidgets
@@ -10,6 +9,7 @@ from PyQt5.QtGui import QDesktopServices
 from RaspPiReader.ui.serial_number_management import Ui_SerialNumberManagementDialog
 from RaspPiReader.libs.database import Database
 from RaspPiReader.libs.models import CycleSerialNumber, User, CycleData, CycleReport
+from RaspPiReader.libs import reports_catalog
 from RaspPiReader import pool
 from sqlalchemy.orm import joinedload
 from sqlalchemy import and_, desc, func, distinct
@@ -360,7 +360,7 @@ class SerialNumberManagementFormHandler(QtWidgets.QDialog):
             
             if cycle_report:
                 # Log the cycle report details to debug
-                logger.info(f"Found CycleReport for cycle {cycle_id}: {cycle_report.__dict__}")
+                logger.debug(f"Found CycleReport for cycle {cycle_id}: {cycle_report.__dict__}")
                 
                 # Handle both old and new schema
                 if report_type.lower() == 'pdf':
@@ -387,38 +387,14 @@ class SerialNumberManagementFormHandler(QtWidgets.QDialog):
                             logger.info(f"Found HTML report via database path: {html_path}")
                             return html_path
             
-            # If not found in database, search for files with cycle ID in the name
-            cycle_id_str = str(cycle_id)
-            
-            # Log directory info
-            logger.info(f"Searching for {report_type} files in directory: {reports_dir}")
-            if not os.path.exists(reports_dir):
-                logger.warning(f"Reports directory doesn't exist: {reports_dir}")
-                os.makedirs(reports_dir, exist_ok=True)
-            
-            # Search for files with this pattern: *_cycle_id_* or cycle_id_* with correct extension
-            pattern = f"*{cycle_id_str}*.{report_type.lower()}"
-            matching_files = glob.glob(os.path.join(reports_dir, pattern))
-            
-            # Log what we found
-            logger.info(f"Found {len(matching_files)} {report_type} files matching pattern '{pattern}'")
-            for f in matching_files:
-                logger.info(f"  - {f}")
-            
-            if matching_files:
-                # Sort by modification time to get the newest first
-                matching_files.sort(key=os.path.getmtime, reverse=True)
-                logger.info(f"Using newest matching {report_type} file: {matching_files[0]}")
-                return matching_files[0]
-                
-            # Last resort: search in all files for any with the cycle ID in the name
-            all_files = glob.glob(os.path.join(reports_dir, f"*.{report_type.lower()}"))
-            for file_path in all_files:
-                file_name = os.path.basename(file_path)
-                if cycle_id_str in file_name:
-                    logger.info(f"Found {report_type} file containing cycle ID in name: {file_path}")
-                    return file_path
-                    
+            # If not found in database, look the cycle up in the reports catalog
+            cycle_number = self.db.session.query(CycleData.cycle_id).filter(CycleData.id == cycle_id).scalar()
+            path = reports_catalog.get_instance().find(report_type.lower(), cycle_id=cycle_id,
+                                                       cycle_number=cycle_number or str(cycle_id))
+            if path:
+                logger.debug(f"Found {report_type} report for cycle {cycle_id} in catalog: {path}")
+                return path
+
             logger.warning(f"No {report_type} report found for cycle {cycle_id}")
             return None
             
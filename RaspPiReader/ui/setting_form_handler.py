@@ -18,13 +18,13 @@ from .color_label import ColorLabel
 from .settingForm import Ui_SettingForm as SettingForm
 from RaspPiReader.libs.database import Database
 from RaspPiReader.libs.models import GeneralConfigSettings, ChannelConfigSettings, BooleanAddress
+from RaspPiReader.libs import channel_config
 from RaspPiReader.libs.configuration import config
+from RaspPiReader.libs.communication import READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS
 from RaspPiReader.ui.serial_number_management_form_handler import SerialNumberManagementFormHandler
 from RaspPiReader.utils.virtual_keyboard import setup_virtual_keyboard
 
 CHANNEL_COUNT = 14
-READ_INPUT_REGISTERS = "Read Input Registers"
-READ_HOLDING_REGISTERS = "Read Holding Registers"
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -243,6 +243,7 @@ class SettingFormHandler(QMainWindow):
                 "max_scale_range": ("max_scale_range", 0)
             }
 
+            pool_values = {}
             for ch in range(1, CHANNEL_COUNT + 1):
                 channel_settings = self.db.session.query(ChannelConfigSettings).filter_by(id=ch).first()
                 if not channel_settings:
@@ -263,11 +264,11 @@ class SettingFormHandler(QMainWindow):
                     setattr(channel_settings, attribute, value)
                     channel_updates[attribute] = value
                 
-                # Update pool configuration for this channel
-                for key, value in channel_updates.items():
-                    pool.set_config(f'channel_{ch}_{key}', value)
+                pool_values.update({f'channel_{ch}_{key}': value for key, value in channel_updates.items()})
             
             self.db.session.commit()
+            # One change for all channels, so subscribers refresh once
+            pool.update(pool_values)
                 
             # Save Boolean Address settings to the database
             numRows = self.boolTable.rowCount()
@@ -302,6 +303,8 @@ class SettingFormHandler(QMainWindow):
 
             # Force reload all settings
             pool.force_reload_all()
+            # Swap in the compiled channel configuration used by the read loop
+            channel_config.reload(self.db)
 
             logging.info("Settings saved successfully.")
             QTimer.singleShot(100, self._delayed_write_to_device)
@@ -10,14 +10,15 @@ from PyQt5.QtWidgets import QMainWindow, QMessageBox, QLineEdit, QSpinBox, QDoub
 
 from RaspPiReader import pool
 from RaspPiReader.libs.communication import dataReader
-from RaspPiReader.libs.demo_data_reader import data as demo_data
+from RaspPiReader.libs import demo_data_reader
 from RaspPiReader.ui.setting_form_handler import CHANNEL_COUNT, SettingFormHandler
 from RaspPiReader.ui.startCycleForm import Ui_CycleStart  
 
 from RaspPiReader.libs.database import Database
-from RaspPiReader.libs.cycle_finalization import finalize_cycle
+from RaspPiReader.libs import finalization_jobs
+from RaspPiReader.libs import channel_config
 from RaspPiReader.ui.serial_number_management_form_handler import SerialNumberManagementFormHandler
-from RaspPiReader.libs.models import CycleData, User, Alarm, DefaultProgram, CycleSerialNumber
+from RaspPiReader.libs.models import CycleData, User, DefaultProgram, CycleSerialNumber
 from RaspPiReader.libs import plc_communication
 from RaspPiReader.libs.plc_communication import write_coil
 
@@ -286,31 +287,18 @@ class StartCycleFormHandler(QMainWindow):
             
     def initiate_onedrive_update_thread(self):
         try:
-            from RaspPiReader.libs.onedrive_api import OneDriveAPI
+            from RaspPiReader.libs import upload_queue
             client_id = pool.config('onedrive_client_id', str, '')
             client_secret = pool.config('onedrive_client_secret', str, '')
             tenant_id = pool.config('onedrive_tenant_id', str, '')
             if not all([client_id, client_secret, tenant_id]):
                 logger.warning("OneDrive settings incomplete - skipping OneDrive thread initialization")
                 return
-            logger.info("Initializing OneDrive update thread")
-            def update_onedrive():
-                try:
-                    one_drive = OneDriveAPI()
-                    one_drive.authenticate(client_id, client_secret, tenant_id)
-                    today = datetime.now().strftime("%Y%m%d")
-                    reports_folder = "reports"
-                    if not os.path.exists(reports_folder):
-                        os.makedirs(reports_folder)
-                    logger.info("OneDrive update thread started")
-                except Exception as e:
-                    logger.error(f"OneDrive update thread error: {e}")
-            from threading import Thread
-            self.onedrive_thread = Thread(target=update_onedrive, daemon=True)
-            self.onedrive_thread.start()
-            logger.info("OneDrive update thread initialized")
+            # The queue persists across restarts; starting it resumes uploads left unfinished
+            upload_queue.get_instance().start()
+            logger.info("OneDrive upload queue initialized")
         except Exception as e:
-            logger.error(f"Failed to initialize OneDrive update thread: {e}")
+            logger.error(f"Failed to initialize OneDrive upload queue: {e}")
 
     def open_serial_management(self):
         dialog = SerialNumberManagementFormHandler(self)
@@ -590,19 +578,17 @@ class StartCycleFormHandler(QMainWindow):
                 try:
                     serial_numbers = self.get_serial_numbers() or []
                     supervisor_username = self.get_supervisor_override() or ""
-                    alarm_values = self.read_alarms() or {}
                     
-                    # Finalize the cycle
-                    pdf_file, csv_file = finalize_cycle(
+                    # Finalize the cycle on the finalization worker pool
+                    job_id = finalization_jobs.get_instance().submit(
                         cycle_data=self.cycle_record,
                         serial_numbers=serial_numbers,
                         supervisor_username=supervisor_username,
-                        alarm_values=alarm_values,
                         reports_folder="reports",
                         template_file="RaspPiReader/ui/result_template.html"
                     )
                     
-                    logger.info(f"Cycle finalized successfully. Reports generated: {pdf_file}, {csv_file}")
+                    logger.info(f"Cycle finalization queued as job {job_id}")
                 except Exception as e:
                     logger.error(f"Error finalizing cycle: {e}")
                     QMessageBox.warning(self, "Warning", f"Error finalizing cycle: {str(e)}")
@@ -643,14 +629,6 @@ class StartCycleFormHandler(QMainWindow):
         else:
             return "supervisor"
 
-    def read_alarms(self):
-        db = Database("sqlite:///local_database.db")
-        alarms = db.session.query(Alarm).all()
-        alarm_dict = {}
-        for alarm in alarms:
-            alarm_dict[alarm.address] = alarm.alarm_text
-        return alarm_dict
-
     @staticmethod
     def read_data(handler, data_stack, updated_signal, dt, process_data=True):
         # Retrieve configuration values:
@@ -694,6 +672,7 @@ class StartCycleFormHandler(QMainWindow):
 
         if pool.get('demo'):
             read_index = 0
+            demo_data = demo_data_reader.get_data()
             n_data = len(demo_data)
             while handler.running and read_index < n_data:
                 iteration_start_time = datetime.now()
@@ -728,52 +707,20 @@ class StartCycleFormHandler(QMainWindow):
         else:
             while handler.running:
                 iteration_start_time = datetime.now()
-                temp_arr = []
+                raw_arr = [None] * CHANNEL_COUNT
+                failed = set()
                 handler.data_reader_lock.acquire()
+                # One snapshot per scan: a settings save swaps in a new one between scans
+                snapshot = channel_config.current()
                 for i in range(CHANNEL_COUNT):
                     if (i + 1) in active_channels:
+                        spec = snapshot.channels[i]
                         try:
-                            addr_str = pool.config('address' + str(i + 1), str, "0")
-                            pv_str = pool.config('pv' + str(i + 1), str, "0")
-                            address = int(addr_str, 10)
-                            pv = int(pv_str, 16)
-                            temp = dataReader.readData(address, pv)
-                            if temp is None:
+                            if spec.error:
+                                raise ValueError(spec.error)
+                            raw_arr[i] = dataReader.readData(spec.address, spec.pv)
+                            if raw_arr[i] is None:
                                 raise ValueError("DataReader.readData returned None")
-                            if temp & 0x8000 > 0:
-                                temp = -((0xFFFF - temp) + 1)
-                            dec_point = pool.config('decimal_point' + str(i + 1), int, 0)
-                            if dec_point > 0:
-                                temp = temp / pow(10, dec_point)
-                            
-                            # Special handling for channels 12 and 13
-                            if i + 1 == 12:  # Core temperature channel
-                                if pool.config('scale' + str(i + 1), bool, False):
-                                    input_low = pool.config('limit_low' + str(i + 1), float, 0.0)
-                                    input_high = pool.config('limit_high' + str(i + 1), float, 100.0)
-                                    output_low = pool.config('min_scale_range' + str(i + 1), float, 0.0)
-                                    output_high = pool.config('max_scale_range' + str(i + 1), float, 200.0)
-                                    if input_high > input_low:
-                                        temp = (output_high - output_low) / (input_high - input_low) * (temp - input_low) + output_low
-                                        temp = round(temp, dec_point)
-                            elif i + 1 == 13:  # Pressure channel
-                                if pool.config('scale' + str(i + 1), bool, False):
-                                    input_low = pool.config('limit_low' + str(i + 1), float, 0.0)
-                                    input_high = pool.config('limit_high' + str(i + 1), float, 100.0)
-                                    output_low = pool.config('min_scale_range' + str(i + 1), float, 0.0)
-                                    output_high = pool.config('max_scale_range' + str(i + 1), float, 10.0)
-                                    if input_high > input_low:
-                                        temp = (output_high - output_low) / (input_high - input_low) * (temp - input_low) + output_low
-                                        temp = round(temp, dec_point)
-                            else:  # Other channels
-                                if pool.config('scale' + str(i + 1), bool, False):
-                                    input_low = pool.config('limit_low' + str(i + 1), float, 0.0)
-                                    input_high = pool.config('limit_high' + str(i + 1), float, 0.0)
-                                    if input_high >= input_low + 10 and temp >= input_low:
-                                        output_high = pool.config('max_scale_range' + str(i + 1), float, 1000.0)
-                                        output_low = pool.config('min_scale_range' + str(i + 1), float, 0.0)
-                                        temp = (output_high - output_low) / (input_high - input_low) * (temp - input_low) + output_low
-                                        temp = round(temp, dec_point)
                         except Exception as e:
                             print(f"Failed to read or process data from channel {i + 1}.\n{e}")
                             try:
@@ -783,11 +730,17 @@ class StartCycleFormHandler(QMainWindow):
                                 print("Restart successful")
                             except Exception as e:
                                 print(f"Restart failed channel {i + 1}.\n{e}")
-                            temp = -1000.00
-                    else:
-                        temp = 0.00
-                    temp_arr.append(temp)
+                            raw_arr[i] = None
+                            failed.add(i)
                 handler.data_reader_lock.release()
+                # The whole scan is converted in one pass and shared with the other readers
+                values = channel_config.convert_scan(raw_arr, snapshot)
+                channel_config.publish_scan(values, snapshot.version)
+                # Plain register values stay ints, as the CSV has always shown them
+                integers = channel_config.integer_channels(raw_arr, snapshot)
+                temp_arr = [-1000.00 if i in failed else 0.00 if raw_arr[i] is None
+                            else int(values[i]) if integers[i] else float(values[i])
+                            for i in range(CHANNEL_COUNT)]
                 for i in range(CHANNEL_COUNT):
                     try:
                         data_stack[i + 1].append(temp_arr[i])
@@ -0,0 +1,227 @@
+from datetime import datetime
+import math
+
+from PyQt5 import QtCore, QtGui
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SampleTableModel(QtCore.QAbstractTableModel):
+    """
+    Read-only table model over a ColumnarSampleStore.
+
+    Rows are exposed to the view in batches through canFetchMore/fetchMore, so
+    a view only ever asks for the rows it scrolls to and no per-cell widgets or
+    items are created. New samples are announced by flush(), which inserts all
+    rows appended since the previous flush in a single rowsInserted call.
+    """
+
+    FETCH_BATCH = 1000
+
+    def __init__(self, store, column_labels=None, decimals=2, parent=None):
+        super(SampleTableModel, self).__init__(parent)
+        self.store = store
+        self.column_labels = column_labels or {}
+        self.decimals = decimals
+        self._loaded_rows = 0
+        self._column_count = len(store.columns)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._loaded_rows
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._column_count + 1
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return False
+        return self._loaded_rows < len(self.store)
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return
+        remaining = len(self.store) - self._loaded_rows
+        count = min(self.FETCH_BATCH, remaining)
+        if count <= 0:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), self._loaded_rows, self._loaded_rows + count - 1)
+        self._loaded_rows += count
+        self.endInsertRows()
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._loaded_rows:
+            return None
+        if role == QtCore.Qt.DisplayRole:
+            row, column = index.row(), index.column()
+            if column == 0:
+                return datetime.fromtimestamp(self.store.timestamp(row)).strftime("%Y-%m-%d %H:%M:%S")
+            value = self.store.value(row, column - 1)
+            if math.isnan(value):
+                return ""
+            return f"{value:.{self.decimals}f}"
+        if role == QtCore.Qt.TextAlignmentRole and index.column() > 0:
+            return int(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Vertical:
+            return str(section + 1)
+        if section == 0:
+            return "Time"
+        name = self.store.columns[section - 1]
+        return self.column_labels.get(name, name)
+
+    def flush(self, follow_tail=True):
+        """
+        Publish samples appended to the store since the last flush.
+
+        Args:
+            follow_tail: Insert the new rows right away when every stored row is
+                already loaded; otherwise leave them to fetchMore so a user
+                scrolled back in history is not disturbed.
+        """
+        columns = len(self.store.columns)
+        if columns != self._column_count:
+            self.beginInsertColumns(QtCore.QModelIndex(), self._column_count + 1, columns)
+            self._column_count = columns
+            self.endInsertColumns()
+        total = len(self.store)
+        if total < self._loaded_rows:
+            # Store was cleared
+            self.beginResetModel()
+            self._loaded_rows = 0
+            self.endResetModel()
+            return
+        if follow_tail and total > self._loaded_rows:
+            self.beginInsertRows(QtCore.QModelIndex(), self._loaded_rows, total - 1)
+            self._loaded_rows = total
+            self.endInsertRows()
+
+    def reset(self):
+        self.beginResetModel()
+        self.store.clear()
+        self._loaded_rows = 0
+        self.endResetModel()
+
+
+class ChannelTableModel(QtCore.QAbstractTableModel):
+    """
+    Table model for the dashboard's per-channel settings and live PV grid.
+
+    PV updates only mark rows dirty; a single-shot timer later emits one
+    dataChanged covering the dirty row span, so a burst of 14 channel updates
+    costs one repaint instead of 14.
+    """
+
+    # (header, config keys in lookup order, default)
+    COLUMNS = [
+        ("CH", None, None),
+        ("Address", ('address',), ''),
+        ("Label", ('name', 'label'), None),
+        ("PV", None, "0.0"),
+        ("SV", ('sv',), 0),
+        ("Set Point", ('set_point',), 0),
+        ("Low Limit", ('low_limit', 'limit_low'), 0),
+        ("High Limit", ('high_limit', 'limit_high'), 100),
+        ("Decimal", ('dec_point', 'decimal_point'), 0),
+        ("Scale", ('scale',), False),
+        ("Axis", ('axis_direction',), 'normal'),
+        ("Color", ('color',), None),
+    ]
+    PV_COLUMN = 3
+    COLOR_COLUMN = 11
+
+    def __init__(self, channels_config, default_color=None, coalesce_ms=100, parent=None):
+        super(ChannelTableModel, self).__init__(parent)
+        self.channels_config = channels_config
+        self.default_color = default_color or (lambda channel_number: "#ffffff")
+        self.channel_numbers = sorted(channels_config.keys())
+        self.pv_text = {channel_number: "0.0" for channel_number in self.channel_numbers}
+        self._dirty_rows = set()
+        self._flush_timer = QtCore.QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(coalesce_ms)
+        self._flush_timer.timeout.connect(self.flush)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.channel_numbers)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.COLUMNS[section][0]
+        return super(ChannelTableModel, self).headerData(section, orientation, role)
+
+    def _config_value(self, channel_number, column):
+        header, keys, default = self.COLUMNS[column]
+        config = self.channels_config.get(channel_number, {})
+        if column == 0:
+            return f"CH{channel_number}"
+        if column == self.PV_COLUMN:
+            return self.pv_text.get(channel_number, default)
+        if column == self.COLOR_COLUMN:
+            return config.get('color', self.default_color(channel_number))
+        for key in keys:
+            if key in config:
+                value = config[key]
+                break
+        else:
+            value = f"Channel {channel_number}" if default is None else default
+        if header == "Scale":
+            return "Yes" if value else "No"
+        return str(value)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        channel_number = self.channel_numbers[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return self._config_value(channel_number, index.column())
+        if role == QtCore.Qt.BackgroundRole:
+            color = QtGui.QColor(self.channels_config.get(channel_number, {}).get(
+                'color', self.default_color(channel_number)))
+            if index.column() != self.COLOR_COLUMN:
+                color.setAlpha(40)
+            return QtGui.QBrush(color)
+        return None
+
+    def set_pv(self, channel_number, text):
+        """Store the formatted PV of a channel and schedule a coalesced repaint"""
+        if self.pv_text.get(channel_number) == text:
+            return
+        self.pv_text[channel_number] = text
+        self._mark_dirty(channel_number)
+
+    def refresh_channel(self, channel_number):
+        """Schedule a repaint of a channel row after its settings changed"""
+        self._mark_dirty(channel_number)
+
+    def reset_pv(self):
+        for channel_number in self.channel_numbers:
+            self.pv_text[channel_number] = "0.0"
+            self._dirty_rows.add(self.channel_numbers.index(channel_number))
+        self.flush()
+
+    def _mark_dirty(self, channel_number):
+        if channel_number not in self.pv_text:
+            return
+        self._dirty_rows.add(self.channel_numbers.index(channel_number))
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def flush(self):
+        """Emit one dataChanged spanning every row changed since the last flush"""
+        if not self._dirty_rows:
+            return
+        first, last = min(self._dirty_rows), max(self._dirty_rows)
+        self._dirty_rows.clear()
+        self.dataChanged.emit(self.index(first, 0), self.index(last, len(self.COLUMNS) - 1))
@@ -3,6 +3,8 @@ import pyqtgraph as pg
 import numpy as np
 import os
 from ..libs.visualization import LiveDataVisualization
+from .table_models import ChannelTableModel
+from ..libs import frame_scheduler
 from ..libs.models import ChannelConfigSettings, BooleanAddress
 from RaspPiReader.libs.plc_communication import read_boolean
 from ..libs.database import Database
@@ -294,7 +296,7 @@ class VisualizationDashboard(QtWidgets.QWidget):
         self.status_bar = QtWidgets.QStatusBar()
         self.status_bar.showMessage("Ready")
         self.main_layout.addWidget(self.status_bar)
-        self.timer = QtCore.QTimer()
+        self.timer = frame_scheduler.get_instance().timer("dashboard_cycle_time", self)
         self.timer.timeout.connect(self.update_cycle_time)
         self.cycle_start_time = None
         self.paused = False
@@ -306,32 +308,37 @@ class VisualizationDashboard(QtWidgets.QWidget):
             os.makedirs(export_dir)
         export_path = os.path.join(export_dir, "plot_export.png")
         
-        # Store current view ranges
-        left_range = self.combined_plot_widget.getViewBox().viewRange()
-        right_range = self.right_vb.viewRange() if hasattr(self, 'right_vb') else None
-        
-        # Ensure both view boxes are properly sized
-        if hasattr(self, 'right_vb'):
-            self.right_vb.setGeometry(self.combined_plot_widget.getViewBox().sceneBoundingRect())
-            self.right_vb.linkedViewChanged(self.combined_plot_widget.getViewBox(), self.right_vb.XAxis)
-            
-            # Set fixed ranges for export
-            self.combined_plot_widget.setYRange(-150, 800, padding=0)  # Left axis range
-            self.right_vb.setYRange(0, 140, padding=0)  # Right axis range
-        
-        # Export the plot
-        if self.combined_visualization.export_chart_image(self.combined_plot_widget, export_path):
-            # Restore view ranges
-            self.combined_plot_widget.getViewBox().setRange(xRange=left_range[0], yRange=left_range[1])
-            if right_range and hasattr(self, 'right_vb'):
-                self.right_vb.setRange(xRange=right_range[0], yRange=right_range[1])
-            
+        # Render from a snapshot of the data on a worker; the live plot is not touched
+        axes = {
+            f"ch{i}": config.get('axis_direction', 'L').strip().upper()
+            for i, config in self.channels_config.items()
+        }
+        self.btn_export.setEnabled(False)
+        self.status_bar.showMessage(f"Exporting chart to {export_path}...")
+        self._chart_export_worker = self.combined_visualization.export_chart_image_async(
+            export_path,
+            axes=axes,
+            on_finished=self._on_chart_export_finished,
+            parent=self,
+            left_range=(-150, 800),
+            right_range=(0, 140),
+            left_label='Left Axis Values',
+            right_label='Right Axis Values',
+        )
+
+    def _on_chart_export_finished(self, success, result):
+        """Report the outcome of a background chart export"""
+        self.btn_export.setEnabled(True)
+        self._chart_export_worker = None
+        if success:
+            self.status_bar.showMessage(f"Chart image exported to {result}")
             QtWidgets.QMessageBox.information(
-                self, "Export Success", f"Chart image exported to:\n{export_path}"
+                self, "Export Success", f"Chart image exported to:\n{result}"
             )
             template_path = os.path.join(os.path.dirname(__file__), "result_template.html")
-            self.update_report_template(template_path, export_path)
+            self.update_report_template(template_path, result)
         else:
+            self.status_bar.showMessage(f"Failed to export chart image: {result}")
             QtWidgets.QMessageBox.warning(self, "Export Failed", "Failed to export chart image.")
 
     def update_report_template(self, template_path, image_path):
@@ -412,28 +419,10 @@ class VisualizationDashboard(QtWidgets.QWidget):
             self.plot_grid_layout.addWidget(container, row, col)
         
     def create_table_view(self):
-        """Create a table view for numeric channel data (existing code)"""
-        self.data_table = QtWidgets.QTableWidget()
-        self.data_table.setColumnCount(12)
-        self.data_table.setRowCount(14)
-        headers = ["CH", "Address", "Label", "PV", "SV", "Set Point", "Low Limit", "High Limit", "Decimal", "Scale", "Axis", "Color"]
-        self.data_table.setHorizontalHeaderLabels(headers)
-        for i in range(1, 15):
-            channel_config = self.channels_config.get(i, {})
-            self.data_table.setItem(i-1, 0, QtWidgets.QTableWidgetItem(f"CH{i}"))
-            self.data_table.setItem(i-1, 1, QtWidgets.QTableWidgetItem(str(channel_config.get('address', ''))))
-            self.data_table.setItem(i-1, 2, QtWidgets.QTableWidgetItem(channel_config.get('label', f"Channel {i}")))
-            self.data_table.setItem(i-1, 3, QtWidgets.QTableWidgetItem("0.0"))
-            self.data_table.setItem(i-1, 4, QtWidgets.QTableWidgetItem(str(channel_config.get('sv', 0))))
-            self.data_table.setItem(i-1, 5, QtWidgets.QTableWidgetItem(str(channel_config.get('set_point', 0))))
-            self.data_table.setItem(i-1, 6, QtWidgets.QTableWidgetItem(str(channel_config.get('limit_low', 0))))
-            self.data_table.setItem(i-1, 7, QtWidgets.QTableWidgetItem(str(channel_config.get('limit_high', 100))))
-            self.data_table.setItem(i-1, 8, QtWidgets.QTableWidgetItem(str(channel_config.get('decimal_point', 0))))
-            self.data_table.setItem(i-1, 9, QtWidgets.QTableWidgetItem("Yes" if channel_config.get('scale', False) else "No"))
-            self.data_table.setItem(i-1, 10, QtWidgets.QTableWidgetItem(channel_config.get('axis_direction', 'normal')))
-            color_item = QtWidgets.QTableWidgetItem(channel_config.get('color', self.get_default_color(i)))
-            color_item.setBackground(QtGui.QColor(channel_config.get('color', self.get_default_color(i))))
-            self.data_table.setItem(i-1, 11, color_item)
+        """Create a table view for numeric channel data backed by ChannelTableModel"""
+        self.channel_table_model = ChannelTableModel(self.channels_config, default_color=self.get_default_color, parent=self)
+        self.data_table = QtWidgets.QTableView()
+        self.data_table.setModel(self.channel_table_model)
         self.table_layout.addWidget(self.data_table)
         
     def start_visualization(self):
@@ -449,7 +438,7 @@ class VisualizationDashboard(QtWidgets.QWidget):
         self.paused = False
         self.status_bar.showMessage("Visualization started")
         if not hasattr(self, "boolean_timer"):
-            self.boolean_timer = QtCore.QTimer(self)
+            self.boolean_timer = frame_scheduler.get_instance().timer("dashboard_boolean", self)
             self.boolean_timer.timeout.connect(self.update_all_boolean_data)
             self.boolean_timer.start(100)  # update every 100 ms
         self.visualization_active = True
@@ -474,7 +463,7 @@ class VisualizationDashboard(QtWidgets.QWidget):
         Update numeric channel data.
         Args:
             channel_number: 1-14 for numeric channels
-            value: Current numeric value
+            value: Current reading, already converted by channel_config
         """
         if not self.visualization_active:
             return
@@ -482,16 +471,6 @@ class VisualizationDashboard(QtWidgets.QWidget):
             return
         channel_config = self.channels_config.get(channel_number, {})
         decimal_places = channel_config.get('decimal_point', 0)
-        # Handle negative numbers (convert from unsigned to signed if needed)
-        if value > 32767:  # If value is in unsigned range
-            value = value - 65536  # Convert to signed 16-bit integer
-        if channel_config.get('scale', False):
-            low_limit = channel_config.get('limit_low', 0)
-            high_limit = channel_config.get('limit_high', 100)
-            min_range = channel_config.get('min_scale_range', low_limit)
-            max_range = channel_config.get('max_scale_range', high_limit)
-            if high_limit != low_limit and max_range != min_range:
-                value = min_range + ((value - low_limit) * (max_range - min_range)) / (high_limit - low_limit)
         formatted_value = f"{value:.{decimal_places}f}"
         logger.debug(f"update_data: CH{channel_number} value={value} formatted={formatted_value}")
         channel_name = f"ch{channel_number}"
@@ -512,11 +491,8 @@ class VisualizationDashboard(QtWidgets.QWidget):
         if channel_number in self.channel_info_widgets:
             self.channel_info_widgets[channel_number]['pv'].setText(formatted_value)
         
-        # Update table view if visible
-        if self.tab_widget.currentIndex() == 2:
-            pv_item = self.data_table.item(channel_number-1, 3)
-            if pv_item:
-                pv_item.setText(formatted_value)
+        # Update table view (repaints are coalesced by the model)
+        self.channel_table_model.set_pv(channel_number, formatted_value)
         
         try:
             channel = self.db.session.query(ChannelConfigSettings).filter_by(id=channel_number).first()
@@ -674,13 +650,12 @@ class VisualizationDashboard(QtWidgets.QWidget):
                             else:
                                 widgets[key].setText(str(value))
                 
-                # Update table view if visible
-                if self.tab_widget.currentIndex() == 1:
-                    self.update_table_row(channel_number)
+                # Update table view
+                self.update_table_row(channel_number)
                 
-                # Force immediate update of all visualizations
+                # Redraw all visualizations in the next UI frame
                 self.apply_channel_colors()
-                self.update_plots()
+                frame_scheduler.get_instance().post('plot_redraw', self.update_plots)
                 
                 self.status_bar.showMessage(f"Updated settings for CH{channel_number}")
                 
@@ -756,8 +731,18 @@ class VisualizationDashboard(QtWidgets.QWidget):
         """Export visualization data to CSV"""
         file_path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export Visualization Data", "", "CSV Files (*.csv);;All Files (*)")
         if file_path:
-            success = self.visualization.export_data(file_path)
-            self.status_bar.showMessage(f"Data exported to {file_path}" if success else "Failed to export data")
+            self.status_bar.showMessage(f"Exporting data to {file_path}...")
+            self._export_worker = self.visualization.export_data_async(
+                file_path, on_finished=self._on_export_finished, parent=self
+            )
+
+    def _on_export_finished(self, success, result, rows_written):
+        """Report the outcome of a background data export"""
+        if success:
+            self.status_bar.showMessage(f"Data exported to {result} ({rows_written} rows)")
+        else:
+            self.status_bar.showMessage(f"Failed to export data: {result}")
+        self._export_worker = None
                 
     
     def reset(self):
@@ -772,11 +757,7 @@ class VisualizationDashboard(QtWidgets.QWidget):
         self.cycle_time_label.setText("Cycle Time: 00:00:00")
         for channel_number, widgets in self.channel_info_widgets.items():
             widgets['pv'].setText("0.0")
-        if self.tab_widget.currentIndex() == 1:
-            for i in range(1, 15):
-                pv_item = self.data_table.item(i-1, 2)
-                if pv_item:
-                    pv_item.setText("0.0")
+        self.channel_table_model.reset_pv()
         self.status_bar.showMessage("Visualization reset")
         self.visualization_active = False
         
@@ -784,54 +765,7 @@ class VisualizationDashboard(QtWidgets.QWidget):
         """Update a specific row in the table view"""
         if channel_number < 1 or channel_number > 14:
             return
-            
-        channel_config = self.channels_config.get(channel_number, {})
-        row = channel_number - 1
-        
-        # Name/Label
-        name_item = self.data_table.item(row, 1)
-        if name_item:
-            name_item.setText(channel_config.get('name', f"Channel {channel_number}"))
-        
-        # SV
-        sv_item = self.data_table.item(row, 3)
-        if sv_item:
-            sv_item.setText(str(channel_config.get('sv', 0)))
-        
-        # Set Point
-        setpoint_item = self.data_table.item(row, 4)
-        if setpoint_item:
-            setpoint_item.setText(str(channel_config.get('set_point', 0)))
-        
-        # Low Limit
-        low_item = self.data_table.item(row, 5)
-        if low_item:
-            low_item.setText(str(channel_config.get('low_limit', 0)))
-        
-        # High Limit
-        high_item = self.data_table.item(row, 6)
-        if high_item:
-            high_item.setText(str(channel_config.get('high_limit', 100)))
-        
-        # Decimal Places
-        decimal_item = self.data_table.item(row, 7)
-        if decimal_item:
-            decimal_item.setText(str(channel_config.get('dec_point', 0)))
-        
-        # Scale
-        scale_item = self.data_table.item(row, 8)
-        if scale_item:
-            scale_item.setText("Yes" if channel_config.get('scale', False) else "No")
-        
-        # Update row colors if color changed
-        color = channel_config.get('color', "#ffffff")
-        color_with_alpha = QtGui.QColor(color)
-        color_with_alpha.setAlpha(40)  # Make it more transparent
-        
-        for col in range(9):
-            item = self.data_table.item(row, col)
-            if item:
-                item.setBackground(color_with_alpha)
+        self.channel_table_model.refresh_channel(channel_number)
     
     def apply_channel_colors(self):
         """Apply channel colors to the respective plots and UI elements"""
@@ -860,9 +794,8 @@ class VisualizationDashboard(QtWidgets.QWidget):
                 if ch_label:
                     ch_label.setStyleSheet(f"color: {color};")
             
-            # Update table row if needed
-            if self.tab_widget.currentIndex() == 1:
-                self.update_table_row(i)
+            # Update table row
+            self.update_table_row(i)
                 
     def get_default_color(self, channel_number):
         """Get a default color based on channel type"""
@@ -2,7 +2,6 @@
 import sys
 import os
 import argparse
-import time
 import logging
 from PyQt5 import QtWidgets
 
@@ -10,8 +9,7 @@ from RaspPiReader import pool
 from RaspPiReader.ui.login_form_handler import LoginFormHandler
 from RaspPiReader.libs.database import Database
 from RaspPiReader.libs.sync import SyncThread
-from RaspPiReader.libs.demo_data_reader import data as demo_data
-from RaspPiReader.libs.plc_communication import initialize_plc_communication_async
+from RaspPiReader.libs.startup import StartupOrchestrator, task
 from RaspPiReader.libs.logging_config import setup_logging
 from RaspPiReader.ui.splash_screen import SplashScreen
 from RaspPiReader.libs.resource_path import resource_path
@@ -33,18 +31,10 @@ def process_arguments():
     pool.set('demo', args.demo)
     return args
 
-def initialize_components(logger, args):
-    """Initialize application components"""
-    demo_mode = pool.config('demo', bool, False) or args.demo
-    pool.set('demo', demo_mode)
-    logger.info(f"Demo mode: {demo_mode}")
-
-    logger.info("Initializing local database...")
-    db_path = resource_path("local_database.db")
-    db = Database(f"sqlite:///{db_path}")
-    db.create_tables()
+def start_plc_communication(logger):
+    """Start connecting to the PLC in the background; the UI does not wait for it"""
+    from RaspPiReader.libs.plc_communication import initialize_plc_communication_async
 
-    # Start PLC initialization in background to avoid blocking startup
     logger.info("Starting PLC communication initialization in background...")
 
     def plc_init_callback(success, error):
@@ -63,8 +53,17 @@ def initialize_components(logger, args):
             logger.error(f"Failed to initialize PLC communication: {error}")
             # Optionally, you could set a flag here to indicate PLC is offline.
     # Start initialization asynchronously; errors in connecting are logged, and the UI continues.
-    initialize_plc_communication_async(plc_init_callback)
+    return initialize_plc_communication_async(plc_init_callback)
+
+def initialize_database(logger):
+    """Open the local database, creating missing tables and indexes"""
+    from RaspPiReader.libs import alarm_history
 
+    logger.info("Initializing local database...")
+    db_path = resource_path("local_database.db")
+    db = Database(f"sqlite:///{db_path}")
+    db.create_tables()
+    alarm_history.ensure_indexes(db.engine)
     return db
 
 def start_sync_thread(logger):
@@ -75,17 +74,48 @@ def start_sync_thread(logger):
     logger.info("Database sync thread started")
     return sync_thread
 
+def load_channel_config():
+    """Compile the channel settings the read loop converts with"""
+    from RaspPiReader.libs import channel_config
+    return channel_config.reload()
+
+def load_alarm_rules():
+    """Compile the alarm rules, migrating the alarm tables if needed"""
+    from RaspPiReader.libs import alarm_rules
+    return alarm_rules.reload()
+
+def preload_forms():
+    """Import the main window's modules now, so it opens quickly after login"""
+    import RaspPiReader.ui.main_form_handler
+
+def startup_tasks(logger, args):
+    """
+    The work done before the login window is shown.
+
+    Tasks on the pool run concurrently with each other and with the GUI
+    thread tasks, which create Qt objects and so must run in the GUI thread.
+    Weights are the tasks' rough share of the startup time on a Pi.
+    """
+    demo_mode = pool.config('demo', bool, False) or args.demo
+    pool.set('demo', demo_mode)
+    logger.info(f"Demo mode: {demo_mode}")
+
+    return [
+        task('database', lambda: initialize_database(logger), weight=2, critical=True),
+        task('channel_config', load_channel_config, requires=['database'], weight=2),
+        task('alarm_rules', load_alarm_rules, requires=['database']),
+        task('sync', lambda: start_sync_thread(logger), requires=['database']),
+        task('plc', lambda: start_plc_communication(logger), main_thread=True, weight=2),
+        task('forms', preload_forms, main_thread=True, weight=4),
+        task('login_form', LoginFormHandler, requires=['database'], main_thread=True, weight=2, critical=True),
+    ]
+
 def show_splash_screen(logger):
-    """Show the splash screen with a progress bar"""
+    """Show the splash screen; its progress bar follows the startup tasks"""
     logger.info("Launching splash screen...")
     splash = SplashScreen()
     splash.show()
-
-    for i in range(101):
-        QtWidgets.QApplication.processEvents()
-        splash.progress_bar.setValue(i)
-        time.sleep(0.02)
-
+    QtWidgets.QApplication.processEvents()
     return splash
 
 def Main():
@@ -100,12 +130,13 @@ def Main():
     app = QtWidgets.QApplication(sys.argv)
 
     try:
-        initialize_components(logger, args)
-        start_sync_thread(logger)
         splash = show_splash_screen(logger)
+        orchestrator = StartupOrchestrator(startup_tasks(logger, args),
+                                           progress=lambda percent, name: splash.update_progress(percent))
+        results = orchestrator.run(app)
 
         logger.info("Launching login form...")
-        login_form = LoginFormHandler()
+        login_form = results['login_form'].value
         splash.finish(login_form)
         login_form.show()
 
@@ -0,0 +1,202 @@
+"""
+AlarmEngine state machine: hysteresis, on/off delays, latching and scans without readings.
+
+Run with: python -m pytest tests
+"""
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RaspPiReader.libs import alarm_rules
+from RaspPiReader.libs.alarm_engine import (ACKNOWLEDGE, ACKNOWLEDGED, ACTIVE, CLEARED, NORMAL, RAISED, RETURNED,
+                                            AlarmEngine)
+from RaspPiReader.libs.alarm_rules import CHANNEL_COUNT, HIGH_THRESHOLD, LOW_THRESHOLD, AlarmRule
+
+T0 = 1700000000.0
+
+
+def rule(rule_id=1, number=1, kind=HIGH_THRESHOLD, threshold=100.0, hysteresis=0.0, on_delay=0.0, off_delay=0.0,
+         latching=False):
+    return AlarmRule(rule_id, f"CH{number}", number, kind, threshold, f"rule {rule_id}", hysteresis, on_delay,
+                     off_delay, latching)
+
+
+@pytest.fixture
+def install(monkeypatch):
+    """Make a compiled rule set the current one, as alarm_rules.reload() would"""
+    def install(*rules):
+        monkeypatch.setattr(alarm_rules, '_ruleset', alarm_rules.compile_rules(rules, version=1))
+        return AlarmEngine()
+    return install
+
+
+def scan(value, number=1):
+    values = [math.nan] * CHANNEL_COUNT
+    values[number - 1] = value
+    return values
+
+
+def events(transitions):
+    return [(t.rule.id, t.event, t.state) for t in transitions]
+
+
+def state(engine, rule_id=1):
+    for rules in engine.alarms().values():
+        for alarm_rule, alarm_state in rules:
+            if alarm_rule.id == rule_id:
+                return alarm_state
+    return NORMAL
+
+
+def test_high_threshold_clears_only_past_the_hysteresis(install):
+    engine = install(rule(hysteresis=5.0))
+
+    assert engine.update(scan(100.0), T0) == []
+    raised = engine.update(scan(101.0), T0 + 1)
+    assert events(raised) == [(1, RAISED, ACTIVE)]
+    assert raised[0].value == 101.0
+    assert engine.update(scan(99.0), T0 + 2) == []
+    assert engine.update(scan(95.1), T0 + 3) == []
+    assert state(engine) == ACTIVE
+    assert events(engine.update(scan(95.0), T0 + 4)) == [(1, CLEARED, NORMAL)]
+    assert state(engine) == NORMAL
+
+
+def test_low_threshold_clears_only_past_the_hysteresis(install):
+    engine = install(rule(kind=LOW_THRESHOLD, threshold=10.0, hysteresis=2.0))
+
+    assert events(engine.update(scan(9.0), T0)) == [(1, RAISED, ACTIVE)]
+    assert engine.update(scan(11.9), T0 + 1) == []
+    assert events(engine.update(scan(12.0), T0 + 2)) == [(1, CLEARED, NORMAL)]
+
+
+def test_on_delay_raises_once_the_condition_held_long_enough(install):
+    engine = install(rule(on_delay=10.0))
+
+    assert engine.update(scan(101.0), T0) == []
+    assert engine.update(scan(101.0), T0 + 9.9) == []
+    assert events(engine.update(scan(101.0), T0 + 10)) == [(1, RAISED, ACTIVE)]
+    assert engine.update(scan(101.0), T0 + 20) == []
+
+
+def test_on_delay_restarts_when_the_condition_drops(install):
+    engine = install(rule(on_delay=10.0))
+
+    engine.update(scan(101.0), T0)
+    engine.update(scan(90.0), T0 + 5)
+    engine.update(scan(101.0), T0 + 6)
+    assert engine.update(scan(101.0), T0 + 15) == []
+    assert events(engine.update(scan(101.0), T0 + 16)) == [(1, RAISED, ACTIVE)]
+
+
+def test_off_delay_clears_once_the_condition_stayed_clear_long_enough(install):
+    engine = install(rule(off_delay=10.0))
+
+    engine.update(scan(101.0), T0)
+    assert engine.update(scan(90.0), T0 + 1) == []
+    assert engine.update(scan(90.0), T0 + 10.9) == []
+    assert state(engine) == ACTIVE
+    assert events(engine.update(scan(90.0), T0 + 11)) == [(1, CLEARED, NORMAL)]
+
+
+def test_off_delay_restarts_when_the_condition_returns(install):
+    engine = install(rule(off_delay=10.0))
+
+    engine.update(scan(101.0), T0)
+    engine.update(scan(90.0), T0 + 1)
+    engine.update(scan(101.0), T0 + 5)
+    engine.update(scan(90.0), T0 + 6)
+    assert engine.update(scan(90.0), T0 + 15) == []
+    assert events(engine.update(scan(90.0), T0 + 16)) == [(1, CLEARED, NORMAL)]
+
+
+def test_latching_alarm_returns_until_acknowledged(install):
+    engine = install(rule(latching=True))
+
+    engine.update(scan(101.0), T0)
+    assert events(engine.update(scan(90.0), T0 + 1)) == [(1, CLEARED, RETURNED)]
+    assert state(engine) == RETURNED
+    assert engine.update(scan(90.0), T0 + 2) == []
+    assert events(engine.acknowledge(now=T0 + 3)) == [(1, ACKNOWLEDGE, NORMAL)]
+    assert state(engine) == NORMAL
+    assert engine.acknowledge(now=T0 + 4) == []
+
+
+def test_latching_alarm_acknowledged_while_up_clears_normally(install):
+    engine = install(rule(latching=True))
+
+    engine.update(scan(101.0), T0)
+    assert events(engine.acknowledge(now=T0 + 1)) == [(1, ACKNOWLEDGE, ACKNOWLEDGED)]
+    assert state(engine) == ACKNOWLEDGED
+    assert events(engine.update(scan(90.0), T0 + 2)) == [(1, CLEARED, NORMAL)]
+
+
+def test_acknowledge_only_the_given_rules(install):
+    engine = install(rule(1, number=1), rule(2, number=2))
+
+    values = scan(101.0)
+    values[1] = 101.0
+    assert events(engine.update(values, T0)) == [(1, RAISED, ACTIVE), (2, RAISED, ACTIVE)]
+    assert events(engine.acknowledge([2], now=T0 + 1)) == [(2, ACKNOWLEDGE, ACKNOWLEDGED)]
+    assert state(engine, 1) == ACTIVE
+    assert state(engine, 2) == ACKNOWLEDGED
+
+
+def test_a_new_raise_needs_a_new_acknowledgement(install):
+    engine = install(rule())
+
+    engine.update(scan(101.0), T0)
+    engine.acknowledge(now=T0 + 1)
+    engine.update(scan(90.0), T0 + 2)
+    assert events(engine.update(scan(101.0), T0 + 3)) == [(1, RAISED, ACTIVE)]
+
+
+def test_missing_readings_neither_raise_nor_clear(install):
+    engine = install(rule(), rule(2, kind=LOW_THRESHOLD, threshold=10.0))
+
+    assert engine.update(scan(math.nan), T0) == []
+    engine.update(scan(101.0), T0 + 1)
+    assert engine.update(scan(math.nan), T0 + 2) == []
+    assert state(engine) == ACTIVE
+    assert state(engine, 2) == NORMAL
+    cleared = engine.update(scan(90.0), T0 + 3)
+    assert events(cleared) == [(1, CLEARED, NORMAL)]
+    assert cleared[0].value == 90.0
+
+
+def test_missing_reading_does_not_restart_the_on_delay(install):
+    engine = install(rule(on_delay=10.0))
+
+    engine.update(scan(101.0), T0)
+    engine.update(scan(math.nan), T0 + 5)
+    assert events(engine.update(scan(101.0), T0 + 10)) == [(1, RAISED, ACTIVE)]
+
+
+def test_reset_clears_raised_and_returned_alarms(install):
+    engine = install(rule(1, number=1, latching=True), rule(2, number=2))
+
+    values = scan(101.0)
+    values[1] = 101.0
+    engine.update(values, T0)
+    values[0] = 90.0
+    engine.update(values, T0 + 1)
+    assert state(engine, 1) == RETURNED
+    assert sorted(events(engine.reset(now=T0 + 2))) == [(1, CLEARED, NORMAL), (2, CLEARED, NORMAL)]
+    assert state(engine, 1) == NORMAL and state(engine, 2) == NORMAL
+
+
+def test_transitions_are_published_with_the_cycle(install):
+    engine = install(rule())
+    published = []
+    engine.subscribe(published.extend)
+    engine.set_cycle(42)
+
+    engine.update(scan(101.0), T0)
+    engine.acknowledge(now=T0 + 1)
+
+    assert events(published) == [(1, RAISED, ACTIVE), (1, ACKNOWLEDGE, ACKNOWLEDGED)]
+    assert all(transition.cycle_id == 42 for transition in published)
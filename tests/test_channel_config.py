@@ -0,0 +1,102 @@
+"""
+Whole-scan conversion (channel_config.convert_scan / integer_channels) against
+the per-channel conversion the read loop used before it.
+
+Run with: python -m pytest tests
+"""
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RaspPiReader.libs import channel_config
+from RaspPiReader.libs.channel_config import (CHANNEL_COUNT, ChannelConfigSnapshot, ChannelSpec,
+                                              compile_coefficients)
+
+
+def reference_convert(spec, raw):
+    """The read loop's former per-channel conversion"""
+    if raw & 0x8000:
+        raw -= 0x10000
+    value = raw / spec.divisor if spec.divisor else raw
+    if spec.slope is not None and (not spec.gated or value >= spec.input_low):
+        value = round(spec.slope * (value - spec.input_low) + spec.output_low, spec.decimal_point)
+    return value
+
+
+def spec(number, decimal_point=0, slope=None, input_low=0.0, output_low=0.0, gated=False):
+    divisor = 10 ** decimal_point if decimal_point > 0 else None
+    return ChannelSpec(number, 0, 0, decimal_point, divisor, slope, input_low, output_low, gated, None)
+
+
+def snapshot(specs):
+    specs = tuple(specs)
+    return ChannelConfigSnapshot(specs, 1, compile_coefficients(specs))
+
+
+def readings(raw, snap):
+    """The read loop's stored readings: ints where integer_channels() says so"""
+    values = channel_config.convert_scan(raw, snap)
+    integers = channel_config.integer_channels(raw, snap)
+    return [None if np.isnan(values[i]) else int(values[i]) if integers[i] else float(values[i])
+            for i in range(len(raw))]
+
+
+def assert_same(specs, raw):
+    snap = snapshot(specs)
+    scan = [np.nan if value is None else value for value in raw]
+    for index, value in enumerate(readings(scan, snap)):
+        if raw[index] is None:
+            assert value is None
+            continue
+        expected = reference_convert(specs[index], raw[index])
+        assert value == expected and type(value) is type(expected), \
+            f"{specs[index]} raw {raw[index]}: {value!r} != {expected!r}"
+
+
+def test_random_configurations_match_the_per_channel_conversion():
+    rng = random.Random(20240501)
+    for _ in range(2000):
+        specs = [spec(number, decimal_point=rng.choice([0, 0, 1, 2]), slope=rng.choice([None, 0.5, 1.7, 0.0125]),
+                      input_low=rng.choice([0.0, 100.0, -50.0]), output_low=rng.choice([0.0, 10.0, -20.0]),
+                      gated=rng.random() < 0.5)
+                 for number in range(1, CHANNEL_COUNT + 1)]
+        raw = [rng.choice([None, rng.randint(0, 0xFFFF), rng.randint(0, 300)]) for _ in range(CHANNEL_COUNT)]
+        assert_same(specs, raw)
+
+
+@pytest.mark.parametrize('raw', [0, 1, 0x7FFF, 0x8000, 0xFFFF, 0xFF38])
+def test_registers_are_sign_extended(raw):
+    assert_same([spec(1), spec(2, decimal_point=1)], [raw, raw])
+
+
+def test_gated_channels_are_only_scaled_at_or_above_their_input_low():
+    specs = [spec(1, slope=2.0, input_low=100.0, output_low=5.0, gated=True),
+             spec(2, slope=2.0, input_low=100.0, output_low=5.0, gated=False)]
+    for raw in (0, 99, 100, 101, 0xFFFF):
+        assert_same(specs, [raw, raw])
+
+
+def test_half_way_values_round_like_round():
+    # 0.5 * 5 = 2.5 and 0.5 * 7 / 10 = 0.35: values exactly or nearly half way between two steps
+    specs = [spec(1, slope=0.5), spec(2, decimal_point=1, slope=0.5), spec(3, decimal_point=2, slope=0.125)]
+    for raw in range(0, 400):
+        assert_same(specs, [raw, raw, raw])
+
+
+def test_plain_register_values_stay_ints():
+    specs = [spec(1), spec(2, decimal_point=1), spec(3, slope=1.0), spec(4, slope=1.0, input_low=50.0, gated=True)]
+    snap = snapshot(specs)
+    values = readings([123, 123, 123, 10], snap)
+    assert values == [123, 12.3, 123.0, 10]
+    assert [type(value) for value in values] == [int, float, float, int]
+
+
+def test_missing_channels_are_nan_and_not_integers():
+    snap = snapshot([spec(1), spec(2)])
+    assert np.isnan(channel_config.convert_scan([np.nan, 5], snap)[0])
+    assert list(channel_config.integer_channels([np.nan, 5], snap)) == [False, True]
@@ -0,0 +1,164 @@
+"""
+Chunked OneDrive uploads against the local Graph stand-in (tools/graph_stand_in.py).
+
+Run with: python -m pytest tests
+"""
+import hashlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'tools'))
+
+from graph_stand_in import GraphHandler, GraphStandIn
+from RaspPiReader.libs.onedrive_api import CHUNK_UNIT, NO_PROGRESS_LIMIT, OneDriveAPI, UploadSessionStore
+
+FILE_SIZE = 2 * CHUNK_UNIT + 1000
+
+
+class StalledHandler(GraphHandler):
+    """Accepts upload fragments but never moves the session past byte 0"""
+
+    def _put_fragment(self, session_id):
+        self.state.count('upload_chunk')
+        self._read_body()
+        self._send(202, {'nextExpectedRanges': ['0-']})
+
+
+class ThrottlingHandler(GraphHandler):
+    """Throttles the first simple upload with 429 and Retry-After"""
+
+    def do_PUT(self):
+        if '/upload/' not in self.path and not self.state.requests.get('upload'):
+            self.state.count('upload')
+            self._read_body()
+            return self._error(429, 'activityLimitReached', 'Throttled', {'Retry-After': '1'})
+        return super(ThrottlingHandler, self).do_PUT()
+
+
+def start_stand_in(handler=None):
+    """Start a stand-in; a custom handler must be set before any client connects, as
+    handlers serve a keep-alive connection for its whole lifetime"""
+    stand_in = GraphStandIn()
+    if handler:
+        stand_in.server.RequestHandlerClass = handler
+    return stand_in.start()
+
+
+@pytest.fixture
+def stand_in():
+    server = GraphStandIn().start()
+    yield server
+    server.stop()
+
+
+def make_client(stand_in, tmp_path):
+    api = OneDriveAPI(base_url=stand_in.url, login_url=stand_in.url,
+                      session_store=UploadSessionStore(f"sqlite:///{tmp_path / 'sessions.db'}"))
+    api.authenticate('test-client', 'test-secret', 'test-tenant')
+    return api
+
+
+@pytest.fixture
+def client(stand_in, tmp_path):
+    return make_client(stand_in, tmp_path)
+
+
+@pytest.fixture
+def report(tmp_path):
+    path = tmp_path / 'report.pdf'
+    path.write_bytes(os.urandom(FILE_SIZE))
+    return str(path)
+
+
+def sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def start_interrupted_upload(client, path, chunks):
+    """Create and persist a session for path and send its first chunks, as an interrupted upload would"""
+    target = client._item_path(os.path.basename(path))
+    stat = os.stat(path)
+    upload_url = client._start_session(path, target, stat.st_size, stat.st_mtime)
+    with open(path, 'rb') as f:
+        for index in range(chunks):
+            response = client._put_chunk(upload_url, f.read(CHUNK_UNIT), index * CHUNK_UNIT, stat.st_size)
+            assert response.status_code == 202
+    return upload_url
+
+
+def test_upload_is_sent_in_chunks(stand_in, client, report):
+    item = client.upload_large_file(report, chunk_size=CHUNK_UNIT)
+
+    assert item['size'] == FILE_SIZE
+    assert stand_in.state.files['root/report.pdf'] == (FILE_SIZE, sha256(report))
+    assert stand_in.state.requests['create_upload_session'] == 1
+    assert stand_in.state.requests['upload_chunk'] == 3
+    assert stand_in.state.stats()['open_sessions'] == 0
+
+
+def test_chunk_size_is_rounded_to_the_fragment_unit(stand_in, client, report):
+    client.upload_large_file(report, chunk_size=CHUNK_UNIT + 1000)
+
+    assert stand_in.state.requests['upload_chunk'] == 3
+    assert stand_in.state.files['root/report.pdf'] == (FILE_SIZE, sha256(report))
+
+
+def test_interrupted_upload_resumes_where_it_stopped(stand_in, client, report):
+    start_interrupted_upload(client, report, chunks=1)
+
+    client.upload_large_file(report, chunk_size=CHUNK_UNIT)
+
+    assert stand_in.state.files['root/report.pdf'] == (FILE_SIZE, sha256(report))
+    assert stand_in.state.requests['create_upload_session'] == 1
+    assert stand_in.state.requests['upload_status'] == 1
+    # One chunk before the interruption, the remaining two after it
+    assert stand_in.state.requests['upload_chunk'] == 3
+    target = client._item_path('report.pdf')
+    assert client.sessions.load(report, target, FILE_SIZE, os.stat(report).st_mtime) is None
+
+
+def test_expired_session_restarts_the_upload(stand_in, client, report):
+    upload_url = start_interrupted_upload(client, report, chunks=1)
+    # The session still answers status queries but rejects fragments with 404
+    stand_in.state.sessions[upload_url.rsplit('/', 1)[-1]]['expires'] = 0
+
+    client.upload_large_file(report, chunk_size=CHUNK_UNIT)
+
+    assert stand_in.state.files['root/report.pdf'] == (FILE_SIZE, sha256(report))
+    assert stand_in.state.requests['create_upload_session'] == 2
+    # One chunk before the interruption, the rejected one, then the whole file again
+    assert stand_in.state.requests['upload_chunk'] == 5
+
+
+def test_upload_without_progress_fails(tmp_path, report):
+    stand_in = start_stand_in(StalledHandler)
+    try:
+        client = make_client(stand_in, tmp_path)
+        with pytest.raises(Exception, match="no progress"):
+            client.upload_large_file(report, chunk_size=CHUNK_UNIT)
+    finally:
+        stand_in.stop()
+
+    # Every answer leaves the session at byte 0, the first one included
+    assert stand_in.state.requests['upload_chunk'] == NO_PROGRESS_LIMIT
+    assert 'root/report.pdf' not in stand_in.state.files
+
+
+def test_throttled_simple_upload_is_retried(tmp_path):
+    path = tmp_path / 'report.csv'
+    path.write_bytes(os.urandom(1000))
+    stand_in = start_stand_in(ThrottlingHandler)
+    try:
+        client = make_client(stand_in, tmp_path)
+        item = client.upload_file(str(path))
+    finally:
+        stand_in.stop()
+
+    assert item['size'] == 1000
+    assert stand_in.state.requests['upload'] == 2
+    assert stand_in.state.files['root/report.csv'] == (1000, sha256(str(path)))
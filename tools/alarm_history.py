@@ -0,0 +1,135 @@
+"""
+Query the alarm history.
+
+Answers questions such as "which cycles in the last month had high
+pressure alarms, and for how long?" from the per-cycle alarm summaries
+written at finalization, and lists the alarm transitions of a cycle.
+
+Usage:
+    python tools/alarm_history.py cycles --channel 13 --kind high --days 30
+    python tools/alarm_history.py cycles --since 2025-01-01 --min-minutes 5
+    python tools/alarm_history.py totals --days 365
+    python tools/alarm_history.py events 1042 --channel CH13
+    python tools/alarm_history.py rebuild            # summarize cycles finalized before summaries existed
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RaspPiReader.libs import alarm_history
+from RaspPiReader.libs.database import Database
+
+logging.basicConfig(level=logging.WARNING, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+KIND_NAMES = {kind: name for name, kind in alarm_history.KINDS.items()}
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def time_range(args):
+    since = args.since
+    if args.days is not None:
+        since = datetime.now() - timedelta(days=args.days)
+    return since, args.until
+
+
+def format_seconds(seconds):
+    seconds = int(round(seconds or 0))
+    return f"{seconds // 3600:d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def format_time(value):
+    return value.strftime("%Y-%m-%d %H:%M") if value else "-"
+
+
+def show_cycles(session, args):
+    since, until = time_range(args)
+    min_seconds = args.min_minutes * 60 if args.min_minutes is not None else None
+    kind = alarm_history.KINDS.get(args.kind) if args.kind else None
+    rows = alarm_history.find_cycles(session, args.channel, kind, since, until, min_seconds, args.limit)
+    print(f"{'cycle':>7}  {'order':<14}{'number':<12}{'started':<18}{'channel':<9}{'kind':<6}"
+          f"{'alarms':>7}{'total':>10}{'longest':>10}")
+    for row in rows:
+        print(f"{row.cycle_id:>7}  {str(row.order_id or '-'):<14}{str(row.cycle_number or '-'):<12}"
+              f"{format_time(row.cycle_start):<18}{row.channel:<9}{KIND_NAMES.get(row.kind, row.kind):<6}"
+              f"{row.alarm_count:>7}{format_seconds(row.total_seconds):>10}{format_seconds(row.longest_seconds):>10}")
+    print(f"{len(rows)} rows, {len({row.cycle_id for row in rows})} cycles")
+
+
+def show_totals(session, args):
+    since, until = time_range(args)
+    kind = alarm_history.KINDS.get(args.kind) if args.kind else None
+    rows = alarm_history.totals(session, since, until, kind)
+    print(f"{'channel':<9}{'kind':<6}{'cycles':>8}{'alarms':>8}{'total':>12}")
+    for channel, kind, cycles, count, seconds in rows:
+        print(f"{channel:<9}{KIND_NAMES.get(kind, kind):<6}{cycles:>8}{count:>8}{format_seconds(seconds):>12}")
+
+
+def show_events(session, args):
+    rows = alarm_history.events(session, args.cycle, args.channel)
+    for event in rows:
+        value = f"{event.value:.2f}" if event.value is not None else "-"
+        print(f"{event.timestamp:%Y-%m-%d %H:%M:%S}  {event.channel:<6}{KIND_NAMES.get(event.kind, event.kind):<6}"
+              f"{event.event:<14}{event.state:<14}{value:>10}  {event.message}")
+    print(f"{len(rows)} transitions")
+
+
+def rebuild(session, args):
+    def progress(done, total):
+        print(f"  {done}/{total} cycles")
+    count = alarm_history.rebuild(session, args.cycles or None, progress)
+    print(f"Summarized {count} cycles")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the alarm history")
+    parser.add_argument('--database', default="sqlite:///local_database.db", help="Database URL")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_range(command):
+        command.add_argument('--days', type=int, default=None, help="Only cycles started in the last DAYS days")
+        command.add_argument('--since', type=parse_date, help="Only cycles started on or after this date (YYYY-MM-DD)")
+        command.add_argument('--until', type=parse_date, help="Only cycles started before this date (YYYY-MM-DD)")
+        command.add_argument('--kind', choices=sorted(alarm_history.KINDS), help="Only low or high threshold alarms")
+
+    cycles = commands.add_parser('cycles', help="Cycles with alarms and how long they lasted")
+    add_range(cycles)
+    cycles.add_argument('--channel', help="Only this channel, e.g. 13 or CH13")
+    cycles.add_argument('--min-minutes', type=float, default=None, help="Only alarms up at least this long in total")
+    cycles.add_argument('--limit', type=int, default=None, help="At most this many rows")
+    cycles.set_defaults(handler=show_cycles)
+
+    totals = commands.add_parser('totals', help="Alarm counts and durations per channel")
+    add_range(totals)
+    totals.set_defaults(handler=show_totals)
+
+    events = commands.add_parser('events', help="Alarm transitions of one cycle")
+    events.add_argument('cycle', type=int, help="Cycle id")
+    events.add_argument('--channel', help="Only this channel")
+    events.set_defaults(handler=show_events)
+
+    rebuild_command = commands.add_parser('rebuild', help="Recompute the per-cycle summaries")
+    rebuild_command.add_argument('cycles', nargs='*', type=int, help="Cycle ids (default: every cycle with alarm history)")
+    rebuild_command.set_defaults(handler=rebuild)
+    args = parser.parse_args()
+
+    db = Database(args.database)
+    alarm_history.ensure_indexes(db.engine)
+    started = time.perf_counter()
+    try:
+        args.handler(db.session, args)
+    finally:
+        db.session.close()
+    print(f"({(time.perf_counter() - started) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
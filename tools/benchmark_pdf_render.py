@@ -0,0 +1,129 @@
+"""
+Benchmark report PDF rendering.
+
+Renders the cycle report template with sample data and a full-size plot image
+through every available backend and prints the average render time and file
+size per report:
+
+    native          in-process QTextDocument renderer (PdfRenderService)
+    wkhtmltopdf     wkhtmltopdf with the service's dpi and image settings
+    wkhtmltopdf-old wkhtmltopdf with the previous dpi=2000 options
+
+The wkhtmltopdf rows are skipped when the binary is not installed.
+
+Usage: python tools/benchmark_pdf_render.py [--reports N] [--out DIR]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import jinja2
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PyQt5.QtGui import QGuiApplication
+
+from RaspPiReader.libs.pdf_renderer import PdfRenderService, find_wkhtmltopdf
+
+logging.basicConfig(level=logging.WARNING, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'RaspPiReader', 'ui')
+
+LEGACY_OPTIONS = {
+    'page-size': 'A4',
+    'dpi': 2000,
+    'margin-top': '0.35in',
+    'margin-right': '0.75in',
+    'margin-bottom': '0.75in',
+    'margin-left': '0.75in',
+    'encoding': "UTF-8",
+    'no-outline': None,
+    'enable-local-file-access': None,
+    'quiet': None,
+}
+
+
+def make_plot(path, channels=14, samples=20000):
+    """Write a 1600x900 plot with the density of a long cycle"""
+    figure = Figure(figsize=(16, 9), dpi=100)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot(111)
+    x = np.arange(samples)
+    for channel in range(channels):
+        axes.plot(x, np.cumsum(np.random.randn(samples)) + channel * 10, linewidth=0.8)
+    figure.savefig(path)
+
+
+def make_report_html(plot_path):
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(TEMPLATE_DIR))
+    data = {
+        "order_id": "WO-1001", "cycle_id": "C-42", "quantity": 12, "cycle_location": "Oven 2",
+        "dwell_time": 120, "cool_down_temp": 60, "temp_ramp": 2.5, "set_pressure": 80,
+        "maintain_vacuum": 90, "initial_set_cure_temp": 120, "final_set_cure_temp": 140,
+        "cycle_date": "2024/01/01", "cycle_start_time": "08:00:00", "cycle_end_time": "14:00:00",
+        "serial_numbers": ", ".join(f"SN{n:05d}" for n in range(12)),
+        "plot_path": plot_path, "timestamp": int(time.time()),
+        "alarm_logs": [f"Alarm {n}: CH{n} high limit" for n in range(5)],
+    }
+    return env.get_template('result_template.html').render(data=data)
+
+
+def run_case(name, render, count, out_dir):
+    times = []
+    size = 0
+    for index in range(count):
+        pdf_path = os.path.join(out_dir, f"{name}_{index}.pdf")
+        started = time.perf_counter()
+        render(pdf_path)
+        times.append(time.perf_counter() - started)
+        size = os.path.getsize(pdf_path)
+    # The first render includes warm-up (fonts, image cache)
+    warm = times[1:] or times
+    print(f"{name:<16} first {times[0]:7.2f}s  avg {sum(warm) / len(warm):7.2f}s  size {size / 1024:9.0f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report PDF rendering")
+    parser.add_argument('--reports', type=int, default=5, help="Reports rendered per backend")
+    parser.add_argument('--out', default=None, help="Output folder (default: a temporary folder)")
+    args = parser.parse_args()
+
+    app = QGuiApplication(sys.argv)
+    out_dir = args.out or tempfile.mkdtemp(prefix='pdf_bench_')
+    os.makedirs(out_dir, exist_ok=True)
+    plot_path = os.path.join(out_dir, 'plot.png')
+    make_plot(plot_path)
+    html = make_report_html(plot_path)
+    print(f"Rendering {args.reports} reports per backend into {out_dir}")
+
+    service = PdfRenderService(backend='native')
+    try:
+        run_case('native', lambda path: service.render(html, path), args.reports, out_dir)
+        binary = find_wkhtmltopdf()
+        if not binary:
+            print("wkhtmltopdf not found, skipping wkhtmltopdf backends")
+            return
+        run_case('wkhtmltopdf', lambda path: service.render(html, path, backend='wkhtmltopdf'),
+                 args.reports, out_dir)
+
+        import pdfkit
+        config = pdfkit.configuration(wkhtmltopdf=binary)
+        run_case('wkhtmltopdf-old',
+                 lambda path: pdfkit.from_string(html, path, options=LEGACY_OPTIONS, configuration=config),
+                 args.reports, out_dir)
+    finally:
+        service.shutdown()
+        del app
+
+
+if __name__ == "__main__":
+    main()
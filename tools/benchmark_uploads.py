@@ -0,0 +1,152 @@
+"""
+Benchmark OneDrive report uploads against the local Graph stand-in.
+
+Starts tools/graph_stand_in.py in-process with the requested latency,
+bandwidth and failure rate, generates a batch of synthetic cycle reports
+(CSV, PDF and plot PNG per cycle) and uploads them:
+
+    direct  OneDriveAPI.upload_files() into the day's report folder
+    queue   the persistent UploadQueue, as finalization does, followed by a
+            second pass over the same files that the queue should skip
+
+Prints files/s, cycles/s and MB/s end to end, the client's per-endpoint
+latency and the server's request and injected failure counts. Nothing
+touches the application's settings or local_database.db: the client and
+queue use a scratch database in the output folder.
+
+Usage:
+    python tools/benchmark_uploads.py --cycles 20 --latency 0.05 --bandwidth 5000000
+    python tools/benchmark_uploads.py --mode direct --pdf-kb 8000 --failure-rate 0.1 --workers 4
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_stand_in import GraphStandIn
+from RaspPiReader.libs.onedrive_api import OneDriveAPI, UploadSessionStore
+from RaspPiReader.libs.upload_queue import UploadQueue
+
+logging.basicConfig(level=logging.WARNING, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+
+def make_reports(out_dir, cycles, csv_kb, pdf_kb, png_kb):
+    """
+    Write csv/pdf/png files of the given sizes for each cycle.
+
+    Returns:
+        list: File paths, grouped per cycle
+    """
+    paths = []
+    for cycle in range(1, cycles + 1):
+        for extension, size_kb in (('csv', csv_kb), ('pdf', pdf_kb), ('png', png_kb)):
+            if size_kb <= 0:
+                continue
+            path = os.path.join(out_dir, f"BENCH{cycle:04d}_report.{extension}")
+            with open(path, 'wb') as f:
+                f.write(os.urandom(size_kb * 1024))
+            paths.append(path)
+    return paths
+
+
+def run_direct(client, paths, workers, chunk_size):
+    folder_id = client.daily_folder_id()
+    results = client.upload_files(paths, folder_id, max_workers=workers, chunk_size=chunk_size)
+    return sum(1 for result in results.values() if isinstance(result, Exception))
+
+
+def run_queue(queue, paths, workers, timeout):
+    queue.enqueue_many(paths)
+    queue.start(workers=workers)
+    if not queue.wait_idle(timeout):
+        print(f"Queue did not drain within {timeout}s")
+    return queue.counts().get('failed', 0)
+
+
+def print_results(label, paths, cycles, elapsed, failed):
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    elapsed = max(elapsed, 1e-6)
+    print(f"{label}: {len(paths)} files ({total_bytes / 1024 / 1024:.1f} MB) in {elapsed:.2f}s, {failed} failed")
+    print(f"  {len(paths) / elapsed:.2f} files/s, {cycles / elapsed:.2f} cycles/s, "
+          f"{total_bytes / 1024 / 1024 / elapsed:.2f} MB/s")
+
+
+def print_latency(client):
+    print(f"{'endpoint':<24}{'requests':>10}{'avg ms':>10}{'max ms':>10}")
+    for name, stats in sorted(client.latency_stats().items()):
+        print(f"{name:<24}{stats['count']:>10}{stats['avg_ms']:>10.0f}{stats['max_ms']:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OneDrive report uploads against a local Graph stand-in")
+    parser.add_argument('--mode', choices=('queue', 'direct'), default='queue')
+    parser.add_argument('--cycles', type=int, default=10, help="Cycles in the batch")
+    parser.add_argument('--csv-kb', type=int, default=200, help="CSV size per cycle")
+    parser.add_argument('--pdf-kb', type=int, default=6000, help="PDF size per cycle")
+    parser.add_argument('--png-kb', type=int, default=300, help="Plot size per cycle, 0 to leave it out")
+    parser.add_argument('--workers', type=int, default=2, help="Concurrent uploads")
+    parser.add_argument('--chunk-kb', type=int, default=None, help="Upload session fragment size (direct mode)")
+    parser.add_argument('--latency', type=float, default=0.02, help="Seconds added to every request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Random latency variation in seconds")
+    parser.add_argument('--bandwidth', type=int, default=0, help="Server upload bytes per second, 0 for unlimited")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Probability of a failed upload request")
+    parser.add_argument('--retry-seconds', type=float, default=1.0, help="First queue retry delay after a failed upload")
+    parser.add_argument('--timeout', type=float, default=600, help="Seconds to wait for the queue to drain")
+    parser.add_argument('--out', default=None, help="Scratch folder (default: a temporary folder, removed afterwards)")
+    args = parser.parse_args()
+
+    out_dir = args.out or tempfile.mkdtemp(prefix='upload_bench_')
+    os.makedirs(out_dir, exist_ok=True)
+    database_url = f"sqlite:///{os.path.join(out_dir, 'upload_bench.db')}"
+    stand_in = GraphStandIn(latency=args.latency, jitter=args.jitter, bandwidth=args.bandwidth,
+                            failure_rate=args.failure_rate).start()
+    try:
+        paths = make_reports(out_dir, args.cycles, args.csv_kb, args.pdf_kb, args.png_kb)
+        print(f"Uploading {args.cycles} cycles ({len(paths)} files) in {args.mode} mode with {args.workers} workers, "
+              f"latency {args.latency * 1000:.0f} ms, bandwidth "
+              f"{f'{args.bandwidth / 1024 / 1024:.1f} MB/s' if args.bandwidth else 'unlimited'}, "
+              f"failure rate {args.failure_rate:.0%}")
+
+        client = OneDriveAPI(base_url=stand_in.url, login_url=stand_in.url,
+                             session_store=UploadSessionStore(database_url))
+        client.authenticate('bench-client', 'bench-secret', 'bench-tenant')
+        chunk_size = args.chunk_kb * 1024 if args.chunk_kb else None
+
+        started = time.perf_counter()
+        if args.mode == 'direct':
+            failed = run_direct(client, paths, args.workers, chunk_size)
+            print_results("direct", paths, args.cycles, time.perf_counter() - started, failed)
+        else:
+            queue = UploadQueue(database_url, client_factory=lambda: client, retry_seconds=args.retry_seconds)
+            failed = run_queue(queue, paths, args.workers, args.timeout)
+            print_results("queue", paths, args.cycles, time.perf_counter() - started, failed)
+
+            # Unchanged files must not be sent again
+            before = stand_in.state.stats()['bytes_received']
+            started = time.perf_counter()
+            queued = queue.enqueue_many(paths)
+            queue.wait_idle(args.timeout)
+            resent = stand_in.state.stats()['bytes_received'] - before
+            print(f"second pass: {queued} files queued again, {resent} bytes sent, "
+                  f"{time.perf_counter() - started:.2f}s")
+            queue.stop()
+
+        print_latency(client)
+        stats = stand_in.state.stats()
+        print(f"server: {stats['files']} files stored, {stats['bytes_received'] / 1024 / 1024:.1f} MB received, "
+              f"{stats['failures']} injected failures")
+        print("  " + ", ".join(f"{name} {count}" for name, count in sorted(stats['requests'].items())))
+    finally:
+        stand_in.stop()
+        if not args.out:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
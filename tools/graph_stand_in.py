@@ -0,0 +1,394 @@
+"""
+Local stand-in for the Microsoft Graph endpoints used by OneDriveAPI.
+
+Emulates just enough of Graph to run report uploads without a tenant:
+
+    POST /<tenant>/oauth2/v2.0/token                      client credentials token
+    GET  /me/drive                                        connection check
+    GET  /me/drive/root:/<name>                           folder lookup
+    POST /me/drive/root/children, /items/<id>/children    create folder
+    PUT  .../<name>:/content                              simple upload
+    POST .../<name>:/createUploadSession                  upload session
+    PUT  /upload/<session>                                session fragment (Content-Range)
+    GET  /upload/<session>                                session status (nextExpectedRanges)
+    DELETE /upload/<session>                              cancel a session
+
+Latency, link bandwidth and failures can be injected: every request waits
+--latency seconds (plus jitter), request bodies are read no faster than
+--bandwidth bytes/s shared by all connections, and uploads answer 503 (or
+429 with Retry-After) with probability --failure-rate. Uploaded content is
+not kept, only its size and SHA-256.
+
+Point the application at it with the 'onedrive_graph_url' and
+'onedrive_login_url' settings, or construct OneDriveAPI(base_url=...,
+login_url=...) as tools/benchmark_uploads.py does.
+
+Usage:
+    python tools/graph_stand_in.py --port 8765 --latency 0.05 --bandwidth 2000000 --failure-rate 0.05
+"""
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK = 64 * 1024
+
+_TOKEN_RE = re.compile(r'^/[^/]+/oauth2/v2\.0/token$')
+_CHILDREN_RE = re.compile(r'^/me/drive/(?:root|items/(?P<parent>[^/]+))/children$')
+_FOLDER_RE = re.compile(r'^/me/drive/root:/(?P<name>[^:]+)$')
+_ITEM_RE = re.compile(r'^/me/drive/(?:root|items/(?P<parent>[^/:]+)):/(?P<name>[^:]+):/(?P<action>content|createUploadSession)$')
+_SESSION_RE = re.compile(r'^/upload/(?P<session>[0-9a-f]+)$')
+_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class Throttle(object):
+    """Token bucket limiting the bytes per second read across all connections"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def consume(self, count):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + count / self.rate
+            wait = self._next - now
+        if wait > 0:
+            time.sleep(wait)
+
+
+class GraphState(object):
+    """Drive contents, tokens, upload sessions and request counters"""
+
+    def __init__(self, token_lifetime=3600, session_lifetime=3600):
+        self.token_lifetime = token_lifetime
+        self.session_lifetime = session_lifetime
+        self.lock = threading.Lock()
+        self.tokens = {}
+        self.folders = {}
+        self.files = {}
+        self.sessions = {}
+        self.requests = {}
+        self.failures = 0
+        self.bytes_received = 0
+
+    def count(self, endpoint):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def issue_token(self):
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.tokens[token] = time.monotonic() + self.token_lifetime
+        return token
+
+    def token_valid(self, header):
+        if not header or not header.startswith('Bearer '):
+            return False
+        with self.lock:
+            expires = self.tokens.get(header[7:])
+        return expires is not None and expires > time.monotonic()
+
+    def stats(self):
+        with self.lock:
+            return {'requests': dict(self.requests), 'failures': self.failures,
+                    'bytes_received': self.bytes_received, 'files': len(self.files),
+                    'open_sessions': len(self.sessions)}
+
+
+class GraphHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _send(self, status, body=None, headers=None):
+        data = b'' if status == 204 else json.dumps(body or {}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, code, message, headers=None):
+        self._send(status, {'error': {'code': code, 'message': message}}, headers)
+
+    def _read_body(self, digest=None):
+        """Read the request body at the configured bandwidth; returns its length, or the bytes without digest"""
+        remaining = int(self.headers.get('Content-Length') or 0)
+        chunks = [] if digest is None else None
+        size = 0
+        while remaining > 0:
+            block = self.rfile.read(min(READ_BLOCK, remaining))
+            if not block:
+                break
+            self.server.throttle.consume(len(block))
+            remaining -= len(block)
+            size += len(block)
+            if digest is None:
+                chunks.append(block)
+            else:
+                digest.update(block)
+        with self.state.lock:
+            self.state.bytes_received += size
+        return size if digest is not None else b''.join(chunks)
+
+    def _delay(self):
+        latency = self.server.latency
+        if latency:
+            time.sleep(max(0.0, latency + random.uniform(-self.server.jitter, self.server.jitter)))
+
+    def _inject_failure(self):
+        """Answer an upload with an injected 503 or 429; True if the request was answered"""
+        if random.random() >= self.server.failure_rate:
+            return False
+        with self.state.lock:
+            self.state.failures += 1
+        if random.random() < 0.5:
+            self._error(429, 'activityLimitReached', 'Injected throttling', {'Retry-After': '1'})
+        else:
+            self._error(503, 'serviceNotAvailable', 'Injected failure')
+        return True
+
+    def _authorized(self):
+        if self.state.token_valid(self.headers.get('Authorization')):
+            return True
+        self._error(401, 'InvalidAuthenticationToken', 'Access token is missing or expired')
+        return False
+
+    def _item(self, name, size, sha256):
+        return {'id': uuid.uuid5(uuid.NAMESPACE_URL, name).hex, 'name': name.rsplit('/', 1)[-1],
+                'size': size, 'file': {'hashes': {'sha256Hash': sha256}}}
+
+    def do_POST(self):
+        self._delay()
+        path = self.path.split('?', 1)[0]
+        if _TOKEN_RE.match(path):
+            self.state.count('token')
+            self._read_body()
+            return self._send(200, {'token_type': 'Bearer', 'expires_in': self.state.token_lifetime,
+                                    'access_token': self.state.issue_token()})
+        match = _CHILDREN_RE.match(path)
+        if match:
+            self.state.count('create_folder')
+            body = json.loads(self._read_body() or b'{}')
+            if not self._authorized():
+                return
+            name = body.get('name', 'folder')
+            with self.state.lock:
+                folder_name = name
+                suffix = 1
+                while folder_name in self.state.folders:
+                    suffix += 1
+                    folder_name = f"{name} {suffix}"
+                folder_id = uuid.uuid4().hex
+                self.state.folders[folder_name] = folder_id
+            return self._send(201, {'id': folder_id, 'name': folder_name, 'folder': {'childCount': 0}})
+        match = _ITEM_RE.match(path)
+        if match and match.group('action') == 'createUploadSession':
+            self.state.count('create_upload_session')
+            self._read_body()
+            if not self._authorized():
+                return
+            session_id = uuid.uuid4().hex
+            name = f"{match.group('parent') or 'root'}/{match.group('name')}"
+            expires = datetime.utcnow() + timedelta(seconds=self.state.session_lifetime)
+            with self.state.lock:
+                self.state.sessions[session_id] = {'name': name, 'offset': 0, 'digest': hashlib.sha256(),
+                                                   'expires': time.monotonic() + self.state.session_lifetime}
+            host, port = self.server.server_address[:2]
+            return self._send(200, {'uploadUrl': f"http://{host}:{port}/upload/{session_id}",
+                                    'expirationDateTime': expires.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+                                    'nextExpectedRanges': ['0-']})
+        self._read_body()
+        self._error(404, 'itemNotFound', f"No route for POST {path}")
+
+    def do_GET(self):
+        self._delay()
+        path = self.path.split('?', 1)[0]
+        match = _SESSION_RE.match(path)
+        if match:
+            self.state.count('upload_status')
+            with self.state.lock:
+                session = self.state.sessions.get(match.group('session'))
+                offset = session['offset'] if session else None
+            if session is None:
+                return self._error(404, 'itemNotFound', 'Upload session not found')
+            return self._send(200, {'nextExpectedRanges': [f"{offset}-"]})
+        if not self._authorized():
+            return
+        if path == '/me/drive':
+            self.state.count('drive')
+            return self._send(200, {'id': 'stand-in-drive', 'driveType': 'business'})
+        match = _FOLDER_RE.match(path)
+        if match:
+            self.state.count('get_folder')
+            with self.state.lock:
+                folder_id = self.state.folders.get(match.group('name'))
+            if folder_id is None:
+                return self._error(404, 'itemNotFound', 'Folder not found')
+            return self._send(200, {'id': folder_id, 'name': match.group('name'), 'folder': {}})
+        self._error(404, 'itemNotFound', f"No route for GET {path}")
+
+    def do_PUT(self):
+        self._delay()
+        path = self.path.split('?', 1)[0]
+        match = _SESSION_RE.match(path)
+        if match:
+            return self._put_fragment(match.group('session'))
+        match = _ITEM_RE.match(path)
+        if match and match.group('action') == 'content':
+            self.state.count('upload')
+            digest = hashlib.sha256()
+            size = self._read_body(digest)
+            if not self._authorized() or self._inject_failure():
+                return
+            name = f"{match.group('parent') or 'root'}/{match.group('name')}"
+            with self.state.lock:
+                self.state.files[name] = (size, digest.hexdigest())
+            return self._send(201, self._item(name, size, digest.hexdigest()))
+        self._read_body()
+        self._error(404, 'itemNotFound', f"No route for PUT {path}")
+
+    def _put_fragment(self, session_id):
+        self.state.count('upload_chunk')
+        with self.state.lock:
+            session = self.state.sessions.get(session_id)
+        if session is None or session['expires'] <= time.monotonic():
+            self._read_body()
+            return self._error(404, 'itemNotFound', 'Upload session not found or expired')
+        if self.headers.get('Authorization'):
+            self._read_body()
+            return self._error(401, 'unauthenticated', 'Upload URLs must not carry an Authorization header')
+        match = _RANGE_RE.match(self.headers.get('Content-Range') or '')
+        if not match:
+            self._read_body()
+            return self._error(400, 'invalidRequest', 'Missing or invalid Content-Range')
+        first, last, total = (int(value) for value in match.groups())
+        data = self._read_body()
+        if self._inject_failure():
+            return
+        with self.state.lock:
+            if first != session['offset'] or last - first + 1 != len(data):
+                offset = session['offset']
+                expected = True
+            else:
+                expected = False
+                session['digest'].update(data)
+                session['offset'] = last + 1
+                offset = session['offset']
+                if offset == total:
+                    sha256 = session['digest'].hexdigest()
+                    self.state.files[session['name']] = (total, sha256)
+                    del self.state.sessions[session_id]
+        if expected:
+            return self._error(416, 'invalidRange', f"Expected a fragment starting at byte {offset}")
+        if offset == total:
+            return self._send(201, self._item(session['name'], total, sha256))
+        return self._send(202, {'nextExpectedRanges': [f"{offset}-"],
+                                'expirationDateTime': datetime.utcnow().isoformat() + 'Z'})
+
+    def do_DELETE(self):
+        self._delay()
+        match = _SESSION_RE.match(self.path.split('?', 1)[0])
+        if match:
+            self.state.count('cancel_session')
+            with self.state.lock:
+                found = self.state.sessions.pop(match.group('session'), None) is not None
+            return self._send(204) if found else self._error(404, 'itemNotFound', 'Upload session not found')
+        self._error(404, 'itemNotFound', f"No route for DELETE {self.path}")
+
+
+class GraphStandIn(object):
+    """
+    The stand-in server, running on a background thread.
+
+    Args:
+        host / port: Listen address; port 0 picks a free port
+        latency: Seconds added to every request
+        jitter: Latency varies by up to this many seconds either way
+        bandwidth: Bytes per second read across all uploads, 0 for unlimited
+        failure_rate: Probability that an upload request fails (503, or 429 with Retry-After)
+        token_lifetime: expires_in of issued tokens
+        session_lifetime: Seconds an upload session stays valid
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, bandwidth=0, failure_rate=0.0,
+                 token_lifetime=3600, session_lifetime=3600):
+        self.server = ThreadingHTTPServer((host, port), GraphHandler)
+        self.server.daemon_threads = True
+        self.server.state = GraphState(token_lifetime, session_lifetime)
+        self.server.throttle = Throttle(bandwidth)
+        self.server.latency = latency
+        self.server.jitter = min(jitter, latency)
+        self.server.failure_rate = failure_rate
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def set_failure_rate(self, rate):
+        self.server.failure_rate = rate
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="graph_stand_in", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Microsoft Graph stand-in for OneDrive upload tests")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Random latency variation in seconds")
+    parser.add_argument('--bandwidth', type=int, default=0, help="Upload bytes per second, 0 for unlimited")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Probability of a failed upload request")
+    parser.add_argument('--token-lifetime', type=int, default=3600, help="Seconds a token stays valid")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+    stand_in = GraphStandIn(args.host, args.port, args.latency, args.jitter, args.bandwidth,
+                            args.failure_rate, args.token_lifetime)
+    print(f"Graph stand-in listening on {stand_in.url}")
+    print(f"Set onedrive_graph_url={stand_in.url} and onedrive_login_url={stand_in.url}")
+    try:
+        stand_in.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(stand_in.state.stats(), indent=1))
+        stand_in.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Build the reports catalog for report files written before it existed.
+
+Walks one or more report folders and records every CSV/PDF/HTML/PNG/TXT file
+in the report_files table with its size, checksum and the cycle it belongs
+to (matched through the cycle number in the file name). Files that are
+already cataloged and unchanged are skipped, so the script can be re-run.
+
+Usage: python tools/index_reports.py [folder ...] [--no-checksum]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RaspPiReader.libs.reports_catalog import ReportsCatalog
+
+logging.basicConfig(level=logging.WARNING, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index existing report files into the reports catalog")
+    parser.add_argument('folders', nargs='*', help="Report folders (default: ./reports)")
+    parser.add_argument('--database', default="sqlite:///local_database.db", help="Database URL")
+    parser.add_argument('--no-checksum', action='store_true', help="Skip SHA-256 checksums")
+    args = parser.parse_args()
+
+    folders = args.folders or [os.path.join(os.getcwd(), "reports")]
+    catalog = ReportsCatalog(args.database)
+    started = time.perf_counter()
+    totals = {'indexed': 0, 'skipped': 0, 'unmatched': 0}
+
+    def progress(indexed, skipped, path):
+        print(f"  {indexed} files indexed ...")
+
+    for folder in folders:
+        if not os.path.isdir(folder):
+            logger.error(f"Not a folder: {folder}")
+            continue
+        print(f"Indexing {folder}")
+        counts = catalog.index_folder(folder, checksum=not args.no_checksum, progress=progress)
+        for key, value in counts.items():
+            totals[key] += value
+        print(f"  indexed {counts['indexed']}, unchanged {counts['skipped']}, "
+              f"without a matching cycle {counts['unmatched']}")
+
+    print(f"Done in {time.perf_counter() - started:.1f}s: {totals['indexed']} indexed, "
+          f"{totals['skipped']} unchanged, {totals['unmatched']} without a matching cycle")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Profile application startup.
+
+Runs the startup imports in a fresh interpreter with `python -X importtime`
+and reports where the time goes: the slowest modules by cumulative and by
+own import time, the total per top-level package, and which heavy optional
+modules (matplotlib, pandas, pymodbus, ...) were loaded. With --login it
+also times, over several fresh interpreters, how long it takes from start
+until the login window is shown.
+
+Run it on the Pi before and after a change to see its effect on startup:
+
+    python tools/profile_startup.py
+    python tools/profile_startup.py --login --runs 5
+    python tools/profile_startup.py --module run --module RaspPiReader.ui.main_form_handler   # and what login then costs
+
+Usage: python tools/profile_startup.py [--module M ...] [--top N] [--login] [--runs N]
+"""
+import argparse
+import logging
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import namedtuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+logging.basicConfig(level=logging.WARNING, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+# Modules that should only load when the feature needing them is used
+HEAVY_MODULES = ('matplotlib', 'matplotlib.pyplot', 'pandas', 'pyqtgraph', 'pyqtgraph.exporters', 'pymodbus',
+                 'pyodbc', 'jinja2', 'requests', 'numpy')
+
+# What the login window needs from start, timed by --login
+LOGIN_SCRIPT = """
+import time
+started = time.perf_counter()
+import run
+from PyQt5 import QtWidgets
+from RaspPiReader.ui.login_form_handler import LoginFormHandler
+app = QtWidgets.QApplication([])
+form = LoginFormHandler()
+form.show()
+app.processEvents()
+print(time.perf_counter() - started)
+"""
+
+# One line of -X importtime output; times in microseconds, depth from the name's indentation
+ImportTime = namedtuple('ImportTime', ['name', 'self_us', 'cumulative_us', 'depth'])
+
+_LINE_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$')
+
+
+def _environment():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    if sys.platform.startswith('linux') and not env.get('DISPLAY'):
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return env
+
+
+def parse_importtime(output):
+    """
+    Parse `python -X importtime` output.
+
+    Returns:
+        list: ImportTime per imported module, in import completion order
+    """
+    rows = []
+    for line in output.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append(ImportTime(name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def profile_imports(modules, cwd=ROOT):
+    """
+    Import modules in a fresh interpreter and collect its import times.
+
+    Args:
+        modules: Module names to import, in order
+        cwd: Working directory of the interpreter (the database and settings are looked up from there)
+
+    Returns:
+        list: ImportTime rows, see parse_importtime()
+    """
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=cwd, env=_environment(),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    rows = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError(f"Importing {', '.join(modules)} failed: {' '.join(errors[-3:])}")
+    return rows
+
+
+def time_login(runs, cwd=ROOT):
+    """
+    Seconds from interpreter start until the login window is shown, per run.
+
+    Each run starts a new interpreter, so module caches do not carry over
+    but the operating system's file cache does, as on a warm restart.
+    """
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', LOGIN_SCRIPT], cwd=cwd, env=_environment(),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Showing the login window failed: {result.stderr.strip().splitlines()[-1:]}")
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def print_report(rows, top):
+    total = sum(row.self_us for row in rows)
+    print(f"{len(rows)} modules imported in {total / 1000:.1f} ms")
+
+    print(f"\nSlowest imports including what they import:")
+    for row in sorted(rows, key=lambda row: row.cumulative_us, reverse=True)[:top]:
+        print(f"  {row.cumulative_us / 1000:9.1f} ms  {'  ' * (row.depth - 1)}{row.name}")
+
+    print(f"\nSlowest imports by own time:")
+    for row in sorted(rows, key=lambda row: row.self_us, reverse=True)[:top]:
+        print(f"  {row.self_us / 1000:9.1f} ms  {row.name}")
+
+    packages = {}
+    for row in rows:
+        package = row.name.split('.')[0]
+        packages[package] = packages.get(package, 0) + row.self_us
+    print(f"\nPer package:")
+    for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {self_us / 1000:9.1f} ms  {package:<24}{self_us * 100 / total if total else 0:5.1f}%")
+
+    print(f"\nHeavy modules:")
+    for name in HEAVY_MODULES:
+        # Own time of the module and its submodules, wherever they were first imported from
+        modules = [row for row in rows if row.name == name or row.name.startswith(name + '.')]
+        status = f"loaded, {sum(row.self_us for row in modules) / 1000:.1f} ms" if modules else "not loaded"
+        print(f"  {name:<24}{status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile application startup")
+    parser.add_argument('--module', action='append', help="Module to import (repeatable, default: run)")
+    parser.add_argument('--top', type=int, default=20, help="Rows per section")
+    parser.add_argument('--login', action='store_true', help="Also time start until the login window is shown")
+    parser.add_argument('--runs', type=int, default=3, help="Runs to time with --login")
+    parser.add_argument('--cwd', default=ROOT, help="Directory to start in (where local_database.db lives)")
+    args = parser.parse_args()
+
+    try:
+        print_report(profile_imports(args.module or ['run'], args.cwd), args.top)
+        if args.login:
+            times = time_login(args.runs, args.cwd)
+            print(f"\nLogin window shown after {statistics.median(times) * 1000:.0f} ms "
+                  f"(median of {len(times)}, {min(times) * 1000:.0f}-{max(times) * 1000:.0f} ms)")
+    except Exception as e:
+        logger.error(f"{e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
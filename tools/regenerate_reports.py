@@ -0,0 +1,308 @@
+"""
+Regenerate cycle report artifacts from stored data.
+
+Rebuilds the CSV, plot, HTML and PDF reports of the selected cycles from the
+database, one cycle per task on a process pool. The finalization stages run
+with the PLC signal disabled, so the script never talks to the PLC, and the
+cycle's report record, serial numbers and OneDrive uploads are left alone.
+The reports get the cycle's stored serial numbers, and the supervisor and
+alarm values it was finalized with, as recorded by its finalization job.
+
+Progress is kept in a JSON state file: cycles that finished are skipped when
+the script is started again with the same state file, so an interrupted run
+resumes where it stopped. Use --restart to regenerate everything again.
+
+Usage:
+    python tools/regenerate_reports.py --all
+    python tools/regenerate_reports.py 12 15-20 --workers 4
+    python tools/regenerate_reports.py --since 2024-01-01 --stages csv,html
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+logging.basicConfig(level=logging.WARNING, format='%(levelname)s:%(processName)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+# Stages a regeneration may run; 'prepare' always runs first
+REGENERATION_STAGES = ('csv', 'plot', 'pyramid', 'alarms', 'html', 'pdf')
+DEFAULT_STAGES = ('csv', 'plot', 'html', 'pdf')
+DEFAULT_STATE_FILE = "regenerate_reports_state.json"
+
+_app = None
+
+
+def parse_cycle_ids(values):
+    """Expand '12' and '15-20' style arguments into a sorted list of ids"""
+    ids = set()
+    for value in values:
+        for part in str(value).split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if '-' in part:
+                first, last = part.split('-', 1)
+                ids.update(range(int(first), int(last) + 1))
+            else:
+                ids.add(int(part))
+    return sorted(ids)
+
+
+def select_cycles(database_url, ids=None, select_all=False, since=None, until=None):
+    """
+    Return the database ids of the cycles to regenerate.
+
+    Args:
+        ids: Explicit cycle ids
+        select_all: Every cycle in the database
+        since / until: Only cycles that started in this date range
+    """
+    from RaspPiReader.libs.database import Database
+    from RaspPiReader.libs.models import CycleData
+
+    db = Database(database_url)
+    try:
+        query = db.session.query(CycleData.id)
+        if ids:
+            query = query.filter(CycleData.id.in_(ids))
+        elif not (select_all or since or until):
+            return []
+        if since:
+            query = query.filter(CycleData.start_time >= since)
+        if until:
+            query = query.filter(CycleData.start_time < until)
+        return [row[0] for row in query.order_by(CycleData.id)]
+    finally:
+        db.session.close()
+
+
+def load_state(path):
+    if not path or not os.path.exists(path):
+        return {'done': {}, 'failed': {}}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        state.setdefault('done', {})
+        state.setdefault('failed', {})
+        return state
+    except Exception as e:
+        logger.error(f"Error reading state file {path}, starting over: {e}")
+        return {'done': {}, 'failed': {}}
+
+
+def save_state(path, state):
+    """Write the state file atomically so an interruption never leaves it half written"""
+    if not path:
+        return
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1)
+    os.replace(temp_path, path)
+
+
+def stored_context(database_url, cycle_db_id):
+    """
+    Return what the cycle was finalized with: its serial numbers, and the
+    supervisor and alarm values from the context of its latest finalization job.
+
+    Returns:
+        tuple: (serial number list, supervisor username or None, alarm values dict)
+    """
+    from RaspPiReader.libs.database import Database
+    from RaspPiReader.libs.models import CycleSerialNumber, FinalizationJob
+
+    db = Database(database_url)
+    try:
+        serial_numbers = [row[0] for row in db.session.query(CycleSerialNumber.serial_number)
+                          .filter(CycleSerialNumber.cycle_id == cycle_db_id)
+                          .order_by(CycleSerialNumber.id)]
+        job_context = db.session.query(FinalizationJob.context)\
+            .filter(FinalizationJob.cycle_id == cycle_db_id)\
+            .order_by(FinalizationJob.id.desc())\
+            .first()
+    finally:
+        db.session.close()
+
+    stored = {}
+    if job_context and job_context[0]:
+        try:
+            stored = json.loads(job_context[0])
+        except ValueError as e:
+            logger.error(f"Error reading the finalization context of cycle {cycle_db_id}: {e}")
+    if not serial_numbers:
+        serial_numbers = list(stored.get('serial_numbers') or [])
+    return serial_numbers, stored.get('supervisor_username'), dict(stored.get('alarm_values') or {})
+
+
+def init_worker(working_dir, database_url):
+    """
+    Process pool initializer: the native PDF renderer needs a Qt application
+    per process, and the shared catalog, artifact store and template cache
+    must use the database the cycles are read from.
+    """
+    global _app
+    os.chdir(working_dir)
+    if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtGui import QGuiApplication
+    from RaspPiReader.libs import artifact_store, report_templates, reports_catalog
+    _app = QGuiApplication.instance() or QGuiApplication([sys.argv[0]])
+    reports_catalog.configure(database_url)
+    artifact_store.configure(database_url)
+    report_templates.configure(database_url)
+
+
+def regenerate_cycle(cycle_db_id, stages, reports_folder, template_file, database_url):
+    """
+    Run the selected finalization stages for one cycle without signalling the PLC.
+
+    Returns:
+        dict: cycle id, success flag, per-stage seconds, written files and error text
+    """
+    from RaspPiReader.libs.cycle_finalization import STAGE_FUNCTIONS, new_finalization_context
+
+    result = {'cycle': cycle_db_id, 'ok': False, 'times': {}, 'files': [], 'bytes': 0, 'error': None}
+    try:
+        serial_numbers, supervisor_username, alarm_values = stored_context(database_url, cycle_db_id)
+        ctx = new_finalization_context(cycle_db_id, serial_numbers, supervisor_username, alarm_values,
+                                       reports_folder, template_file, signal_plc=False, plot_from_data=True,
+                                       open_report=False, database_url=database_url)
+        for stage in ('prepare',) + tuple(stages):
+            started = time.perf_counter()
+            STAGE_FUNCTIONS[stage](ctx)
+            result['times'][stage] = time.perf_counter() - started
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        return result
+
+    outputs = {'csv': ctx.get('csv_path'), 'plot': ctx.get('plot_path'),
+               'html': ctx.get('html_path'), 'pdf': ctx.get('pdf_path')}
+    for stage in stages:
+        path = outputs.get(stage)
+        if path and os.path.exists(path):
+            result['files'].append(path)
+            result['bytes'] += os.path.getsize(path)
+    missing = [stage for stage in stages if stage in outputs and outputs[stage] not in result['files']]
+    if missing:
+        result['error'] = f"No output written by stage(s): {', '.join(missing)}"
+    else:
+        result['ok'] = True
+    return result
+
+
+def print_summary(results, elapsed, skipped):
+    done = [result for result in results if result['ok']]
+    failed = [result for result in results if not result['ok']]
+    total_bytes = sum(result['bytes'] for result in results)
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+    print()
+    print(f"Regenerated {len(done)} cycles, {len(failed)} failed, {skipped} skipped (already done) "
+          f"in {elapsed:.1f}s")
+    print(f"Throughput: {rate:.2f} cycles/s, {total_bytes / 1024 / 1024 / elapsed if elapsed > 0 else 0:.2f} MB/s "
+          f"({total_bytes / 1024 / 1024:.1f} MB written)")
+    stage_times = {}
+    for result in results:
+        for stage, seconds in result['times'].items():
+            stage_times.setdefault(stage, []).append(seconds)
+    if stage_times:
+        print(f"{'stage':<10}{'avg s':>10}{'max s':>10}{'total s':>10}")
+        for stage, times in stage_times.items():
+            print(f"{stage:<10}{sum(times) / len(times):>10.3f}{max(times):>10.3f}{sum(times):>10.1f}")
+    for result in failed:
+        print(f"  cycle {result['cycle']} failed: {result['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate cycle reports from stored data")
+    parser.add_argument('cycles', nargs='*', help="Cycle ids or ranges, e.g. 12 15-20")
+    parser.add_argument('--all', action='store_true', help="Regenerate every cycle")
+    parser.add_argument('--since', type=lambda value: datetime.strptime(value, "%Y-%m-%d"),
+                        help="Only cycles started on or after this date (YYYY-MM-DD)")
+    parser.add_argument('--until', type=lambda value: datetime.strptime(value, "%Y-%m-%d"),
+                        help="Only cycles started before this date (YYYY-MM-DD)")
+    parser.add_argument('--stages', default=",".join(DEFAULT_STAGES),
+                        help=f"Comma separated stages out of {', '.join(REGENERATION_STAGES)}")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Worker processes")
+    parser.add_argument('--reports-folder', default="reports", help="Output folder, relative to the working directory")
+    parser.add_argument('--template', default="RaspPiReader/ui/result_template.html", help="Report template file")
+    parser.add_argument('--state', default=DEFAULT_STATE_FILE, help="Progress file used to resume an interrupted run")
+    parser.add_argument('--restart', action='store_true', help="Ignore the progress file and regenerate every selected cycle")
+    parser.add_argument('--database', default="sqlite:///local_database.db",
+                        help="Database URL the cycles are read from and their records written to")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in REGENERATION_STAGES]
+    if unknown:
+        parser.error(f"Unknown stage(s): {', '.join(unknown)}")
+    if ('html' in stages or 'pdf' in stages) and 'plot' not in stages:
+        stages.insert(0, 'plot')
+    if 'pdf' in stages and 'html' not in stages:
+        stages.insert(stages.index('pdf'), 'html')
+    stages = [stage for stage in REGENERATION_STAGES if stage in stages]
+
+    try:
+        cycle_ids = select_cycles(args.database, parse_cycle_ids(args.cycles), args.all, args.since, args.until)
+    except ValueError as e:
+        parser.error(f"Invalid cycle id: {e}")
+    if not cycle_ids:
+        print("No cycles selected (give cycle ids, --all, --since or --until)")
+        return
+
+    state = {'done': {}, 'failed': {}} if args.restart else load_state(args.state)
+    pending = [cycle_id for cycle_id in cycle_ids if str(cycle_id) not in state['done']]
+    skipped = len(cycle_ids) - len(pending)
+    print(f"Regenerating {len(pending)} of {len(cycle_ids)} cycles ({', '.join(stages)}) "
+          f"with {args.workers} workers")
+    if not pending:
+        return
+
+    results = []
+    started = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                   initargs=(os.getcwd(), args.database))
+    try:
+        futures = {executor.submit(regenerate_cycle, cycle_id, stages, args.reports_folder, args.template,
+                                   args.database): cycle_id
+                   for cycle_id in pending}
+        for future in as_completed(futures):
+            cycle_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'cycle': cycle_id, 'ok': False, 'times': {}, 'files': [], 'bytes': 0,
+                          'error': f"{type(e).__name__}: {e}"}
+            results.append(result)
+            key = str(cycle_id)
+            if result['ok']:
+                state['done'][key] = {'files': result['files'], 'at': datetime.now().isoformat(timespec='seconds')}
+                state['failed'].pop(key, None)
+            else:
+                state['failed'][key] = result['error']
+            save_state(args.state, state)
+            elapsed = time.perf_counter() - started
+            print(f"  [{len(results)}/{len(pending)}] cycle {cycle_id} "
+                  f"{'ok' if result['ok'] else 'FAILED'} ({len(results) / elapsed:.2f} cycles/s)")
+    except KeyboardInterrupt:
+        print("Interrupted; finished cycles are recorded in the state file, run again to resume")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise SystemExit(1)
+    finally:
+        executor.shutdown(wait=True)
+
+    print_summary(results, time.perf_counter() - started, skipped)
+
+
+if __name__ == "__main__":
+    main()